@@ -27,6 +27,41 @@ def create_app(config_name=None):
     # Inicializar extensiones
     db.init_app(app)
     
+    # Listener que mantiene asistencia_resumen_mensual en cada flush de Asistencia
+    from . import resumen_asistencia  # noqa: F401
+    
+    # Calendario laboral memorizado por proceso: una app nueva puede apuntar a otra BD
+    from .calendario import invalidar_calendario
+    invalidar_calendario()
+    
+    # Caché de dispositivos de marcación (hash -> id), también por proceso
+    from .dispositivos import invalidar_dispositivos
+    invalidar_dispositivos()
+    
+    # Tablero de presencia en vivo: estado por día en memoria, mantenido por la sesión
+    from .tablero_presencia import invalidar_tablero
+    invalidar_tablero()
+    
+    # Caché de métricas de asistencia por período (se invalida con cada cambio de asistencias)
+    from .metricas_asistencia import invalidar_metricas
+    invalidar_metricas()
+    
+    # Configuración de la empresa cacheada (se recarga cuando cambia estado_sistema.empresa_version)
+    from .empresa_config import invalidar_empresa
+    invalidar_empresa()
+    
+    # Usuarios de la sesión cacheados (se recargan cuando cambia estado_sistema.usuarios_version)
+    from .sesion_usuarios import invalidar_principales
+    invalidar_principales()
+    
+    # Reglas de asistencia (umbrales ASISTENCIA_*) parseadas una sola vez
+    from .marcaciones import ReglasAsistencia
+    app.extensions['reglas_asistencia'] = ReglasAsistencia.desde_config(app.config)
+    
+    # Logger estructurado de nómina (silencioso por debajo de NOMINA_LOG_NIVEL)
+    from .trazas import configurar_logger
+    configurar_logger(app)
+    
     # Inicializar CSRF protection
     csrf = CSRFProtect()
     csrf.init_app(app)
@@ -40,7 +75,8 @@ def create_app(config_name=None):
     
     @login_manager.user_loader
     def load_user(user_id):
-        return Usuario.query.get(int(user_id))
+        from .sesion_usuarios import cargar_principal
+        return cargar_principal(int(user_id))
     
     # Crear directorio de uploads
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
@@ -64,10 +100,9 @@ def create_app(config_name=None):
     # Context processor para empresa (disponible en todos los templates)
     @app.context_processor
     def inject_empresa():
-        """Inyecta la información de la empresa en todos los templates"""
-        from .models import Empresa
-        empresa = Empresa.query.first()
-        return dict(empresa_global=empresa)
+        """Inyecta la información de la empresa en todos los templates (copia cacheada por proceso)"""
+        from .empresa_config import empresa_actual
+        return dict(empresa_global=empresa_actual())
     
     # Registrar blueprints
     from .routes.auth import auth_bp
@@ -80,11 +115,19 @@ def create_app(config_name=None):
     app.register_blueprint(main_bp)
     app.register_blueprint(admin_bp)
     
+    # Los relojes biométricos se autentican con token; la ruta valida CSRF solo para sesiones de usuario
+    from .routes.rrhh import importar_marcaciones_lote
+    csrf.exempt(importar_marcaciones_lote)
+    
+    # Comandos de consola (flask asistencia-resumen-reconstruir, ...)
+    from .comandos import registrar_comandos
+    registrar_comandos(app)
+    
     # Configurar APScheduler para cierre automático de asistencias
     if not app.debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
         from flask_apscheduler import APScheduler
         from .routes.rrhh import cerrar_asistencias_automatico
-        from datetime import date
+        from datetime import date, datetime, timedelta
         
         scheduler = APScheduler()
         scheduler.init_app(app)
@@ -102,6 +145,66 @@ def create_app(config_name=None):
                 except Exception as e:
                     print(f"❌ Error en cierre automático: {e}")
         
+        # Primera ejecución poco después de arrancar (cubre los días con el sistema apagado)
+        primera = {} if app.testing else {'next_run_time': datetime.now() + timedelta(seconds=30)}
+        
+        @scheduler.task('interval', id='recuperar_cierres_asistencia', hours=1, **primera)
+        def tarea_recuperar_cierres():
+            """Tarea programada: cierra los días hábiles que quedaron sin cerrar (sistema apagado)"""
+            from .cierre_asistencias import recuperar_cierres
+            with app.app_context():
+                try:
+                    resultado = recuperar_cierres()
+                    db.session.commit()
+                    if resultado['dias']:
+                        print(f"🔔 Recuperados {len(resultado['dias'])} días sin cerrar: "
+                              f"{resultado['procesados']} registros ({resultado['ausencias']} ausencias)")
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"❌ Error al recuperar cierres de asistencia: {e}")
+        
+        @scheduler.task('cron', id='detectar_horas_extra', hour=0, minute=30)
+        def tarea_detectar_horas_extra():
+            """Tarea programada: detecta las horas extra del mes del día anterior para toda la empresa"""
+            from .horas_extra import detectar_horas_extra
+            with app.app_context():
+                try:
+                    ayer = date.today() - timedelta(days=1)
+                    resultado = detectar_horas_extra(ayer.year, ayer.month)
+                    db.session.commit()
+                    print(f"⏱️ Horas extra {ayer:%Y-%m}: {resultado['creados']} nuevas, "
+                          f"{resultado['actualizados']} actualizadas")
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"❌ Error al detectar horas extra: {e}")
+        
+        @scheduler.task('cron', id='crear_particiones_eventos', hour=1, minute=0, **primera)
+        def tarea_crear_particiones_eventos():
+            """Tarea programada: crea por adelantado las particiones mensuales de asistencia_eventos (PostgreSQL)"""
+            from .almacen_eventos import crear_particiones
+            with app.app_context():
+                try:
+                    creadas = crear_particiones()
+                    db.session.commit()
+                    for nombre in creadas:
+                        print(f"🗂️ Partición {nombre} creada")
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"❌ Error al crear particiones de asistencia_eventos: {e}")
+        
+        # Pool de tareas en segundo plano (liquidaciones, aguinaldos, planillas)
+        from .tareas import iniciar_ejecutor, reanudar_tareas
+        iniciar_ejecutor(app)
+        
+        @scheduler.task('interval', id='reanudar_tareas', minutes=5)
+        def tarea_reanudar_tareas():
+            """Tarea programada: reenvía al pool las tareas interrumpidas (sin latido reciente)"""
+            with app.app_context():
+                try:
+                    reanudar_tareas()
+                except Exception as e:
+                    print(f"❌ Error al reanudar tareas: {e}")
+        
         scheduler.start()
         print("📅 Scheduler iniciado: Cierre automático de asistencias programado para las 17:30")
 
@@ -109,6 +212,11 @@ def create_app(config_name=None):
     with app.app_context():
         try:
             db.create_all()
+            
+            # Reanudar desde su último checkpoint las tareas que quedaron a medias
+            from .tareas import ejecutor_activo, reanudar_tareas
+            if ejecutor_activo():
+                reanudar_tareas()
         except UnicodeDecodeError as ude:
             print("ERROR: UnicodeDecodeError al conectar con la base de datos:", ude)
             print("Revisa que las variables de entorno (DATABASE_URL, PGPASSWORD, etc.) estén en UTF-8 y no tengan caracteres acentuados.")
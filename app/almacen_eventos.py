@@ -0,0 +1,243 @@
+"""
+almacen_eventos.py
+Almacenamiento de asistencia_eventos por mes.
+
+PostgreSQL: la migración particionar_asistencia_eventos convierte la tabla
+en particionada por rango de `ts` (una partición por mes más DEFAULT) y
+`crear_particiones` (tarea programada diaria y `flask
+asistencia-eventos-particiones`) crea por adelantado las de los próximos
+meses; si la partición DEFAULT ya tiene marcaciones de ese mes (relojes con
+la fecha adelantada) las pasa a la nueva partición. Todas las consultas filtran `ts` con límites literales (periodos.
+en_rango), así el planificador solo abre la partición del mes consultado.
+
+SQLite: `archivar_mes` (`flask asistencia-eventos-archivar`) mueve los
+eventos de un mes cerrado a un archivo JSON por línea comprimido con gzip,
+ordenado por (empleado_id, ts, id), y los borra de la tabla.
+`eventos_archivados` los vuelve a leer en ese orden para el reproceso, el
+recálculo de días y la detección de duplicados de las importaciones.
+"""
+
+import gzip
+import heapq
+import json
+import os
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import select, delete, func, text
+
+from .models import db, AsistenciaEvento
+from .periodos import rango_mes, en_rango
+
+MESES_ADELANTE = 2  # particiones creadas por adelantado además del mes actual
+TABLA = AsistenciaEvento.__tablename__
+
+_COLUMNAS = ('id', 'empleado_id', 'ts', 'tipo', 'origen', 'dispositivo_id', 'detalles', 'fecha_creacion')
+
+
+def _mes_siguiente(año, mes):
+    return (año + 1, 1) if mes == 12 else (año, mes + 1)
+
+
+def meses_entre(desde, hasta):
+    """[(año, mes)] de los meses que tocan las fechas desde..hasta (inclusive)."""
+    meses, actual = [], (desde.year, desde.month)
+    while actual <= (hasta.year, hasta.month):
+        meses.append(actual)
+        actual = _mes_siguiente(*actual)
+    return meses
+
+
+# ==================== PARTICIONES (PostgreSQL) ====================
+
+def nombre_particion(año, mes):
+    return f'{TABLA}_{año}_{mes:02d}'
+
+
+def esta_particionada():
+    """True si asistencia_eventos es una tabla particionada de PostgreSQL."""
+    if db.engine.dialect.name != 'postgresql':
+        return False
+    return db.session.execute(text(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = :tabla AND pg_table_is_visible(c.oid)"
+    ), {'tabla': TABLA}).first() is not None
+
+
+def sql_particion(año, mes):
+    inicio, fin = rango_mes(año, mes)
+    return (f"CREATE TABLE IF NOT EXISTS {nombre_particion(año, mes)} PARTITION OF {TABLA} "
+            f"FOR VALUES FROM ('{inicio.isoformat()}') TO ('{fin.isoformat()}')")
+
+
+def _crear_particion_desde_default(año, mes):
+    """
+    Crea la partición de un mes que ya tiene filas en DEFAULT: PostgreSQL no
+    admite PARTITION OF en ese caso ("updated partition constraint for default
+    partition would be violated"). Se crea como tabla suelta, se le mueven las
+    filas del mes y se adjunta, todo en la transacción actual.
+
+    Returns: cantidad de filas movidas desde DEFAULT
+    """
+    inicio, fin = rango_mes(año, mes)
+    nombre, default = nombre_particion(año, mes), f'{TABLA}_default'
+    rango = {'inicio': inicio, 'fin': fin}
+    db.session.execute(text(f"CREATE TABLE {nombre} (LIKE {TABLA} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    movidas = db.session.execute(text(
+        f"WITH movidas AS (DELETE FROM {default} WHERE ts >= :inicio AND ts < :fin RETURNING *) "
+        f"INSERT INTO {nombre} SELECT * FROM movidas"
+    ), rango).rowcount
+    db.session.execute(text(
+        f"ALTER TABLE {TABLA} ATTACH PARTITION {nombre} "
+        f"FOR VALUES FROM ('{inicio.isoformat()}') TO ('{fin.isoformat()}')"
+    ))
+    return movidas
+
+
+def crear_particiones(meses_adelante=MESES_ADELANTE, desde=None):
+    """
+    Crea las particiones mensuales que falten desde el mes de `desde` (por
+    defecto hoy) y los `meses_adelante` siguientes, pasando a cada una las
+    filas del mes que hubieran caído en DEFAULT. No hace nada si la tabla no
+    está particionada. No hace commit.
+
+    Returns:
+        list con los nombres de las particiones creadas
+    """
+    if not esta_particionada():
+        return []
+    desde = desde or date.today()
+    existentes = set(db.session.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = :tabla"
+    ), {'tabla': TABLA}).scalars())
+
+    con_default = f'{TABLA}_default' in existentes
+
+    creadas, mes = [], (desde.year, desde.month)
+    for _ in range(meses_adelante + 1):
+        if nombre_particion(*mes) not in existentes:
+            inicio, fin = rango_mes(*mes)
+            en_default = con_default and db.session.execute(text(
+                f"SELECT 1 FROM {TABLA}_default WHERE ts >= :inicio AND ts < :fin LIMIT 1"
+            ), {'inicio': inicio, 'fin': fin}).first() is not None
+            if en_default:
+                _crear_particion_desde_default(*mes)
+            else:
+                db.session.execute(text(sql_particion(*mes)))
+            creadas.append(nombre_particion(*mes))
+        mes = _mes_siguiente(*mes)
+    return creadas
+
+
+# ==================== ARCHIVO DE MESES CERRADOS (SQLite) ====================
+
+def directorio_archivo():
+    return current_app.config['ASISTENCIA_ARCHIVO_DIR']
+
+
+def ruta_archivo(año, mes, directorio=None):
+    return os.path.join(directorio or directorio_archivo(), f'{TABLA}_{año}_{mes:02d}.jsonl.gz')
+
+
+def _clave(registro):
+    return registro['empleado_id'], registro['ts'], registro['id']
+
+
+def _a_json(registro):
+    return json.dumps({
+        columna: valor.isoformat() if isinstance(valor, datetime) else valor
+        for columna, valor in registro.items()
+    }, ensure_ascii=False)
+
+
+def _desde_json(linea):
+    registro = json.loads(linea)
+    for columna in ('ts', 'fecha_creacion'):
+        if registro.get(columna):
+            registro[columna] = datetime.fromisoformat(registro[columna])
+    return registro
+
+
+def _leer(ruta):
+    with gzip.open(ruta, 'rt', encoding='utf-8') as f:
+        for linea in f:
+            if linea.strip():
+                yield _desde_json(linea)
+
+
+def archivar_mes(año, mes, directorio=None):
+    """
+    Mueve los eventos del mes a su archivo comprimido y los borra de la
+    tabla. Si el mes ya tenía archivo (marcaciones tardías), se combinan.
+    El archivo se escribe completo y se renombra antes del DELETE: si algo
+    falla la tabla queda intacta. Hace commit.
+
+    Returns:
+        dict eventos (movidos), total (en el archivo), ruta, bytes
+    """
+    directorio = directorio or directorio_archivo()
+    ruta = ruta_archivo(año, mes, directorio)
+    inicio, fin = rango_mes(año, mes)
+    columnas = [getattr(AsistenciaEvento, c) for c in _COLUMNAS]
+    orden = (AsistenciaEvento.empleado_id, AsistenciaEvento.ts, AsistenciaEvento.id)
+
+    filas = db.session.execute(select(*columnas).where(en_rango(AsistenciaEvento.ts, inicio, fin)).order_by(*orden)).all()
+    if not filas:
+        return {'eventos': 0, 'total': 0, 'ruta': ruta, 'bytes': os.path.getsize(ruta) if os.path.exists(ruta) else 0}
+
+    registros = [dict(zip(_COLUMNAS, fila)) for fila in filas]
+    if os.path.exists(ruta):
+        # Los eventos ya archivados no están en la tabla: los de ahora son marcaciones tardías
+        registros = sorted(list(_leer(ruta)) + registros, key=_clave)
+
+    os.makedirs(directorio, exist_ok=True)
+    temporal = ruta + '.tmp'
+    with gzip.open(temporal, 'wt', encoding='utf-8') as f:
+        for registro in registros:
+            f.write(_a_json(registro) + '\n')
+    os.replace(temporal, ruta)
+
+    db.session.execute(delete(AsistenciaEvento).where(en_rango(AsistenciaEvento.ts, inicio, fin)))
+    db.session.commit()
+    return {'eventos': len(filas), 'total': len(registros), 'ruta': ruta, 'bytes': os.path.getsize(ruta)}
+
+
+def meses_archivables(hasta):
+    """(año, mes) con eventos en la tabla, hasta el mes de `hasta` inclusive."""
+    fin = rango_mes(hasta.year, hasta.month)[1]
+    meses = set()
+    ts = db.session.query(func.min(AsistenciaEvento.ts)).scalar()
+    while ts is not None and ts.date() < fin:
+        meses.add((ts.year, ts.month))
+        siguiente = datetime.combine(rango_mes(ts.year, ts.month)[1], datetime.min.time())
+        ts = db.session.query(func.min(AsistenciaEvento.ts)).filter(AsistenciaEvento.ts >= siguiente).scalar()
+    return sorted(meses)
+
+
+def eventos_archivados(desde, hasta, empleado_ids=None, directorio=None):
+    """
+    Registros archivados (dicts con las columnas de AsistenciaEvento) con
+    ts entre las fechas desde y hasta (inclusive), en orden (empleado_id,
+    ts, id). `empleado_ids` admite cualquier contenedor (set, range).
+    Vacío si ningún mes del rango está archivado.
+    """
+    directorio = directorio or current_app.config.get('ASISTENCIA_ARCHIVO_DIR')
+    if not directorio:
+        return iter(())
+    inicio = datetime.combine(desde, datetime.min.time())
+    fin = datetime.combine(hasta + timedelta(days=1), datetime.min.time())
+
+    def filtrar(ruta):
+        for registro in _leer(ruta):
+            if inicio <= registro['ts'] < fin and (empleado_ids is None or registro['empleado_id'] in empleado_ids):
+                yield registro
+
+    rutas = [r for r in (ruta_archivo(a, m, directorio) for a, m in meses_entre(desde, hasta)) if os.path.exists(r)]
+    return heapq.merge(*(filtrar(r) for r in rutas), key=_clave)
+
+
+def con_archivados(eventos, desde, hasta, empleado_ids=None):
+    """Intercala en `eventos` ((empleado_id, ts, tipo) ordenados) los archivados del rango."""
+    archivados = ((r['empleado_id'], r['ts'], r['tipo']) for r in eventos_archivados(desde, hasta, empleado_ids))
+    return heapq.merge(eventos, archivados, key=lambda e: e[:2])
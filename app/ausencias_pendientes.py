@@ -0,0 +1,80 @@
+"""
+ausencias_pendientes.py
+Ausencias por justificar (presente = false, justificacion_estado = 'PENDIENTE')
+para el widget del dashboard.
+
+El dashboard muestra el total (un COUNT) y las primeras TAMANO_PAGINA filas,
+con el empleado cargado en la misma consulta. El resto se pide por JSON con
+paginación keyset sobre (fecha, id) descendente: el cursor es la última fila
+vista, así que cada página cuesta lo mismo sin importar cuántas haya antes.
+Las tres consultas usan el índice parcial ix_asistencias_ausencias_justificacion
+(justificacion_estado, fecha, id) WHERE presente = false.
+"""
+
+from datetime import date
+
+from sqlalchemy import func, and_, or_
+from sqlalchemy.orm import joinedload
+
+from .models import Asistencia
+
+TAMANO_PAGINA = 10
+MAX_PAGINA = 100
+
+
+def _pendientes():
+    return Asistencia.query.filter(
+        Asistencia.presente == False,
+        Asistencia.justificacion_estado == 'PENDIENTE'
+    )
+
+
+def contar_ausencias_pendientes():
+    """Cantidad de ausencias pendientes de justificación."""
+    return _pendientes().with_entities(func.count(Asistencia.id)).scalar()
+
+
+def cursor_ausencia(asistencia):
+    """Cursor de paginación de una fila: 'YYYY-MM-DD:id'."""
+    return f'{asistencia.fecha.isoformat()}:{asistencia.id}'
+
+
+def leer_cursor(texto):
+    """(fecha, id) de un cursor; ValueError si no tiene el formato de cursor_ausencia."""
+    fecha, _, asistencia_id = texto.partition(':')
+    return date.fromisoformat(fecha), int(asistencia_id)
+
+
+def ausencias_pendientes(despues=None, limite=TAMANO_PAGINA):
+    """
+    Página de ausencias pendientes, más recientes primero.
+
+    Args:
+        despues: cursor (fecha, id) de la última fila ya mostrada, o None
+        limite: filas por página (como mucho MAX_PAGINA)
+
+    Returns:
+        (lista de Asistencia con empleado cargado, cursor de la siguiente página o None)
+    """
+    limite = max(1, min(limite, MAX_PAGINA))
+    consulta = _pendientes().options(joinedload(Asistencia.empleado))
+    if despues is not None:
+        fecha, asistencia_id = despues
+        consulta = consulta.filter(or_(
+            Asistencia.fecha < fecha,
+            and_(Asistencia.fecha == fecha, Asistencia.id < asistencia_id)
+        ))
+    filas = consulta.order_by(Asistencia.fecha.desc(), Asistencia.id.desc()).limit(limite + 1).all()
+    if len(filas) > limite:
+        return filas[:limite], cursor_ausencia(filas[limite - 1])
+    return filas, None
+
+
+def ausencia_json(asistencia):
+    return {
+        'id': asistencia.id,
+        'empleado_id': asistencia.empleado_id,
+        'codigo': asistencia.empleado.codigo,
+        'nombre': asistencia.empleado.nombre_completo,
+        'fecha': asistencia.fecha.isoformat(),
+    }
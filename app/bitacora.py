@@ -2,6 +2,24 @@ from flask import request
 from functools import wraps
 from .models import db, Bitacora
 
+def agregar_bitacora(usuario, modulo, accion, tabla, registro_id=None, detalle=None):
+    """
+    Agrega el registro de bitácora a la sesión sin hacer commit, para que se
+    guarde en la misma transacción que la operación registrada.
+    """
+    bitacora = Bitacora(
+        usuario_id=usuario.id,
+        modulo=modulo,
+        accion=accion,
+        tabla=tabla,
+        registro_id=registro_id,
+        detalle=detalle,
+        ip_address=request.remote_addr,
+        user_agent=request.headers.get('User-Agent', '')[:255]
+    )
+    db.session.add(bitacora)
+    return bitacora
+
 def registrar_bitacora(usuario, modulo, accion, tabla, registro_id=None, detalle=None):
     """
     Registra una acción en la bitácora
@@ -15,17 +33,7 @@ def registrar_bitacora(usuario, modulo, accion, tabla, registro_id=None, detalle
         detalle: Detalles adicionales de la acción
     """
     try:
-        bitacora = Bitacora(
-            usuario_id=usuario.id,
-            modulo=modulo,
-            accion=accion,
-            tabla=tabla,
-            registro_id=registro_id,
-            detalle=detalle,
-            ip_address=request.remote_addr,
-            user_agent=request.headers.get('User-Agent', '')[:255]
-        )
-        db.session.add(bitacora)
+        agregar_bitacora(usuario, modulo, accion, tabla, registro_id, detalle)
         db.session.commit()
     except Exception as e:
         print(f"Error al registrar bitácora: {str(e)}")
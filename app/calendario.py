@@ -0,0 +1,206 @@
+"""
+calendario.py
+Calendario laboral: días hábiles y feriados.
+
+Único criterio de día hábil para toda la aplicación: día de la semana
+incluido en CALENDARIO_DIAS_LABORALES (lunes a viernes por defecto) y que no
+figure en la tabla `feriados`. La lista de días hábiles de cada mes se
+calcula una vez por proceso y queda memorizada, de modo que contar días
+hábiles de un mes es O(1) y recorrer un rango solo toca los meses
+involucrados.
+
+La caché se invalida al crear, editar o borrar un Feriado: en el proceso que
+lo hizo, al hacer flush y al cerrar la transacción; en los demás (otros
+workers, el scheduler), por el contador `calendario_version` de
+estado_sistema, que las rutas de feriados incrementan con
+`registrar_cambio_calendario()` y que cada proceso compara como mucho cada
+VERIFICAR_SEGUNDOS antes de usar lo memorizado.
+"""
+
+import time as reloj
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+from itertools import chain
+
+from flask import current_app
+from sqlalchemy import event
+
+from .models import db, Feriado
+from .periodos import en_año
+from .versiones import leer_version, incrementar_version
+
+DIAS_LABORALES_DEFECTO = (0, 1, 2, 3, 4)  # lunes a viernes
+CLAVE_VERSION = 'calendario_version'
+VERIFICAR_SEGUNDOS = 30
+
+# año -> frozenset de fechas feriadas
+_feriados = {}
+# (año, mes) -> tuple ordenada de días hábiles
+_habiles_mes = {}
+_version = {'valor': None, 'verificado': None}
+
+
+def invalidar_calendario():
+    """Descarta la caché (feriados editados o nueva base de datos)."""
+    _feriados.clear()
+    _habiles_mes.clear()
+    _version.update(valor=None, verificado=None)
+
+
+def _verificar_version():
+    """Vacía la caché si otro proceso incrementó calendario_version (como mucho cada VERIFICAR_SEGUNDOS)."""
+    ahora = reloj.monotonic()
+    if _version['verificado'] is not None and ahora - _version['verificado'] < VERIFICAR_SEGUNDOS:
+        return
+    valor = leer_version(CLAVE_VERSION)
+    if valor != _version['valor']:
+        _feriados.clear()
+        _habiles_mes.clear()
+    _version.update(valor=valor, verificado=ahora)
+
+
+def _dias_laborales():
+    return tuple(current_app.config.get('CALENDARIO_DIAS_LABORALES', DIAS_LABORALES_DEFECTO))
+
+
+def feriados_del_año(año):
+    _verificar_version()
+    if año not in _feriados:
+        _feriados[año] = frozenset(f for (f,) in db.session.query(Feriado.fecha).filter(en_año(Feriado.fecha, año)))
+    return _feriados[año]
+
+
+def dias_habiles_lista(año, mes):
+    """Días hábiles del mes, ordenados (memorizado)."""
+    _verificar_version()
+    clave = (año, mes)
+    if clave not in _habiles_mes:
+        laborales = _dias_laborales()
+        feriados = feriados_del_año(año)
+        dia = date(año, mes, 1)
+        dias = []
+        while dia.month == mes:
+            if dia.weekday() in laborales and dia not in feriados:
+                dias.append(dia)
+            dia += timedelta(days=1)
+        _habiles_mes[clave] = tuple(dias)
+    return _habiles_mes[clave]
+
+
+def dias_habiles_mes(año, mes):
+    """Cantidad de días hábiles del mes."""
+    return len(dias_habiles_lista(año, mes))
+
+
+def es_dia_habil(fecha):
+    dias = dias_habiles_lista(fecha.year, fecha.month)
+    i = bisect_left(dias, fecha)
+    return i < len(dias) and dias[i] == fecha
+
+
+def _meses_entre(desde, hasta):
+    año, mes = desde.year, desde.month
+    while (año, mes) <= (hasta.year, hasta.month):
+        yield año, mes
+        año, mes = (año + 1, 1) if mes == 12 else (año, mes + 1)
+
+
+def _recorte(año, mes, desde, hasta):
+    dias = dias_habiles_lista(año, mes)
+    return dias, bisect_left(dias, desde), bisect_right(dias, hasta)
+
+
+def dias_habiles_entre(desde, hasta):
+    """Lista de días hábiles entre dos fechas (ambas inclusive)."""
+    if desde > hasta:
+        return []
+    resultado = []
+    for año, mes in _meses_entre(desde, hasta):
+        dias, i, j = _recorte(año, mes, desde, hasta)
+        resultado.extend(dias[i:j])
+    return resultado
+
+
+def contar_dias_habiles(desde, hasta):
+    """Cantidad de días hábiles entre dos fechas (ambas inclusive)."""
+    if desde > hasta:
+        return 0
+    total = 0
+    for año, mes in _meses_entre(desde, hasta):
+        dias, i, j = _recorte(año, mes, desde, hasta)
+        total += j - i
+    return total
+
+
+# ==================== INVALIDACIÓN ====================
+
+def registrar_cambio_calendario():
+    """Incrementa calendario_version en la transacción actual (avisa a los demás procesos)."""
+    incrementar_version(CLAVE_VERSION)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _feriados_modificados(session, flush_context):
+    if any(isinstance(obj, Feriado) for obj in chain(session.new, session.dirty, session.deleted)):
+        session.info['calendario_modificado'] = True
+        invalidar_calendario()
+
+
+@event.listens_for(db.session, 'after_commit')
+@event.listens_for(db.session, 'after_rollback')
+def _fin_transaccion(session):
+    # Lo cacheado durante la transacción pudo ver feriados no confirmados (o ya revertidos)
+    if session.info.pop('calendario_modificado', False):
+        invalidar_calendario()
+
+
+# ==================== FERIADOS NACIONALES (PARAGUAY) ====================
+
+def _domingo_de_pascua(año):
+    """Algoritmo anónimo gregoriano (Meeus/Jones/Butcher)."""
+    a = año % 19
+    b, c = divmod(año, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    mes, dia = divmod(h + l - 7 * m + 114, 31)
+    return date(año, mes, dia + 1)
+
+
+def feriados_paraguay(año):
+    """
+    Feriados nacionales de Paraguay (Ley 1723/01 y modificatorias) en sus fechas
+    oficiales. Los traslados que decreta el Poder Ejecutivo se cargan a mano.
+    """
+    pascua = _domingo_de_pascua(año)
+    return [
+        (date(año, 1, 1), 'Año Nuevo'),
+        (date(año, 3, 1), 'Día de los Héroes'),
+        (pascua - timedelta(days=3), 'Jueves Santo'),
+        (pascua - timedelta(days=2), 'Viernes Santo'),
+        (date(año, 5, 1), 'Día del Trabajador'),
+        (date(año, 5, 14), 'Independencia Nacional'),
+        (date(año, 5, 15), 'Independencia Nacional'),
+        (date(año, 6, 12), 'Paz del Chaco'),
+        (date(año, 8, 15), 'Fundación de Asunción'),
+        (date(año, 9, 29), 'Victoria de Boquerón'),
+        (date(año, 12, 8), 'Virgen de Caacupé'),
+        (date(año, 12, 25), 'Navidad'),
+    ]
+
+
+def cargar_feriados_paraguay(año, usuario_id=None):
+    """Agrega los feriados nacionales del año que aún no existan. No hace commit."""
+    existentes = feriados_del_año(año)
+    nuevos = [
+        Feriado(fecha=fecha, descripcion=descripcion, usuario_creador_id=usuario_id)
+        for fecha, descripcion in feriados_paraguay(año) if fecha not in existentes
+    ]
+    if nuevos:
+        db.session.add_all(nuevos)
+        registrar_cambio_calendario()
+    return len(nuevos)
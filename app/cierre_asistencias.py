@@ -0,0 +1,201 @@
+"""
+cierre_asistencias.py
+Cierre de un día de asistencias con INSERT ... SELECT.
+
+Por cada empleado activo y vigente en la fecha que no tiene fila de
+Asistencia ese día (anti-join NOT EXISTS) se inserta, en este orden:
+1. Vacaciones aprobadas que cubren la fecha
+2. Permisos aprobados/completados que cubren la fecha
+3. Ausencia pendiente de justificar
+Cada sentencia excluye a los empleados que la anterior ya cerró, y la
+restricción única (empleado_id, fecha) junto con ON CONFLICT DO NOTHING
+evita duplicados si una marcación llega durante el cierre.
+
+Los INSERT de Core no pasan por el listener de resumen_asistencia: los
+contadores mensuales se actualizan aquí con aplicar_deltas a partir de los
+empleado_id devueltos (RETURNING), o reconstruyendo el mes si la BD no lo
+soporta. La fecha se anota para invalidar la caché de metricas_asistencia.
+
+`recuperar_cierres` (tarea programada y `flask asistencia-recuperar`) cierra
+los días hábiles que quedaron sin cerrar mientras el sistema estuvo apagado.
+Avanza una marca persistida en estado_sistema con el último día cerrado, así
+cada ejecución solo mira los días posteriores.
+"""
+
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import select, insert, exists, func, literal, null, or_
+
+from .models import (
+    db, Asistencia, Empleado, EstadoEmpleadoEnum, Vacacion, EstadoVacacionEnum, Permiso, EstadoPermisoEnum,
+    EstadoSistema
+)
+from .calendario import dias_habiles_entre
+from .resumen_asistencia import clasificar, aplicar_deltas, reconstruir_resumen, CONTADORES, PREFIJO_PERMISO
+from .metricas_asistencia import anotar_cambio
+
+OBSERVACION_VACACIONES = 'Vacaciones (auto-generado)'
+OBSERVACION_AUSENCIA = 'Ausencia sin marcación (auto-generado)'
+OBSERVACION_SIN_SISTEMA = 'Ausencia sin registro - Sistema no operativo'
+
+CLAVE_CERRADO_HASTA = 'asistencias_cerradas_hasta'
+MAX_DIAS_RECUPERACION = 7
+
+_COLUMNAS = ['empleado_id', 'fecha', 'presente', 'observaciones', 'justificacion_estado', 'fecha_creacion']
+
+
+def _vigentes(fecha):
+    """Empleados activos, ingresados y no retirados a la fecha."""
+    return [
+        Empleado.estado == EstadoEmpleadoEnum.ACTIVO,
+        or_(Empleado.fecha_ingreso.is_(None), Empleado.fecha_ingreso <= fecha),
+        or_(Empleado.fecha_retiro.is_(None), Empleado.fecha_retiro >= fecha),
+    ]
+
+
+def _con_asistencia(fecha):
+    return exists().where(Asistencia.empleado_id == Empleado.id, Asistencia.fecha == fecha)
+
+
+def _insertar(seleccion):
+    """
+    INSERT INTO asistencias ... SELECT, ignorando conflictos.
+    Returns: (cantidad, empleado_ids insertados o None sin RETURNING)
+    """
+    conexion = db.session.connection()
+    tabla = Asistencia.__table__
+    if conexion.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as insert_dialecto
+        stmt = insert_dialecto(tabla).from_select(_COLUMNAS, seleccion).on_conflict_do_nothing()
+    elif conexion.dialect.name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as insert_dialecto
+        stmt = insert_dialecto(tabla).from_select(_COLUMNAS, seleccion).on_conflict_do_nothing()
+    else:
+        stmt = insert(tabla).from_select(_COLUMNAS, seleccion)
+
+    if conexion.dialect.insert_returning:
+        empleado_ids = db.session.execute(stmt.returning(tabla.c.empleado_id)).scalars().all()
+        return len(empleado_ids), empleado_ids
+    return db.session.execute(stmt).rowcount, None
+
+
+def cerrar_dia(fecha, observacion_ausencia=OBSERVACION_AUSENCIA):
+    """
+    Genera las filas de Asistencia faltantes del día. No hace commit ni
+    verifica que sea día hábil.
+
+    Returns:
+        dict procesados, vacaciones, permisos, ausencias, ya_registrados
+    """
+    vigentes = _vigentes(fecha)
+    sin_asistencia = ~_con_asistencia(fecha)
+    ahora = datetime.utcnow()
+
+    ya_registrados = db.session.query(func.count(Empleado.id)).filter(*vigentes, _con_asistencia(fecha)).scalar()
+
+    # 1. Vacaciones aprobadas (cuentan como día trabajado)
+    vacaciones = select(
+        Empleado.id, literal(fecha), literal(True), literal(OBSERVACION_VACACIONES), null(), literal(ahora)
+    ).where(*vigentes, sin_asistencia, exists().where(
+        Vacacion.empleado_id == Empleado.id,
+        Vacacion.estado == EstadoVacacionEnum.APROBADA,
+        Vacacion.fecha_inicio_solicitud <= fecha,
+        Vacacion.fecha_fin_solicitud >= fecha
+    ))
+
+    # 2. Permisos aprobados (el de menor id si hay varios)
+    permiso_dia = select(Permiso.empleado_id, func.min(Permiso.id).label('permiso_id')).where(
+        Permiso.estado.in_([EstadoPermisoEnum.APROBADO, EstadoPermisoEnum.COMPLETADO]),
+        Permiso.fecha_inicio <= fecha,
+        Permiso.fecha_fin >= fecha
+    ).group_by(Permiso.empleado_id).subquery()
+    permisos = select(
+        Empleado.id, literal(fecha), literal(True),
+        literal(f'{PREFIJO_PERMISO} ') + func.coalesce(Permiso.motivo, '') + ' (auto-generado)', null(), literal(ahora)
+    ).select_from(Empleado).join(permiso_dia, permiso_dia.c.empleado_id == Empleado.id).join(
+        Permiso, Permiso.id == permiso_dia.c.permiso_id
+    ).where(*vigentes, sin_asistencia)
+
+    # 3. Sin marcación ni justificación = ausencia pendiente de justificar
+    ausencias = select(
+        Empleado.id, literal(fecha), literal(False), literal(observacion_ausencia), literal('PENDIENTE'), literal(ahora)
+    ).where(*vigentes, sin_asistencia)
+
+    stats = {'procesados': 0, 'vacaciones': 0, 'permisos': 0, 'ausencias': 0, 'ya_registrados': ya_registrados}
+    deltas = defaultdict(lambda: dict.fromkeys(CONTADORES, 0))
+    completos = True
+    for clave, seleccion, valores in (
+        ('vacaciones', vacaciones, (True, None, OBSERVACION_VACACIONES)),
+        ('permisos', permisos, (True, None, PREFIJO_PERMISO)),
+        ('ausencias', ausencias, (False, 'PENDIENTE', observacion_ausencia)),
+    ):
+        stats[clave], empleado_ids = _insertar(seleccion)
+        if empleado_ids is None:
+            completos = False
+            continue
+        for contador in clasificar(*valores):
+            for empleado_id in empleado_ids:
+                deltas[(empleado_id, fecha.year, fecha.month)][contador] += 1
+
+    if not completos:
+        # Sin RETURNING no se sabe a quién se insertó: reconstruir el mes
+        reconstruir_resumen(fecha.year, fecha.month)
+    elif deltas:
+        aplicar_deltas(db.session.connection(), deltas)
+
+    stats['procesados'] = stats['vacaciones'] + stats['permisos'] + stats['ausencias']
+    if stats['procesados']:
+        anotar_cambio(db.session, fecha)
+    return stats
+
+
+# ==================== RECUPERACIÓN DE DÍAS SIN CERRAR ====================
+
+def leer_cerrado_hasta():
+    """Último día cubierto por recuperar_cierres (date) o None si nunca se ejecutó."""
+    fila = db.session.get(EstadoSistema, CLAVE_CERRADO_HASTA)
+    return date.fromisoformat(fila.valor) if fila and fila.valor else None
+
+
+def _guardar_cerrado_hasta(fecha):
+    fila = db.session.get(EstadoSistema, CLAVE_CERRADO_HASTA)
+    if fila is None:
+        fila = EstadoSistema(clave=CLAVE_CERRADO_HASTA)
+        db.session.add(fila)
+    fila.valor = fecha.isoformat()
+
+
+def recuperar_cierres(hasta=None, max_dias=MAX_DIAS_RECUPERACION):
+    """
+    Cierra los días hábiles posteriores a la marca y hasta `hasta` (por
+    defecto ayer), como mucho los últimos `max_dias`. Los días ya cerrados
+    por la tarea de las 17:30 no generan filas nuevas. No hace commit.
+
+    La primera vez la marca parte de la última fecha con asistencias; sin
+    asistencias previas, o si ya llegan hasta `hasta`, solo se inicializa.
+
+    Returns:
+        dict dias (fechas cerradas), procesados, vacaciones, permisos, ausencias
+    """
+    hasta = hasta or date.today() - timedelta(days=1)
+    resultado = {'dias': [], 'procesados': 0, 'vacaciones': 0, 'permisos': 0, 'ausencias': 0}
+
+    marca = leer_cerrado_hasta()
+    if marca is None:
+        marca = db.session.query(func.max(Asistencia.fecha)).scalar()
+        if marca is None or marca >= hasta:
+            _guardar_cerrado_hasta(hasta)
+            return resultado
+    if marca >= hasta:
+        return resultado
+
+    desde = max(marca + timedelta(days=1), hasta - timedelta(days=max_dias - 1))
+    for fecha in dias_habiles_entre(desde, hasta):
+        stats = cerrar_dia(fecha, OBSERVACION_SIN_SISTEMA)
+        resultado['dias'].append(fecha)
+        for clave in ('procesados', 'vacaciones', 'permisos', 'ausencias'):
+            resultado[clave] += stats[clave]
+
+    _guardar_cerrado_hasta(hasta)
+    return resultado
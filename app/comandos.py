@@ -0,0 +1,172 @@
+"""
+comandos.py
+Comandos de consola (`flask <comando>`) de mantenimiento.
+"""
+
+import click
+from flask.cli import with_appcontext
+
+from .models import db
+
+
+@click.command('asistencia-resumen-reconstruir')
+@click.option('--año', 'año', type=int, help='Año a reconstruir (requerido con --mes)')
+@click.option('--mes', type=int, help='Mes a reconstruir (1-12)')
+@click.option('--empleado', 'empleado_id', type=int, help='Solo este empleado')
+@click.option('--todo', is_flag=True, help='Reconstruir todos los meses con asistencias')
+@with_appcontext
+def asistencia_resumen_reconstruir(año, mes, empleado_id, todo):
+    """Recalcula desde cero asistencia_resumen_mensual para un mes (o todos con --todo)."""
+    from .resumen_asistencia import reconstruir_resumen, meses_con_asistencias
+
+    if todo:
+        meses = meses_con_asistencias(empleado_id)
+    elif año and mes:
+        meses = [(año, mes)]
+    else:
+        raise click.UsageError('Indique --año y --mes, o --todo')
+
+    for a, m in meses:
+        filas = reconstruir_resumen(a, m, empleado_id)
+        db.session.commit()
+        click.echo(f'✅ {a}-{m:02d}: {filas} filas de resumen')
+
+
+@click.command('feriados-cargar')
+@click.option('--año', 'año', type=int, required=True, help='Año cuyos feriados nacionales se cargan')
+@with_appcontext
+def feriados_cargar(año):
+    """Carga los feriados nacionales de Paraguay del año (omite los ya cargados)."""
+    from .calendario import cargar_feriados_paraguay
+
+    nuevos = cargar_feriados_paraguay(año)
+    db.session.commit()
+    click.echo(f'✅ {nuevos} feriados agregados para {año}')
+
+
+@click.command('asistencia-importar')
+@click.argument('archivo', type=click.Path(exists=True, dir_okay=False))
+@click.option('--formato', type=click.Choice(['csv', 'json']), help='Por defecto, según la extensión del archivo')
+@click.option('--dispositivo', help='device_id de las filas que no lo traen')
+@with_appcontext
+def asistencia_importar(archivo, formato, dispositivo):
+    """Importa marcaciones de un reloj biométrico (CSV o JSON: codigo, ts, tipo, device_id)."""
+    from .marcaciones import leer_marcaciones, importar_marcaciones
+
+    formato = formato or ('json' if archivo.lower().endswith('.json') else 'csv')
+    with open(archivo, encoding='utf-8-sig') as f:
+        filas = leer_marcaciones(f.read(), formato)
+    resultado = importar_marcaciones(filas, dispositivo)
+    db.session.commit()
+
+    click.echo(f"✅ {resultado['aceptadas']} aceptadas, {resultado['duplicadas']} duplicadas, "
+               f"{resultado['rechazadas']} rechazadas ({resultado['dias_recalculados']} días recalculados)")
+    for error in resultado['errores']:
+        click.echo(f"   ⚠️ Fila {error['fila']}: {error['motivo']}")
+
+
+@click.command('asistencia-recuperar')
+@click.option('--hasta', type=click.DateTime(formats=['%Y-%m-%d']), help='Último día a cerrar (por defecto, ayer)')
+@click.option('--dias', type=int, default=7, show_default=True, help='Máximo de días hacia atrás')
+@with_appcontext
+def asistencia_recuperar(hasta, dias):
+    """Cierra los días hábiles sin cerrar desde la última marca (sistema apagado)."""
+    from .cierre_asistencias import recuperar_cierres, leer_cerrado_hasta
+
+    resultado = recuperar_cierres(hasta.date() if hasta else None, max_dias=dias)
+    db.session.commit()
+    for fecha in resultado['dias']:
+        click.echo(f'   📅 {fecha} cerrado')
+    click.echo(f"✅ {resultado['procesados']} registros ({resultado['vacaciones']} vacaciones, "
+               f"{resultado['permisos']} permisos, {resultado['ausencias']} ausencias). "
+               f"Cerrado hasta {leer_cerrado_hasta()}")
+
+
+@click.command('horas-extra-detectar')
+@click.option('--periodo', required=True, help='Mes a procesar (YYYY-MM)')
+@click.option('--empleado', 'empleado_ids', type=int, multiple=True, help='Solo estos empleados (repetible)')
+@with_appcontext
+def horas_extra_detectar(periodo, empleado_ids):
+    """Detecta horas extra desde las marcaciones y actualiza HorasExtra para todo el mes."""
+    from .horas_extra import detectar_horas_extra
+    from .nomina import parse_periodo
+
+    año, mes = parse_periodo(periodo)
+    resultado = detectar_horas_extra(año, mes, list(empleado_ids) or None)
+    db.session.commit()
+    click.echo(f"✅ {periodo}: {resultado['creados']} horas extra nuevas, {resultado['actualizados']} actualizadas")
+
+
+@click.command('asistencia-reprocesar')
+@click.option('--desde', type=click.DateTime(formats=['%Y-%m-%d']), required=True, help='Primer día (YYYY-MM-DD)')
+@click.option('--hasta', type=click.DateTime(formats=['%Y-%m-%d']), required=True, help='Último día (YYYY-MM-DD)')
+@click.option('--empleado', 'empleado_id', type=int, help='Solo este empleado')
+@click.option('--procesos', type=int, default=1, show_default=True, help='Procesos en paralelo (por rangos de empleados)')
+@click.option('--lote', type=int, default=2000, show_default=True, help='Días por lote de escritura')
+@with_appcontext
+def asistencia_reprocesar(desde, hasta, empleado_id, procesos, lote):
+    """Regenera los resúmenes de Asistencia desde las marcaciones (tras cambiar reglas o relojes)."""
+    from .reproceso_asistencia import reprocesar_asistencias
+
+    if hasta < desde:
+        raise click.UsageError('--hasta debe ser posterior a --desde')
+    stats = reprocesar_asistencias(desde.date(), hasta.date(), empleado_id, procesos, lote)
+    segundos = stats['segundos'] or 0.001
+    click.echo(f"✅ {stats['dias']} días de {stats['eventos']} marcaciones en {stats['segundos']} s "
+               f"({stats['procesos']} procesos)")
+    click.echo(f"   {stats['actualizadas']} actualizadas, {stats['creadas']} creadas, "
+               f"{stats['sin_cambios']} sin cambios, {stats['omitidas']} omitidas (justificadas a mano)")
+    click.echo(f"   📈 {stats['eventos'] / segundos:,.0f} marcaciones/s, {stats['dias'] / segundos:,.0f} días/s")
+
+
+@click.command('asistencia-eventos-particiones')
+@click.option('--meses', type=int, default=2, show_default=True, help='Meses por adelantado además del actual')
+@with_appcontext
+def asistencia_eventos_particiones(meses):
+    """Crea las particiones mensuales faltantes de asistencia_eventos (PostgreSQL particionado)."""
+    from .almacen_eventos import crear_particiones, esta_particionada
+
+    if not esta_particionada():
+        raise click.ClickException('asistencia_eventos no está particionada (ver migrations/particionar_asistencia_eventos.py)')
+    creadas = crear_particiones(meses)
+    db.session.commit()
+    for nombre in creadas:
+        click.echo(f'   🗂️ {nombre}')
+    click.echo(f'✅ {len(creadas)} particiones creadas')
+
+
+@click.command('asistencia-eventos-archivar')
+@click.option('--hasta', type=click.DateTime(formats=['%Y-%m']),
+              help='Último mes a archivar (YYYY-MM; por defecto, el anterior al mes pasado)')
+@with_appcontext
+def asistencia_eventos_archivar(hasta):
+    """Mueve los eventos de los meses cerrados a archivos comprimidos por mes en ASISTENCIA_ARCHIVO_DIR (SQLite)."""
+    from datetime import date, timedelta
+    from .almacen_eventos import archivar_mes, meses_archivables, esta_particionada
+
+    if esta_particionada():
+        raise click.ClickException('Con particiones, los meses viejos se separan con DETACH PARTITION')
+    if hasta is None:
+        mes_pasado = date.today().replace(day=1) - timedelta(days=1)
+        hasta = mes_pasado.replace(day=1) - timedelta(days=1)
+    elif (hasta.year, hasta.month) >= (date.today().year, date.today().month):
+        raise click.UsageError('Solo se archivan meses cerrados')
+
+    total = 0
+    for año, mes in meses_archivables(hasta):
+        resultado = archivar_mes(año, mes)
+        total += resultado['eventos']
+        click.echo(f"   📦 {año}-{mes:02d}: {resultado['eventos']} eventos -> {resultado['ruta']} "
+                   f"({resultado['bytes'] / 1024:,.1f} KB)")
+    click.echo(f'✅ {total} eventos archivados')
+
+
+def registrar_comandos(app):
+    app.cli.add_command(asistencia_resumen_reconstruir)
+    app.cli.add_command(feriados_cargar)
+    app.cli.add_command(asistencia_importar)
+    app.cli.add_command(asistencia_recuperar)
+    app.cli.add_command(horas_extra_detectar)
+    app.cli.add_command(asistencia_reprocesar)
+    app.cli.add_command(asistencia_eventos_particiones)
+    app.cli.add_command(asistencia_eventos_archivar)
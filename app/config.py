@@ -18,12 +18,38 @@ class Config:
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB máximo
     ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx', 'jpg', 'jpeg', 'png'}
 
-    # Asistencia - umbrales (HH:MM)
-    ASISTENCIA_ON_TIME = '08:30'
-    ASISTENCIA_TOLERANCE = '08:50'
-    ASISTENCIA_CORTE_MANANA = '12:00'
-    ASISTENCIA_INICIO_TARDE = '13:30'
-    ASISTENCIA_SALIDA_FINAL = '16:00'
+    # Asistencia - umbrales (HH:MM), ver marcaciones.ReglasAsistencia
+    ASISTENCIA_ON_TIME = '08:00'  # inicio de jornada: la tardanza se mide desde aquí
+    ASISTENCIA_TOLERANCE = '08:00'  # entradas hasta esta hora no cuentan como llegada tarde
+    ASISTENCIA_ALMUERZO_DESDE = '11:30'  # salida desde esta hora = salida al almuerzo
+    ASISTENCIA_CORTE_MANANA = '13:30'  # fin de la franja de almuerzo; salir antes sin volver = solo mañana
+    ASISTENCIA_INICIO_TARDE = '13:00'  # entrada desde esta hora = solo turno tarde
+    ASISTENCIA_SALIDA_FINAL = '16:00'  # salida antes de esta hora = salida anticipada
+
+    # Tokens de los relojes biométricos para POST /rrhh/asistencia/marcaciones/lote (header X-Dispositivo-Token),
+    # separados por comas; sin tokens solo importan usuarios RRHH con sesión
+    MARCACIONES_TOKENS = tuple(t.strip() for t in os.environ.get('MARCACIONES_TOKENS', '').split(',') if t.strip())
+
+    # Archivo de meses cerrados de asistencia_eventos (SQLite), ver almacen_eventos.py
+    ASISTENCIA_ARCHIVO_DIR = os.environ.get('ASISTENCIA_ARCHIVO_DIR') or os.path.join(os.path.dirname(__file__), 'archivo_eventos')
+
+    # Calendario laboral: días de la semana hábiles (0 = lunes ... 6 = domingo); los feriados van en la tabla feriados
+    CALENDARIO_DIAS_LABORALES = (0, 1, 2, 3, 4)
+
+    # Tareas en segundo plano (liquidaciones, aguinaldos, planillas)
+    TAREAS_WORKERS = int(os.environ.get('TAREAS_WORKERS', 2))
+    TAREAS_TAMANO_LOTE = int(os.environ.get('TAREAS_TAMANO_LOTE', 200))  # empleados por commit
+    TAREAS_LATIDO_MAXIMO = timedelta(minutes=10)  # sin latido por más tiempo = tarea huérfana, se reanuda
+
+    # Cálculo de nómina en varios procesos (1 = serial)
+    NOMINA_PROCESOS = int(os.environ.get('NOMINA_PROCESOS', 1))
+    NOMINA_MIN_EMPLEADOS_PARALELO = int(os.environ.get('NOMINA_MIN_EMPLEADOS_PARALELO', 1000))
+
+    # Inserciones masivas: por encima de este número de filas se usa COPY en PostgreSQL
+    ESCRITURA_UMBRAL_COPY = int(os.environ.get('ESCRITURA_UMBRAL_COPY', 5000))
+
+    # Logger estructurado de nómina (JSON por línea); INFO muestra un evento por corrida
+    NOMINA_LOG_NIVEL = os.environ.get('NOMINA_LOG_NIVEL', 'WARNING')
 
 class DevelopmentConfig(Config):
     """Configuración de desarrollo"""
@@ -44,6 +70,8 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False
+    TAREAS_WORKERS = 0  # los tests ejecutan las tareas con ejecutar_tarea()
+    ASISTENCIA_ARCHIVO_DIR = None  # sin archivo salvo que el test lo configure
 
 config = {
     'development': DevelopmentConfig,
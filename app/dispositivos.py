@@ -0,0 +1,89 @@
+"""
+dispositivos.py
+Diccionario de dispositivos de marcación.
+
+Cada evento guardaba en `detalles` el JSON {ip, user_agent}, y las tablets
+de kiosco repetían la misma cadena en millones de filas. La tripleta
+(origen, ip, user_agent) se guarda ahora una sola vez en `dispositivos`,
+identificada por su SHA-256, y el evento lleva solo dispositivo_id.
+
+`id_dispositivo` resuelve la tripleta con una caché LRU por proceso
+(hash -> id) delante de la tabla. Las filas creadas en la transacción
+actual entran a la caché recién con el commit; un rollback las descarta.
+"""
+
+import hashlib
+from collections import OrderedDict
+
+from sqlalchemy import event, insert
+
+from .models import db, Dispositivo
+
+TAMANO_CACHE = 1024
+
+# hash -> id, en orden de uso (el primero es el menos reciente)
+_cache = OrderedDict()
+
+
+def invalidar_dispositivos():
+    """Descarta la caché (nueva base de datos)."""
+    _cache.clear()
+
+
+def hash_dispositivo(origen, ip, user_agent):
+    return hashlib.sha256('\x1f'.join(v or '' for v in (origen, ip, user_agent)).encode('utf-8')).hexdigest()
+
+
+def _recordar(clave, id_):
+    _cache[clave] = id_
+    _cache.move_to_end(clave)
+    if len(_cache) > TAMANO_CACHE:
+        _cache.popitem(last=False)
+
+
+def _insertar(clave, origen, ip, user_agent):
+    """INSERT ignorando el conflicto si otra transacción creó el mismo hash. Returns: True si insertó."""
+    conexion = db.session.connection()
+    valores = {'hash': clave, 'origen': origen, 'ip': ip, 'user_agent': user_agent}
+    if conexion.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as insert_dialecto
+    elif conexion.dialect.name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as insert_dialecto
+    else:
+        db.session.execute(insert(Dispositivo.__table__).values(**valores))
+        return True
+    stmt = insert_dialecto(Dispositivo.__table__).values(**valores).on_conflict_do_nothing(index_elements=['hash'])
+    return db.session.execute(stmt).rowcount == 1
+
+
+def id_dispositivo(origen, ip, user_agent):
+    """id del dispositivo (origen, ip, user_agent); lo crea si no existe, sin commit."""
+    origen = origen[:50] if origen else None
+    ip = ip[:45] if ip else None
+    clave = hash_dispositivo(origen, ip, user_agent)
+    if clave in _cache:
+        _cache.move_to_end(clave)
+        return _cache[clave]
+
+    nuevos = db.session.info.setdefault('dispositivos_nuevos', {})
+    if clave in nuevos:
+        return nuevos[clave]
+
+    insertado = _insertar(clave, origen, ip, user_agent)
+    id_ = db.session.query(Dispositivo.id).filter_by(hash=clave).scalar()
+    if insertado:
+        nuevos[clave] = id_
+    else:
+        _recordar(clave, id_)
+    return id_
+
+
+@event.listens_for(db.session, 'after_commit')
+def _confirmar_nuevos(session):
+    for clave, id_ in session.info.pop('dispositivos_nuevos', {}).items():
+        _recordar(clave, id_)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _descartar_nuevos(session):
+    session.info.pop('dispositivos_nuevos', None)
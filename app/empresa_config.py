@@ -0,0 +1,84 @@
+"""
+empresa_config.py
+Configuración de la empresa (fila única de `empresas`) cacheada por proceso.
+
+`empresa_actual()` devuelve una copia de solo lectura de la fila, con los
+mismos atributos, cargada una vez por proceso. Se usa en el context processor
+de los templates, los PDF, las planillas IPS y el cálculo de horas extra.
+Así esas rutas y bucles no consultan `empresas` en cada uso.
+
+Las ediciones (ver_empresa, editar_empresa) llaman a
+`registrar_cambio_empresa()` dentro de su transacción. Eso incrementa el
+contador `empresa_version` de estado_sistema, y al confirmar, el proceso que
+editó descarta su copia. Los demás procesos comparan el contador, como mucho
+cada VERIFICAR_SEGUNDOS, con una lectura por clave primaria, y recargan si
+cambió. Entre verificaciones una página no hace ninguna consulta por la
+empresa.
+"""
+
+import threading
+import time as reloj
+from types import SimpleNamespace
+
+from sqlalchemy import event
+
+from .models import db, Empresa
+from .versiones import leer_version, incrementar_version
+
+CLAVE_VERSION = 'empresa_version'
+VERIFICAR_SEGUNDOS = 30
+
+_candado = threading.Lock()
+_estado = {'empresa': None, 'version': None, 'verificado': None}
+
+
+def invalidar_empresa():
+    """Descarta la copia (empresa editada en este proceso o nueva base de datos)."""
+    with _candado:
+        _estado.update(empresa=None, version=None, verificado=None)
+
+
+def _copia(empresa):
+    """Atributos de la fila en un objeto independiente de la sesión (None si no hay empresa)."""
+    if empresa is None:
+        return None
+    return SimpleNamespace(**{columna.key: getattr(empresa, columna.key) for columna in Empresa.__table__.columns})
+
+
+def empresa_actual():
+    """Configuración de la empresa (copia de solo lectura) o None si no hay empresa cargada."""
+    ahora = reloj.monotonic()
+    with _candado:
+        vigente = _estado['verificado'] is not None and ahora - _estado['verificado'] < VERIFICAR_SEGUNDOS
+        if vigente:
+            return _estado['empresa']
+        version_cacheada = _estado['version']
+        cargada = _estado['verificado'] is not None
+
+    version = leer_version(CLAVE_VERSION)
+    if cargada and version == version_cacheada:
+        with _candado:
+            _estado['verificado'] = ahora
+            return _estado['empresa']
+
+    empresa = _copia(Empresa.query.order_by(Empresa.id).first())
+    with _candado:
+        _estado.update(empresa=empresa, version=version, verificado=ahora)
+    return empresa
+
+
+def registrar_cambio_empresa():
+    """Incrementa empresa_version en la transacción actual; al confirmar se descarta la copia local."""
+    incrementar_version(CLAVE_VERSION)
+    db.session.info['empresa_modificada'] = True
+
+
+@event.listens_for(db.session, 'after_commit')
+def _confirmar_cambio(session):
+    if session.info.pop('empresa_modificada', False):
+        invalidar_empresa()
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _descartar_cambio(session):
+    session.info.pop('empresa_modificada', None)
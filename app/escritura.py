@@ -0,0 +1,139 @@
+"""
+escritura.py
+Inserción masiva de filas para procesos por lotes (nómina).
+
+`insertar_filas` recibe diccionarios columna -> valor y los inserta dentro de
+la transacción de la sesión actual:
+- hasta ESCRITURA_UMBRAL_COPY filas (o fuera de PostgreSQL): un executemany
+  vía `bulk_insert_mappings`;
+- por encima del umbral en PostgreSQL: `COPY ... FROM STDIN`, reservando
+  antes los ids de la secuencia si el llamador los necesita.
+
+`insertar_sin_duplicados` es la variante para tablas con clave única: un
+INSERT ... ON CONFLICT DO NOTHING (PostgreSQL y SQLite) que devuelve las filas
+efectivamente insertadas, así dos lotes que se solapan no duplican filas.
+"""
+
+import io
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask import current_app
+from sqlalchemy import text, insert
+
+from .models import db
+
+UMBRAL_COPY_DEFECTO = 5000
+
+
+def _usar_copy(cantidad):
+    if db.engine.dialect.name != 'postgresql':
+        return False
+    if db.engine.dialect.driver not in ('psycopg2', 'psycopg'):
+        return False
+    return cantidad > current_app.config.get('ESCRITURA_UMBRAL_COPY', UMBRAL_COPY_DEFECTO)
+
+
+def insertar_filas(modelo, filas, devolver_ids=False):
+    """
+    Inserta `filas` (lista de dicts) en la tabla de `modelo`. No hace commit.
+
+    Con devolver_ids=True cada dict recibe su 'id' generado.
+    Returns: cantidad de filas insertadas.
+    """
+    if not filas:
+        return 0
+    if _usar_copy(len(filas)):
+        return _copiar_filas(modelo.__table__, filas, devolver_ids)
+
+    db.session.bulk_insert_mappings(modelo, filas, return_defaults=devolver_ids)
+    return len(filas)
+
+
+def insertar_sin_duplicados(modelo, filas, columnas_unicas, devolver):
+    """
+    Inserta `filas` ignorando las que chocan con el índice único de
+    `columnas_unicas`. No hace commit.
+
+    Returns: tuplas con las columnas `devolver` de las filas insertadas.
+    """
+    if not filas:
+        return []
+    tabla = modelo.__table__
+    dialecto = db.session.connection().dialect.name
+    if dialecto == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as insert_dialecto
+    elif dialecto == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as insert_dialecto
+    else:
+        db.session.execute(insert(tabla), filas)
+        return [tuple(fila[c] for c in devolver) for fila in filas]
+    stmt = insert_dialecto(tabla).on_conflict_do_nothing(index_elements=list(columnas_unicas)).returning(
+        *(tabla.c[c] for c in devolver))
+    # executemany con RETURNING: SQLAlchemy lo envía en tandas de VALUES múltiples
+    return [tuple(fila) for fila in db.session.execute(stmt, filas)]
+
+
+# ==================== COPY (POSTGRESQL) ====================
+
+def _completar_defaults(tabla, filas):
+    """COPY no aplica los default de Python: se completan aquí."""
+    for columna in tabla.columns:
+        default = columna.default
+        if columna.primary_key or default is None or not (default.is_scalar or default.is_callable):
+            continue
+        for fila in filas:
+            if fila.get(columna.key) is None:
+                fila[columna.key] = default.arg(None) if default.is_callable else default.arg
+
+
+def _reservar_ids(tabla, filas):
+    ids = db.session.execute(
+        text("SELECT nextval(pg_get_serial_sequence(:tabla, 'id')) FROM generate_series(1, :n)"),
+        {'tabla': tabla.name, 'n': len(filas)}
+    ).scalars().all()
+    for fila, id_ in zip(filas, ids):
+        fila['id'] = id_
+
+
+def _valor_copy(valor):
+    """Formato text de COPY: \\N para NULL, escapes de barra, tab y saltos de línea."""
+    if valor is None:
+        return '\\N'
+    if isinstance(valor, bool):
+        return 't' if valor else 'f'
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, (int, Decimal)):
+        return str(valor)
+    return (str(valor).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+def _copiar_filas(tabla, filas, devolver_ids):
+    _completar_defaults(tabla, filas)
+    if devolver_ids:
+        _reservar_ids(tabla, filas)
+
+    columnas = [c for c in tabla.columns if c.key in filas[0]]
+    # Mismo valor que enviaría un INSERT (p. ej. Enum -> nombre del miembro)
+    procesadores = [c.type.bind_processor(db.engine.dialect) or (lambda v: v) for c in columnas]
+    buffer = io.StringIO()
+    for fila in filas:
+        buffer.write('\t'.join(
+            _valor_copy(procesar(fila.get(c.key))) for c, procesar in zip(columnas, procesadores)
+        ))
+        buffer.write('\n')
+    buffer.seek(0)
+
+    quote = db.engine.dialect.identifier_preparer.quote
+    sql = f"COPY {quote(tabla.name)} ({', '.join(quote(c.name) for c in columnas)}) FROM STDIN"
+    # Misma conexión (y transacción) que la sesión
+    conexion = db.session.connection().connection.dbapi_connection
+    with conexion.cursor() as cursor:
+        if db.engine.dialect.driver == 'psycopg2':
+            cursor.copy_expert(sql, buffer)
+        else:
+            with cursor.copy(sql) as copia:
+                copia.write(buffer.getvalue())
+    return len(filas)
@@ -0,0 +1,87 @@
+"""
+horas_extra.py
+Detección de horas extra a partir de las marcaciones, para toda la empresa.
+
+La última salida de cada (empleado, día) del mes se obtiene con una sola
+consulta agrupada; las horas posteriores al fin de jornada se valorizan con
+el salario por hora (salario base / días hábiles de Empresa / horas de
+jornada) y se guardan en HorasExtra en bloque: los registros existentes del
+mismo (empleado, fecha) se actualizan solo si siguen PENDIENTE, sin aplicar
+y con origen 'asistencia' (los aprobados, aplicados o cargados a mano no se
+tocan); los días sin registro se insertan.
+"""
+
+from datetime import datetime, time
+
+from sqlalchemy import func
+
+from .models import db, Empleado, AsistenciaEvento, HorasExtra
+from .periodos import rango_mes, en_rango
+from .calendario import dias_habiles_entre
+from .escritura import insertar_filas
+from .empresa_config import empresa_actual
+
+HORAS_JORNADA = 8
+FIN_JORNADA = time(17, 0)
+MULTIPLICADOR = 1.5
+
+
+def _ultimas_salidas(año, mes, empleado_ids=None):
+    """{(empleado_id, fecha): ts de la última salida del día} del mes, en una consulta."""
+    inicio, fin = rango_mes(año, mes)
+    consulta = db.session.query(AsistenciaEvento.empleado_id, func.max(AsistenciaEvento.ts)).filter(
+        en_rango(AsistenciaEvento.ts, inicio, fin),
+        AsistenciaEvento.tipo == 'out'
+    )
+    if empleado_ids is not None:
+        consulta = consulta.filter(AsistenciaEvento.empleado_id.in_(empleado_ids))
+    filas = consulta.group_by(AsistenciaEvento.empleado_id, func.date(AsistenciaEvento.ts)).all()
+    return {(empleado_id, ts.date()): ts for empleado_id, ts in filas}
+
+
+def detectar_horas_extra(año, mes, empleado_ids=None):
+    """
+    Crea o actualiza los registros HorasExtra (origen 'asistencia') del mes
+    para todos los empleados (o los de `empleado_ids`). No hace commit.
+
+    Returns:
+        dict creados, actualizados
+    """
+    habiles = set(dias_habiles_entre(*rango_mes(año, mes)))
+    salidas = {
+        clave: ts for clave, ts in _ultimas_salidas(año, mes, empleado_ids).items()
+        if clave[1] in habiles and ts > datetime.combine(clave[1], FIN_JORNADA)
+    }
+    if not salidas:
+        return {'creados': 0, 'actualizados': 0}
+
+    empresa = empresa_actual()
+    dias_habiles = empresa.dias_habiles_mes if empresa and empresa.dias_habiles_mes else 30
+    ids = {empleado_id for empleado_id, _ in salidas}
+    salario_hora = {
+        empleado_id: float(salario or 0) / float(dias_habiles) / float(HORAS_JORNADA)
+        for empleado_id, salario in db.session.query(Empleado.id, Empleado.salario_base).filter(Empleado.id.in_(ids))
+    }
+    existentes = {
+        (empleado_id, fecha): (id_, estado == 'PENDIENTE' and not aplicado and origen == 'asistencia')
+        for id_, empleado_id, fecha, estado, aplicado, origen in db.session.query(
+            HorasExtra.id, HorasExtra.empleado_id, HorasExtra.fecha, HorasExtra.estado, HorasExtra.aplicado,
+            HorasExtra.origen
+        ).filter(HorasExtra.empleado_id.in_(ids), en_rango(HorasExtra.fecha, *rango_mes(año, mes)))
+    }
+
+    nuevos, cambios = [], []
+    for (empleado_id, fecha), ts in salidas.items():
+        horas = round((ts - datetime.combine(fecha, FIN_JORNADA)).total_seconds() / 3600.0, 4)
+        monto = round(horas * salario_hora[empleado_id] * MULTIPLICADOR)
+        id_, actualizable = existentes.get((empleado_id, fecha), (None, False))
+        if id_ is None:
+            nuevos.append({'empleado_id': empleado_id, 'fecha': fecha, 'horas': horas, 'monto_calculado': monto,
+                           'origen': 'asistencia', 'estado': 'PENDIENTE'})
+        elif actualizable:
+            cambios.append({'id': id_, 'horas': horas, 'monto_calculado': monto})
+
+    insertar_filas(HorasExtra, nuevos)
+    if cambios:
+        db.session.bulk_update_mappings(HorasExtra, cambios)
+    return {'creados': len(nuevos), 'actualizados': len(cambios)}
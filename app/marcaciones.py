@@ -0,0 +1,469 @@
+"""
+marcaciones.py
+Máquina de estados de las marcaciones (punches) de asistencia.
+
+La fila diaria de Asistencia guarda el estado acumulado del día: primera
+entrada (hora_entrada), última salida (hora_salida), salida y regreso del
+almuerzo, cantidad de eventos y tipo del último. Cada marcación nueva se
+aplica sobre ese estado en O(1), sin volver a leer los eventos del día, y el
+resumen (presente / observaciones) se deriva del estado.
+
+Los umbrales (hora de entrada, tolerancia, franja de almuerzo, turno tarde,
+salida final) viven en ReglasAsistencia, que create_app compila una vez desde
+las claves ASISTENCIA_* de la configuración. `ReglasAsistencia.plegar`
+resume en una sola pasada un flujo de eventos ordenado por (empleado_id, ts).
+
+Los eventos deben aplicarse en orden cronológico; `reconstruir_estado`
+vuelve a plegar todos los eventos del día (filas antiguas sin estado o
+marcaciones recibidas fuera de orden).
+
+`importar_marcaciones` recibe lotes de los relojes biométricos (que guardan
+marcaciones sin conexión y las envían en ráfagas): descarta duplicados por
+(empleado, ts, dispositivo), inserta los eventos en bloque y recalcula solo
+los días afectados.
+"""
+
+import csv
+import io
+import json
+from datetime import datetime, date, time, timedelta
+
+from flask import current_app, has_app_context
+
+from .models import db, Asistencia, AsistenciaEvento, Empleado, EstadoEmpleadoEnum
+from .periodos import en_dia, en_rango
+from .escritura import insertar_sin_duplicados
+from .almacen_eventos import eventos_archivados, con_archivados
+from .resumen_asistencia import PREFIJO_VACACIONES, PREFIJO_PERMISO
+
+CAMPOS_ESTADO = ('hora_entrada', 'hora_salida', 'salida_almuerzo', 'regreso_almuerzo', 'eventos', 'ultimo_evento')
+# Ausencias clasificadas por RRHH: recalcular_dias y el reproceso no las modifican
+JUSTIFICACIONES_MANUALES = ('JUSTIFICADO', 'INJUSTIFICADO')
+
+
+class EstadoDia:
+    """Estado del día sin fila de Asistencia (p. ej. para resumir sin escribir)."""
+
+    def __init__(self):
+        for campo in CAMPOS_ESTADO:
+            setattr(self, campo, None)
+
+
+def _minutos(desde, hasta):
+    return int((datetime.combine(date.min, hasta) - datetime.combine(date.min, desde)).total_seconds() / 60)
+
+
+def _hora(valor):
+    return valor if isinstance(valor, time) else datetime.strptime(valor, '%H:%M').time()
+
+
+def _texto_almuerzo(duracion):
+    if duracion <= 60:
+        return f"Almuerzo {duracion}min"
+    horas, minutos = divmod(duracion, 60)
+    return f"Almuerzo {horas}h {minutos}min" if minutos > 0 else f"Almuerzo {horas}h"
+
+
+class ReglasAsistencia:
+    """
+    Umbrales de asistencia ya convertidos a time (se parsean una vez, al
+    crear la app, desde las claves ASISTENCIA_* de la configuración).
+
+    - hora_esperada: inicio de la jornada; la tardanza se mide desde aquí
+    - tolerancia: entradas hasta esta hora no cuentan como llegada tarde
+    - almuerzo_desde / corte_manana: una salida en esa franja es la salida
+      al almuerzo; salir antes de corte_manana sin volver = solo turno mañana
+    - inicio_tarde: entrada desde esta hora = solo turno tarde
+    - salida_final: salir antes de esta hora = salida anticipada
+    """
+
+    def __init__(self, hora_esperada='08:00', tolerancia='08:00', almuerzo_desde='11:30',
+                 corte_manana='13:30', inicio_tarde='13:00', salida_final='16:00'):
+        self.hora_esperada = _hora(hora_esperada)
+        self.tolerancia = _hora(tolerancia)
+        self.almuerzo_desde = _hora(almuerzo_desde)
+        self.corte_manana = _hora(corte_manana)
+        self.inicio_tarde = _hora(inicio_tarde)
+        self.salida_final = _hora(salida_final)
+
+    @classmethod
+    def desde_config(cls, config):
+        return cls(
+            hora_esperada=config.get('ASISTENCIA_ON_TIME', '08:00'),
+            tolerancia=config.get('ASISTENCIA_TOLERANCE', '08:00'),
+            almuerzo_desde=config.get('ASISTENCIA_ALMUERZO_DESDE', '11:30'),
+            corte_manana=config.get('ASISTENCIA_CORTE_MANANA', '13:30'),
+            inicio_tarde=config.get('ASISTENCIA_INICIO_TARDE', '13:00'),
+            salida_final=config.get('ASISTENCIA_SALIDA_FINAL', '16:00'),
+        )
+
+    def aplicar(self, estado, tipo, ts):
+        """Aplica una marcación al estado del día (O(1))."""
+        hora = ts.time()
+        if tipo == 'in':
+            if estado.hora_entrada is None:
+                estado.hora_entrada = hora
+            if estado.salida_almuerzo is not None and estado.regreso_almuerzo is None and hora > estado.salida_almuerzo:
+                estado.regreso_almuerzo = hora
+        else:
+            estado.hora_salida = hora
+            if estado.salida_almuerzo is None and self.almuerzo_desde <= hora <= self.corte_manana:
+                estado.salida_almuerzo = hora
+        estado.eventos = (estado.eventos or 0) + 1
+        estado.ultimo_evento = tipo
+
+    def resumir(self, estado):
+        """
+        Resumen del día a partir del estado: hora_entrada, hora_salida (time),
+        presente y observaciones detalladas.
+        """
+        entrada, salida = estado.hora_entrada, estado.hora_salida
+        salida_almuerzo, regreso_almuerzo = estado.salida_almuerzo, estado.regreso_almuerzo
+
+        if entrada is None and salida is None:
+            return {'hora_entrada': None, 'hora_salida': None, 'presente': False,
+                    'observaciones': 'Ausencia injustificada - Sin marcaciones'}
+
+        # Solo marcó entrada, nunca salió
+        if salida is None:
+            return {'hora_entrada': entrada, 'hora_salida': None, 'presente': True,
+                    'observaciones': 'Solo marcó entrada - Sin salida registrada'}
+
+        # Solo marcó salida (extraño)
+        if entrada is None:
+            return {'hora_entrada': None, 'hora_salida': salida, 'presente': False,
+                    'observaciones': 'Solo marcó salida - Sin entrada registrada'}
+
+        tardanza = _minutos(self.hora_esperada, entrada) if entrada > max(self.hora_esperada, self.tolerancia) else 0
+
+        # Solo vino a la mañana (salió antes del corte y no volvió)
+        if salida < self.corte_manana and not regreso_almuerzo:
+            if tardanza > 0:
+                observacion = f"Llegada tarde {tardanza} min - Solo turno mañana - No regresó"
+            else:
+                observacion = "Solo turno mañana - No regresó del almuerzo"
+
+        # Solo vino a la tarde
+        elif entrada >= self.inicio_tarde:
+            observacion = f"Solo turno tarde ({_minutos(entrada, salida) // 60}h)"
+
+        # Salida anticipada (salió antes de la salida final pero sí almorzó)
+        elif salida < self.salida_final and salida_almuerzo and regreso_almuerzo:
+            if tardanza > 0:
+                observacion = f"Llegada tarde {tardanza} min - Salida anticipada {salida.strftime('%H:%M')}"
+            else:
+                observacion = f"Salida anticipada {salida.strftime('%H:%M')}"
+
+        # Día completo con información de almuerzo
+        elif salida_almuerzo and regreso_almuerzo:
+            almuerzo = _texto_almuerzo(_minutos(salida_almuerzo, regreso_almuerzo))
+            if tardanza > 0:
+                observacion = f"Llegada tarde {tardanza} min - Día completo - {almuerzo}"
+            else:
+                observacion = f"Día completo (8h) - {almuerzo}"
+
+        # Día completo sin registro de almuerzo
+        elif tardanza >= 60:
+            horas, minutos = divmod(tardanza, 60)
+            if minutos > 0:
+                observacion = f"Llegada tarde {horas}h {minutos}min - Día completo"
+            else:
+                observacion = f"Llegada tarde {horas}h - Día completo"
+        elif tardanza > 0:
+            observacion = f"Llegada tarde {tardanza} min - Día completo"
+        else:
+            observacion = "Día completo - Sin registro de almuerzo"
+
+        return {'hora_entrada': entrada, 'hora_salida': salida, 'presente': True, 'observaciones': observacion}
+
+    def plegar(self, eventos):
+        """
+        Una pasada sobre eventos (empleado_id, ts, tipo) ordenados por
+        (empleado_id, ts): produce ((empleado_id, fecha), estado) por cada día
+        con eventos, sin acumular más de un día en memoria.
+        """
+        clave, estado = None, None
+        for empleado_id, ts, tipo in eventos:
+            actual = (empleado_id, ts.date())
+            if actual != clave:
+                if estado is not None:
+                    yield clave, estado
+                clave, estado = actual, EstadoDia()
+                _reiniciar(estado)
+            self.aplicar(estado, tipo, ts)
+        if estado is not None:
+            yield clave, estado
+
+
+REGLAS_POR_DEFECTO = ReglasAsistencia()
+
+
+def reglas():
+    """Reglas de la app actual (compiladas en create_app) o las por defecto fuera de contexto."""
+    if has_app_context():
+        return current_app.extensions.get('reglas_asistencia', REGLAS_POR_DEFECTO)
+    return REGLAS_POR_DEFECTO
+
+
+def inferir_tipo(estado):
+    """Entradas y salidas alternadas: par de eventos previos -> 'in'."""
+    return 'in' if (estado.eventos or 0) % 2 == 0 else 'out'
+
+
+def aplicar_evento(estado, tipo, ts):
+    """Aplica una marcación al estado del día con las reglas vigentes."""
+    reglas().aplicar(estado, tipo, ts)
+
+
+def resumir_estado(estado):
+    """Resumen del día con las reglas vigentes (ver ReglasAsistencia.resumir)."""
+    return reglas().resumir(estado)
+
+
+def _reiniciar(estado):
+    for campo in CAMPOS_ESTADO:
+        setattr(estado, campo, None)
+    estado.eventos = 0
+
+
+def _eventos_dia(empleado_id, dia):
+    return AsistenciaEvento.query.filter(
+        AsistenciaEvento.empleado_id == empleado_id,
+        en_dia(AsistenciaEvento.ts, dia)
+    ).order_by(AsistenciaEvento.ts, AsistenciaEvento.id).all()
+
+
+def reconstruir_estado(estado, empleado_id, dia):
+    """Recalcula el estado desde cero a partir de los eventos guardados del día."""
+    _reiniciar(estado)
+    for evento in _eventos_dia(empleado_id, dia):
+        aplicar_evento(estado, evento.tipo, evento.ts)
+
+
+def resumen_a_json(resumen):
+    """Horas como 'HH:MM:SS' para respuestas JSON."""
+    return {
+        **resumen,
+        'hora_entrada': resumen['hora_entrada'].strftime('%H:%M:%S') if resumen['hora_entrada'] else None,
+        'hora_salida': resumen['hora_salida'].strftime('%H:%M:%S') if resumen['hora_salida'] else None,
+    }
+
+
+def resumen_dia(empleado_id, dia):
+    """Resumen del día desde el estado guardado; rescanea eventos solo si la fila no tiene estado."""
+    asistencia = Asistencia.query.filter_by(empleado_id=empleado_id, fecha=dia).first()
+    if asistencia is not None and asistencia.eventos is not None:
+        return resumir_estado(asistencia)
+    estado = EstadoDia()
+    reconstruir_estado(estado, empleado_id, dia)
+    return resumir_estado(estado)
+
+
+def fila_del_dia(empleado_id, dia):
+    """
+    Fila de Asistencia del día con su estado, bloqueada para la transacción
+    actual (FOR UPDATE donde la BD lo soporta). La crea si no existe.
+    """
+    asistencia = Asistencia.query.filter_by(empleado_id=empleado_id, fecha=dia).with_for_update().first()
+    if asistencia is None:
+        asistencia = Asistencia(empleado_id=empleado_id, fecha=dia)
+        _reiniciar(asistencia)
+        db.session.add(asistencia)
+    elif asistencia.eventos is None:
+        # Fila creada sin estado (cierre automático o anterior a esta versión)
+        reconstruir_estado(asistencia, empleado_id, dia)
+    return asistencia
+
+
+def registrar_marcacion(asistencia, ts, tipo, origen='web', dispositivo_id=None, detalles=None):
+    """
+    Guarda el evento y lo aplica a la fila diaria (de fila_del_dia) en la
+    transacción actual, sin commit.
+
+    Returns:
+        (evento, resumen)
+    """
+    evento = AsistenciaEvento(empleado_id=asistencia.empleado_id, ts=ts, tipo=tipo, origen=origen,
+                              dispositivo_id=dispositivo_id, detalles=detalles)
+    db.session.add(evento)
+
+    aplicar_evento(asistencia, tipo, ts)
+    resumen = resumir_estado(asistencia)
+    asistencia.presente = resumen['presente']
+    asistencia.observaciones = resumen['observaciones']
+    return evento, resumen
+
+
+# ==================== IMPORTACIÓN POR LOTES ====================
+
+MAX_ERRORES_INFORMADOS = 100
+
+
+def leer_marcaciones(contenido, formato):
+    """
+    Filas (dicts codigo, ts, tipo, device_id) de un lote CSV (con encabezado)
+    o JSON (lista de objetos, o {"marcaciones": [...]}).
+    """
+    if formato == 'csv':
+        return list(csv.DictReader(io.StringIO(contenido)))
+    datos = json.loads(contenido)
+    if isinstance(datos, dict):
+        datos = datos.get('marcaciones', [])
+    if not isinstance(datos, list):
+        raise ValueError('Se esperaba una lista de marcaciones')
+    return datos
+
+
+def _parse_ts(valor):
+    if isinstance(valor, datetime):
+        ts = valor
+    else:
+        ts = datetime.fromisoformat(str(valor).strip())
+    if ts.tzinfo is not None:
+        ts = ts.astimezone().replace(tzinfo=None)  # hora local, como datetime.now()
+    return ts
+
+
+def _normalizar(filas, dispositivo_defecto):
+    """Valida las filas. Returns: (válidas [(codigo, ts, tipo, origen)], errores [(n° de fila, motivo)])."""
+    validas, errores = [], []
+    for n, fila in enumerate(filas, start=1):
+        if not isinstance(fila, dict):
+            errores.append((n, 'Fila inválida'))
+            continue
+        codigo = str(fila.get('codigo') or '').strip().upper()
+        tipo = str(fila.get('tipo') or '').strip().lower()
+        origen = str(fila.get('device_id') or dispositivo_defecto or '').strip()[:50]
+        if not codigo:
+            errores.append((n, 'Código de empleado requerido'))
+            continue
+        if tipo not in ('in', 'out'):
+            errores.append((n, f"Tipo inválido: {fila.get('tipo')!r} (in/out)"))
+            continue
+        if not origen:
+            errores.append((n, 'device_id requerido'))
+            continue
+        try:
+            ts = _parse_ts(fila.get('ts'))
+        except (TypeError, ValueError):
+            errores.append((n, f"Fecha/hora inválida: {fila.get('ts')!r}"))
+            continue
+        validas.append((n, codigo, ts, tipo, origen))
+    return validas, errores
+
+
+def importar_marcaciones(filas, dispositivo_defecto=None):
+    """
+    Inserta un lote de marcaciones con su hora del dispositivo, sin commit.
+
+    Idempotente: las marcaciones ya guardadas o archivadas (o repetidas en el
+    lote) con el mismo (empleado, ts, dispositivo) se cuentan como duplicadas.
+    Las guardadas las descarta el índice único de asistencia_eventos, así que
+    dos envíos simultáneos del mismo lote no las duplican. El dispositivo se
+    guarda en AsistenciaEvento.origen.
+
+    Returns:
+        dict con aceptadas, duplicadas, rechazadas, dias_recalculados y
+        errores [{'fila', 'motivo'}] (los primeros MAX_ERRORES_INFORMADOS)
+    """
+    validas, errores = _normalizar(filas, dispositivo_defecto)
+
+    # Empleados del lote en una consulta
+    codigos = {codigo for _, codigo, _, _, _ in validas}
+    empleados = dict(db.session.query(Empleado.codigo, Empleado.id).filter(
+        Empleado.codigo.in_(codigos), Empleado.estado == EstadoEmpleadoEnum.ACTIVO
+    ).all()) if codigos else {}
+
+    marcaciones = []
+    for n, codigo, ts, tipo, origen in validas:
+        empleado_id = empleados.get(codigo)
+        if empleado_id is None:
+            errores.append((n, f'Empleado {codigo} no encontrado o inactivo'))
+        else:
+            marcaciones.append((empleado_id, ts, tipo, origen))
+
+    # Claves archivadas (fuera de la tabla); las guardadas las descarta el índice único
+    vistas = set()
+    if marcaciones:
+        vistas.update((r['empleado_id'], r['ts'], r['origen']) for r in eventos_archivados(
+            min(m[1] for m in marcaciones).date(), max(m[1] for m in marcaciones).date(), {m[0] for m in marcaciones}
+        ))
+
+    candidatas = []
+    for empleado_id, ts, tipo, origen in marcaciones:
+        clave = (empleado_id, ts, origen)
+        if clave not in vistas:
+            vistas.add(clave)
+            candidatas.append({'empleado_id': empleado_id, 'ts': ts, 'tipo': tipo, 'origen': origen})
+
+    # ON CONFLICT DO NOTHING: un reenvío simultáneo del mismo lote no duplica eventos
+    insertadas = insertar_sin_duplicados(AsistenciaEvento, candidatas, ('empleado_id', 'ts', 'origen'),
+                                         ('empleado_id', 'ts'))
+    dias = {(empleado_id, ts.date()) for empleado_id, ts in insertadas}
+    recalcular_dias(dias)
+
+    errores.sort()
+    return {
+        'aceptadas': len(insertadas),
+        'duplicadas': len(marcaciones) - len(insertadas),
+        'rechazadas': len(errores),
+        'dias_recalculados': len(dias),
+        'errores': [{'fila': n, 'motivo': motivo} for n, motivo in errores[:MAX_ERRORES_INFORMADOS]],
+    }
+
+
+def valores_del_dia(asistencia, estado, reglas_dia=None):
+    """
+    Columnas que el estado plegado de un día escribe en su fila de Asistencia
+    (None si la fila todavía no existe). Regla común de recalcular_dias y del
+    reproceso:
+    - fila justificada o injustificada por RRHH: None (no se toca);
+    - día cerrado como vacaciones o permiso: solo las columnas de estado;
+    - resto: estado más presente y observaciones del resumen.
+    """
+    if asistencia is not None and asistencia.justificacion_estado in JUSTIFICACIONES_MANUALES:
+        return None
+    valores = {campo: getattr(estado, campo) for campo in CAMPOS_ESTADO}
+    if asistencia is not None and asistencia.observaciones and \
+            asistencia.observaciones.startswith((PREFIJO_VACACIONES, PREFIJO_PERMISO)):
+        return valores
+    resumen = (reglas_dia or reglas()).resumir(estado)
+    valores['presente'] = resumen['presente']
+    valores['observaciones'] = resumen['observaciones']
+    return valores
+
+
+def recalcular_dias(claves):
+    """
+    Reconstruye el estado y el resumen de los días (empleado_id, fecha)
+    indicados: una consulta para sus eventos (ordenados por empleado y ts),
+    otra para sus filas de Asistencia, y un plegado por día. Sin commit.
+
+    Las filas justificadas o injustificadas por RRHH no se tocan. En los días
+    cerrados como vacaciones o permiso se actualizan las horas, pero se
+    conservan presente y observaciones (la clasificación del resumen).
+    """
+    if not claves:
+        return 0
+    empleado_ids = {e for e, _ in claves}
+    desde, hasta = min(d for _, d in claves), max(d for _, d in claves) + timedelta(days=1)
+
+    eventos = db.session.query(AsistenciaEvento.empleado_id, AsistenciaEvento.ts, AsistenciaEvento.tipo).filter(
+        AsistenciaEvento.empleado_id.in_(empleado_ids),
+        en_rango(AsistenciaEvento.ts, desde, hasta)
+    ).order_by(AsistenciaEvento.empleado_id, AsistenciaEvento.ts, AsistenciaEvento.id)
+    eventos = con_archivados(eventos, desde, hasta - timedelta(days=1), empleado_ids)
+    estados = {clave: estado for clave, estado in reglas().plegar(eventos) if clave in claves}
+
+    filas = {(a.empleado_id, a.fecha): a for a in Asistencia.query.filter(
+        Asistencia.empleado_id.in_(empleado_ids), en_rango(Asistencia.fecha, desde, hasta)
+    )}
+    for (empleado_id, dia), estado in estados.items():
+        asistencia = filas.get((empleado_id, dia))
+        valores = valores_del_dia(asistencia, estado)
+        if asistencia is None:
+            db.session.add(Asistencia(empleado_id=empleado_id, fecha=dia, **valores))
+        elif valores is not None:
+            for campo, valor in valores.items():
+                setattr(asistencia, campo, valor)
+    return len(estados)
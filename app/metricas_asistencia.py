@@ -0,0 +1,154 @@
+"""
+metricas_asistencia.py
+Métricas de asistencia por empleado para un rango de fechas.
+
+Una sola consulta: empleados activos (con los filtros de cargo o lista de
+empleados) LEFT JOIN asistencias del rango [desde, hasta], agrupada por
+empleado con SUM(CASE ...) por contador. El filtro de fecha es un rango
+sobre la columna desnuda, así que usa los índices de fecha.
+
+Los resultados se guardan por proceso, con clave (desde, hasta, filtros).
+Una entrada se descarta cuando cambia una asistencia con fecha dentro de su
+rango. Los flush de Asistencia anotan las fechas y after_commit las aplica.
+Las escrituras por Core (cierre_asistencias) las anotan con anotar_cambio.
+Los cambios de empleados (alta, baja, cargo) vacían la caché. Como otros
+procesos no avisan, cada entrada vence igualmente a los TTL_SEGUNDOS.
+"""
+
+import threading
+import time as reloj
+from datetime import timedelta
+from collections import OrderedDict
+from itertools import chain
+
+from sqlalchemy import event, inspect, func, case, and_
+
+from .models import db, Asistencia, Empleado, EstadoEmpleadoEnum
+from .periodos import en_rango
+from .calendario import contar_dias_habiles
+
+TTL_SEGUNDOS = 300
+MAX_ENTRADAS = 128
+
+# (desde, hasta, cargo_id, empleado_ids) -> (reloj.monotonic(), resultado)
+_cache = OrderedDict()
+_candado = threading.Lock()
+
+
+def invalidar_metricas(fechas=None):
+    """Descarta los resultados cuyo rango incluye alguna de `fechas` (todos si es None)."""
+    with _candado:
+        if fechas is None:
+            _cache.clear()
+            return
+        for clave in [c for c in _cache if any(c[0] <= f <= c[1] for f in fechas)]:
+            del _cache[clave]
+
+
+def anotar_cambio(session, *fechas):
+    """Marca fechas de asistencias modificadas sin ORM; se invalidan al confirmar la transacción."""
+    session.info.setdefault('metricas_fechas', set()).update(fechas)
+
+
+def _contar(condicion):
+    return func.coalesce(func.sum(case((condicion, 1), else_=0)), 0)
+
+
+def _calcular(desde, hasta, cargo_id, empleado_ids):
+    ausente = Asistencia.presente == False
+    consulta = db.session.query(
+        Empleado.id, Empleado.codigo, Empleado.nombre, Empleado.apellido,
+        _contar(Asistencia.presente == True),
+        _contar(ausente),
+        _contar(and_(ausente, Asistencia.justificacion_estado == 'JUSTIFICADO')),
+        _contar(and_(ausente, Asistencia.justificacion_estado == 'INJUSTIFICADO')),
+    ).outerjoin(Asistencia, and_(
+        Asistencia.empleado_id == Empleado.id, en_rango(Asistencia.fecha, desde, hasta + timedelta(days=1))
+    )).filter(Empleado.estado == EstadoEmpleadoEnum.ACTIVO)
+    if cargo_id is not None:
+        consulta = consulta.filter(Empleado.cargo_id == cargo_id)
+    if empleado_ids is not None:
+        consulta = consulta.filter(Empleado.id.in_(empleado_ids))
+    filas = consulta.group_by(Empleado.id, Empleado.codigo, Empleado.nombre, Empleado.apellido).order_by(Empleado.id).all()
+
+    dias_habiles = contar_dias_habiles(desde, hasta)
+    metricas = [{
+        'empleado_id': empleado_id,
+        'codigo': codigo,
+        'nombre': f'{nombre} {apellido}',
+        'dias_presentes': presentes,
+        'ausencias_totales': ausencias,
+        'ausencias_justificadas': justificadas,
+        'ausencias_injustificadas': injustificadas,
+        'tasa_asistencia': round((presentes / dias_habiles * 100) if dias_habiles > 0 else 0, 2),
+    } for empleado_id, codigo, nombre, apellido, presentes, ausencias, justificadas, injustificadas in filas]
+    # Mayor cantidad de ausencias injustificadas primero
+    metricas.sort(key=lambda m: m['ausencias_injustificadas'], reverse=True)
+
+    total_presentes = sum(m['dias_presentes'] for m in metricas)
+    return {
+        'dias_habiles': dias_habiles,
+        'empleados': metricas,
+        'resumen': {
+            'total_empleados': len(metricas),
+            'total_presentes': total_presentes,
+            'total_ausencias': sum(m['ausencias_totales'] for m in metricas),
+            'total_justificadas': sum(m['ausencias_justificadas'] for m in metricas),
+            'total_injustificadas': sum(m['ausencias_injustificadas'] for m in metricas),
+            'tasa_general': round((total_presentes / (len(metricas) * dias_habiles) * 100)
+                                  if dias_habiles > 0 and metricas else 0, 2),
+        },
+    }
+
+
+def metricas_asistencias(desde, hasta, cargo_id=None, empleado_ids=None):
+    """
+    Métricas de los empleados activos entre desde y hasta (fechas inclusive).
+
+    Returns:
+        dict dias_habiles, empleados (lista ordenada por ausencias
+        injustificadas) y resumen (totales y tasa general)
+    """
+    clave = (desde, hasta, cargo_id, tuple(sorted(set(empleado_ids))) if empleado_ids is not None else None)
+    ahora = reloj.monotonic()
+    with _candado:
+        guardado = _cache.get(clave)
+        if guardado is not None and ahora - guardado[0] < TTL_SEGUNDOS:
+            _cache.move_to_end(clave)
+            return guardado[1]
+
+    resultado = _calcular(desde, hasta, cargo_id, clave[3])
+    with _candado:
+        _cache[clave] = (ahora, resultado)
+        _cache.move_to_end(clave)
+        while len(_cache) > MAX_ENTRADAS:
+            _cache.popitem(last=False)
+    return resultado
+
+
+# ==================== INVALIDACIÓN ====================
+
+@event.listens_for(db.session, 'after_flush')
+def _anotar_asistencias(session, flush_context):
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Asistencia):
+            # Fecha actual y, si se movió de día, la anterior
+            fechas = [obj.fecha, *inspect(obj).attrs.fecha.history.deleted]
+            anotar_cambio(session, *(f for f in fechas if f is not None))
+        elif isinstance(obj, Empleado):
+            session.info['metricas_empleados'] = True
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidar_confirmados(session):
+    if session.info.pop('metricas_empleados', False):
+        invalidar_metricas()
+    fechas = session.info.pop('metricas_fechas', None)
+    if fechas:
+        invalidar_metricas(fechas)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _descartar_anotados(session):
+    session.info.pop('metricas_empleados', None)
+    session.info.pop('metricas_fechas', None)
@@ -213,6 +213,13 @@ class Asistencia(db.Model):
     presente = db.Column(db.Boolean, default=True)
     observaciones = db.Column(db.Text)
     fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_actualizacion = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Estado de las marcaciones del día (ver marcaciones.py); eventos NULL = sin estado
+    salida_almuerzo = db.Column(db.Time, nullable=True)
+    regreso_almuerzo = db.Column(db.Time, nullable=True)
+    eventos = db.Column(db.Integer, nullable=True)
+    ultimo_evento = db.Column(db.String(10), nullable=True)
     
     # Campos de justificación de ausencias
     justificacion_estado = db.Column(db.String(20), nullable=True)  # PENDIENTE, JUSTIFICADO, INJUSTIFICADO
@@ -223,12 +230,40 @@ class Asistencia(db.Model):
     # Relación con usuario que justificó
     justificador = db.relationship('Usuario', foreign_keys=[justificacion_por], backref='justificaciones_hechas')
     
-    __table_args__ = (db.UniqueConstraint('empleado_id', 'fecha', name='uq_empleado_fecha'),)
+    __table_args__ = (
+        db.UniqueConstraint('empleado_id', 'fecha', name='uq_empleado_fecha'),
+        # Ausencias por justificar del dashboard (ver ausencias_pendientes.py); solo filas con presente = false
+        db.Index('ix_asistencias_ausencias_justificacion', 'justificacion_estado', 'fecha', 'id',
+                 postgresql_where=(presente == False), sqlite_where=(presente == False)),
+    )
     
     def __repr__(self):
         return f'<Asistencia {self.empleado.codigo} - {self.fecha}>'
 
 
+# ===================== RESUMEN MENSUAL DE ASISTENCIA =====================
+class AsistenciaResumenMensual(db.Model):
+    """Contadores de asistencia por empleado y mes.
+    Se mantienen en la misma transacción que cada cambio de Asistencia (ver app/resumen_asistencia.py).
+    """
+    __tablename__ = 'asistencia_resumen_mensual'
+
+    empleado_id = db.Column(db.Integer, db.ForeignKey('empleados.id'), primary_key=True)
+    año = db.Column(db.Integer, primary_key=True)
+    mes = db.Column(db.Integer, primary_key=True)
+    presentes = db.Column(db.Integer, nullable=False, default=0)
+    ausencias = db.Column(db.Integer, nullable=False, default=0)
+    justificadas = db.Column(db.Integer, nullable=False, default=0)
+    injustificadas = db.Column(db.Integer, nullable=False, default=0)
+    pendientes = db.Column(db.Integer, nullable=False, default=0)
+    dias_vacaciones = db.Column(db.Integer, nullable=False, default=0)
+    dias_permiso = db.Column(db.Integer, nullable=False, default=0)
+    fecha_actualizacion = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<AsistenciaResumenMensual {self.empleado_id} - {self.año}-{self.mes:02d}>'
+
+
 # ===================== ASISTENCIA EVENTOS =====================
 class AsistenciaEvento(db.Model):
     """Registra cada punch (entrada/salida) con timestamp para luego resumir por día."""
@@ -239,12 +274,35 @@ class AsistenciaEvento(db.Model):
     ts = db.Column(db.DateTime, nullable=False, index=True)
     tipo = db.Column(db.String(10), nullable=False)  # 'in' o 'out'
     origen = db.Column(db.String(50), default='web')
-    detalles = db.Column(db.Text, nullable=True)  # JSON con ip, user_agent, etc.
+    dispositivo_id = db.Column(db.Integer, db.ForeignKey('dispositivos.id'), nullable=True)  # origen, ip, user_agent
+    detalles = db.Column(db.Text, nullable=True)  # JSON con datos adicionales (ip y user_agent van en dispositivo)
     fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_asistencia_eventos_empleado_ts', 'empleado_id', 'ts'),
+        # Una marcación por (empleado, hora, dispositivo): los reenvíos de los relojes no la duplican
+        db.Index('ux_asistencia_eventos_empleado_ts_origen', 'empleado_id', 'ts', 'origen', unique=True),
+    )
+
+    dispositivo = db.relationship('Dispositivo')
 
     def __repr__(self):
         return f'<AsistenciaEvento {self.empleado_id} - {self.ts} - {self.tipo}>'
 
+class Dispositivo(db.Model):
+    """Origen, IP y user agent de las marcaciones, guardados una sola vez (ver dispositivos.py)."""
+    __tablename__ = 'dispositivos'
+
+    id = db.Column(db.Integer, primary_key=True)
+    hash = db.Column(db.String(64), unique=True, nullable=False)  # SHA-256 de (origen, ip, user_agent)
+    origen = db.Column(db.String(50), nullable=True)
+    ip = db.Column(db.String(45), nullable=True)
+    user_agent = db.Column(db.Text, nullable=True)
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<Dispositivo {self.id} - {self.origen} - {self.ip}>'
+
 # ===================== PERMISO =====================
 class Permiso(db.Model):
     __tablename__ = 'permisos'
@@ -264,6 +322,9 @@ class Permiso(db.Model):
     justificativo_archivo = db.Column(db.String(255))
     observaciones = db.Column(db.Text)
     fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_actualizacion = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (db.Index('ix_permisos_empleado_fecha_creacion', 'empleado_id', 'fecha_creacion'),)
     
     def __repr__(self):
         return f'<Permiso {self.empleado.codigo} - {self.tipo_permiso}>'
@@ -282,6 +343,9 @@ class Sancion(db.Model):
     # Ruta al archivo justificativo (imagen/PDF) asociado a la sanción
     justificativo_archivo = db.Column(db.String(255), nullable=True)
     fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_actualizacion = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (db.Index('ix_sanciones_empleado_fecha', 'empleado_id', 'fecha'),)
     
     def __repr__(self):
         return f'<Sancion {self.empleado.codigo} - {self.tipo_sancion}>'
@@ -298,6 +362,7 @@ class IngresoExtra(db.Model):
     año = db.Column(db.Integer)
     descripcion = db.Column(db.Text)
     fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_actualizacion = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     # Estado y control de aplicación
     estado = db.Column(db.String(20), default='PENDIENTE')  # PENDIENTE, APROBADO, RECHAZADO, APLICADO
     creado_por = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=True)
@@ -305,6 +370,8 @@ class IngresoExtra(db.Model):
     fecha_aplicacion = db.Column(db.DateTime, nullable=True)
     justificativo_archivo = db.Column(db.String(255), nullable=True)
     
+    __table_args__ = (db.Index('ix_ingresos_extras_empleado_periodo', 'empleado_id', 'año', 'mes'),)
+    
     def __repr__(self):
         return f'<IngresoExtra {self.empleado.codigo} - {self.tipo}>'
 
@@ -325,6 +392,8 @@ class HorasExtra(db.Model):
     aplicado = db.Column(db.Boolean, default=False)
     fecha_aplicacion = db.Column(db.DateTime, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (db.Index('ix_horas_extras_empleado_fecha', 'empleado_id', 'fecha'),)
 
     def __repr__(self):
         return f'<HorasExtra {self.empleado_id} - {self.fecha} - {self.horas}h>'
@@ -347,6 +416,8 @@ class Descuento(db.Model):
     origen_tipo = db.Column(db.String(50))
     origen_id = db.Column(db.Integer)
     
+    __table_args__ = (db.Index('ix_descuentos_empleado_periodo', 'empleado_id', 'año', 'mes'),)
+    
     def __repr__(self):
         return f'<Descuento {self.empleado.codigo} - {self.tipo}>'
 
@@ -370,6 +441,9 @@ class Anticipo(db.Model):
     justificativo_archivo = db.Column(db.String(255), nullable=True)
     observaciones = db.Column(db.Text, nullable=True)
     fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_actualizacion = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (db.Index('ix_anticipos_empleado_fecha_aprobacion', 'empleado_id', 'fecha_aprobacion'),)
 
     def __repr__(self):
         return f'<Anticipo {self.empleado_id} - {self.monto} - Aprobado:{self.aprobado} - Rechazado:{self.rechazado}>'
@@ -389,6 +463,7 @@ class Liquidacion(db.Model):
     salario_neto = db.Column(db.Numeric(12, 2), nullable=False)
     dias_trabajados = db.Column(db.Integer)
     fecha_generacion = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_actualizacion = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     pdf_content = db.Column(db.LargeBinary)
     
     # Desglose de descuentos
@@ -452,6 +527,7 @@ class Vacacion(db.Model):
     fecha_fin_solicitud = db.Column(db.Date)
     estado = db.Column(db.Enum(EstadoVacacionEnum), default=EstadoVacacionEnum.PENDIENTE)
     fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_actualizacion = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     def __repr__(self):
         return f'<Vacacion {self.empleado.codigo} - {self.año}>'
@@ -474,6 +550,60 @@ class Bitacora(db.Model):
     def __repr__(self):
         return f'<Bitacora {self.usuario.nombre_usuario} - {self.accion} en {self.modulo}>'
 
+# ===================== TAREA (SEGUNDO PLANO) =====================
+class Tarea(db.Model):
+    """Trabajo largo (liquidaciones, aguinaldos, planillas) ejecutado fuera del request HTTP."""
+    __tablename__ = 'tareas'
+
+    id = db.Column(db.Integer, primary_key=True)
+    tipo = db.Column(db.String(50), nullable=False)  # liquidacion, aguinaldo, planilla_mtess, planilla_ips
+    parametros = db.Column(db.Text)  # JSON con los parámetros de la tarea
+    estado = db.Column(db.String(20), default='PENDIENTE', index=True)  # PENDIENTE, EN_PROCESO, COMPLETADA, FALLIDA, CANCELADA
+    total = db.Column(db.Integer, default=0)  # empleados a procesar
+    procesados = db.Column(db.Integer, default=0)  # empleados ya procesados (confirmados)
+    checkpoint = db.Column(db.Integer, nullable=True)  # último empleado_id confirmado; se reanuda desde aquí
+    cancelacion_solicitada = db.Column(db.Boolean, default=False)
+    mensaje = db.Column(db.Text)  # resumen o error
+    resumen = db.Column(db.Text)  # JSON con el resultado de la tarea
+    resultado = db.Column(db.LargeBinary)  # archivo generado (Excel/PDF)
+    resultado_nombre = db.Column(db.String(255))
+    resultado_mimetype = db.Column(db.String(100))
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=True)
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_inicio = db.Column(db.DateTime, nullable=True)
+    fecha_fin = db.Column(db.DateTime, nullable=True)
+    latido = db.Column(db.DateTime, nullable=True)  # última señal de vida del worker
+
+    @property
+    def progreso(self):
+        """Porcentaje de avance (0-100)"""
+        if not self.total:
+            return 100 if self.estado == 'COMPLETADA' else 0
+        return round(self.procesados * 100 / self.total, 1)
+
+    def __repr__(self):
+        return f'<Tarea {self.id} {self.tipo} - {self.estado}>'
+
+# ===================== CORRIDA NOMINA =====================
+class CorridaNomina(db.Model):
+    """Ejecución de la generación de nómina con la duración de cada etapa (ver app/trazas.py)."""
+    __tablename__ = 'corridas_nomina'
+
+    id = db.Column(db.Integer, primary_key=True)
+    tipo = db.Column(db.String(50), nullable=False)  # liquidacion
+    periodo = db.Column(db.String(10), nullable=False)  # YYYY-MM
+    estado = db.Column(db.String(20), default='COMPLETADA')  # COMPLETADA, FALLIDA
+    empleados = db.Column(db.Integer, default=0)  # liquidaciones generadas
+    etapas = db.Column(db.Text)  # JSON etapa -> ms acumulados
+    duracion_ms = db.Column(db.Float)
+    tarea_id = db.Column(db.Integer, db.ForeignKey('tareas.id'), nullable=True)  # si corrió en segundo plano
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=True)
+    fecha_inicio = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_fin = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<CorridaNomina {self.id} {self.tipo} {self.periodo} - {self.duracion_ms}ms>'
+
 # ===================== DETALLE LIQUIDACION =====================
 class DetalleLiquidacion(db.Model):
     """Desglose itemizado de rubros en una liquidación"""
@@ -613,6 +743,34 @@ class SalarioMinimo(db.Model):
         hoy = date.today()
         return self.vigencia_desde <= hoy and (self.vigencia_hasta is None or self.vigencia_hasta >= hoy)
 
+# ===================== FERIADO =====================
+class Feriado(db.Model):
+    """Feriados nacionales (días no hábiles). Los consume app/calendario.py"""
+    __tablename__ = 'feriados'
+
+    id = db.Column(db.Integer, primary_key=True)
+    fecha = db.Column(db.Date, nullable=False, unique=True)
+    descripcion = db.Column(db.String(150), nullable=False)
+
+    # Auditoría
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    usuario_creador_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=True)
+
+    def __repr__(self):
+        return f'<Feriado {self.fecha} - {self.descripcion}>'
+
+# ===================== ESTADO SISTEMA =====================
+class EstadoSistema(db.Model):
+    """Valores de control de procesos programados (marcas de avance, versiones)."""
+    __tablename__ = 'estado_sistema'
+
+    clave = db.Column(db.String(100), primary_key=True)
+    valor = db.Column(db.String(255), nullable=True)
+    fecha_actualizacion = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<EstadoSistema {self.clave}={self.valor}>'
+
 # ===================== TIPO HIJO ENUM =====================
 class TipoHijoEnum(Enum):
     MENOR_18 = "Menor de 18 años"
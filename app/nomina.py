@@ -0,0 +1,536 @@
+"""
+nomina.py
+Motor de cálculo de liquidaciones mensuales.
+
+Calcula todos los agregados por empleado de un período con UNA consulta
+agrupada por tabla origen (asistencias, ingresos extras, horas extra,
+descuentos, anticipos, sanciones e hijos para bonificación familiar) y
+combina los resultados en memoria. Lo usan tanto `generar_liquidacion`
+como `preview_liquidacion`, de modo que la vista previa y la generación
+real producen exactamente los mismos números.
+"""
+
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy import func, desc, or_, update
+
+from .models import (
+    db, Empleado, IngresoExtra, HorasExtra, Descuento, Anticipo,
+    Sancion, Liquidacion, DetalleLiquidacion, SalarioMinimo, BonificacionFamiliar, EstadoEmpleadoEnum
+)
+from .periodos import rango_mes, en_rango
+from .resumen_asistencia import resumenes_mes
+from .calendario import dias_habiles_mes
+from .escritura import insertar_filas
+from .trazas import medir
+
+# Aporte obrero IPS aplicado en la liquidación mensual
+PORCENTAJE_IPS_LIQUIDACION = Decimal('0.09625')
+
+
+# ==================== BONIFICACIÓN FAMILIAR ====================
+
+def obtener_salario_minimo_vigente(fecha=None):
+    """
+    Obtiene el salario mínimo vigente para una fecha específica.
+    Si no se proporciona fecha, usa la fecha actual.
+    """
+    if fecha is None:
+        fecha = date.today()
+
+    salario = SalarioMinimo.query.filter(
+        SalarioMinimo.vigencia_desde <= fecha,
+        or_(SalarioMinimo.vigencia_hasta.is_(None), SalarioMinimo.vigencia_hasta >= fecha)
+    ).order_by(desc(SalarioMinimo.vigencia_desde)).first()
+
+    if not salario:
+        # Si no hay salario mínimo registrado, retornar el último conocido
+        salario = SalarioMinimo.query.order_by(desc(SalarioMinimo.vigencia_desde)).first()
+
+    return salario.monto if salario else Decimal('2798309')  # Fallback a salario mínimo 2025
+
+def _filtro_hijos_activos(fecha):
+    return [
+        BonificacionFamiliar.activo == True,
+        or_(
+            BonificacionFamiliar.fecha_baja.is_(None),
+            BonificacionFamiliar.fecha_baja >= fecha
+        )
+    ]
+
+def contar_hijos_activos(empleado_id, fecha=None):
+    """
+    Cuenta la cantidad de hijos activos de un empleado para bonificación familiar.
+    """
+    if fecha is None:
+        fecha = date.today()
+
+    return BonificacionFamiliar.query.filter(
+        BonificacionFamiliar.empleado_id == empleado_id,
+        *_filtro_hijos_activos(fecha)
+    ).count()
+
+def bonificacion_por_hijos(salario_minimo, hijos_activos):
+    """(Salario Mínimo × 5%) × hijos, redondeado a céntimos como en la ley paraguaya."""
+    if hijos_activos == 0:
+        return Decimal('0')
+
+    bonificacion_por_hijo = (salario_minimo * Decimal('0.05')).quantize(Decimal('0.01'))
+    return (bonificacion_por_hijo * hijos_activos).quantize(Decimal('0.01'))
+
+def calcular_bonificacion_familiar(empleado_id, fecha=None):
+    """
+    Calcula bonificación familiar según ley paraguaya.
+    Fórmula: (Salario Mínimo × 5%) × Cantidad de hijos activos
+    """
+    if fecha is None:
+        fecha = date.today()
+
+    salario_minimo = obtener_salario_minimo_vigente(fecha)
+    hijos_activos = contar_hijos_activos(empleado_id, fecha)
+
+    return bonificacion_por_hijos(salario_minimo, hijos_activos)
+
+
+# ==================== AGREGADOS DEL PERÍODO ====================
+
+def parse_periodo(periodo):
+    """'YYYY-MM' -> (año, mes)"""
+    año, mes = map(int, periodo.split('-'))
+    return año, mes
+
+def _restringir_ids(columna, empleado_ids):
+    """
+    Acota una consulta agregada a los empleados solicitados. Se usa un rango
+    (min, max) en lugar de un IN gigante: los ids sobrantes del rango se
+    descartan al combinar en memoria.
+    """
+    if empleado_ids is None:
+        return []
+    if not empleado_ids:
+        return [columna.is_(None)]
+    return [columna.between(min(empleado_ids), max(empleado_ids))]
+
+def _agrupar(columna_empleado, expresion, *filtros):
+    """Ejecuta SELECT empleado_id, <expresion> ... GROUP BY empleado_id y devuelve un dict."""
+    filas = db.session.query(columna_empleado, expresion).filter(*filtros).group_by(columna_empleado).all()
+    return {empleado_id: valor for empleado_id, valor in filas}
+
+def cargar_agregados_periodo(año, mes, empleado_ids=None):
+    """
+    Carga los agregados por empleado del período: una consulta agrupada por tabla.
+
+    Args:
+        año, mes: Período a liquidar
+        empleado_ids: Lista opcional de ids a considerar (None = todos)
+
+    Returns:
+        dict con un diccionario {empleado_id: valor} por cada fuente
+    """
+    inicio, fin = rango_mes(año, mes)
+
+    # Días presentes: una fila por empleado en asistencia_resumen_mensual (sin recontar asistencias)
+    dias_presentes = {
+        empleado_id: contadores['presentes']
+        for empleado_id, contadores in resumenes_mes(año, mes, empleado_ids).items()
+    }
+
+    ingresos_extras = _agrupar(
+        IngresoExtra.empleado_id, func.sum(IngresoExtra.monto),
+        IngresoExtra.mes == mes,
+        IngresoExtra.año == año,
+        IngresoExtra.estado == 'APROBADO',
+        IngresoExtra.aplicado == False,
+        *_restringir_ids(IngresoExtra.empleado_id, empleado_ids)
+    )
+
+    horas_extra = _agrupar(
+        HorasExtra.empleado_id, func.sum(HorasExtra.monto_calculado),
+        en_rango(HorasExtra.fecha, inicio, fin),
+        HorasExtra.estado == 'APROBADO',
+        HorasExtra.aplicado == False,
+        *_restringir_ids(HorasExtra.empleado_id, empleado_ids)
+    )
+
+    descuentos = _agrupar(
+        Descuento.empleado_id, func.sum(Descuento.monto),
+        Descuento.mes == mes,
+        Descuento.año == año,
+        *_restringir_ids(Descuento.empleado_id, empleado_ids)
+    )
+
+    anticipos = _agrupar(
+        Anticipo.empleado_id, func.sum(Anticipo.monto),
+        en_rango(Anticipo.fecha_aprobacion, inicio, fin),
+        Anticipo.aprobado == True,
+        Anticipo.aplicado == False,
+        *_restringir_ids(Anticipo.empleado_id, empleado_ids)
+    )
+
+    sanciones = _agrupar(
+        Sancion.empleado_id, func.sum(Sancion.monto),
+        en_rango(Sancion.fecha, inicio, fin),
+        *_restringir_ids(Sancion.empleado_id, empleado_ids)
+    )
+
+    hijos_activos = _agrupar(
+        BonificacionFamiliar.empleado_id, func.count(BonificacionFamiliar.id),
+        *_filtro_hijos_activos(inicio),
+        *_restringir_ids(BonificacionFamiliar.empleado_id, empleado_ids)
+    )
+
+    liquidados = {
+        empleado_id for (empleado_id,) in db.session.query(Liquidacion.empleado_id).filter(
+            Liquidacion.periodo == f'{año}-{mes:02d}',
+            *_restringir_ids(Liquidacion.empleado_id, empleado_ids)
+        ).distinct()
+    }
+
+    return {
+        'dias_presentes': dias_presentes,
+        'ingresos_extras': ingresos_extras,
+        'horas_extra': horas_extra,
+        'descuentos': descuentos,
+        'anticipos': anticipos,
+        'sanciones': sanciones,
+        'hijos_activos': hijos_activos,
+        'liquidados': liquidados,
+        'salario_minimo': obtener_salario_minimo_vigente(inicio),
+    }
+
+
+# ==================== CÁLCULO ====================
+
+def _decimal(valor):
+    return Decimal(str(valor)) if valor is not None else Decimal('0')
+
+def calcular_liquidacion_empleado(empleado, agregados, dias_habiles):
+    """
+    Calcula la liquidación de un empleado a partir de los agregados ya cargados.
+    No toca la base de datos.
+    """
+    eid = empleado.id
+    dias_presentes = agregados['dias_presentes'].get(eid, 0)
+
+    # NUEVO ENFOQUE: presente=True incluye presentes, vacaciones, permisos con goce
+    # Solo descontamos días marcados como presente=False
+    dias_ausentes = dias_habiles - dias_presentes
+    descuento_ausencias = Decimal('0')
+    if dias_ausentes > 0:
+        salario_diario = empleado.salario_base / Decimal(str(dias_habiles))
+        descuento_ausencias = salario_diario * Decimal(str(dias_ausentes))
+
+    # Salario base = salario completo (no se ajusta por ausencias aquí)
+    salario_base = empleado.salario_base
+
+    ingresos_manuales = _decimal(agregados['ingresos_extras'].get(eid))
+    horas_extra = _decimal(agregados['horas_extra'].get(eid))
+    ingresos_extras = ingresos_manuales + horas_extra
+
+    descuentos_manuales = _decimal(agregados['descuentos'].get(eid))
+    anticipos = _decimal(agregados['anticipos'].get(eid))
+    sanciones = _decimal(agregados['sanciones'].get(eid))
+    descuentos_totales = descuentos_manuales + anticipos + sanciones + descuento_ausencias
+
+    bonificacion_familiar = bonificacion_por_hijos(
+        agregados['salario_minimo'], agregados['hijos_activos'].get(eid, 0)
+    )
+
+    aporte_ips = (salario_base + ingresos_extras + bonificacion_familiar) * PORCENTAJE_IPS_LIQUIDACION
+    salario_neto = salario_base + ingresos_extras + bonificacion_familiar - descuentos_totales - aporte_ips
+
+    return {
+        'empleado': empleado,
+        'empleado_id': eid,
+        'dias_habiles': dias_habiles,
+        'dias_presentes': dias_presentes,
+        'dias_ausentes': max(dias_ausentes, 0),
+        'salario_base': salario_base,
+        'ingresos_manuales': ingresos_manuales,
+        'horas_extra': horas_extra,
+        'ingresos_extras': ingresos_extras,
+        'bonificacion_familiar': bonificacion_familiar,
+        'descuento_ausencias': descuento_ausencias,
+        'descuento_anticipos': anticipos,
+        'descuento_sanciones': sanciones,
+        'descuento_otros': descuentos_manuales,
+        'descuentos': descuentos_totales,
+        'aporte_ips': aporte_ips,
+        'salario_neto': salario_neto,
+    }
+
+def calcular_liquidaciones_periodo(periodo, empleados=None, incluir_liquidados=False, tiempos=None):
+    """
+    Calcula las liquidaciones de un período para varios empleados.
+
+    Args:
+        periodo: 'YYYY-MM'
+        empleados: Lista de Empleado (por defecto, todos los activos)
+        incluir_liquidados: Si False, omite empleados que ya tienen liquidación en el período
+        tiempos: trazas.Tiempos opcional donde acumular la duración de cada etapa
+
+    Returns:
+        dict con 'resultados' (lista de dicts por empleado), 'omitidos',
+        'advertencias' y 'dias_habiles'
+    """
+    año, mes = parse_periodo(periodo)
+    if empleados is None:
+        with medir(tiempos, 'cargar_empleados'):
+            empleados = Empleado.query.filter_by(estado=EstadoEmpleadoEnum.ACTIVO).order_by(Empleado.id).all()
+
+    with medir(tiempos, 'agregar_fuentes'):
+        empleado_ids = [e.id for e in empleados]
+        agregados = cargar_agregados_periodo(año, mes, empleado_ids)
+        dias_habiles = dias_habiles_mes(año, mes)
+
+    resultados = []
+    advertencias = []
+    omitidos = 0
+    with medir(tiempos, 'calcular'):
+        for empleado in empleados:
+            if not incluir_liquidados and empleado.id in agregados['liquidados']:
+                omitidos += 1
+                continue
+
+            resultado = calcular_liquidacion_empleado(empleado, agregados, dias_habiles)
+
+            # VALIDACIÓN: Días presentes no puede superar días hábiles
+            if resultado['dias_presentes'] > dias_habiles:
+                advertencias.append(
+                    f'{empleado.nombre_completo} tiene inconsistencia en asistencias '
+                    f'({resultado["dias_presentes"]} > {dias_habiles})'
+                )
+            resultados.append(resultado)
+
+    return {
+        'periodo': periodo,
+        'dias_habiles': dias_habiles,
+        'resultados': resultados,
+        'omitidos': omitidos,
+        'advertencias': advertencias,
+    }
+
+
+# ==================== ESCRITURA ====================
+
+def fila_liquidacion(resultado, periodo):
+    """Valores de columna de la Liquidacion correspondiente a un resultado."""
+    return {
+        'empleado_id': resultado['empleado_id'],
+        'periodo': periodo,
+        'salario_base': resultado['salario_base'],
+        'ingresos_extras': resultado['ingresos_extras'],
+        'bonificacion_familiar': resultado['bonificacion_familiar'],
+        'descuentos': resultado['descuentos'],  # ← CRÍTICO: Incluye anticipos
+        'aporte_ips': resultado['aporte_ips'],
+        'salario_neto': resultado['salario_neto'],
+        'dias_trabajados': resultado['dias_presentes'],
+        # Desglose de descuentos
+        'descuento_ausencias': resultado['descuento_ausencias'],
+        'descuento_anticipos': resultado['descuento_anticipos'],
+        'descuento_sanciones': resultado['descuento_sanciones'],
+        'descuento_otros': resultado['descuento_otros'],
+    }
+
+def construir_liquidacion(resultado, periodo):
+    """Crea (sin agregar a la sesión) la Liquidacion correspondiente a un resultado."""
+    return Liquidacion(**fila_liquidacion(resultado, periodo))
+
+# (tipo_rubro, descripción, clave del resultado) de los rubros itemizados
+RUBROS_DETALLE = [
+    ('salario_base', 'Salario base', 'salario_base'),
+    ('extras', 'Ingresos extras', 'ingresos_manuales'),
+    ('extras', 'Horas extra', 'horas_extra'),
+    ('extras', 'Bonificación familiar', 'bonificacion_familiar'),
+    ('descuentos', 'Ausencias', 'descuento_ausencias'),
+    ('descuentos', 'Anticipos', 'descuento_anticipos'),
+    ('descuentos', 'Sanciones', 'descuento_sanciones'),
+    ('descuentos', 'Otros descuentos', 'descuento_otros'),
+]
+
+def filas_detalle(resultado, liquidacion_id):
+    """Filas de DetalleLiquidacion (rubros con monto distinto de cero)."""
+    filas = [
+        {'liquidacion_id': liquidacion_id, 'tipo_rubro': tipo, 'descripcion': descripcion,
+         'monto': resultado[clave], 'porcentaje': Decimal('0')}
+        for tipo, descripcion, clave in RUBROS_DETALLE if resultado[clave]
+    ]
+    filas.append({'liquidacion_id': liquidacion_id, 'tipo_rubro': 'aporte_ips', 'descripcion': 'Aporte obrero IPS',
+                  'monto': resultado['aporte_ips'], 'porcentaje': PORCENTAJE_IPS_LIQUIDACION * 100})
+    return filas
+
+def guardar_liquidaciones(periodo, resultados, tiempos=None):
+    """
+    Inserta en bloque las liquidaciones del período y su detalle, y marca como
+    aplicados los ítems incluidos. Todo en la transacción actual, sin commit.
+
+    Returns:
+        Dict con las filas afectadas por tabla, para verificar la corrida:
+        liquidaciones, detalles, ingresos_extras, horas_extras, anticipos.
+    """
+    with medir(tiempos, 'insertar'):
+        filas = [fila_liquidacion(r, periodo) for r in resultados]
+        afectadas = {'liquidaciones': insertar_filas(Liquidacion, filas, devolver_ids=True)}
+
+        detalles = [d for r, fila in zip(resultados, filas) for d in filas_detalle(r, fila['id'])]
+        afectadas['detalles'] = insertar_filas(DetalleLiquidacion, detalles)
+
+    with medir(tiempos, 'marcar_aplicados'):
+        afectadas.update(marcar_aplicados(periodo, [r['empleado_id'] for r in resultados]))
+    return afectadas
+
+def _marcar(modelo, fecha_aplicacion, *filtros):
+    resultado = db.session.execute(
+        update(modelo).where(*filtros)
+        .values(aplicado=True, fecha_aplicacion=fecha_aplicacion)
+        .execution_options(synchronize_session=False)
+    )
+    return resultado.rowcount
+
+def marcar_aplicados(periodo, empleado_ids):
+    """
+    Marca como aplicados los IngresoExtra, HorasExtra y Anticipo incluidos en
+    las liquidaciones del período: un UPDATE por tabla para todos los empleados.
+
+    Returns:
+        Dict con las filas marcadas por tabla (ingresos_extras, horas_extras, anticipos).
+    """
+    if not empleado_ids:
+        return {'ingresos_extras': 0, 'horas_extras': 0, 'anticipos': 0}
+    año, mes = parse_periodo(periodo)
+    inicio, fin = rango_mes(año, mes)
+    ahora = datetime.utcnow()
+
+    return {
+        'ingresos_extras': _marcar(
+            IngresoExtra, ahora,
+            IngresoExtra.empleado_id.in_(empleado_ids),
+            IngresoExtra.mes == mes,
+            IngresoExtra.año == año,
+            IngresoExtra.estado == 'APROBADO',
+            IngresoExtra.aplicado == False
+        ),
+        'horas_extras': _marcar(
+            HorasExtra, ahora,
+            HorasExtra.empleado_id.in_(empleado_ids),
+            en_rango(HorasExtra.fecha, inicio, fin),
+            HorasExtra.estado == 'APROBADO',
+            HorasExtra.aplicado == False
+        ),
+        'anticipos': _marcar(
+            Anticipo, inicio,
+            Anticipo.empleado_id.in_(empleado_ids),
+            en_rango(Anticipo.fecha_aprobacion, inicio, fin),
+            Anticipo.aprobado == True,
+            Anticipo.aplicado == False
+        ),
+    }
+
+
+# ==================== AGUINALDO ====================
+
+# Ingresos extras que integran el total devengado (se excluyen viáticos)
+TIPOS_INGRESO_AGUINALDO = ['Horas Extras', 'Comisión', 'Bonificación']
+PORCENTAJE_IPS_AGUINALDO = Decimal('0.09')
+
+def calcular_aguinaldos(año, fecha_corte, empleados, incluir_generados=False):
+    """
+    Calcula el aguinaldo anual de varios empleados con una consulta agrupada por tabla.
+
+    Args:
+        año: Año del aguinaldo
+        fecha_corte: Fecha de corte del cálculo
+        empleados: Lista de Empleado
+        incluir_generados: Si False, omite empleados que ya tienen aguinaldo en el año
+
+    Returns:
+        dict con 'resultados' (lista de dicts por empleado) y 'duplicados'
+    """
+    empleado_ids = [e.id for e in empleados]
+
+    ya_generados = {
+        empleado_id for (empleado_id,) in db.session.query(Liquidacion.empleado_id).filter(
+            Liquidacion.periodo.like(f'{año}%'),
+            Liquidacion.aguinaldo_monto > 0,  # Solo si ya hay aguinaldo
+            *_restringir_ids(Liquidacion.empleado_id, empleado_ids)
+        ).distinct()
+    }
+
+    # Suma de salarios base de liquidaciones del año (excluye aguinaldos previos)
+    total_salarios = _agrupar(
+        Liquidacion.empleado_id, func.sum(Liquidacion.salario_base),
+        Liquidacion.periodo.like(f'{año}%'),
+        Liquidacion.aguinaldo_monto == 0,
+        *_restringir_ids(Liquidacion.empleado_id, empleado_ids)
+    )
+
+    # Ingresos extras del año (horas extras, comisiones, bonificaciones)
+    total_extras = _agrupar(
+        IngresoExtra.empleado_id, func.sum(IngresoExtra.monto),
+        IngresoExtra.año == año,
+        IngresoExtra.tipo.in_(TIPOS_INGRESO_AGUINALDO),
+        *_restringir_ids(IngresoExtra.empleado_id, empleado_ids)
+    )
+
+    resultados = []
+    duplicados = 0
+    for empleado in empleados:
+        if not incluir_generados and empleado.id in ya_generados:
+            duplicados += 1
+            continue
+
+        # Si el empleado fue contratado después del inicio del año, usar fecha de contratación
+        fecha_desde = max(date(año, 1, 1), empleado.fecha_ingreso)
+
+        # Si el empleado se retiró antes del corte, usar fecha de retiro
+        fecha_hasta = fecha_corte
+        if empleado.fecha_retiro and empleado.fecha_retiro < fecha_corte:
+            fecha_hasta = empleado.fecha_retiro
+
+        dias_trabajados = (fecha_hasta - fecha_desde).days + 1
+        if dias_trabajados <= 0:
+            continue
+
+        # CÁLCULO SEGÚN LEY PARAGUAYA: total devengado en el año / 12
+        total_devengado = (total_salarios.get(empleado.id) or Decimal('0')) + (total_extras.get(empleado.id) or Decimal('0'))
+        meses_trabajados = Decimal(str(dias_trabajados)) / Decimal('30')
+
+        if total_devengado > 0:
+            aguinaldo_bruto = (total_devengado / Decimal('12')).quantize(Decimal('0.01'))
+        else:
+            # FALLBACK: Si no hay liquidaciones, calcular proporcional por meses trabajados
+            aguinaldo_bruto = (Decimal(str(empleado.salario_base)) * meses_trabajados / Decimal('12')).quantize(Decimal('0.01'))
+
+        aportes_ips = (aguinaldo_bruto * PORCENTAJE_IPS_AGUINALDO).quantize(Decimal('0.01'))
+        aguinaldo_neto = (aguinaldo_bruto - aportes_ips).quantize(Decimal('0.01'))
+
+        resultados.append({
+            'empleado': empleado,
+            'empleado_id': empleado.id,
+            'dias_trabajados': dias_trabajados,
+            'meses': meses_trabajados,
+            'total_devengado': total_devengado,
+            'aguinaldo_bruto': aguinaldo_bruto,
+            'aportes_ips': aportes_ips,
+            'aguinaldo_neto': aguinaldo_neto,
+        })
+
+    return {'resultados': resultados, 'duplicados': duplicados}
+
+def construir_liquidacion_aguinaldo(resultado, periodo):
+    """Crea (sin agregar a la sesión) la Liquidacion de aguinaldo de un resultado."""
+    return Liquidacion(
+        empleado_id=resultado['empleado_id'],
+        periodo=periodo,
+        salario_base=resultado['empleado'].salario_base,
+        salario_neto=resultado['aguinaldo_neto'],
+        aguinaldo_monto=resultado['aguinaldo_bruto'],
+        aportes_ips_despido=resultado['aportes_ips'],
+        indemnizacion_monto=Decimal('0'),
+        vacaciones_monto=Decimal('0'),
+        ingresos_extras=Decimal('0'),
+        descuentos=Decimal('0'),
+        aporte_ips=Decimal('0'),
+        dias_trabajados=resultado['dias_trabajados']
+    )
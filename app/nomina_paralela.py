@@ -0,0 +1,183 @@
+"""
+nomina_paralela.py
+Cálculo de liquidaciones y aguinaldos repartido en varios procesos.
+
+Los empleados activos se dividen en rangos contiguos de id; cada rango se
+calcula en un worker de ProcessPoolExecutor con su propio engine y sesión
+(usando las mismas funciones de nomina.py) y el proceso padre une los
+resultados en orden de id. Así la aritmética Decimal y la construcción de
+objetos aprovechan varios núcleos, mientras que la escritura (liquidaciones
+y marcado de `aplicado`) sigue haciéndose en una única transacción del padre.
+
+Con NOMINA_PROCESOS <= 1, pocos empleados, SQLite en memoria o sin `fork`
+disponible se usa el camino serial, que produce exactamente lo mismo.
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from flask import Flask, current_app
+
+from .models import db, Empleado, EstadoEmpleadoEnum
+from .nomina import calcular_liquidaciones_periodo, calcular_aguinaldos
+from .trazas import medir
+
+# App mínima del worker (una por proceso, creada en el initializer)
+_app_worker = None
+# Engine del padre, heredado por fork: el worker debe soltarlo sin cerrar sus conexiones
+_engine_padre = None
+
+
+def particionar_ids(ids, partes):
+    """Divide una lista ordenada de ids en `partes` rangos contiguos (id_desde, id_hasta)."""
+    if not ids:
+        return []
+    partes = max(1, min(partes, len(ids)))
+    tamaño, resto = divmod(len(ids), partes)
+    rangos = []
+    inicio = 0
+    for i in range(partes):
+        fin = inicio + tamaño + (1 if i < resto else 0)
+        rangos.append((ids[inicio], ids[fin - 1]))
+        inicio = fin
+    return rangos
+
+
+def admite_procesos():
+    """La BD y la plataforma permiten repartir trabajo en procesos hijos."""
+    url = db.engine.url
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        return False  # cada proceso tendría su propia BD vacía
+    # Con spawn los workers reimportarían run.py (y con él el scheduler)
+    return 'fork' in multiprocessing.get_all_start_methods()
+
+
+def _usar_paralelo(cantidad_empleados):
+    procesos = current_app.config.get('NOMINA_PROCESOS', 1)
+    if procesos <= 1:
+        return False
+    if cantidad_empleados < current_app.config.get('NOMINA_MIN_EMPLEADOS_PARALELO', 1000):
+        return False
+    return admite_procesos()
+
+
+def _empleados_activos():
+    return Empleado.query.filter_by(estado=EstadoEmpleadoEnum.ACTIVO).order_by(Empleado.id).all()
+
+
+def _iniciar_worker(uri, opciones_engine):
+    """Initializer: app Flask mínima con engine propio (no se comparte el pool del padre)."""
+    global _app_worker
+    if _engine_padre is not None:
+        _engine_padre.dispose(close=False)
+    _app_worker = Flask('nomina_worker')
+    _app_worker.config['SQLALCHEMY_DATABASE_URI'] = uri
+    _app_worker.config['SQLALCHEMY_ENGINE_OPTIONS'] = opciones_engine
+    _app_worker.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(_app_worker)
+
+
+def _empleados_rango(id_desde, id_hasta):
+    return Empleado.query.filter(
+        Empleado.estado == EstadoEmpleadoEnum.ACTIVO,
+        Empleado.id.between(id_desde, id_hasta)
+    ).order_by(Empleado.id).all()
+
+
+def _sin_objetos(resultados):
+    """Los resultados viajan al padre sin la instancia ORM (se reasocia allá)."""
+    return [{**r, 'empleado': None} for r in resultados]
+
+
+def _en_worker(funcion, *args):
+    with _app_worker.app_context():
+        try:
+            return funcion(*args)
+        finally:
+            db.session.remove()
+
+
+def _calcular_rango_liquidaciones(id_desde, id_hasta, periodo, incluir_liquidados):
+    calculo = calcular_liquidaciones_periodo(periodo, _empleados_rango(id_desde, id_hasta), incluir_liquidados)
+    calculo['resultados'] = _sin_objetos(calculo['resultados'])
+    return calculo
+
+
+def _calcular_rango_aguinaldos(id_desde, id_hasta, año, fecha_corte, incluir_generados):
+    calculo = calcular_aguinaldos(año, fecha_corte, _empleados_rango(id_desde, id_hasta), incluir_generados)
+    calculo['resultados'] = _sin_objetos(calculo['resultados'])
+    return calculo
+
+
+def ejecutar_rangos(funcion, rangos, *args):
+    """
+    Ejecuta `funcion(id_desde, id_hasta, *args)` para cada rango en su propio
+    proceso (fork), con app y sesión propias, y retorna los resultados en el
+    orden de los rangos. `funcion` debe ser de nivel de módulo.
+    """
+    global _engine_padre
+    _engine_padre = db.engine
+    # URL ya resuelta por Flask-SQLAlchemy (rutas sqlite relativas al instance_path)
+    iniciar = (
+        _engine_padre.url.render_as_string(hide_password=False),
+        current_app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+    )
+
+    with ProcessPoolExecutor(
+        max_workers=len(rangos),
+        mp_context=multiprocessing.get_context('fork'),
+        initializer=_iniciar_worker,
+        initargs=iniciar
+    ) as ejecutor:
+        futuros = [ejecutor.submit(_en_worker, funcion, id_desde, id_hasta, *args) for id_desde, id_hasta in rangos]
+        return [f.result() for f in futuros]
+
+
+def _ejecutar_particiones(funcion, empleados, *args):
+    """Ejecuta `funcion(id_desde, id_hasta, *args)` por rango y retorna los cálculos en orden de id."""
+    rangos = particionar_ids([e.id for e in empleados], current_app.config['NOMINA_PROCESOS'])
+    calculos = ejecutar_rangos(funcion, rangos, *args)
+
+    por_id = {e.id: e for e in empleados}
+    for calculo in calculos:
+        for resultado in calculo['resultados']:
+            resultado['empleado'] = por_id[resultado['empleado_id']]
+    return calculos
+
+
+def calcular_liquidaciones_periodo_paralelo(periodo, incluir_liquidados=False, tiempos=None):
+    """
+    Igual que nomina.calcular_liquidaciones_periodo para todos los empleados
+    activos, repartiendo el cálculo entre NOMINA_PROCESOS procesos. En modo
+    paralelo la agregación ocurre en los workers y se mide dentro de 'calcular'.
+    """
+    with medir(tiempos, 'cargar_empleados'):
+        empleados = _empleados_activos()
+    if not _usar_paralelo(len(empleados)):
+        return calcular_liquidaciones_periodo(periodo, empleados, incluir_liquidados, tiempos)
+
+    with medir(tiempos, 'calcular'):
+        calculos = _ejecutar_particiones(_calcular_rango_liquidaciones, empleados, periodo, incluir_liquidados)
+    return {
+        'periodo': periodo,
+        'dias_habiles': calculos[0]['dias_habiles'],
+        'resultados': [r for c in calculos for r in c['resultados']],
+        'omitidos': sum(c['omitidos'] for c in calculos),
+        'advertencias': [a for c in calculos for a in c['advertencias']],
+    }
+
+
+def calcular_aguinaldos_paralelo(año, fecha_corte, incluir_generados=False):
+    """
+    Igual que nomina.calcular_aguinaldos para todos los empleados activos,
+    repartiendo el cálculo entre NOMINA_PROCESOS procesos.
+    """
+    empleados = _empleados_activos()
+    if not _usar_paralelo(len(empleados)):
+        return calcular_aguinaldos(año, fecha_corte, empleados, incluir_generados)
+
+    calculos = _ejecutar_particiones(_calcular_rango_aguinaldos, empleados, año, fecha_corte, incluir_generados)
+    return {
+        'resultados': [r for c in calculos for r in c['resultados']],
+        'duplicados': sum(c['duplicados'] for c in calculos),
+    }
@@ -0,0 +1,126 @@
+"""
+nomina_vectorial.py
+Vista previa de liquidaciones con NumPy y aritmética entera.
+
+Los agregados del período (los mismos de nomina.cargar_agregados_periodo)
+se cargan en arreglos int64 de céntimos y todas las fórmulas de
+nomina.calcular_liquidacion_empleado se evalúan sobre el arreglo completo
+como fracciones exactas, redondeando al guaraní (mitad hacia arriba) solo al
+final. Así la vista previa coincide al guaraní con el cálculo Decimal sin
+crear un Decimal por campo y por empleado.
+
+Requiere NumPy; si no está instalado la vista previa usa el cálculo Decimal.
+"""
+
+from decimal import Decimal, ROUND_HALF_UP
+
+import numpy as np
+
+from .models import db, Empleado, EstadoEmpleadoEnum
+from .nomina import parse_periodo, cargar_agregados_periodo, PORCENTAJE_IPS_LIQUIDACION
+from .calendario import dias_habiles_mes
+
+# 0.09625 = 77 / 800
+IPS_NUM, IPS_DEN = PORCENTAJE_IPS_LIQUIDACION.as_integer_ratio()
+
+CAMPOS = ('salario', 'bonificacion', 'ingresos', 'descuentos', 'anticipos', 'ips', 'neto')
+
+
+def _a_centimos(valor):
+    if valor is None:
+        return 0
+    return int((Decimal(str(valor)) * 100).to_integral_value(ROUND_HALF_UP))
+
+
+def _arreglo(valores, ids):
+    """{empleado_id: monto} -> int64 de céntimos alineado con ids."""
+    return np.fromiter((_a_centimos(valores.get(i)) for i in ids), dtype=np.int64, count=len(ids))
+
+
+def _redondear(numerador, denominador):
+    """numerador / denominador redondeado al entero, mitad alejándose de cero (ROUND_HALF_UP)."""
+    absoluto = np.abs(numerador)
+    return np.sign(numerador) * ((2 * absoluto + denominador) // (2 * denominador))
+
+
+def calcular_vectorial(periodo, empleados):
+    """
+    Montos en guaraníes (int64) de cada empleado, en el orden recibido.
+
+    Args:
+        periodo: 'YYYY-MM'
+        empleados: Filas u objetos con .id y .salario_base
+
+    Returns:
+        dict campo -> np.ndarray: salario, bonificacion, ingresos, descuentos
+        (sin anticipos), anticipos, descuentos_totales, ips, neto, dias,
+        dias_ausentes; y 'dias_habiles'
+    """
+    año, mes = parse_periodo(periodo)
+    empleado_ids = [e.id for e in empleados]
+    agregados = cargar_agregados_periodo(año, mes, empleado_ids)
+    habiles = dias_habiles_mes(año, mes)
+    h = max(habiles, 1)  # sin días hábiles no hay ausencias que descontar
+
+    s = np.fromiter((_a_centimos(e.salario_base) for e in empleados), dtype=np.int64, count=len(empleados))
+    extras = _arreglo(agregados['ingresos_extras'], empleado_ids) + _arreglo(agregados['horas_extra'], empleado_ids)
+    descuentos = _arreglo(agregados['descuentos'], empleado_ids)
+    anticipos = _arreglo(agregados['anticipos'], empleado_ids)
+    sanciones = _arreglo(agregados['sanciones'], empleado_ids)
+    hijos = np.fromiter((agregados['hijos_activos'].get(i, 0) for i in empleado_ids), dtype=np.int64,
+                        count=len(empleado_ids))
+    dias = np.fromiter((agregados['dias_presentes'].get(i, 0) for i in empleado_ids), dtype=np.int64,
+                       count=len(empleado_ids))
+
+    # Bonificación: (salario mínimo × 5%, a céntimos) × hijos
+    por_hijo = _a_centimos((agregados['salario_minimo'] * Decimal('0.05')).quantize(Decimal('0.01')))
+    bonificacion = por_hijo * hijos
+
+    # Ausencias: salario / días hábiles × días ausentes, como fracción exacta s·a / h
+    ausentes = np.maximum(habiles - dias, 0) if habiles > 0 else np.zeros_like(dias)
+    bruto = s + extras + bonificacion
+    fijos = descuentos + anticipos + sanciones
+
+    # neto = bruto - fijos - s·a/h - bruto·77/800, con denominador común h·800
+    neto = (bruto - fijos) * (h * IPS_DEN) - s * ausentes * IPS_DEN - bruto * IPS_NUM * h
+
+    return {
+        'dias_habiles': habiles,
+        'dias': dias,
+        'dias_ausentes': ausentes,
+        'salario': _redondear(s, 100),
+        'bonificacion': _redondear(bonificacion, 100),
+        'ingresos': _redondear(extras, 100),
+        'descuentos': _redondear((descuentos + sanciones) * h + s * ausentes, h * 100),
+        'anticipos': _redondear(anticipos, 100),
+        'descuentos_totales': _redondear(fijos * h + s * ausentes, h * 100),
+        'ips': _redondear(bruto * IPS_NUM, IPS_DEN * 100),
+        'neto': _redondear(neto, h * IPS_DEN * 100),
+    }
+
+
+def preview_vectorial(periodo):
+    """Misma respuesta que /liquidaciones/preview/<periodo>, en guaraníes enteros."""
+    empleados = db.session.query(
+        Empleado.id, Empleado.codigo, Empleado.nombre, Empleado.apellido, Empleado.salario_base
+    ).filter(Empleado.estado == EstadoEmpleadoEnum.ACTIVO).order_by(Empleado.id).all()
+    montos = calcular_vectorial(periodo, empleados)
+
+    columnas = {campo: montos[campo].tolist() for campo in CAMPOS}
+    dias = montos['dias'].tolist()
+    filas = [
+        {'codigo': e.codigo, 'nombre': f'{e.nombre} {e.apellido}', 'dias': dias[i],
+         **{campo: columnas[campo][i] for campo in CAMPOS}}
+        for i, e in enumerate(empleados)
+    ]
+    totales = {
+        'salarios': 'salario', 'bonificaciones': 'bonificacion', 'ingresos': 'ingresos',
+        'descuentos': 'descuentos', 'anticipos': 'anticipos', 'ips': 'ips', 'neto': 'neto'
+    }
+    return {
+        'periodo': periodo,
+        'modo': 'vectorial',
+        'empleados': filas,
+        'totales': {total: int(montos[campo].sum()) for total, campo in totales.items()},
+        'cantidad_empleados': len(filas),
+    }
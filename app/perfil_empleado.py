@@ -0,0 +1,235 @@
+"""
+perfil_empleado.py
+Resúmenes del legajo del empleado (pestañas del perfil) en una sola llamada.
+
+Cada sección (general, asistencias, vacaciones, permisos, sanciones,
+liquidaciones, anticipos, ingresos_extras) se calcula con una consulta de
+agregados sobre su tabla, en vez de los conteos sueltos de cada endpoint de
+pestaña.
+
+Cada sección lleva una versión: un hash de (cantidad de filas, máximo id,
+máximo fecha_actualizacion) del empleado en las tablas de las que depende.
+Las altas y bajas cambian la cantidad o el máximo id, y las ediciones cambian
+fecha_actualizacion (onupdate). Las versiones de todas las tablas salen de
+una sola consulta UNION ALL. Con ellas la ruta arma el ETag y responde 304 a
+un If-None-Match vigente sin calcular ninguna sección.
+"""
+
+import hashlib
+from datetime import date
+
+from sqlalchemy import select, union_all, literal, func, case, and_, or_
+
+from .models import (
+    db, Empleado, Asistencia, AsistenciaEvento, Vacacion, Permiso, Sancion, Liquidacion,
+    Anticipo, IngresoExtra, EstadoPermisoEnum
+)
+from .periodos import en_mes
+from .resumen_asistencia import resumen_mes
+from .marcaciones import resumen_dia, resumen_a_json
+
+# tabla de versión -> modelo (asistencia_eventos no tiene fecha_actualizacion: los eventos no se editan)
+_TABLAS = {
+    'empleado': Empleado,
+    'asistencias': Asistencia,
+    'eventos': AsistenciaEvento,
+    'vacaciones': Vacacion,
+    'permisos': Permiso,
+    'sanciones': Sancion,
+    'liquidaciones': Liquidacion,
+    'anticipos': Anticipo,
+    'ingresos_extras': IngresoExtra,
+}
+
+
+def _contar(condicion):
+    return func.coalesce(func.sum(case((condicion, 1), else_=0)), 0)
+
+
+def _sumar(valor, condicion=None):
+    if condicion is not None:
+        valor = case((condicion, valor), else_=0)
+    return func.coalesce(func.sum(valor), 0)
+
+
+# ==================== SECCIONES ====================
+
+def resumen_general(empleado):
+    """Sección general: KPIs del mes, resumen de hoy e ingresos extras (formato de api_empleado_general_v2)."""
+    hoy = date.today()
+    vacaciones_pendientes, sanciones, permisos_mes = db.session.query(
+        select(_sumar(Vacacion.dias_pendientes)).where(
+            Vacacion.empleado_id == empleado.id, Vacacion.año == hoy.year).scalar_subquery(),
+        select(func.count(Sancion.id)).where(Sancion.empleado_id == empleado.id).scalar_subquery(),
+        select(func.count(Permiso.id)).where(
+            Permiso.empleado_id == empleado.id, en_mes(Permiso.fecha_creacion, hoy.year, hoy.month)).scalar_subquery(),
+    ).one()
+    ingresos = _ingresos_extras(empleado)
+
+    antiguedad = '-'
+    if empleado.fecha_ingreso:
+        antiguedad = f"{(hoy - empleado.fecha_ingreso).days // 365} años"
+
+    return {
+        'asistencia_mes': int(resumen_mes(empleado.id, hoy.year, hoy.month)['presentes']),
+        'vacaciones_pendientes': int(vacaciones_pendientes),
+        'sanciones_activas': int(sanciones),
+        'permisos_usados': int(permisos_mes),
+        'salario_base': float(empleado.salario_base) if empleado.salario_base is not None else 0,
+        'fecha_ingreso': empleado.fecha_ingreso.strftime('%Y-%m-%d') if empleado.fecha_ingreso else None,
+        'antiguedad': antiguedad,
+        'estado': 'Activo' if getattr(empleado.estado, 'name', '').upper() == 'ACTIVO' else (
+            empleado.estado.value if hasattr(empleado.estado, 'value') else str(empleado.estado)),
+        'email': empleado.email,
+        'telefono': empleado.telefono,
+        'resumen_hoy': resumen_a_json(resumen_dia(empleado.id, hoy)),
+        'ingresos_extras': {
+            'pendientes_count': ingresos['pendientes'],
+            'pendientes_total': ingresos['pendientes_total'],
+            'ultimo': ingresos['ultimo'],
+        },
+    }
+
+
+def _asistencias(empleado):
+    """Totales de días y ausencias por estado de justificación (incluye la pestaña justificaciones)."""
+    ausente = Asistencia.presente == False
+    total, presentes, ausencias, pendientes, justificadas, injustificadas = db.session.query(
+        func.count(Asistencia.id),
+        _contar(Asistencia.presente == True),
+        _contar(ausente),
+        _contar(and_(ausente, or_(Asistencia.justificacion_estado == None,
+                                  Asistencia.justificacion_estado == 'PENDIENTE'))),
+        _contar(and_(ausente, Asistencia.justificacion_estado == 'JUSTIFICADO')),
+        _contar(and_(ausente, Asistencia.justificacion_estado == 'INJUSTIFICADO')),
+    ).filter(Asistencia.empleado_id == empleado.id).one()
+    return {
+        'total': total, 'presentes': int(presentes), 'ausencias': int(ausencias),
+        'justificaciones': {'pendientes': int(pendientes), 'justificadas': int(justificadas),
+                            'injustificadas': int(injustificadas)},
+    }
+
+
+def _vacaciones(empleado):
+    total, disponibles, tomados, pendientes = db.session.query(
+        func.count(Vacacion.id), _sumar(Vacacion.dias_disponibles), _sumar(Vacacion.dias_tomados),
+        _sumar(Vacacion.dias_pendientes),
+    ).filter(Vacacion.empleado_id == empleado.id).one()
+    return {'total': total, 'dias_disponibles': int(disponibles), 'dias_tomados': int(tomados),
+            'dias_pendientes': int(pendientes)}
+
+
+def _permisos(empleado):
+    filas = db.session.query(Permiso.estado, func.count(Permiso.id)).filter(
+        Permiso.empleado_id == empleado.id).group_by(Permiso.estado).all()
+    por_estado = {estado.value if estado else 'N/A': cantidad for estado, cantidad in filas}
+    usados = sum(c for e, c in filas if e in (EstadoPermisoEnum.APROBADO, EstadoPermisoEnum.COMPLETADO))
+    return {'total': sum(por_estado.values()), 'por_estado': por_estado, 'usados': usados}
+
+
+def _sanciones(empleado):
+    total, monto, ultima = db.session.query(
+        func.count(Sancion.id), _sumar(Sancion.monto), func.max(Sancion.fecha)
+    ).filter(Sancion.empleado_id == empleado.id).one()
+    return {'total': total, 'monto_total': float(monto), 'ultima': ultima.strftime('%d/%m/%Y') if ultima else None}
+
+
+def _liquidaciones(empleado):
+    total, ultimo_periodo = db.session.query(
+        func.count(Liquidacion.id), func.max(Liquidacion.periodo)
+    ).filter(Liquidacion.empleado_id == empleado.id).one()
+    neto = None
+    if ultimo_periodo:
+        neto = db.session.query(Liquidacion.salario_neto).filter(
+            Liquidacion.empleado_id == empleado.id, Liquidacion.periodo == ultimo_periodo
+        ).order_by(Liquidacion.id.desc()).limit(1).scalar()
+    return {'total': total, 'ultimo_periodo': ultimo_periodo,
+            'ultimo_neto': float(neto) if neto is not None else None}
+
+
+def _anticipos(empleado):
+    pendiente = and_(Anticipo.aprobado == False, Anticipo.rechazado.isnot(True))
+    total, pendientes, monto_pendiente, sin_aplicar = db.session.query(
+        func.count(Anticipo.id), _contar(pendiente), _sumar(Anticipo.monto, pendiente),
+        _sumar(Anticipo.monto, and_(Anticipo.aprobado == True, Anticipo.aplicado == False)),
+    ).filter(Anticipo.empleado_id == empleado.id).one()
+    return {'total': total, 'pendientes': int(pendientes), 'monto_pendiente': float(monto_pendiente),
+            'aprobado_sin_aplicar': float(sin_aplicar)}
+
+
+def _ingresos_extras(empleado):
+    pendiente = IngresoExtra.estado == 'PENDIENTE'
+    total, pendientes, pendientes_total = db.session.query(
+        func.count(IngresoExtra.id), _contar(pendiente), _sumar(IngresoExtra.monto, pendiente)
+    ).filter(IngresoExtra.empleado_id == empleado.id).one()
+    ultimo = IngresoExtra.query.filter_by(empleado_id=empleado.id).order_by(IngresoExtra.id.desc()).first()
+    return {
+        'total': total, 'pendientes': int(pendientes), 'pendientes_total': float(pendientes_total),
+        'ultimo': {
+            'id': ultimo.id, 'tipo': ultimo.tipo,
+            'monto': float(ultimo.monto) if ultimo.monto is not None else None,
+            'mes': ultimo.mes, 'año': ultimo.año, 'estado': ultimo.estado,
+            'justificativo': ultimo.justificativo_archivo,
+        } if ultimo else None,
+    }
+
+
+# sección -> (tablas de las que depende, función que la calcula)
+SECCIONES = {
+    'general': (('empleado', 'asistencias', 'eventos', 'vacaciones', 'sanciones', 'permisos', 'ingresos_extras'),
+                resumen_general),
+    'asistencias': (('asistencias',), _asistencias),
+    'vacaciones': (('vacaciones',), _vacaciones),
+    'permisos': (('permisos',), _permisos),
+    'sanciones': (('sanciones',), _sanciones),
+    'liquidaciones': (('liquidaciones',), _liquidaciones),
+    'anticipos': (('anticipos',), _anticipos),
+    'ingresos_extras': (('ingresos_extras',), _ingresos_extras),
+}
+
+
+# ==================== VERSIONES ====================
+
+def _sello(nombre, modelo, empleado_id):
+    filtro = modelo.id == empleado_id if modelo is Empleado else modelo.empleado_id == empleado_id
+    actualizado = getattr(modelo, 'fecha_actualizacion', None)
+    return select(
+        literal(nombre), func.count(modelo.id), func.max(modelo.id),
+        func.max(actualizado) if actualizado is not None else literal(None)
+    ).where(filtro)
+
+
+def versiones_perfil(empleado_id, secciones=None):
+    """
+    {sección: versión} de `secciones` (todas si es None), con una consulta.
+    None si el empleado no existe.
+    """
+    secciones = list(SECCIONES) if secciones is None else secciones
+    tablas = {'empleado'} | {t for s in secciones for t in SECCIONES[s][0]}
+    sellos = {nombre: (cantidad, maximo, str(actualizado))
+              for nombre, cantidad, maximo, actualizado in db.session.execute(union_all(
+                  *(_sello(nombre, _TABLAS[nombre], empleado_id) for nombre in sorted(tablas))))}
+    if not sellos['empleado'][0]:
+        return None
+
+    versiones = {}
+    for seccion in secciones:
+        partes = [seccion, *(f'{t}={sellos[t]}' for t in SECCIONES[seccion][0])]
+        if seccion == 'general':
+            partes.append(date.today().isoformat())  # KPIs del mes y resumen de hoy
+        versiones[seccion] = hashlib.sha1('|'.join(partes).encode()).hexdigest()[:16]
+    return versiones
+
+
+def etag_perfil(versiones):
+    """ETag de una respuesta: la versión si es una sola sección, o el hash de todas."""
+    if len(versiones) == 1:
+        return next(iter(versiones.values()))
+    return hashlib.sha1(','.join(f'{s}:{v}' for s, v in sorted(versiones.items())).encode()).hexdigest()[:16]
+
+
+def datos_perfil(empleado_id, versiones):
+    """{sección: {'version', 'datos'}} de las secciones de `versiones`."""
+    empleado = db.session.get(Empleado, empleado_id)
+    return {seccion: {'version': version, 'datos': SECCIONES[seccion][1](empleado)}
+            for seccion, version in versiones.items()}
@@ -0,0 +1,54 @@
+"""
+periodos.py
+Filtros de período como rangos semiabiertos [inicio, fin).
+
+`func.extract('month', col) == mes` o `func.date(ts) == dia` envuelven la
+columna en una función y ni PostgreSQL ni SQLite pueden usar su índice;
+comparar la columna desnuda contra dos límites sí lo permite (index range
+scan sobre (empleado_id, fecha), (empleado_id, ts), etc.).
+"""
+
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import and_, DateTime
+
+
+def rango_mes(año, mes):
+    """Rango semiabierto [primer día del mes, primer día del mes siguiente)."""
+    inicio = date(año, mes, 1)
+    fin = date(año + 1, 1, 1) if mes == 12 else date(año, mes + 1, 1)
+    return inicio, fin
+
+
+def rango_año(año):
+    return date(año, 1, 1), date(año + 1, 1, 1)
+
+
+def rango_dia(dia):
+    inicio = datetime.combine(dia, datetime.min.time())
+    return inicio, inicio + timedelta(days=1)
+
+
+def en_rango(columna, inicio, fin):
+    """columna >= inicio AND columna < fin. Con columnas DateTime los límites date se pasan a medianoche."""
+    if isinstance(columna.type, DateTime):
+        if not isinstance(inicio, datetime):
+            inicio = datetime.combine(inicio, datetime.min.time())
+        if not isinstance(fin, datetime):
+            fin = datetime.combine(fin, datetime.min.time())
+    return and_(columna >= inicio, columna < fin)
+
+
+def en_mes(columna, año, mes):
+    """Reemplazo indexable de extract('month') == mes AND extract('year') == año."""
+    return en_rango(columna, *rango_mes(año, mes))
+
+
+def en_año(columna, año):
+    """Reemplazo indexable de extract('year') == año."""
+    return en_rango(columna, *rango_año(año))
+
+
+def en_dia(columna, dia):
+    """Reemplazo indexable de func.date(columna) == dia para columnas DateTime."""
+    return en_rango(columna, *rango_dia(dia))
@@ -0,0 +1,151 @@
+"""
+reproceso_asistencia.py
+Regenera los resúmenes diarios de Asistencia desde AsistenciaEvento.
+
+Se usa tras cambiar las reglas (ASISTENCIA_*) o corregir el reloj de un
+dispositivo. Los eventos del rango se leen en un flujo ordenado por
+(empleado_id, ts): en PostgreSQL con cursor del lado del servidor (en una
+conexión aparte, para poder hacer commit por lote sin cerrarlo); en SQLite
+en páginas por clave. Los meses archivados (almacen_eventos) se intercalan
+en el mismo orden. ReglasAsistencia.plegar los resume en una sola pasada y
+cada lote de días se compara con las filas guardadas:
+- solo se escriben las filas que cambian (vía ORM, así el listener de
+  resumen_asistencia mantiene los contadores mensuales);
+- qué columnas se escriben lo decide marcaciones.valores_del_dia, igual que
+  al importar: las filas justificadas o no justificadas por RRHH no se
+  tocan, y en los días de vacaciones o permiso solo cambian las horas.
+
+Con varios procesos (no en SQLite, que admite un solo escritor) los
+empleados se reparten en rangos contiguos de id (nomina_paralela.ejecutar_rangos)
+y cada rango se procesa con su propia conexión y transacciones.
+"""
+
+import time as reloj
+from datetime import timedelta
+
+from sqlalchemy import select, tuple_
+
+from .models import db, Asistencia, AsistenciaEvento, Empleado
+from .marcaciones import valores_del_dia, reglas as reglas_actuales
+from .nomina_paralela import particionar_ids, ejecutar_rangos, admite_procesos
+from .periodos import en_rango
+from .almacen_eventos import con_archivados
+
+TAMANO_LOTE = 2000  # días por lote de comparación y commit
+
+_CONTADORES = ('eventos', 'dias', 'actualizadas', 'creadas', 'sin_cambios', 'omitidas')
+
+
+def _guardar_lote(lote, reglas):
+    """Compara un lote [(clave, estado)] con las filas guardadas y escribe solo las diferencias."""
+    stats = dict.fromkeys(_CONTADORES, 0)
+    empleado_ids = {e for (e, _), _ in lote}
+    fechas = [d for (_, d), _ in lote]
+    filas = {(a.empleado_id, a.fecha): a for a in Asistencia.query.filter(
+        Asistencia.empleado_id.in_(empleado_ids),
+        en_rango(Asistencia.fecha, min(fechas), max(fechas) + timedelta(days=1))
+    )}
+
+    for (empleado_id, dia), estado in lote:
+        asistencia = filas.get((empleado_id, dia))
+        valores = valores_del_dia(asistencia, estado, reglas)
+        if asistencia is None:
+            db.session.add(Asistencia(empleado_id=empleado_id, fecha=dia, **valores))
+            stats['creadas'] += 1
+        elif valores is None:
+            stats['omitidas'] += 1
+        elif all(getattr(asistencia, campo) == valor for campo, valor in valores.items()):
+            stats['sin_cambios'] += 1
+        else:
+            for campo, valor in valores.items():
+                setattr(asistencia, campo, valor)
+            stats['actualizadas'] += 1
+
+    db.session.commit()
+    return stats
+
+
+def _flujo_eventos(id_desde, id_hasta, desde, hasta, tamano):
+    """(empleado_id, ts, tipo) del rango, ordenados por (empleado_id, ts, id), leídos de a `tamano`."""
+    columnas = (AsistenciaEvento.empleado_id, AsistenciaEvento.ts, AsistenciaEvento.id)
+    consulta = select(AsistenciaEvento.empleado_id, AsistenciaEvento.ts, AsistenciaEvento.tipo, AsistenciaEvento.id).where(
+        AsistenciaEvento.empleado_id.between(id_desde, id_hasta),
+        en_rango(AsistenciaEvento.ts, desde, hasta + timedelta(days=1))
+    ).order_by(*columnas)
+
+    if db.engine.dialect.name == 'postgresql':
+        # Cursor del servidor en una conexión aparte: sobrevive a los commits de cada lote
+        with db.engine.connect() as lectura:
+            for empleado_id, ts, tipo, _ in lectura.execution_options(stream_results=True, yield_per=tamano).execute(consulta):
+                yield empleado_id, ts, tipo
+        return
+
+    # SQLite: un cursor abierto bloquearía los commits; se pagina por clave (empleado_id, ts, id)
+    ultimo = None
+    while True:
+        pagina = consulta if ultimo is None else consulta.where(tuple_(*columnas) > tuple_(*ultimo))
+        filas = db.session.execute(pagina.limit(tamano)).all()
+        for empleado_id, ts, tipo, _ in filas:
+            yield empleado_id, ts, tipo
+        if len(filas) < tamano:
+            return
+        empleado_id, ts, _, id_ = filas[-1]
+        ultimo = (empleado_id, ts, id_)
+
+
+def _reprocesar_rango(id_desde, id_hasta, desde, hasta, reglas, tamano_lote):
+    """Reprocesa los eventos de los empleados id_desde..id_hasta entre desde y hasta (inclusive)."""
+    stats = dict.fromkeys(_CONTADORES, 0)
+
+    def guardar(lote):
+        for clave, valor in _guardar_lote(lote, reglas).items():
+            stats[clave] += valor
+        stats['dias'] += len(lote)
+
+    def contar(filas):
+        for fila in filas:
+            stats['eventos'] += 1
+            yield fila
+
+    eventos = con_archivados(_flujo_eventos(id_desde, id_hasta, desde, hasta, tamano_lote * 4),
+                             desde, hasta, range(id_desde, id_hasta + 1))
+    lote = []
+    for dia in reglas.plegar(contar(eventos)):
+        lote.append(dia)
+        if len(lote) >= tamano_lote:
+            guardar(lote)
+            lote = []
+    if lote:
+        guardar(lote)
+    return stats
+
+
+def reprocesar_asistencias(desde, hasta, empleado_id=None, procesos=1, tamano_lote=TAMANO_LOTE):
+    """
+    Recalcula estado, presente y observaciones de las asistencias con
+    marcaciones entre `desde` y `hasta` (fechas inclusive). Hace commit por lote.
+
+    Returns:
+        dict eventos, dias, actualizadas, creadas, sin_cambios, omitidas,
+        segundos, procesos
+    """
+    inicio = reloj.perf_counter()
+    reglas = reglas_actuales()
+
+    if empleado_id is not None:
+        rangos = [(empleado_id, empleado_id)]
+    else:
+        ids = [i for i, in db.session.query(Empleado.id).order_by(Empleado.id)]
+        paralelo = procesos > 1 and admite_procesos() and db.engine.dialect.name != 'sqlite'
+        rangos = particionar_ids(ids, procesos if paralelo else 1)
+
+    if len(rangos) > 1:
+        db.session.remove()  # los hijos abren sus propias conexiones
+        parciales = ejecutar_rangos(_reprocesar_rango, rangos, desde, hasta, reglas, tamano_lote)
+    else:
+        parciales = [_reprocesar_rango(*rango, desde, hasta, reglas, tamano_lote) for rango in rangos]
+
+    stats = {clave: sum(p[clave] for p in parciales) for clave in _CONTADORES}
+    stats['segundos'] = round(reloj.perf_counter() - inicio, 3)
+    stats['procesos'] = len(rangos)
+    return stats
@@ -0,0 +1,261 @@
+"""
+resumen_asistencia.py
+Mantenimiento incremental de la tabla asistencia_resumen_mensual.
+
+Cada flush que crea, modifica o elimina filas de Asistencia aplica, en la
+misma transacción, la diferencia de contadores (presentes, ausencias,
+justificadas, ...) sobre la fila (empleado_id, año, mes) correspondiente.
+Así lo cubren registrar_asistencia, justificar/no_justificar_ausencia y
+editar_asistencia sin tener que recordarlo en cada ruta.
+
+Los lectores (nómina, métricas, perfil) consultan una fila por empleado y
+mes en lugar de recontar asistencias. Las escrituras masivas por Core
+(INSERT ... SELECT, UPDATE sin ORM) no pasan por el ORM: deben llamar a
+aplicar_deltas() o a reconstruir_resumen() del mes afectado (ver
+cierre_asistencias.py).
+"""
+
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import event, inspect, select, update, delete, insert, func, case, literal, bindparam, and_
+
+from .models import db, Asistencia, AsistenciaResumenMensual
+from .periodos import en_mes
+
+CONTADORES = ('presentes', 'ausencias', 'justificadas', 'injustificadas', 'pendientes', 'dias_vacaciones', 'dias_permiso')
+
+# Estado de justificación -> contador
+_CONTADOR_JUSTIFICACION = {
+    'JUSTIFICADO': 'justificadas',
+    'INJUSTIFICADO': 'injustificadas',
+    'PENDIENTE': 'pendientes',
+}
+
+# Prefijos de observaciones con que cerrar_asistencias_automatico marca vacaciones y permisos
+PREFIJO_VACACIONES = 'Vacaciones'
+PREFIJO_PERMISO = 'Permiso:'
+
+
+def clasificar(presente, justificacion_estado, observaciones):
+    """Contadores a los que suma una asistencia (mismo criterio que las consultas de conteo)."""
+    contadores = []
+    if presente is True:
+        contadores.append('presentes')
+        if observaciones and observaciones.startswith(PREFIJO_VACACIONES):
+            contadores.append('dias_vacaciones')
+        elif observaciones and observaciones.startswith(PREFIJO_PERMISO):
+            contadores.append('dias_permiso')
+    elif presente is False:
+        contadores.append('ausencias')
+        if justificacion_estado in _CONTADOR_JUSTIFICACION:
+            contadores.append(_CONTADOR_JUSTIFICACION[justificacion_estado])
+    return contadores
+
+
+# ==================== MANTENIMIENTO INCREMENTAL ====================
+
+_CAMPOS = ('empleado_id', 'fecha', 'presente', 'justificacion_estado', 'observaciones')
+
+
+def _conservar_valor_previo(target, value, oldvalue, initiator):
+    """Listener vacío: con active_history=True el ORM carga el valor anterior aunque el atributo esté expirado."""
+
+
+for _campo in _CAMPOS:
+    event.listen(getattr(Asistencia, _campo), 'set', _conservar_valor_previo, active_history=True)
+
+
+def _valores_previos(asistencia):
+    """Valores confirmados antes del flush (historial del atributo)."""
+    estado = inspect(asistencia)
+    previos = {}
+    for campo in _CAMPOS:
+        historial = estado.attrs[campo].history
+        previos[campo] = historial.deleted[0] if historial.deleted else getattr(asistencia, campo)
+    return previos
+
+
+def _valores_actuales(asistencia):
+    return {campo: getattr(asistencia, campo) for campo in _CAMPOS}
+
+
+def _sumar(deltas, valores, signo):
+    if valores['empleado_id'] is None or valores['fecha'] is None:
+        return
+    clave = (valores['empleado_id'], valores['fecha'].year, valores['fecha'].month)
+    for contador in clasificar(valores['presente'], valores['justificacion_estado'], valores['observaciones']):
+        deltas[clave][contador] += signo
+
+
+@event.listens_for(db.session, 'before_flush')
+def _cargar_eliminadas(session, flush_context, instances):
+    # Tras el DELETE ya no se podrían cargar los valores de una fila expirada
+    for obj in session.deleted:
+        if isinstance(obj, Asistencia):
+            for campo in _CAMPOS:
+                getattr(obj, campo)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _actualizar_resumen(session, flush_context):
+    deltas = defaultdict(lambda: dict.fromkeys(CONTADORES, 0))
+
+    for obj in session.new:
+        if isinstance(obj, Asistencia):
+            _sumar(deltas, _valores_actuales(obj), 1)
+    for obj in session.dirty:
+        if isinstance(obj, Asistencia) and session.is_modified(obj, include_collections=False):
+            _sumar(deltas, _valores_previos(obj), -1)
+            _sumar(deltas, _valores_actuales(obj), 1)
+    for obj in session.deleted:
+        if isinstance(obj, Asistencia):
+            _sumar(deltas, _valores_previos(obj), -1)
+
+    deltas = {clave: d for clave, d in deltas.items() if any(d.values())}
+    if deltas:
+        aplicar_deltas(session.connection(), deltas)
+
+
+def _insertar_faltantes(conexion, claves):
+    """Crea en cero las filas (empleado_id, año, mes) que aún no existen."""
+    tabla = AsistenciaResumenMensual.__table__
+    filas = [{'empleado_id': e, 'año': a, 'mes': m, **dict.fromkeys(CONTADORES, 0)} for e, a, m in claves]
+
+    if conexion.dialect.name in ('postgresql', 'sqlite'):
+        if conexion.dialect.name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as insert_dialecto
+        else:
+            from sqlalchemy.dialects.sqlite import insert as insert_dialecto
+        conexion.execute(insert_dialecto(tabla).on_conflict_do_nothing(), filas)
+        return
+
+    existentes = set(conexion.execute(
+        select(tabla.c.empleado_id, tabla.c['año'], tabla.c.mes).where(
+            tabla.c.empleado_id.in_({e for e, _, _ in claves})
+        )
+    ).tuples())
+    faltantes = [f for f in filas if (f['empleado_id'], f['año'], f['mes']) not in existentes]
+    if faltantes:
+        conexion.execute(insert(tabla), faltantes)
+
+
+def aplicar_deltas(conexion, deltas):
+    """
+    Suma los deltas {(empleado_id, año, mes): {contador: n}} con UPDATE atómico
+    (contador = contador + n), seguro frente a transacciones concurrentes.
+    """
+    tabla = AsistenciaResumenMensual.__table__
+    _insertar_faltantes(conexion, list(deltas))
+
+    stmt = update(tabla).where(
+        tabla.c.empleado_id == bindparam('k_empleado'),
+        tabla.c['año'] == bindparam('k_anio'),
+        tabla.c.mes == bindparam('k_mes')
+    ).values(
+        fecha_actualizacion=bindparam('k_ahora'),
+        **{c: tabla.c[c] + bindparam(f'd_{c}') for c in CONTADORES}
+    )
+    ahora = datetime.utcnow()
+    conexion.execute(stmt, [
+        {'k_empleado': e, 'k_anio': a, 'k_mes': m, 'k_ahora': ahora, **{f'd_{c}': d[c] for c in CONTADORES}}
+        for (e, a, m), d in deltas.items()
+    ])
+
+
+# ==================== RECONSTRUCCIÓN ====================
+
+def reconstruir_resumen(año, mes, empleado_id=None):
+    """
+    Recalcula desde cero las filas del mes (de un empleado o de todos) con un
+    único INSERT ... SELECT agrupado. No hace commit.
+
+    Returns:
+        Cantidad de filas de resumen generadas
+    """
+    tabla = AsistenciaResumenMensual.__table__
+
+    borrar = delete(tabla).where(tabla.c['año'] == año, tabla.c.mes == mes)
+    filtros = [en_mes(Asistencia.fecha, año, mes)]
+    if empleado_id is not None:
+        borrar = borrar.where(tabla.c.empleado_id == empleado_id)
+        filtros.append(Asistencia.empleado_id == empleado_id)
+    db.session.execute(borrar)
+
+    ausente = Asistencia.presente == False
+    presente = Asistencia.presente == True
+
+    def contar(condicion):
+        return func.coalesce(func.sum(case((condicion, 1), else_=0)), 0)
+
+    origen = select(
+        Asistencia.empleado_id,
+        literal(año),
+        literal(mes),
+        contar(presente),
+        contar(ausente),
+        contar(and_(ausente, Asistencia.justificacion_estado == 'JUSTIFICADO')),
+        contar(and_(ausente, Asistencia.justificacion_estado == 'INJUSTIFICADO')),
+        contar(and_(ausente, Asistencia.justificacion_estado == 'PENDIENTE')),
+        contar(and_(presente, Asistencia.observaciones.like(f'{PREFIJO_VACACIONES}%'))),
+        contar(and_(presente, Asistencia.observaciones.like(f'{PREFIJO_PERMISO}%'))),
+        literal(datetime.utcnow()),
+    ).where(*filtros).group_by(Asistencia.empleado_id)
+
+    resultado = db.session.execute(insert(tabla).from_select(
+        ['empleado_id', 'año', 'mes', *CONTADORES, 'fecha_actualizacion'], origen
+    ))
+    return resultado.rowcount
+
+
+def meses_con_asistencias(empleado_id=None):
+    """(año, mes) distintos presentes en asistencias, para reconstruir todo."""
+    fechas = db.session.query(func.min(Asistencia.fecha), func.max(Asistencia.fecha))
+    if empleado_id is not None:
+        fechas = fechas.filter(Asistencia.empleado_id == empleado_id)
+    desde, hasta = fechas.one()
+    if desde is None:
+        return []
+    meses = []
+    año, mes = desde.year, desde.month
+    while (año, mes) <= (hasta.year, hasta.month):
+        meses.append((año, mes))
+        año, mes = (año + 1, 1) if mes == 12 else (año, mes + 1)
+    return meses
+
+
+# ==================== LECTURA ====================
+
+def _a_dict(fila):
+    if fila is None:
+        return dict.fromkeys(CONTADORES, 0)
+    return {c: getattr(fila, c) for c in CONTADORES}
+
+
+def resumen_mes(empleado_id, año, mes):
+    """Contadores del mes de un empleado (ceros si no tiene asistencias)."""
+    return _a_dict(db.session.get(AsistenciaResumenMensual, (empleado_id, año, mes)))
+
+
+def resumenes_mes(año, mes, empleado_ids=None):
+    """{empleado_id: contadores} del mes; los empleados sin fila no aparecen."""
+    query = AsistenciaResumenMensual.query.filter_by(año=año, mes=mes)
+    if empleado_ids is not None:
+        if not empleado_ids:
+            return {}
+        # Rango (min, max) en lugar de un IN gigante; los sobrantes se descartan abajo
+        query = query.filter(AsistenciaResumenMensual.empleado_id.between(min(empleado_ids), max(empleado_ids)))
+        empleado_ids = set(empleado_ids)
+    return {
+        fila.empleado_id: _a_dict(fila) for fila in query
+        if empleado_ids is None or fila.empleado_id in empleado_ids
+    }
+
+
+def resumen_año(empleado_id, año):
+    """Contadores sumados de los meses del año de un empleado."""
+    fila = db.session.query(*[func.coalesce(func.sum(getattr(AsistenciaResumenMensual, c)), 0) for c in CONTADORES]).filter(
+        AsistenciaResumenMensual.empleado_id == empleado_id,
+        AsistenciaResumenMensual.año == año
+    ).one()
+    return dict(zip(CONTADORES, (int(v) for v in fila)))
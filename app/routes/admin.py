@@ -9,6 +9,7 @@ from functools import wraps
 from app import db
 from app.models import Usuario, RoleEnum
 from app.bitacora import registrar_bitacora
+from app.sesion_usuarios import registrar_cambio_usuario
 from datetime import datetime
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
@@ -166,6 +167,7 @@ def editar_usuario(usuario_id):
                 
                 usuario.set_password(password)
             
+            registrar_cambio_usuario(usuario.id)
             db.session.commit()
             
             registrar_bitacora(
@@ -207,6 +209,7 @@ def eliminar_usuario(usuario_id):
         nombre = usuario.nombre_usuario
         
         db.session.delete(usuario)
+        registrar_cambio_usuario(usuario_id)
         db.session.commit()
         
         registrar_bitacora(
@@ -238,6 +241,7 @@ def toggle_estado_usuario(usuario_id):
         usuario.activo = not usuario.activo
         estado = 'activado' if usuario.activo else 'desactivado'
         
+        registrar_cambio_usuario(usuario.id)
         db.session.commit()
         
         registrar_bitacora(
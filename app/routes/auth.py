@@ -56,7 +56,8 @@ def cambiar_password():
             flash('Todos los campos son requeridos', 'danger')
             return redirect(url_for('auth.cambiar_password'))
         
-        if not current_user.check_password(password_actual):
+        usuario = db.session.get(Usuario, current_user.id)
+        if not usuario.check_password(password_actual):
             flash('La contraseña actual es incorrecta', 'danger')
             return redirect(url_for('auth.cambiar_password'))
         
@@ -68,7 +69,7 @@ def cambiar_password():
             flash('La contraseña debe tener al menos 6 caracteres', 'danger')
             return redirect(url_for('auth.cambiar_password'))
         
-        current_user.set_password(password_nuevo)
+        usuario.set_password(password_nuevo)
         db.session.commit()
         
         flash('Contraseña actualizada exitosamente', 'success')
@@ -1,13 +1,16 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, send_file, current_app
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, send_file, current_app, Response, abort
 from flask_login import login_required, current_user
 from sqlalchemy import func, desc, or_
+from sqlalchemy.exc import IntegrityError
 from decimal import Decimal
 from datetime import datetime, date, timedelta
 import calendar
 from io import BytesIO
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
+import hmac
 import json
+import logging
 import os
 from werkzeug.utils import secure_filename
 from io import BytesIO
@@ -17,10 +20,38 @@ from ..models import (
     Contrato, Liquidacion, Vacacion, IngresoExtra, Descuento,
     Bitacora, EstadoEmpleadoEnum, EstadoVacacionEnum, EstadoPermisoEnum, RoleEnum, Despido,
     Postulante, DocumentosCurriculum, AsistenciaEvento, Empresa, HorasExtra, Anticipo,
-    SalarioMinimo, BonificacionFamiliar, TipoHijoEnum
+    SalarioMinimo, BonificacionFamiliar, TipoHijoEnum, Tarea, Feriado, CorridaNomina
 )
-from ..bitacora import registrar_bitacora, registrar_operacion_crud
+from ..bitacora import registrar_bitacora, registrar_operacion_crud, agregar_bitacora
+from ..tareas import encolar_tarea, solicitar_cancelacion
+from ..trazas import Tiempos, nueva_corrida, corrida_a_dict, registrar_evento
 from ..reports.report_utils import ReportUtils
+from ..nomina import (
+    calcular_liquidaciones_periodo, guardar_liquidaciones,
+    calcular_aguinaldos, construir_liquidacion_aguinaldo,
+    obtener_salario_minimo_vigente, contar_hijos_activos, calcular_bonificacion_familiar
+)
+from ..periodos import en_mes, en_año, rango_mes
+try:
+    from ..nomina_vectorial import preview_vectorial
+except ImportError:  # sin NumPy la vista previa usa el cálculo Decimal
+    preview_vectorial = None
+from ..calendario import dias_habiles_mes, es_dia_habil, cargar_feriados_paraguay, registrar_cambio_calendario
+from ..marcaciones import (
+    fila_del_dia, inferir_tipo, registrar_marcacion, resumen_a_json,
+    leer_marcaciones, importar_marcaciones
+)
+from ..cierre_asistencias import cerrar_dia
+from ..horas_extra import detectar_horas_extra
+from ..dispositivos import id_dispositivo
+from ..tablero_presencia import flujo_presencia
+from ..metricas_asistencia import metricas_asistencias as calcular_metricas_asistencias
+from ..empresa_config import empresa_actual, registrar_cambio_empresa
+from ..perfil_empleado import (
+    resumen_general, versiones_perfil, etag_perfil, datos_perfil, SECCIONES as SECCIONES_PERFIL
+)
+from ..resumen_asistencia import resumen_año
+from ..nomina_paralela import calcular_liquidaciones_periodo_paralelo, calcular_aguinaldos_paralelo
 from openpyxl import Workbook
 from io import BytesIO as IOBytes
 
@@ -202,88 +233,7 @@ def editar_empleado(empleado_id):
 def api_empleado_general_v2(empleado_id):
     """API usada por el perfil del empleado: KPIs y resumen de hoy, incluyendo Ingresos Extras."""
     empleado = Empleado.query.get_or_404(empleado_id)
-
-    # Asistencia mes (conteo de días presentes en el mes actual)
-    hoy = date.today()
-    asistencia_mes = db.session.query(func.count(Asistencia.id)).filter(
-        Asistencia.empleado_id == empleado.id,
-        func.extract('month', Asistencia.fecha) == hoy.month,
-        func.extract('year', Asistencia.fecha) == hoy.year,
-        Asistencia.presente == True
-    ).scalar() or 0
-
-    # Vacaciones pendientes: sumar días pendientes para el año actual (más representativo)
-    vacaciones_pendientes = 0
-    if 'Vacacion' in globals():
-        try:
-            vacaciones_pendientes = db.session.query(func.coalesce(func.sum(Vacacion.dias_pendientes), 0)).filter(
-                Vacacion.empleado_id == empleado.id,
-                Vacacion.año == hoy.year
-            ).scalar() or 0
-            vacaciones_pendientes = int(vacaciones_pendientes)
-        except Exception:
-            # fallback al conteo de solicitudes pendientes si hay algún problema
-            vacaciones_pendientes = Vacacion.query.filter_by(empleado_id=empleado.id, estado=EstadoVacacionEnum.PENDIENTE).count()
-
-    # Sanciones activas
-    sanciones_activas = Sancion.query.filter_by(empleado_id=empleado.id).count()
-
-    # Permisos usados (conteo de permisos en el mes)
-    permisos_usados = Permiso.query.filter(
-        Permiso.empleado_id == empleado.id,
-        func.extract('month', Permiso.fecha_creacion) == hoy.month,
-        func.extract('year', Permiso.fecha_creacion) == hoy.year
-    ).count()
-
-    # Resumen hoy
-    resumen_hoy = _resumir_dia_asistencias(empleado.id, hoy)
-
-    # Ingresos extras resumen
-    ingresos_pending_count = IngresoExtra.query.filter_by(empleado_id=empleado.id, estado='PENDIENTE').count()
-    ingresos_pending_total = db.session.query(func.coalesce(func.sum(IngresoExtra.monto), 0)).filter(
-        IngresoExtra.empleado_id == empleado.id,
-        IngresoExtra.estado == 'PENDIENTE'
-    ).scalar() or 0
-
-    ultimo_ingreso = IngresoExtra.query.filter_by(empleado_id=empleado.id).order_by(IngresoExtra.id.desc()).first()
-    ultimo = None
-    if ultimo_ingreso:
-        ultimo = {
-            'id': ultimo_ingreso.id,
-            'tipo': getattr(ultimo_ingreso, 'tipo', None),
-            'monto': float(ultimo_ingreso.monto) if getattr(ultimo_ingreso, 'monto', None) is not None else None,
-            'mes': getattr(ultimo_ingreso, 'mes', None),
-            'año': getattr(ultimo_ingreso, 'año', None),
-            'estado': getattr(ultimo_ingreso, 'estado', None),
-            'justificativo': getattr(ultimo_ingreso, 'justificativo_archivo', None)
-        }
-
-    # calcular antiguedad en años (texto)
-    antig = '-'
-    if empleado.fecha_ingreso:
-        años = (date.today() - empleado.fecha_ingreso).days // 365
-        antig = f"{años} años"
-
-    data = {
-        'asistencia_mes': int(asistencia_mes),
-        'vacaciones_pendientes': int(vacaciones_pendientes) if vacaciones_pendientes is not None else 0,
-        'sanciones_activas': int(sanciones_activas),
-        'permisos_usados': int(permisos_usados),
-        'salario_base': float(empleado.salario_base) if empleado.salario_base is not None else 0,
-        'fecha_ingreso': empleado.fecha_ingreso.strftime('%Y-%m-%d') if empleado.fecha_ingreso else None,
-        'antiguedad': antig,
-        'estado': 'Activo' if getattr(empleado.estado, 'name', '').upper() == 'ACTIVO' else (empleado.estado.value if hasattr(empleado.estado, 'value') else str(empleado.estado)),
-        'email': empleado.email,
-        'telefono': empleado.telefono,
-        'resumen_hoy': resumen_hoy,
-        'ingresos_extras': {
-            'pendientes_count': int(ingresos_pending_count),
-            'pendientes_total': float(ingresos_pending_total),
-            'ultimo': ultimo
-        }
-    }
-
-    return jsonify(data)
+    return jsonify(resumen_general(empleado))
 
 @rrhh_bp.route('/empleados/<int:empleado_id>/eliminar', methods=['POST'])
 @login_required
@@ -318,21 +268,18 @@ def planillas_mtess():
     return render_template('planillas/mtess.html', current_year=hoy.year)
 
 
-@rrhh_bp.route('/planillas/mtess/download', methods=['GET'])
-@login_required
-def planillas_mtess_download():
-    tipo = request.args.get('tipo') or 'personal'
-    anio = int(request.args.get('anio') or date.today().year)
-    mes = request.args.get('mes')
-    mes = int(mes) if mes else None
+def construir_planilla_mtess(tipo, anio, mes=None):
+    """
+    Genera la planilla MTESS en memoria.
 
+    Returns:
+        (BytesIO con el .xlsx, nombre de archivo)
+    """
     wb = Workbook()
     # Remove default sheet
     default = wb.active
     wb.remove(default)
 
-    detalle_bitacora = {'tipo': tipo, 'anio': anio, 'mes': mes}
-
     if tipo == 'personal':
         ws = wb.create_sheet('Personal')
         headers = ['Nombre', 'Apellido', 'Cédula', 'Fecha Ingreso', 'Fecha Salida', 'Cargo', 'Sexo', 'Edad', 'Nacionalidad', 'Motivo Salida']
@@ -406,12 +353,26 @@ def planillas_mtess_download():
     out.seek(0)
 
     filename = f"MTESS_{tipo}_{anio}{('_%02d' % mes) if mes else ''}.xlsx"
+    return out, filename
+
+
+@rrhh_bp.route('/planillas/mtess/download', methods=['GET'])
+@login_required
+def planillas_mtess_download():
+    tipo = request.args.get('tipo') or 'personal'
+    anio = int(request.args.get('anio') or date.today().year)
+    mes = request.args.get('mes')
+    mes = int(mes) if mes else None
+
+    detalle_bitacora = {'tipo': tipo, 'anio': anio, 'mes': mes}
+
+    out, filename = construir_planilla_mtess(tipo, anio, mes)
 
     # Registrar en bitácora
     try:
         registrar_bitacora(current_user, 'planillas', 'DOWNLOAD', 'planillas_mtess', None, json.dumps(detalle_bitacora))
     except Exception as e:
-        print('Error bitacora planillas:', e)
+        registrar_evento('bitacora_planilla_error', logging.WARNING, planilla='mtess', error=str(e))
 
     return send_file(out, as_attachment=True, download_name=filename, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
 
@@ -423,54 +384,26 @@ def planillas_mtess_download():
 def planillas_ips_rei():
     """Vista para generar planilla IPS/REI (usa la empresa única del sistema)"""
     hoy = date.today()
-    empresa = Empresa.query.first()
+    empresa = empresa_actual()
     return render_template('planillas/ips_rei.html', current_year=hoy.year, empresa=empresa)
 
 
-@rrhh_bp.route('/planillas/ips-rei/download', methods=['GET'])
-@login_required
-@role_required(RoleEnum.RRHH)
-def planillas_ips_rei_download():
-    """Descargar planilla IPS/REI en formato Excel exacto"""
-    from ..ips_utils import generar_fila_planilla_ips
-
-    mes = request.args.get('mes', type=int)
-    anio = request.args.get('anio', type=int)
-
-    if not all([mes, anio]):
-        flash('Mes y año son requeridos', 'danger')
-        return redirect(url_for('rrhh.planillas_ips_rei'))
-
-    # Obtener la empresa configurada
-    empresa = Empresa.query.first()
-    if not empresa:
-        flash('No hay empresa configurada en el sistema', 'danger')
-        return redirect(url_for('rrhh.planillas_ips_rei'))
-
-    # Validar numero patronal
-    if not empresa.numero_patronal:
-        flash(f'⚠️ La empresa "{empresa.nombre}" no tiene número patronal configurado. Por favor, agregalo antes de generar la planilla.', 'danger')
-        return redirect(url_for('rrhh.planillas_ips_rei'))
-
-    # Periodo
-    periodo = f"{anio}-{mes:02d}"
-
-    # Obtener liquidaciones del mes SOLO para empleados ACTIVOS
-    liquidaciones = Liquidacion.query.filter(
+def liquidaciones_planilla_ips(periodo):
+    """Liquidaciones del período SOLO para empleados ACTIVOS (base de la planilla IPS/REI)"""
+    return Liquidacion.query.filter(
         Liquidacion.periodo == periodo,
         Liquidacion.empleado.has(Empleado.estado == EstadoEmpleadoEnum.ACTIVO)
     ).all()
 
-    if not liquidaciones:
-        flash(f'No hay liquidaciones de empleados ACTIVOS para {periodo}', 'warning')
-        return redirect(url_for('rrhh.planillas_ips_rei'))
 
-    # Validar que todos los empleados tengan ips_numero
-    empleados_sin_ips = [liq for liq in liquidaciones if not liq.empleado.ips_numero]
-    if empleados_sin_ips:
-        nombres_sin_ips = ', '.join([e.empleado.nombre_completo for e in empleados_sin_ips])
-        flash(f'⚠️ Los siguientes empleados no tienen número IPS asignado: {nombres_sin_ips}', 'warning')
-        # Continuamos de todas formas (pero mostramos la advertencia)
+def construir_planilla_ips_rei(empresa, periodo, liquidaciones):
+    """
+    Genera la planilla IPS/REI en memoria (hojas de 50 filas).
+
+    Returns:
+        (BytesIO con el .xlsx, nombre de archivo)
+    """
+    from ..ips_utils import generar_fila_planilla_ips
 
     # Crear workbook
     wb = Workbook()
@@ -544,8 +477,51 @@ def planillas_ips_rei_download():
     wb.save(out)
     out.seek(0)
 
-
     filename = f"REI_{empresa.nombre.replace(' ', '_')}_{periodo}.xlsx"
+    return out, filename
+
+
+@rrhh_bp.route('/planillas/ips-rei/download', methods=['GET'])
+@login_required
+@role_required(RoleEnum.RRHH)
+def planillas_ips_rei_download():
+    """Descargar planilla IPS/REI en formato Excel exacto"""
+    mes = request.args.get('mes', type=int)
+    anio = request.args.get('anio', type=int)
+
+    if not all([mes, anio]):
+        flash('Mes y año son requeridos', 'danger')
+        return redirect(url_for('rrhh.planillas_ips_rei'))
+
+    # Obtener la empresa configurada
+    empresa = empresa_actual()
+    if not empresa:
+        flash('No hay empresa configurada en el sistema', 'danger')
+        return redirect(url_for('rrhh.planillas_ips_rei'))
+
+    # Validar numero patronal
+    if not empresa.numero_patronal:
+        flash(f'⚠️ La empresa "{empresa.nombre}" no tiene número patronal configurado. Por favor, agregalo antes de generar la planilla.', 'danger')
+        return redirect(url_for('rrhh.planillas_ips_rei'))
+
+    # Periodo
+    periodo = f"{anio}-{mes:02d}"
+
+    # Obtener liquidaciones del mes SOLO para empleados ACTIVOS
+    liquidaciones = liquidaciones_planilla_ips(periodo)
+
+    if not liquidaciones:
+        flash(f'No hay liquidaciones de empleados ACTIVOS para {periodo}', 'warning')
+        return redirect(url_for('rrhh.planillas_ips_rei'))
+
+    # Validar que todos los empleados tengan ips_numero
+    empleados_sin_ips = [liq for liq in liquidaciones if not liq.empleado.ips_numero]
+    if empleados_sin_ips:
+        nombres_sin_ips = ', '.join([e.empleado.nombre_completo for e in empleados_sin_ips])
+        flash(f'⚠️ Los siguientes empleados no tienen número IPS asignado: {nombres_sin_ips}', 'warning')
+        # Continuamos de todas formas (pero mostramos la advertencia)
+
+    out, filename = construir_planilla_ips_rei(empresa, periodo, liquidaciones)
 
     # Registrar en bitácora
     try:
@@ -554,7 +530,7 @@ def planillas_ips_rei_download():
             None, json.dumps({'periodo': periodo})
         )
     except Exception as e:
-        print('Error bitacora planillas IPS/REI:', e)
+        registrar_evento('bitacora_planilla_error', logging.WARNING, planilla='ips_rei', error=str(e))
 
     return send_file(
         out,
@@ -611,6 +587,7 @@ def editar_empresa(empresa_id):
                 except:
                     pass
             
+            registrar_cambio_empresa()
             db.session.commit()
             
             registrar_operacion_crud(
@@ -742,10 +719,11 @@ def eliminar_cargo(cargo_id):
 @role_required(RoleEnum.RRHH)
 def ver_empresa():
     """Ver y editar datos de la empresa (configuración única)"""
-    empresa = Empresa.query.first()
+    empresa = Empresa.query.order_by(Empresa.id).first()
     if not empresa:
         empresa = Empresa(nombre='Mi Empresa')
         db.session.add(empresa)
+        registrar_cambio_empresa()
         db.session.commit()
 
     if request.method == 'POST':
@@ -793,6 +771,7 @@ def ver_empresa():
                     file.save(os.path.join(logo_path, filename))
                     empresa.logo_path = f"empresa/{filename}"
 
+            registrar_cambio_empresa()
             db.session.commit()
 
             registrar_operacion_crud(
@@ -828,150 +807,29 @@ def ver_asistencia():
     
     return render_template('rrhh/asistencia.html', asistencias=asistencias, fecha=fecha_filtro)
 
+@rrhh_bp.route('/asistencia/tablero', methods=['GET'])
+@login_required
+def tablero_presencia():
+    """Tablero de presencia en vivo (se actualiza por Server-Sent Events, sin recargar)"""
+    fecha = request.args.get('fecha', str(date.today()))
+    return render_template('rrhh/tablero_presencia.html', fecha=fecha)
 
-def _parse_time(cfg_key, default='08:30'):
-    s = current_app.config.get(cfg_key, default)
-    try:
-        return datetime.strptime(s, '%H:%M').time()
-    except Exception:
-        return datetime.strptime(default, '%H:%M').time()
-
-
-def _resumir_dia_asistencias(empleado_id, dia_date):
-    """Resumir los eventos del día y devolver dict con hora_entrada, hora_salida, presente, observaciones
-    Nivel 2: Observaciones Detalladas con información completa
+@rrhh_bp.route('/asistencia/tablero/eventos', methods=['GET'])
+@login_required
+def tablero_presencia_eventos():
     """
-    eventos = AsistenciaEvento.query.filter(
-        AsistenciaEvento.empleado_id == empleado_id,
-        func.date(AsistenciaEvento.ts) == dia_date
-    ).order_by(AsistenciaEvento.ts).all()
-
-    if not eventos:
-        return {
-            'hora_entrada': None,
-            'hora_salida': None,
-            'presente': False,
-            'observaciones': 'Ausencia injustificada - Sin marcaciones'
-        }
-
-    hora_esperada = datetime.strptime('08:00', '%H:%M').time()
-    
-    primera_entrada = None
-    ultima_salida = None
-    lunch_out = None
-    lunch_in = None
-
-    # Encontrar todos los eventos importantes
-    for ev in eventos:
-        if ev.tipo == 'in' and primera_entrada is None:
-            primera_entrada = ev.ts
-        if ev.tipo == 'out':
-            ultima_salida = ev.ts
-            # Detectar salida al almuerzo (OUT entre 11:30 y 13:30)
-            if lunch_out is None and ev.ts.time() >= datetime.strptime('11:30','%H:%M').time() and ev.ts.time() <= datetime.strptime('13:30','%H:%M').time():
-                lunch_out = ev.ts
-    
-    # Buscar entrada después del almuerzo
-    if lunch_out:
-        for ev in eventos:
-            if ev.tipo == 'in' and ev.ts > lunch_out:
-                lunch_in = ev.ts
-                break
-
-    # Construir observación detallada
-    observacion = ""
-    
-    # Caso 1: Solo marcó entrada, nunca salió
-    if primera_entrada and not ultima_salida:
-        return {
-            'hora_entrada': primera_entrada.time().strftime('%H:%M:%S'),
-            'hora_salida': None,
-            'presente': True,
-            'observaciones': 'Solo marcó entrada - Sin salida registrada'
-        }
-    
-    # Caso 2: Solo marcó salida (extraño)
-    if not primera_entrada and ultima_salida:
-        return {
-            'hora_entrada': None,
-            'hora_salida': ultima_salida.time().strftime('%H:%M:%S'),
-            'presente': False,
-            'observaciones': 'Solo marcó salida - Sin entrada registrada'
-        }
-    
-    # Calcular tardanza si llegó tarde
-    tardanza_minutos = 0
-    if primera_entrada:
-        entrada_time = primera_entrada.time()
-        if entrada_time > hora_esperada:
-            # Calcular minutos de tardanza
-            entrada_dt = datetime.combine(dia_date, entrada_time)
-            esperada_dt = datetime.combine(dia_date, hora_esperada)
-            tardanza_minutos = int((entrada_dt - esperada_dt).total_seconds() / 60)
-    
-    # Determinar tipo de asistencia
-    entrada_time = primera_entrada.time()
-    salida_time = ultima_salida.time()
-    
-    # Verificar si solo vino a la mañana (salió antes de las 13:30 y no volvió)
-    if salida_time < datetime.strptime('13:30','%H:%M').time() and not lunch_in:
-        if tardanza_minutos > 0:
-            observacion = f"Llegada tarde {tardanza_minutos} min - Solo turno mañana - No regresó"
-        else:
-            observacion = "Solo turno mañana - No regresó del almuerzo"
-    
-    # Verificar si solo vino a la tarde (entró después de 13:00)
-    elif entrada_time >= datetime.strptime('13:00','%H:%M').time():
-        horas_tarde = int((datetime.combine(dia_date, salida_time) - datetime.combine(dia_date, entrada_time)).total_seconds() / 3600)
-        observacion = f"Solo turno tarde ({horas_tarde}h)"
-    
-    # Verificar salida anticipada (salió antes de las 16:00 pero sí almorzó)
-    elif salida_time < datetime.strptime('16:00','%H:%M').time() and lunch_out and lunch_in:
-        if tardanza_minutos > 0:
-            observacion = f"Llegada tarde {tardanza_minutos} min - Salida anticipada {salida_time.strftime('%H:%M')}"
-        else:
-            observacion = f"Salida anticipada {salida_time.strftime('%H:%M')}"
-    
-    # Día completo con información de almuerzo
-    else:
-        if lunch_out and lunch_in:
-            # Calcular duración del almuerzo
-            duracion_almuerzo = int((lunch_in - lunch_out).total_seconds() / 60)
-            if duracion_almuerzo <= 60:
-                almuerzo_str = f"Almuerzo {duracion_almuerzo}min"
-            else:
-                horas = duracion_almuerzo // 60
-                minutos = duracion_almuerzo % 60
-                if minutos > 0:
-                    almuerzo_str = f"Almuerzo {horas}h {minutos}min"
-                else:
-                    almuerzo_str = f"Almuerzo {horas}h"
-            
-            if tardanza_minutos > 0:
-                observacion = f"Llegada tarde {tardanza_minutos} min - Día completo - {almuerzo_str}"
-            else:
-                observacion = f"Día completo (8h) - {almuerzo_str}"
-        else:
-            # Día completo sin registro de almuerzo
-            if tardanza_minutos > 0:
-                if tardanza_minutos >= 60:
-                    horas = tardanza_minutos // 60
-                    mins = tardanza_minutos % 60
-                    if mins > 0:
-                        observacion = f"Llegada tarde {horas}h {mins}min - Día completo"
-                    else:
-                        observacion = f"Llegada tarde {horas}h - Día completo"
-                else:
-                    observacion = f"Llegada tarde {tardanza_minutos} min - Día completo"
-            else:
-                observacion = "Día completo - Sin registro de almuerzo"
+    Flujo SSE del tablero: evento `estado` (todas las filas) al conectarse y
+    `cambio` (solo las filas modificadas) en cada marcación.
+    """
+    try:
+        fecha = datetime.strptime(request.args.get('fecha', str(date.today())), '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Fecha inválida (YYYY-MM-DD)'}), 400
 
-    return {
-        'hora_entrada': primera_entrada.time().strftime('%H:%M:%S') if primera_entrada else None,
-        'hora_salida': ultima_salida.time().strftime('%H:%M:%S') if ultima_salida else None,
-        'presente': True,
-        'observaciones': observacion
-    }
+    # El generador usa el engine y no el contexto: la sesión de este request se libera al empezar el flujo
+    flujo = flujo_presencia(db.engine, fecha, request.headers.get('Last-Event-ID'))
+    return Response(flujo, mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 
 def cerrar_asistencias_automatico(fecha_cierre=None):
@@ -988,108 +846,23 @@ def cerrar_asistencias_automatico(fecha_cierre=None):
     Returns:
         dict con estadísticas de procesamiento
     """
-    from app.models import Empleado, EstadoEmpleadoEnum, Vacacion, EstadoVacacionEnum, Permiso, EstadoPermisoEnum
-    
     if fecha_cierre is None:
         fecha_cierre = date.today()
     
-    # Solo procesar días laborales (lunes a sábado)
-    if fecha_cierre.weekday() == 6:  # Domingo = 6
+    # Solo procesar días hábiles (calendario laboral: fines de semana y feriados se omiten)
+    if not es_dia_habil(fecha_cierre):
         return {
             'procesados': 0,
-            'mensaje': f'Domingo {fecha_cierre} no es día laboral (omitido)',
+            'mensaje': f'{fecha_cierre} no es día hábil (omitido)',
             'vacaciones': 0,
             'permisos': 0,
             'ausencias': 0
         }
     
-    # Obtener empleados activos
-    empleados_activos = Empleado.query.filter_by(
-        estado=EstadoEmpleadoEnum.ACTIVO
-    ).all()
-    
-    stats = {
-        'procesados': 0,
-        'vacaciones': 0,
-        'permisos': 0,
-        'ausencias': 0,
-        'ya_registrados': 0
-    }
-    
-    for empleado in empleados_activos:
-        # Saltar si ingresó después de la fecha de cierre
-        if empleado.fecha_ingreso and empleado.fecha_ingreso > fecha_cierre:
-            continue
-        
-        # Saltar si salió antes de la fecha de cierre
-        if empleado.fecha_salida and empleado.fecha_salida < fecha_cierre:
-            continue
-        
-        # Verificar si ya tiene asistencia registrada
-        asistencia_existe = Asistencia.query.filter_by(
-            empleado_id=empleado.id,
-            fecha=fecha_cierre
-        ).first()
-        
-        if asistencia_existe:
-            stats['ya_registrados'] += 1
-            continue
-        
-        # 1. Verificar vacaciones aprobadas
-        vacacion = Vacacion.query.filter(
-            Vacacion.empleado_id == empleado.id,
-            Vacacion.estado == EstadoVacacionEnum.APROBADA,
-            Vacacion.fecha_inicio_solicitud <= fecha_cierre,
-            Vacacion.fecha_fin_solicitud >= fecha_cierre
-        ).first()
-        
-        if vacacion:
-            asistencia = Asistencia(
-                empleado_id=empleado.id,
-                fecha=fecha_cierre,
-                presente=True,  # Vacaciones cuentan como día trabajado
-                observaciones='Vacaciones (auto-generado)',
-                justificacion_estado=None  # No requiere justificación
-            )
-            db.session.add(asistencia)
-            stats['vacaciones'] += 1
-            stats['procesados'] += 1
-            continue
-        
-        # 2. Verificar permisos aprobados
-        permiso = Permiso.query.filter(
-            Permiso.empleado_id == empleado.id,
-            Permiso.estado.in_([EstadoPermisoEnum.APROBADO, EstadoPermisoEnum.COMPLETADO]),
-            Permiso.fecha_inicio <= fecha_cierre,
-            Permiso.fecha_fin >= fecha_cierre
-        ).first()
-        
-        if permiso:
-            asistencia = Asistencia(
-                empleado_id=empleado.id,
-                fecha=fecha_cierre,
-                presente=True,  # Permiso cuenta como presente (si es remunerado)
-                observaciones=f'Permiso: {permiso.motivo} (auto-generado)',
-                justificacion_estado=None  # No requiere justificación
-            )
-            db.session.add(asistencia)
-            stats['permisos'] += 1
-            stats['procesados'] += 1
-            continue
-        
-        # 3. Sin marcación ni justificación = Ausencia pendiente de justificar
-        asistencia = Asistencia(
-            empleado_id=empleado.id,
-            fecha=fecha_cierre,
-            presente=False,
-            observaciones='Ausencia sin marcación (auto-generado)',
-            justificacion_estado='PENDIENTE'  # Requiere decisión de RRHH
-        )
-        db.session.add(asistencia)
-        stats['ausencias'] += 1
-        stats['procesados'] += 1
-    
+    stats = {'procesados': 0, 'vacaciones': 0, 'permisos': 0, 'ausencias': 0, 'ya_registrados': 0}
     try:
+        # Vacaciones, permisos y ausencias con un INSERT ... SELECT cada uno
+        stats = cerrar_dia(fecha_cierre)
         db.session.commit()
         stats['mensaje'] = f'Asistencias del {fecha_cierre} cerradas exitosamente'
     except Exception as e:
@@ -1122,51 +895,95 @@ def registrar_asistencia():
         
         # Hora límite de cierre (17:30)
         hora_cierre = datetime.strptime('17:30', '%H:%M').time()
+        origen = request.json.get('origen', 'web')
+
+        for intento in range(2):
+            # Fila del día con el estado de marcaciones (bloqueada hasta el commit)
+            asistencia = fila_del_dia(empleado.id, hoy)
+
+            # Inferir tipo si no se pasa explícitamente
+            tipo = request.json.get('tipo')
+            if tipo not in ('in', 'out'):
+                tipo = inferir_tipo(asistencia)
+
+            # Validar: después de 17:30 solo se permite salida, NO entrada
+            if hora_actual > hora_cierre and tipo == 'in':
+                db.session.rollback()
+                return jsonify({
+                    'success': False, 
+                    'message': f'No se permite marcar entrada después de las 17:30. Hora actual: {hora_actual.strftime("%H:%M")}'
+                }), 403
+
+            # Evento, fila diaria y bitácora en una sola transacción (el dispositivo, dentro: un rollback lo descarta)
+            dispositivo_id = id_dispositivo(origen, request.remote_addr, request.headers.get('User-Agent'))
+            evento, resumen = registrar_marcacion(asistencia, ahora, tipo, origen, dispositivo_id)
+            try:
+                db.session.flush()
+                agregar_bitacora(current_user, 'asistencia', 'CREATE', 'asistencias', asistencia.id,
+                                 str({'empleado_codigo': codigo, 'evento_id': evento.id, 'tipo_evento': tipo}))
+                db.session.commit()
+                break
+            except IntegrityError:
+                # Otra marcación simultánea creó la fila del día: reintentar sobre ella
+                db.session.rollback()
+                if intento:
+                    raise
 
-        # Inferir tipo si no se pasa explícitamente
-        tipo = request.json.get('tipo')
-        eventos_count = AsistenciaEvento.query.filter(
-            AsistenciaEvento.empleado_id == empleado.id,
-            func.date(AsistenciaEvento.ts) == hoy
-        ).count()
-        if tipo not in ('in', 'out'):
-            tipo = 'in' if eventos_count % 2 == 0 else 'out'
-        
-        # Validar: después de 17:30 solo se permite salida, NO entrada
-        if hora_actual > hora_cierre and tipo == 'in':
-            return jsonify({
-                'success': False, 
-                'message': f'No se permite marcar entrada después de las 17:30. Hora actual: {hora_actual.strftime("%H:%M")}'
-            }), 403
-
-        evento = AsistenciaEvento(
-            empleado_id=empleado.id,
-            ts=ahora,
-            tipo=tipo,
-            origen=request.json.get('origen', 'web'),
-            detalles=json.dumps({'ip': request.remote_addr, 'user_agent': request.headers.get('User-Agent')})
-        )
-        db.session.add(evento)
-        db.session.commit()
-
-        # Recalcular y almacenar resumen diario
-        resumen = _resumir_dia_asistencias(empleado.id, hoy)
+        return jsonify({'success': True, 'message': f'Evento {tipo} registrado para {empleado.nombre_completo}', 'tipo': tipo, 'hora': ahora.strftime('%H:%M:%S'), 'resumen': resumen_a_json(resumen)})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'}), 500
 
-        asistencia = Asistencia.query.filter_by(empleado_id=empleado.id, fecha=hoy).first()
-        if not asistencia:
-            asistencia = Asistencia(empleado_id=empleado.id, fecha=hoy)
-            db.session.add(asistencia)
+def _dispositivo_autorizado(token):
+    """True si `token` es uno de MARCACIONES_TOKENS (comparación en tiempo constante)."""
+    return any(hmac.compare_digest(token, valido) for valido in current_app.config.get('MARCACIONES_TOKENS', ()))
 
-        asistencia.hora_entrada = resumen.get('hora_entrada')
-        asistencia.hora_salida = resumen.get('hora_salida')
-        asistencia.presente = resumen.get('presente', True)
-        asistencia.observaciones = resumen.get('observaciones')
-        db.session.commit()
+@rrhh_bp.route('/asistencia/marcaciones/lote', methods=['POST'])
+def importar_marcaciones_lote():
+    """
+    Importa un lote de marcaciones de relojes biométricos con la hora del dispositivo.
+    Acepta JSON (lista de {codigo, ts, tipo, device_id}), un cuerpo text/csv o un
+    archivo CSV/JSON en el campo 'archivo'. ?dispositivo= se usa para las filas sin device_id.
 
+    Los relojes se autentican con el header X-Dispositivo-Token (MARCACIONES_TOKENS).
+    Sin token hace falta una sesión RRHH y el token CSRF (campo csrf_token o header X-CSRFToken);
+    la ruta está exenta del CSRF global para que los relojes puedan enviar sin sesión.
+    """
+    token = request.headers.get('X-Dispositivo-Token')
+    if token is not None:
+        if not _dispositivo_autorizado(token):
+            return jsonify({'success': False, 'message': 'Token de dispositivo inválido'}), 401
+        usuario = None
+    else:
+        if not current_user.is_authenticated:
+            return current_app.login_manager.unauthorized()
+        if current_user.rol != RoleEnum.RRHH:
+            return jsonify({'success': False, 'message': 'No tienes permiso para acceder a este módulo'}), 403
+        if current_app.config.get('WTF_CSRF_ENABLED', True):
+            current_app.extensions['csrf'].protect()
+        usuario = current_user
+
+    archivo = request.files.get('archivo')
+    if archivo:
+        contenido = archivo.read().decode('utf-8-sig')
+        formato = 'json' if archivo.filename.lower().endswith('.json') else 'csv'
+    elif request.is_json:
+        contenido, formato = request.get_data(as_text=True), 'json'
+    else:
+        contenido, formato = request.get_data(as_text=True), 'csv'
 
-        registrar_operacion_crud(current_user, 'asistencia', 'CREATE', 'asistencias', asistencia.id, {'empleado_codigo': codigo, 'evento_id': evento.id, 'tipo_evento': tipo})
+    try:
+        filas = leer_marcaciones(contenido, formato)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': f'Lote inválido: {e}'}), 400
 
-        return jsonify({'success': True, 'message': f'Evento {tipo} registrado para {empleado.nombre_completo}', 'tipo': tipo, 'hora': ahora.strftime('%H:%M:%S'), 'resumen': resumen})
+    try:
+        resultado = importar_marcaciones(filas, request.args.get('dispositivo'))
+        if usuario is not None:
+            agregar_bitacora(usuario, 'asistencia', 'CREATE', 'asistencia_eventos', detalle=str(
+                {k: resultado[k] for k in ('aceptadas', 'duplicadas', 'rechazadas', 'dias_recalculados')}))
+        db.session.commit()
+        return jsonify({'success': True, **resultado})
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'message': f'Error: {str(e)}'}), 500
@@ -1789,67 +1606,6 @@ def crear_ingreso_extra():
     return render_template('rrhh/ingreso_extra_form.html', empleado=empleado, periodo_default=periodo_default, empleados=empleados)
 
 
-def _compute_horas_extra_for_month(empleado, year, month):
-    """Detecta horas extra desde AsistenciaEvento y crea/actualiza registros en HorasExtra."""
-    from calendar import monthrange
-    empresa = Empresa.query.first()
-    dias_habiles = empresa.dias_habiles_mes if empresa and empresa.dias_habiles_mes else 30
-    horas_jornada = 8
-    # fin jornada por defecto: 17:00
-    fin_jornada_hour = 17
-
-    primer_dia = date(year, month, 1)
-    ultimo_dia = date(year, month, monthrange(year, month)[1])
-
-    # obtener eventos out por día
-    curr = primer_dia
-    created = []
-    while curr <= ultimo_dia:
-        # solo considerar días laborales (lunes-viernes)
-        if curr.weekday() < 5:
-            # buscar último evento 'out' de ese día
-            ev = AsistenciaEvento.query.filter(
-                AsistenciaEvento.empleado_id == empleado.id,
-                func.date(AsistenciaEvento.ts) == curr,
-                AsistenciaEvento.tipo == 'out'
-            ).order_by(AsistenciaEvento.ts.desc()).first()
-
-            if ev:
-                # calcular diferencia en horas
-                fecha_fin_jornada = datetime(curr.year, curr.month, curr.day, fin_jornada_hour, 0, 0)
-                if ev.ts > fecha_fin_jornada:
-                    delta = ev.ts - fecha_fin_jornada
-                    horas_decimal = round(delta.total_seconds() / 3600.0, 4)
-
-                    # calcular monto
-                    salario_hora = float(empleado.salario_base) / float(dias_habiles) / float(horas_jornada)
-                    multiplicador = 1.5
-                    monto = round(horas_decimal * salario_hora * multiplicador)
-
-                    # crear o actualizar registro HorasExtra
-                    he = HorasExtra.query.filter_by(empleado_id=empleado.id, fecha=curr).first()
-                    if he:
-                        he.horas = horas_decimal
-                        he.monto_calculado = monto
-                        he.origen = 'asistencia'
-                    else:
-                        he = HorasExtra(
-                            empleado_id=empleado.id,
-                            fecha=curr,
-                            horas=horas_decimal,
-                            monto_calculado=monto,
-                            origen='asistencia',
-                            estado='PENDIENTE'
-                        )
-                        db.session.add(he)
-                        created.append(he)
-        curr = curr + timedelta(days=1)
-
-    if created:
-        db.session.commit()
-    return True
-
-
 @rrhh_bp.route('/api/ingresos-extras/employees', methods=['GET'])
 @login_required
 def api_ingresos_extras_employees():
@@ -1862,15 +1618,13 @@ def api_ingresos_extras_employees():
     for e in empleados:
         total_horas = db.session.query(func.coalesce(func.sum(HorasExtra.horas), 0)).filter(
             HorasExtra.empleado_id == e.id,
-            func.extract('year', HorasExtra.fecha) == año,
-            func.extract('month', HorasExtra.fecha) == mes,
+            en_mes(HorasExtra.fecha, año, mes),
             HorasExtra.estado == 'PENDIENTE'
         ).scalar() or 0
 
         pendientes = db.session.query(func.count(HorasExtra.id)).filter(
             HorasExtra.empleado_id == e.id,
-            func.extract('year', HorasExtra.fecha) == año,
-            func.extract('month', HorasExtra.fecha) == mes,
+            en_mes(HorasExtra.fecha, año, mes),
             HorasExtra.estado == 'PENDIENTE'
         ).scalar() or 0
 
@@ -1889,12 +1643,12 @@ def api_empleado_horas_extras(empleado_id):
     empleado = Empleado.query.get_or_404(empleado_id)
 
     # intentar detectar/crear registros desde eventos de asistencia
-    _compute_horas_extra_for_month(empleado, año, mes)
+    detectar_horas_extra(año, mes, [empleado.id])
+    db.session.commit()
 
     horas = HorasExtra.query.filter(
         HorasExtra.empleado_id == empleado_id,
-        func.extract('year', HorasExtra.fecha) == año,
-        func.extract('month', HorasExtra.fecha) == mes
+        en_mes(HorasExtra.fecha, año, mes)
     ).order_by(HorasExtra.fecha.desc()).all()
 
     items = []
@@ -1947,8 +1701,12 @@ def rechazar_hora_extra(hora_id):
 def preview_liquidacion(periodo):
     """Pre-visualización de liquidación antes de generar"""
     try:
-        año, mes = map(int, periodo.split('-'))
-        empleados = Empleado.query.filter_by(estado=EstadoEmpleadoEnum.ACTIVO).all()
+        # Por defecto, cálculo vectorial en guaraníes enteros (coincide al guaraní con el Decimal)
+        if preview_vectorial is not None and request.args.get('modo') != 'decimal':
+            return jsonify(preview_vectorial(periodo))
+        
+        # Mismo motor que generar_liquidacion: la vista previa coincide con la generación
+        calculo = calcular_liquidaciones_periodo(periodo, incluir_liquidados=True)
         
         preview_data = []
         totales = {
@@ -1961,69 +1719,30 @@ def preview_liquidacion(periodo):
             'neto': Decimal('0')
         }
         
-        for empleado in empleados:
-            # Calcular días presentes
-            dias_presentes = db.session.query(func.count(Asistencia.id)).filter(
-                Asistencia.empleado_id == empleado.id,
-                func.extract('month', Asistencia.fecha) == mes,
-                func.extract('year', Asistencia.fecha) == año,
-                Asistencia.presente == True
-            ).scalar() or 0
-            
-            salario_proporcional = (empleado.salario_base / 30) * dias_presentes
-            
-            # Ingresos extras
-            ingresos = db.session.query(func.coalesce(func.sum(IngresoExtra.monto), 0)).filter(
-                IngresoExtra.empleado_id == empleado.id,
-                IngresoExtra.mes == mes,
-                IngresoExtra.año == año,
-                IngresoExtra.estado == 'APROBADO',
-                IngresoExtra.aplicado == False
-            ).scalar() or Decimal('0')
-            
-            # Bonificación
-            bonificacion = calcular_bonificacion_familiar(empleado.id, date(año, mes, 1))
-            
-            # Descuentos
-            descuentos = db.session.query(func.sum(Descuento.monto)).filter(
-                Descuento.empleado_id == empleado.id,
-                Descuento.mes == mes,
-                Descuento.año == año
-            ).scalar() or Decimal('0')
-            
-            # Anticipos
-            anticipos = db.session.query(func.sum(Anticipo.monto)).filter(
-                Anticipo.empleado_id == empleado.id,
-                func.extract('month', Anticipo.fecha_aprobacion) == mes,
-                func.extract('year', Anticipo.fecha_aprobacion) == año,
-                Anticipo.aprobado == True,
-                Anticipo.aplicado == False
-            ).scalar() or Decimal('0')
-            
-            descuentos_total = descuentos + anticipos
-            ips = (salario_proporcional + ingresos + bonificacion) * Decimal('0.09625')
-            neto = salario_proporcional + ingresos + bonificacion - descuentos_total - ips
+        for r in calculo['resultados']:
+            # 'descuentos' excluye anticipos, que se informan por separado
+            descuentos = r['descuentos'] - r['descuento_anticipos']
             
             preview_data.append({
-                'codigo': empleado.codigo,
-                'nombre': empleado.nombre_completo,
-                'dias': dias_presentes,
-                'salario': float(salario_proporcional),
-                'bonificacion': float(bonificacion),
-                'ingresos': float(ingresos),
+                'codigo': r['empleado'].codigo,
+                'nombre': r['empleado'].nombre_completo,
+                'dias': r['dias_presentes'],
+                'salario': float(r['salario_base']),
+                'bonificacion': float(r['bonificacion_familiar']),
+                'ingresos': float(r['ingresos_extras']),
                 'descuentos': float(descuentos),
-                'anticipos': float(anticipos),
-                'ips': float(ips),
-                'neto': float(neto)
+                'anticipos': float(r['descuento_anticipos']),
+                'ips': float(r['aporte_ips']),
+                'neto': float(r['salario_neto'])
             })
             
-            totales['salarios'] += salario_proporcional
-            totales['bonificaciones'] += bonificacion
-            totales['ingresos'] += ingresos
+            totales['salarios'] += r['salario_base']
+            totales['bonificaciones'] += r['bonificacion_familiar']
+            totales['ingresos'] += r['ingresos_extras']
             totales['descuentos'] += descuentos
-            totales['anticipos'] += anticipos
-            totales['ips'] += ips
-            totales['neto'] += neto
+            totales['anticipos'] += r['descuento_anticipos']
+            totales['ips'] += r['aporte_ips']
+            totales['neto'] += r['salario_neto']
         
         return jsonify({
             'periodo': periodo,
@@ -2081,92 +1800,31 @@ def anticipos_pendientes():
 @login_required
 @role_required(RoleEnum.RRHH)
 def metricas_asistencias():
-    """Dashboard de métricas de asistencias"""
+    """
+    Dashboard de métricas de asistencias. Por defecto el mes (?mes=&year=);
+    filtros opcionales: desde y hasta (YYYY-MM-DD), cargo_id y empleados (ids separados por coma).
+    """
     mes = request.args.get('mes', date.today().month, type=int)
     año = request.args.get('year', date.today().year, type=int)
-    
-    # Calcular días hábiles del mes
-    import calendar
-    primer_dia = date(año, mes, 1)
-    ultimo_dia = date(año, mes, calendar.monthrange(año, mes)[1])
-    
-    dias_habiles = 0
-    fecha_actual = primer_dia
-    while fecha_actual <= ultimo_dia:
-        if fecha_actual.weekday() < 5:  # Lunes a viernes
-            dias_habiles += 1
-        fecha_actual += timedelta(days=1)
-    
-    # Métricas por empleado
-    empleados = Empleado.query.filter_by(estado=EstadoEmpleadoEnum.ACTIVO).all()
-    metricas = []
-    
-    for empleado in empleados:
-        dias_presentes = db.session.query(func.count(Asistencia.id)).filter(
-            Asistencia.empleado_id == empleado.id,
-            func.extract('month', Asistencia.fecha) == mes,
-            func.extract('year', Asistencia.fecha) == año,
-            Asistencia.presente == True
-        ).scalar() or 0
-        
-        ausencias = db.session.query(func.count(Asistencia.id)).filter(
-            Asistencia.empleado_id == empleado.id,
-            func.extract('month', Asistencia.fecha) == mes,
-            func.extract('year', Asistencia.fecha) == año,
-            Asistencia.presente == False
-        ).scalar() or 0
-        
-        ausencias_justificadas = db.session.query(func.count(Asistencia.id)).filter(
-            Asistencia.empleado_id == empleado.id,
-            func.extract('month', Asistencia.fecha) == mes,
-            func.extract('year', Asistencia.fecha) == año,
-            Asistencia.presente == False,
-            Asistencia.justificacion_estado == 'JUSTIFICADO'
-        ).scalar() or 0
-        
-        ausencias_injustificadas = db.session.query(func.count(Asistencia.id)).filter(
-            Asistencia.empleado_id == empleado.id,
-            func.extract('month', Asistencia.fecha) == mes,
-            func.extract('year', Asistencia.fecha) == año,
-            Asistencia.presente == False,
-            Asistencia.justificacion_estado == 'INJUSTIFICADO'
-        ).scalar() or 0
-        
-        tasa_asistencia = (dias_presentes / dias_habiles * 100) if dias_habiles > 0 else 0
-        
-        metricas.append({
-            'empleado_id': empleado.id,
-            'codigo': empleado.codigo,
-            'nombre': empleado.nombre_completo,
-            'dias_presentes': dias_presentes,
-            'ausencias_totales': ausencias,
-            'ausencias_justificadas': ausencias_justificadas,
-            'ausencias_injustificadas': ausencias_injustificadas,
-            'tasa_asistencia': round(tasa_asistencia, 2)
-        })
-    
-    # Ordenar por ausencias injustificadas (mayor a menor)
-    metricas.sort(key=lambda x: x['ausencias_injustificadas'], reverse=True)
-    
-    # Resumen general
-    total_presentes = sum(m['dias_presentes'] for m in metricas)
-    total_ausencias = sum(m['ausencias_totales'] for m in metricas)
-    total_justificadas = sum(m['ausencias_justificadas'] for m in metricas)
-    total_injustificadas = sum(m['ausencias_injustificadas'] for m in metricas)
-    
-    return jsonify({
-        'periodo': f'{año}-{mes:02d}',
-        'dias_habiles': dias_habiles,
-        'empleados': metricas,
-        'resumen': {
-            'total_empleados': len(metricas),
-            'total_presentes': total_presentes,
-            'total_ausencias': total_ausencias,
-            'total_justificadas': total_justificadas,
-            'total_injustificadas': total_injustificadas,
-            'tasa_general': round((total_presentes / (len(metricas) * dias_habiles) * 100) if dias_habiles > 0 and len(metricas) > 0 else 0, 2)
-        }
-    })
+    try:
+        if request.args.get('desde') or request.args.get('hasta'):
+            desde = datetime.strptime(request.args['desde'], '%Y-%m-%d').date()
+            hasta = datetime.strptime(request.args['hasta'], '%Y-%m-%d').date()
+            periodo = f'{desde}/{hasta}'
+        else:
+            desde, fin = rango_mes(año, mes)
+            hasta = fin - timedelta(days=1)
+            periodo = f'{año}-{mes:02d}'
+        empleados = request.args.get('empleados')
+        empleado_ids = [int(i) for i in empleados.split(',') if i.strip()] if empleados else None
+    except (KeyError, ValueError):
+        return jsonify({'success': False, 'message': 'Parámetros inválidos: desde/hasta (YYYY-MM-DD) y empleados (ids)'}), 400
+    if hasta < desde:
+        return jsonify({'success': False, 'message': 'hasta debe ser posterior a desde'}), 400
+
+    # Una consulta agrupada (SUM(CASE ...)) por rango de fechas, cacheada hasta que cambien esas asistencias
+    resultado = calcular_metricas_asistencias(desde, hasta, request.args.get('cargo_id', type=int), empleado_ids)
+    return jsonify({'periodo': periodo, **resultado})
 
 @rrhh_bp.route('/liquidaciones/generar', methods=['GET', 'POST'])
 @login_required
@@ -2174,216 +1832,34 @@ def metricas_asistencias():
 def generar_liquidacion():
     """Generar liquidaciones para un período"""
     if request.method == 'POST':
+        periodo = request.form.get('periodo')  # YYYY-MM
+        tiempos = Tiempos()
         try:
-            periodo = request.form.get('periodo')  # YYYY-MM
-            año, mes = map(int, periodo.split('-'))
+            # Agregados agrupados por tabla; con NOMINA_PROCESOS > 1 se reparte por rangos de id
+            calculo = calcular_liquidaciones_periodo_paralelo(periodo, tiempos=tiempos)
             
-            # Obtener todos los empleados activos
-            empleados = Empleado.query.filter_by(estado=EstadoEmpleadoEnum.ACTIVO).all()
+            for advertencia in calculo['advertencias']:
+                flash(f'Advertencia: {advertencia}', 'warning')
             
-            contador = 0
-            for empleado in empleados:
-                # Evitar duplicados
-                liquidacion_existente = Liquidacion.query.filter_by(
-                    empleado_id=empleado.id,
-                    periodo=periodo
-                ).first()
-                
-                if liquidacion_existente:
-                    continue
-                
-                # ========================================
-                # CALCULAR DÍAS TRABAJADOS DESDE ASISTENCIAS
-                # ========================================
-                dias_presentes = db.session.query(func.count(Asistencia.id)).filter(
-                    Asistencia.empleado_id == empleado.id,
-                    func.extract('month', Asistencia.fecha) == mes,
-                    func.extract('year', Asistencia.fecha) == año,
-                    Asistencia.presente == True
-                ).scalar() or 0
-                
-                # Calcular días hábiles teóricos del mes (lunes a viernes)
-                import calendar
-                primer_dia = date(año, mes, 1)
-                ultimo_dia = date(año, mes, calendar.monthrange(año, mes)[1])
-                
-                dias_habiles_teoricos = 0
-                fecha_actual = primer_dia
-                while fecha_actual <= ultimo_dia:
-                    if fecha_actual.weekday() < 5:  # Lunes a viernes
-                        dias_habiles_teoricos += 1
-                    fecha_actual += timedelta(days=1)
-                
-                # ========================================
-                # CALCULAR AUSENCIAS REALES
-                # NUEVO ENFOQUE: presente=True incluye presentes, vacaciones, permisos con goce
-                # Solo descontamos días marcados como presente=False
-                # ========================================
-                dias_ausentes_sin_justificar = dias_habiles_teoricos - dias_presentes
-                descuento_por_ausencias = Decimal('0')
-                
-                if dias_ausentes_sin_justificar > 0:
-                    salario_diario_temp = empleado.salario_base / Decimal(str(dias_habiles_teoricos))
-                    descuento_por_ausencias = salario_diario_temp * Decimal(str(dias_ausentes_sin_justificar))
-                
-                # ========================================
-                # VALIDACIÓN: Días presentes no puede superar días hábiles
-                # ========================================
-                if dias_presentes > dias_habiles_teoricos:
-                    print(f"⚠️ ALERTA: Empleado {empleado.codigo} tiene {dias_presentes} días presentes pero solo hay {dias_habiles_teoricos} días hábiles")
-                    flash(f'Advertencia: {empleado.nombre_completo} tiene inconsistencia en asistencias ({dias_presentes} > {dias_habiles_teoricos})', 'warning')
-                
-                # ========================================
-                # CALCULAR SALARIO BASE (COMPLETO - vacaciones no se descuentan)
-                # ========================================
-                print(f"\n{'='*60}")
-                print(f"📊 LIQUIDACIÓN: {empleado.codigo} - {empleado.nombre_completo}")
-                print(f"{'='*60}")
-                
-                salario_diario = empleado.salario_base / Decimal(str(dias_habiles_teoricos))
-                
-                print(f"💰 Salario base mensual: ₲{empleado.salario_base:,.2f}")
-                print(f"📅 Días hábiles del mes: {dias_habiles_teoricos}")
-                print(f"✅ Días presentes (incluye vacaciones y permisos): {dias_presentes}")
-                print(f"❌ Ausencias sin justificar: {dias_ausentes_sin_justificar}")
-                print(f"💵 Salario diario: ₲{salario_diario:,.2f}")
-                if descuento_por_ausencias > 0:
-                    print(f"➖ Descuento por ausencias: ₲{descuento_por_ausencias:,.2f}")
-                
-                # Salario base = salario completo (no se ajusta por ausencias aquí)
-                salario_base_ajustado = empleado.salario_base
-                
-                # Calcular ingresos extras: incluir solo ingresos manuales APROBADOS y horas extra APROBADAS
-                ingresos_extras = db.session.query(func.coalesce(func.sum(IngresoExtra.monto), 0)).filter(
-                    IngresoExtra.empleado_id == empleado.id,
-                    IngresoExtra.mes == mes,
-                    IngresoExtra.año == año,
-                    IngresoExtra.estado == 'APROBADO',
-                    IngresoExtra.aplicado == False
-                ).scalar() or Decimal('0')
-
-                # Sumar horas extra aprobadas y no aplicadas
-                horas_extra_total = db.session.query(func.coalesce(func.sum(HorasExtra.monto_calculado), 0)).filter(
-                    HorasExtra.empleado_id == empleado.id,
-                    func.extract('year', HorasExtra.fecha) == año,
-                    func.extract('month', HorasExtra.fecha) == mes,
-                    HorasExtra.estado == 'APROBADO',
-                    HorasExtra.aplicado == False
-                ).scalar() or Decimal('0')
-
-                # Asegurar Decimal y sumar
-                ingresos_extras = Decimal(str(ingresos_extras)) + Decimal(str(horas_extra_total))
-                print(f"➕ Ingresos extras: ₲{ingresos_extras:,.2f}")
-                
-                # Calcular descuentos manuales
-                descuentos_manuales = db.session.query(func.sum(Descuento.monto)).filter(
-                    Descuento.empleado_id == empleado.id,
-                    Descuento.mes == mes,
-                    Descuento.año == año
-                ).scalar() or Decimal('0')
-                print(f"➖ Descuentos manuales: ₲{descuentos_manuales:,.2f}")
-                
-                # 🆕 CRÍTICO: Calcular anticipos aprobados del mes que no se han aplicado
-                anticipos_mes = db.session.query(func.sum(Anticipo.monto)).filter(
-                    Anticipo.empleado_id == empleado.id,
-                    func.extract('month', Anticipo.fecha_aprobacion) == mes,
-                    func.extract('year', Anticipo.fecha_aprobacion) == año,
-                    Anticipo.aprobado == True,
-                    Anticipo.aplicado == False
-                ).scalar() or Decimal('0')
-                print(f"➖ Anticipos del mes: ₲{anticipos_mes:,.2f}")
-                
-                # 🆕 Calcular sanciones con monto del mes
-                sanciones_mes = db.session.query(func.sum(Sancion.monto)).filter(
-                    Sancion.empleado_id == empleado.id,
-                    func.extract('month', Sancion.fecha) == mes,
-                    func.extract('year', Sancion.fecha) == año
-                ).scalar() or Decimal('0')
-                print(f"➖ Sanciones del mes: ₲{sanciones_mes:,.2f}")
-                
-                # Sumar TODOS los descuentos (incluye ausencias)
-                descuentos_totales = descuentos_manuales + anticipos_mes + sanciones_mes + descuento_por_ausencias
-                print(f"➖ TOTAL DESCUENTOS: ₲{descuentos_totales:,.2f}")
-                
-                # Calcular bonificación familiar
-                fecha_liquidacion = date(año, mes, 1)
-                bonificacion_familiar = calcular_bonificacion_familiar(empleado.id, fecha_liquidacion)
-                print(f"👨‍👩‍👧 Bonificación familiar: ₲{bonificacion_familiar:,.2f}")
-                
-                # Calcular aporte IPS (9.625% sobre salario ajustado + ingresos extras + bonificación)
-                aporte_ips = (salario_base_ajustado + ingresos_extras + bonificacion_familiar) * Decimal('0.09625')
-                print(f"🏦 Aporte IPS (9.625%): ₲{aporte_ips:,.2f}")
-                
-                # Calcular salario neto (USAR descuentos_totales)
-                salario_neto = salario_base_ajustado + ingresos_extras + bonificacion_familiar - descuentos_totales - aporte_ips
-                print(f"{'='*60}")
-                print(f"💵 SALARIO NETO: ₲{salario_neto:,.2f}")
-                print(f"{'='*60}\n")
-                
-                # Crear liquidación (USAR descuentos_totales)
-                liquidacion = Liquidacion(
-                    empleado_id=empleado.id,
-                    periodo=periodo,
-                    salario_base=salario_base_ajustado,  # Salario ajustado a días trabajados
-                    ingresos_extras=ingresos_extras,
-                    bonificacion_familiar=bonificacion_familiar,
-                    descuentos=descuentos_totales,  # ← CRÍTICO: Incluye anticipos
-                    aporte_ips=aporte_ips,
-                    salario_neto=salario_neto,
-                    dias_trabajados=dias_presentes,
-                    # Desglose de descuentos
-                    descuento_ausencias=descuento_por_ausencias,
-                    descuento_anticipos=anticipos_mes,
-                    descuento_sanciones=sanciones_mes,
-                    descuento_otros=descuentos_manuales
-                )
-                
-                db.session.add(liquidacion)
-
-                # Marcar los IngresoExtra aplicados (APROBADOS y no aplicados)
-                ingresos_a_aplicar = IngresoExtra.query.filter_by(
-                    empleado_id=empleado.id,
-                    mes=mes,
-                    año=año,
-                    estado='APROBADO',
-                    aplicado=False
-                ).all()
-                for ie in ingresos_a_aplicar:
-                    ie.aplicado = True
-                    ie.fecha_aplicacion = datetime.utcnow()
-
-                # Marcar HorasExtra aplicadas (APROBADO y no aplicadas)
-                horas_a_aplicar = HorasExtra.query.filter(
-                    HorasExtra.empleado_id == empleado.id,
-                    func.extract('year', HorasExtra.fecha) == año,
-                    func.extract('month', HorasExtra.fecha) == mes,
-                    HorasExtra.estado == 'APROBADO',
-                    HorasExtra.aplicado == False
-                ).all()
-                for he in horas_a_aplicar:
-                    he.aplicado = True
-                    he.fecha_aplicacion = datetime.utcnow()
-                
-                # 🆕 CRÍTICO: Marcar anticipos como aplicados
-                anticipos_a_aplicar = Anticipo.query.filter(
-                    Anticipo.empleado_id == empleado.id,
-                    func.extract('month', Anticipo.fecha_aprobacion) == mes,
-                    func.extract('year', Anticipo.fecha_aprobacion) == año,
-                    Anticipo.aprobado == True,
-                    Anticipo.aplicado == False
-                ).all()
-                for anticipo in anticipos_a_aplicar:
-                    anticipo.aplicado = True
-                    anticipo.fecha_aplicacion = date(año, mes, 1)
-                    print(f"✅ Anticipo ID {anticipo.id} marcado como aplicado")
-
-                contador += 1
+            # Inserción en bloque + IngresoExtra, HorasExtra y Anticipos marcados como aplicados
+            afectadas = guardar_liquidaciones(periodo, calculo['resultados'], tiempos)
+            contador = len(calculo['resultados'])
+            if afectadas['liquidaciones'] != contador:
+                raise RuntimeError(f"Se insertaron {afectadas['liquidaciones']} de {contador} liquidaciones")
+            
+            with tiempos.etapa('commit'):
+                db.session.commit()
             
+            corrida = nueva_corrida('liquidacion', periodo, tiempos, contador, usuario_id=current_user.id)
             db.session.commit()
+            registrar_evento('liquidaciones_generadas', periodo=periodo, corrida_id=corrida.id,
+                             generadas=contador, duracion_ms=corrida.duracion_ms, **afectadas)
             
             registrar_bitacora(
                 current_user, 'liquidaciones', 'CREATE', 'liquidaciones',
-                detalle=f'Generadas {contador} liquidaciones para período {periodo}'
+                detalle=(f'Generadas {contador} liquidaciones para período {periodo} '
+                         f'(aplicados: {afectadas["ingresos_extras"]} ingresos extras, '
+                         f'{afectadas["horas_extras"]} horas extra, {afectadas["anticipos"]} anticipos)')
             )
             
             flash(f'{contador} liquidaciones generadas exitosamente (cálculo basado en asistencias)', 'success')
@@ -2391,10 +1867,29 @@ def generar_liquidacion():
         
         except Exception as e:
             db.session.rollback()
+            registrar_evento('liquidaciones_error', logging.ERROR, exc_info=True, periodo=periodo)
+            nueva_corrida('liquidacion', periodo or '', tiempos, 0, estado='FALLIDA', usuario_id=current_user.id)
+            db.session.commit()
             flash(f'Error al generar liquidaciones: {str(e)}', 'danger')
     
     return render_template('rrhh/generar_liquidacion.html')
 
+@rrhh_bp.route('/liquidaciones/runs', methods=['GET'])
+@login_required
+@role_required(RoleEnum.RRHH)
+def listar_corridas_nomina():
+    """API: Últimas corridas de nómina con su duración total"""
+    corridas = CorridaNomina.query.order_by(desc(CorridaNomina.id)).limit(50).all()
+    return jsonify([corrida_a_dict(c) for c in corridas])
+
+@rrhh_bp.route('/liquidaciones/runs/<int:corrida_id>/perf', methods=['GET'])
+@login_required
+@role_required(RoleEnum.RRHH)
+def perf_corrida_nomina(corrida_id):
+    """API: Tiempos por etapa de una corrida de nómina"""
+    corrida = CorridaNomina.query.get_or_404(corrida_id)
+    return jsonify(corrida_a_dict(corrida))
+
 @rrhh_bp.route('/liquidaciones/<int:liquidacion_id>/descargar-pdf', methods=['GET'])
 @login_required
 def descargar_recibo_pdf(liquidacion_id):
@@ -2408,7 +1903,7 @@ def descargar_recibo_pdf(liquidacion_id):
     )
     
     # Obtener empresa para membrete
-    empresa = Empresa.query.first()
+    empresa = empresa_actual()
     
     # Generar PDF
     pdf_buffer = ReportUtils.generar_recibo_salario(empleado, liquidacion, empresa)
@@ -2438,7 +1933,7 @@ def descargar_planilla_mensual(periodo):
     )
     
     # Obtener empresa para membrete
-    empresa = Empresa.query.first()
+    empresa = empresa_actual()
     
     pdf_buffer = ReportUtils.generar_planilla_mensual(empleados_liquidaciones, periodo, empresa)
     
@@ -2449,6 +1944,156 @@ def descargar_planilla_mensual(periodo):
         download_name=f'planilla_mensual_{periodo}.pdf'
     )
 
+# ==================== TAREAS EN SEGUNDO PLANO ====================
+
+def _tarea_a_dict(tarea):
+    return {
+        'id': tarea.id,
+        'tipo': tarea.tipo,
+        'parametros': json.loads(tarea.parametros or '{}'),
+        'estado': tarea.estado,
+        'total': tarea.total or 0,
+        'procesados': tarea.procesados or 0,
+        'progreso': tarea.progreso,
+        'cancelacion_solicitada': bool(tarea.cancelacion_solicitada),
+        'mensaje': tarea.mensaje,
+        'resumen': json.loads(tarea.resumen) if tarea.resumen else None,
+        'tiene_archivo': tarea.resultado is not None,
+        'fecha_creacion': tarea.fecha_creacion.strftime('%Y-%m-%d %H:%M:%S') if tarea.fecha_creacion else None,
+        'fecha_inicio': tarea.fecha_inicio.strftime('%Y-%m-%d %H:%M:%S') if tarea.fecha_inicio else None,
+        'fecha_fin': tarea.fecha_fin.strftime('%Y-%m-%d %H:%M:%S') if tarea.fecha_fin else None
+    }
+
+@rrhh_bp.route('/api/tareas', methods=['POST'])
+@login_required
+@role_required(RoleEnum.RRHH)
+def api_crear_tarea():
+    """API: Encola una tarea (liquidacion, aguinaldo, planilla_mtess, planilla_ips)"""
+    datos = request.get_json(silent=True) or {}
+    tipo = datos.get('tipo')
+    parametros = datos.get('parametros') or {}
+    
+    try:
+        tarea = encolar_tarea(tipo, parametros, usuario_id=current_user.id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    registrar_bitacora(
+        current_user, 'tareas', 'CREATE', 'tareas', tarea.id,
+        f'Tarea {tipo} encolada: {json.dumps(parametros)}'
+    )
+    
+    return jsonify(_tarea_a_dict(tarea)), 202
+
+@rrhh_bp.route('/api/tareas/<int:tarea_id>', methods=['GET'])
+@login_required
+@role_required(RoleEnum.RRHH)
+def api_estado_tarea(tarea_id):
+    """API: Estado y progreso (empleados procesados / total) de una tarea"""
+    tarea = Tarea.query.get_or_404(tarea_id)
+    return jsonify(_tarea_a_dict(tarea))
+
+@rrhh_bp.route('/api/tareas/<int:tarea_id>/cancelar', methods=['POST'])
+@login_required
+@role_required(RoleEnum.RRHH)
+def api_cancelar_tarea(tarea_id):
+    """API: Solicita la cancelación; los lotes ya confirmados se conservan"""
+    tarea = Tarea.query.get_or_404(tarea_id)
+    if tarea.estado not in ('PENDIENTE', 'EN_PROCESO'):
+        return jsonify({'error': f'La tarea ya está {tarea.estado}'}), 409
+    
+    solicitar_cancelacion(tarea)
+    registrar_bitacora(current_user, 'tareas', 'UPDATE', 'tareas', tarea.id, 'Cancelación solicitada')
+    return jsonify(_tarea_a_dict(tarea))
+
+@rrhh_bp.route('/api/tareas/<int:tarea_id>/resultado', methods=['GET'])
+@login_required
+@role_required(RoleEnum.RRHH)
+def api_resultado_tarea(tarea_id):
+    """API: Descarga el archivo generado o, si no hay archivo, el resumen JSON"""
+    tarea = Tarea.query.get_or_404(tarea_id)
+    if tarea.estado != 'COMPLETADA':
+        return jsonify({'error': f'La tarea está {tarea.estado}', 'estado': tarea.estado}), 409
+    
+    if tarea.resultado is None:
+        return jsonify({'mensaje': tarea.mensaje, 'resumen': json.loads(tarea.resumen) if tarea.resumen else None})
+    
+    return send_file(
+        BytesIO(tarea.resultado),
+        mimetype=tarea.resultado_mimetype,
+        as_attachment=True,
+        download_name=tarea.resultado_nombre
+    )
+
+# ==================== FERIADOS ====================
+
+@rrhh_bp.route('/api/feriados', methods=['GET'])
+@login_required
+@role_required(RoleEnum.RRHH)
+def api_listar_feriados():
+    """API: Feriados de un año y sus días hábiles por mes"""
+    año = request.args.get('año', date.today().year, type=int)
+    feriados = Feriado.query.filter(en_año(Feriado.fecha, año)).order_by(Feriado.fecha).all()
+    
+    return jsonify({
+        'año': año,
+        'feriados': [{'id': f.id, 'fecha': f.fecha.strftime('%Y-%m-%d'), 'descripcion': f.descripcion} for f in feriados],
+        'dias_habiles': {mes: dias_habiles_mes(año, mes) for mes in range(1, 13)}
+    })
+
+@rrhh_bp.route('/api/feriados', methods=['POST'])
+@login_required
+@role_required(RoleEnum.RRHH)
+def api_crear_feriado():
+    """API: Agrega un feriado (invalida la caché del calendario laboral)"""
+    datos = request.get_json(silent=True) or {}
+    try:
+        fecha = datetime.strptime(datos.get('fecha', ''), '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'error': 'Fecha inválida (YYYY-MM-DD)'}), 400
+    descripcion = (datos.get('descripcion') or '').strip()
+    if not descripcion:
+        return jsonify({'error': 'Descripción requerida'}), 400
+    if Feriado.query.filter_by(fecha=fecha).first():
+        return jsonify({'error': f'Ya existe un feriado el {fecha}'}), 409
+    
+    feriado = Feriado(fecha=fecha, descripcion=descripcion, usuario_creador_id=current_user.id)
+    db.session.add(feriado)
+    registrar_cambio_calendario()
+    db.session.commit()
+    
+    registrar_operacion_crud(current_user, 'feriados', 'CREATE', 'feriados', feriado.id,
+                             {'fecha': str(fecha), 'descripcion': descripcion})
+    return jsonify({'id': feriado.id, 'fecha': str(fecha), 'descripcion': descripcion}), 201
+
+@rrhh_bp.route('/api/feriados/<int:feriado_id>', methods=['DELETE'])
+@login_required
+@role_required(RoleEnum.RRHH)
+def api_eliminar_feriado(feriado_id):
+    """API: Elimina un feriado (invalida la caché del calendario laboral)"""
+    feriado = Feriado.query.get_or_404(feriado_id)
+    datos = {'fecha': str(feriado.fecha), 'descripcion': feriado.descripcion}
+    db.session.delete(feriado)
+    registrar_cambio_calendario()
+    db.session.commit()
+    
+    registrar_operacion_crud(current_user, 'feriados', 'DELETE', 'feriados', feriado_id, datos)
+    return jsonify({'success': True})
+
+@rrhh_bp.route('/api/feriados/cargar-nacionales', methods=['POST'])
+@login_required
+@role_required(RoleEnum.RRHH)
+def api_cargar_feriados_nacionales():
+    """API: Carga los feriados nacionales de Paraguay del año indicado"""
+    datos = request.get_json(silent=True) or {}
+    año = int(datos.get('año') or date.today().year)
+    nuevos = cargar_feriados_paraguay(año, usuario_id=current_user.id)
+    db.session.commit()
+    
+    registrar_bitacora(current_user, 'feriados', 'CREATE', 'feriados',
+                       detalle=f'{nuevos} feriados nacionales cargados para {año}')
+    return jsonify({'año': año, 'agregados': nuevos})
+
 # ==================== VACACIONES ====================
 
 def calcular_dias_vacaciones_por_antiguedad(empleado, año=None):
@@ -3421,109 +3066,21 @@ def generar_aguinaldos_anual(año, mes_corte=None, día_corte=None):
     # Fecha de corte para cálculo
     fecha_corte = date(año, mes_corte, día_corte)
     
-    # Obtener empleados activos
-    empleados = Empleado.query.filter_by(estado=EstadoEmpleadoEnum.ACTIVO).all()
+    # Totales devengados del año de los empleados activos (en paralelo si NOMINA_PROCESOS > 1)
+    calculo = calcular_aguinaldos_paralelo(año, fecha_corte)
+    periodo_aguinaldo = f"{año}-{mes_corte:02d}"
     
     generados = 0
-    duplicados = 0
+    duplicados = calculo['duplicados']
     errores = 0
     total_bruto = Decimal('0')
     total_neto = Decimal('0')
     
-    for empleado in empleados:
-        try:
-            # Verificar si ya existe aguinaldo para este año
-            liquidacion_existente = Liquidacion.query.filter(
-                Liquidacion.empleado_id == empleado.id,
-                Liquidacion.periodo.like(f'{año}%'),
-                Liquidacion.aguinaldo_monto > 0  # Solo si ya hay aguinaldo
-            ).first()
-            
-            if liquidacion_existente:
-                duplicados += 1
-                continue
-            
-            # Calcular aguinaldo proporcional para el año
-            fecha_inicio_año = date(año, 1, 1)
-            
-            # Si el empleado fue contratado después del inicio del año, usar fecha de contratación
-            fecha_desde = max(fecha_inicio_año, empleado.fecha_ingreso)
-            
-            # Si el empleado se retiró antes del corte, usar fecha de retiro
-            fecha_hasta = fecha_corte
-            if empleado.fecha_retiro and empleado.fecha_retiro < fecha_corte:
-                fecha_hasta = empleado.fecha_retiro
-            
-            # Calcular días trabajados en el año
-            días_trabajados = (fecha_hasta - fecha_desde).days + 1
-            if días_trabajados <= 0:
-                continue
-            
-            # CÁLCULO SEGÚN LEY PARAGUAYA:
-            # Sumar todos los salarios base de liquidaciones del año
-            total_salarios = db.session.query(
-                func.sum(Liquidacion.salario_base)
-            ).filter(
-                Liquidacion.empleado_id == empleado.id,
-                Liquidacion.periodo.like(f'{año}%'),
-                Liquidacion.aguinaldo_monto == 0  # Excluir liquidaciones de aguinaldo previas
-            ).scalar() or Decimal('0')
-            
-            # Sumar ingresos extras del año (horas extras, comisiones, bonificaciones)
-            total_extras = db.session.query(
-                func.sum(IngresoExtra.monto)
-            ).filter(
-                IngresoExtra.empleado_id == empleado.id,
-                IngresoExtra.año == año,
-                IngresoExtra.tipo.in_(['Horas Extras', 'Comisión', 'Bonificación'])  # Excluir viáticos
-            ).scalar() or Decimal('0')
-            
-            # Total devengado en el año
-            total_devengado = total_salarios + total_extras
-            
-            # Si hay liquidaciones registradas, usar el método correcto: Total / 12
-            if total_devengado > 0:
-                aguinaldo_bruto = (total_devengado / Decimal('12')).quantize(Decimal('0.01'))
-            else:
-                # FALLBACK: Si no hay liquidaciones, calcular proporcional por meses trabajados
-                meses_trabajados = Decimal(str(días_trabajados)) / Decimal('30')
-                aguinaldo_bruto = (Decimal(str(empleado.salario_base)) * meses_trabajados / Decimal('12')).quantize(Decimal('0.01'))
-            
-            # Aportes IPS = 9% sobre aguinaldo
-            aportes_ips = (aguinaldo_bruto * Decimal('0.09')).quantize(Decimal('0.01'))
-            
-            # Aguinaldo neto
-            aguinaldo_neto = (aguinaldo_bruto - aportes_ips).quantize(Decimal('0.01'))
-            
-            # Crear liquidación de aguinaldo
-            periodo_aguinaldo = f"{año}-{mes_corte:02d}"
-            
-            liquidacion = Liquidacion(
-                empleado_id=empleado.id,
-                periodo=periodo_aguinaldo,
-                salario_base=empleado.salario_base,
-                salario_neto=aguinaldo_neto,
-                aguinaldo_monto=aguinaldo_bruto,
-                aportes_ips_despido=aportes_ips,
-                indemnizacion_monto=Decimal('0'),
-                vacaciones_monto=Decimal('0'),
-                ingresos_extras=Decimal('0'),
-                descuentos=Decimal('0'),
-                aporte_ips=Decimal('0'),
-                dias_trabajados=días_trabajados
-            )
-            
-            db.session.add(liquidacion)
-            db.session.flush()
-            
-            generados += 1
-            total_bruto += aguinaldo_bruto
-            total_neto += aguinaldo_neto
-            
-        except Exception as e:
-            errores += 1
-            db.session.rollback()
-            continue
+    for resultado in calculo['resultados']:
+        db.session.add(construir_liquidacion_aguinaldo(resultado, periodo_aguinaldo))
+        generados += 1
+        total_bruto += resultado['aguinaldo_bruto']
+        total_neto += resultado['aguinaldo_neto']
     
     try:
         db.session.commit()
@@ -3612,56 +3169,17 @@ def generar_aguinaldos():
             fecha_corte = date(año, mes_corte, día_corte)
             preview_datos = []
             
-            empleados = Empleado.query.filter_by(estado=EstadoEmpleadoEnum.ACTIVO).all()
+            empleados = Empleado.query.filter_by(estado=EstadoEmpleadoEnum.ACTIVO).order_by(Empleado.id).all()
+            calculo = calcular_aguinaldos(año, fecha_corte, empleados, incluir_generados=True)
             
-            for empleado in empleados:
-                fecha_desde = max(date(año, 1, 1), empleado.fecha_ingreso)
-                fecha_hasta = fecha_corte
-                if empleado.fecha_retiro and empleado.fecha_retiro < fecha_corte:
-                    fecha_hasta = empleado.fecha_retiro
-                
-                días = (fecha_hasta - fecha_desde).days + 1
-                meses = Decimal(str(días)) / Decimal('30')
-                
-                # CÁLCULO SEGÚN LEY PARAGUAYA:
-                # Sumar todos los salarios base de liquidaciones del año
-                total_salarios = db.session.query(
-                    func.sum(Liquidacion.salario_base)
-                ).filter(
-                    Liquidacion.empleado_id == empleado.id,
-                    Liquidacion.periodo.like(f'{año}%'),
-                    Liquidacion.aguinaldo_monto == 0
-                ).scalar() or Decimal('0')
-                
-                # Sumar ingresos extras del año
-                total_extras = db.session.query(
-                    func.sum(IngresoExtra.monto)
-                ).filter(
-                    IngresoExtra.empleado_id == empleado.id,
-                    IngresoExtra.año == año,
-                    IngresoExtra.tipo.in_(['Horas Extras', 'Comisión', 'Bonificación'])
-                ).scalar() or Decimal('0')
-                
-                # Total devengado
-                total_devengado = total_salarios + total_extras
-                
-                # Si hay datos reales, usar método correcto: Total / 12
-                if total_devengado > 0:
-                    aguinaldo = (total_devengado / Decimal('12')).quantize(Decimal('0.01'))
-                else:
-                    # FALLBACK: usar proporcional por meses trabajados
-                    aguinaldo = (Decimal(str(empleado.salario_base)) * meses / Decimal('12')).quantize(Decimal('0.01'))
-                
-                ips = (aguinaldo * Decimal('0.09')).quantize(Decimal('0.01'))
-                neto = (aguinaldo - ips).quantize(Decimal('0.01'))
-                
+            for r in calculo['resultados']:
                 preview_datos.append({
-                    'empleado': empleado,
-                    'meses': meses,
-                    'total_devengado': total_devengado,
-                    'aguinaldo_bruto': aguinaldo,
-                    'ips': ips,
-                    'aguinaldo_neto': neto
+                    'empleado': r['empleado'],
+                    'meses': r['meses'],
+                    'total_devengado': r['total_devengado'],
+                    'aguinaldo_bruto': r['aguinaldo_bruto'],
+                    'ips': r['aportes_ips'],
+                    'aguinaldo_neto': r['aguinaldo_neto']
                 })
             
             resultado = {
@@ -3712,26 +3230,10 @@ def perfil_empleado(empleado_id):
     
     # 📊 Calcular estadísticas de justificaciones del año actual
     año_actual = date.today().year
-    ausencias_justificadas = db.session.query(func.count(Asistencia.id)).filter(
-        Asistencia.empleado_id == empleado_id,
-        func.extract('year', Asistencia.fecha) == año_actual,
-        Asistencia.presente == False,
-        Asistencia.justificacion_estado == 'JUSTIFICADO'
-    ).scalar() or 0
-    
-    ausencias_injustificadas = db.session.query(func.count(Asistencia.id)).filter(
-        Asistencia.empleado_id == empleado_id,
-        func.extract('year', Asistencia.fecha) == año_actual,
-        Asistencia.presente == False,
-        Asistencia.justificacion_estado == 'INJUSTIFICADO'
-    ).scalar() or 0
-    
-    ausencias_pendientes = db.session.query(func.count(Asistencia.id)).filter(
-        Asistencia.empleado_id == empleado_id,
-        func.extract('year', Asistencia.fecha) == año_actual,
-        Asistencia.presente == False,
-        Asistencia.justificacion_estado == 'PENDIENTE'
-    ).scalar() or 0
+    resumen_anual = resumen_año(empleado_id, año_actual)
+    ausencias_justificadas = resumen_anual['justificadas']
+    ausencias_injustificadas = resumen_anual['injustificadas']
+    ausencias_pendientes = resumen_anual['pendientes']
 
     return render_template('rrhh/empleado_perfil.html', 
                          empleado=empleado, 
@@ -3741,78 +3243,29 @@ def perfil_empleado(empleado_id):
                          ausencias_pendientes=ausencias_pendientes,
                          date=date)
 
-@rrhh_bp.route('/api/empleados/<int:empleado_id>/general', methods=['GET'])
+@rrhh_bp.route('/api/empleados/<int:empleado_id>/perfil', methods=['GET'])
 @login_required
 @role_required(RoleEnum.RRHH)
-def api_empleado_general(empleado_id):
-    """API: Datos generales y KPIs del empleado"""
-    empleado = Empleado.query.get_or_404(empleado_id)
-    
-    # Calcular datos
-    vacaciones_total = db.session.query(func.sum(Vacacion.dias_disponibles)).filter_by(empleado_id=empleado_id).scalar() or 0
-    vacaciones_tomadas = db.session.query(func.sum(Vacacion.dias_tomados)).filter_by(empleado_id=empleado_id).scalar() or 0
-    vacaciones_pendientes = vacaciones_total - vacaciones_tomadas
-    
-    sanciones_activas = Sancion.query.filter_by(empleado_id=empleado_id).count()
-    
-    # Permisos usados: contar los que fueron aprobados o completados
-    permisos_usados = Permiso.query.filter(
-        Permiso.empleado_id == empleado_id,
-        or_(Permiso.estado == EstadoPermisoEnum.APROBADO, Permiso.estado == EstadoPermisoEnum.COMPLETADO)
-    ).count()
-    
-    # Asistencia del mes actual
-    mes_actual = date.today().month
-    año_actual = date.today().year
-    asistencias_mes = db.session.query(func.count(Asistencia.id)).filter(
-        Asistencia.empleado_id == empleado_id,
-        func.extract('month', Asistencia.fecha) == mes_actual,
-        func.extract('year', Asistencia.fecha) == año_actual,
-        Asistencia.presente == True
-    ).scalar() or 0
-    
-    dias_habiles_mes = len([d for d in calendar.monthcalendar(año_actual, mes_actual) 
-                           for dow in d if dow != 0 and datetime(año_actual, mes_actual, dow).weekday() < 5])
-    
-    porcentaje_asistencia = (asistencias_mes / dias_habiles_mes * 100) if dias_habiles_mes > 0 else 0
-    
-    # Resumen de asistencia de hoy
-    resumen_hoy = _resumir_dia_asistencias(empleado_id, date.today())
-    # Ingresos extras recientes (últimos 5)
-    try:
-        ingresos_q = IngresoExtra.query.filter_by(empleado_id=empleado_id).order_by(IngresoExtra.fecha_creacion.desc()).limit(5).all()
-    except Exception:
-        ingresos_q = []
-    ingresos_list = []
-    for ie in ingresos_q:
-        ingresos_list.append({
-            'id': ie.id,
-            'tipo': getattr(ie, 'tipo', None),
-            'monto': float(ie.monto) if getattr(ie, 'monto', None) is not None else None,
-            'mes': getattr(ie, 'mes', None),
-            'año': getattr(ie, 'año', None),
-            'estado': getattr(ie, 'estado', None),
-            'justificativo': getattr(ie, 'justificativo_archivo', None)
-        })
-    return jsonify({
-        'id': empleado.id,
-        'codigo': empleado.codigo,
-        'nombre_completo': empleado.nombre_completo,
-        'cargo': empleado.cargo.nombre,
-        'email': empleado.email,
-        'telefono': empleado.telefono,
-        'fecha_ingreso': empleado.fecha_ingreso.strftime('%d/%m/%Y') if empleado.fecha_ingreso else 'N/A',
-        'antiguedad': empleado.antiguedad_texto,
-        'estado': empleado.estado.value,
-        'salario_base': float(empleado.salario_base),
-        'vacaciones_pendientes': int(vacaciones_pendientes),
-        'vacaciones_total': int(vacaciones_total),
-        'sanciones_activas': sanciones_activas,
-        'permisos_usados': permisos_usados,
-        'asistencia_mes': f"{porcentaje_asistencia:.1f}%",
-        'asistencias_count': asistencias_mes,
-        'resumen_hoy': resumen_hoy
-    })
+def api_empleado_perfil(empleado_id):
+    """API: Resúmenes de todas las pestañas del perfil en una llamada, con ETag por sección"""
+    secciones = request.args.get('secciones')
+    secciones = secciones.split(',') if secciones else None
+    if secciones is not None and not set(secciones) <= set(SECCIONES_PERFIL):
+        return jsonify({'error': f"Secciones válidas: {', '.join(SECCIONES_PERFIL)}"}), 400
+    
+    versiones = versiones_perfil(empleado_id, secciones)
+    if versiones is None:
+        abort(404)
+    etag = etag_perfil(versiones)
+    
+    # Revalidación: solo se consultaron las versiones, no se calcula ninguna sección
+    if request.if_none_match.contains_weak(etag):
+        respuesta = Response(status=304)
+    else:
+        respuesta = jsonify({'empleado_id': empleado_id, 'secciones': datos_perfil(empleado_id, versiones)})
+    respuesta.set_etag(etag, weak=True)
+    respuesta.headers['Cache-Control'] = 'private, no-cache'
+    return respuesta
 
 @rrhh_bp.route('/api/empleados/<int:empleado_id>/asistencias', methods=['GET'])
 @login_required
@@ -3830,8 +3283,7 @@ def api_empleado_asistencias(empleado_id):
     
     if mes and año:
         query = query.filter(
-            func.extract('month', Asistencia.fecha) == mes,
-            func.extract('year', Asistencia.fecha) == año
+            en_mes(Asistencia.fecha, año, mes)
         )
     
     paginated = query.paginate(page=pagina, per_page=por_pagina)
@@ -3894,10 +3346,13 @@ def api_empleado_justificaciones(empleado_id):
         Asistencia.presente == False
     ).order_by(desc(Asistencia.fecha))
     
-    if mes:
+    if mes and año:
+        query = query.filter(en_mes(Asistencia.fecha, año, mes))
+    elif año:
+        query = query.filter(en_año(Asistencia.fecha, año))
+    elif mes:
+        # Mismo mes de cualquier año: no hay rango posible
         query = query.filter(func.extract('month', Asistencia.fecha) == mes)
-    if año:
-        query = query.filter(func.extract('year', Asistencia.fecha) == año)
     
     paginated = query.paginate(page=pagina, per_page=por_pagina)
     
@@ -4211,7 +3666,7 @@ def aprobar_anticipo(anticipo_id):
         from reportlab.pdfgen import canvas
 
         # Obtener datos de la empresa
-        empresa = Empresa.query.first()
+        empresa = empresa_actual()
         
         c = canvas.Canvas(filepath, pagesize=A4)
         
@@ -4809,63 +4264,8 @@ def contrato_descargar(contrato_id):
 
 # ==================== BONIFICACIÓN FAMILIAR ====================
 
-def obtener_salario_minimo_vigente(fecha=None):
-    """
-    Obtiene el salario mínimo vigente para una fecha específica.
-    Si no se proporciona fecha, usa la fecha actual.
-    """
-    if fecha is None:
-        fecha = date.today()
-    
-    salario = SalarioMinimo.query.filter(
-        SalarioMinimo.vigencia_desde <= fecha,
-        or_(SalarioMinimo.vigencia_hasta.is_(None), SalarioMinimo.vigencia_hasta >= fecha)
-    ).order_by(desc(SalarioMinimo.vigencia_desde)).first()
-    
-    if not salario:
-        # Si no hay salario mínimo registrado, retornar el último conocido
-        salario = SalarioMinimo.query.order_by(desc(SalarioMinimo.vigencia_desde)).first()
-    
-    return salario.monto if salario else Decimal('2798309')  # Fallback a salario mínimo 2025
-
-def contar_hijos_activos(empleado_id, fecha=None):
-    """
-    Cuenta la cantidad de hijos activos de un empleado para bonificación familiar.
-    """
-    if fecha is None:
-        fecha = date.today()
-    
-    return BonificacionFamiliar.query.filter(
-        BonificacionFamiliar.empleado_id == empleado_id,
-        BonificacionFamiliar.activo == True,
-        or_(
-            BonificacionFamiliar.fecha_baja.is_(None),
-            BonificacionFamiliar.fecha_baja >= fecha
-        )
-    ).count()
-
-def calcular_bonificacion_familiar(empleado_id, fecha=None):
-    """
-    Calcula bonificación familiar según ley paraguaya.
-    Fórmula: (Salario Mínimo × 5%) × Cantidad de hijos activos
-    """
-    if fecha is None:
-        fecha = date.today()
-    
-    # Obtener salario mínimo vigente
-    salario_minimo = obtener_salario_minimo_vigente(fecha)
-    
-    # Contar hijos activos
-    hijos_activos = contar_hijos_activos(empleado_id, fecha)
-    
-    if hijos_activos == 0:
-        return Decimal('0')
-    
-    # Calcular bonificación
-    bonificacion_por_hijo = (salario_minimo * Decimal('0.05')).quantize(Decimal('0.01'))
-    bonificacion_total = (bonificacion_por_hijo * hijos_activos).quantize(Decimal('0.01'))
-    
-    return bonificacion_total
+# obtener_salario_minimo_vigente, contar_hijos_activos y calcular_bonificacion_familiar
+# viven en app/nomina.py (importadas arriba)
 
 # ==================== RUTAS: GESTIÓN DE SALARIOS MÍNIMOS ====================
 
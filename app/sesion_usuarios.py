@@ -0,0 +1,121 @@
+"""
+sesion_usuarios.py
+Usuario de la sesión (Flask-Login) cacheado por proceso.
+
+`load_user` corre en cada petición autenticada, incluidas las llamadas JSON
+de las pestañas del perfil. En vez de consultar `usuarios` cada vez, devuelve
+un `Principal`: una copia inmutable de id, nombre_usuario, nombre_completo,
+rol y activo. Las copias se guardan en un LRU acotado (MAX_PRINCIPALES) y
+vencen a los TTL_SEGUNDOS.
+
+Las rutas de administración que cambian un usuario (editar, activar o
+desactivar, eliminar) llaman a `registrar_cambio_usuario()` en su
+transacción. Al confirmar, el proceso que editó descarta esa copia, y el
+contador `usuarios_version` de estado_sistema avisa a los demás procesos.
+Estos lo comparan como mucho cada VERIFICAR_SEGUNDOS y, si cambió, vacían su
+caché. Un usuario desactivado o eliminado deja de estar autenticado en la
+siguiente petición.
+
+Las operaciones que necesitan la fila (cambiar la contraseña) cargan el
+Usuario con `db.session.get(Usuario, current_user.id)`.
+"""
+
+import threading
+import time as reloj
+from collections import OrderedDict
+
+from flask_login import UserMixin
+from sqlalchemy import event
+
+from .models import db, Usuario
+from .versiones import leer_version, incrementar_version
+
+CLAVE_VERSION = 'usuarios_version'
+TTL_SEGUNDOS = 60
+VERIFICAR_SEGUNDOS = 5
+MAX_PRINCIPALES = 1024
+
+_CAMPOS = ('id', 'nombre_usuario', 'nombre_completo', 'rol', 'activo')
+
+# usuario_id -> (reloj.monotonic(), Principal)
+_principales = OrderedDict()
+_candado = threading.Lock()
+_version = {'valor': None, 'verificado': None}
+
+
+class Principal(UserMixin):
+    """Datos del usuario autenticado, de solo lectura y sin sesión de SQLAlchemy."""
+
+    def __init__(self, usuario):
+        for campo in _CAMPOS:
+            object.__setattr__(self, campo, getattr(usuario, campo))
+
+    def __setattr__(self, nombre, valor):
+        raise AttributeError('Principal es de solo lectura; modificar el Usuario')
+
+    def __repr__(self):
+        return f'<Principal {self.nombre_usuario}>'
+
+
+def invalidar_principales(usuario_ids=None):
+    """Descarta las copias de `usuario_ids` (todas si es None, p. ej. nueva base de datos)."""
+    with _candado:
+        if usuario_ids is None:
+            _principales.clear()
+            _version.update(valor=None, verificado=None)
+            return
+        for usuario_id in usuario_ids:
+            _principales.pop(usuario_id, None)
+
+
+def _verificar_version(ahora):
+    """Vacía la caché si otro proceso incrementó usuarios_version (como mucho cada VERIFICAR_SEGUNDOS)."""
+    with _candado:
+        if _version['verificado'] is not None and ahora - _version['verificado'] < VERIFICAR_SEGUNDOS:
+            return
+    valor = leer_version(CLAVE_VERSION)
+    with _candado:
+        if valor != _version['valor']:
+            _principales.clear()
+        _version.update(valor=valor, verificado=ahora)
+
+
+def cargar_principal(usuario_id):
+    """Principal del usuario o None si no existe o está inactivo (para `login_manager.user_loader`)."""
+    ahora = reloj.monotonic()
+    _verificar_version(ahora)
+    with _candado:
+        guardado = _principales.get(usuario_id)
+        if guardado is not None and ahora - guardado[0] < TTL_SEGUNDOS:
+            _principales.move_to_end(usuario_id)
+            return guardado[1]
+
+    usuario = db.session.get(Usuario, usuario_id)
+    if usuario is None or not usuario.activo:
+        invalidar_principales([usuario_id])
+        return None
+    principal = Principal(usuario)
+    with _candado:
+        _principales[usuario_id] = (ahora, principal)
+        _principales.move_to_end(usuario_id)
+        while len(_principales) > MAX_PRINCIPALES:
+            _principales.popitem(last=False)
+    return principal
+
+
+def registrar_cambio_usuario(usuario_id):
+    """Incrementa usuarios_version en la transacción actual; al confirmar se descarta la copia local."""
+    incrementar_version(CLAVE_VERSION)
+    db.session.info.setdefault('usuarios_modificados', set()).add(usuario_id)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _confirmar_cambios(session):
+    usuario_ids = session.info.pop('usuarios_modificados', None)
+    if usuario_ids:
+        invalidar_principales(usuario_ids)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _descartar_cambios(session):
+    session.info.pop('usuarios_modificados', None)
@@ -38,72 +38,113 @@ function formatearMoneda(valor) {
     }).format(valor);
 }
 
+// ========== RESUMEN DEL PERFIL ==========
+// /perfil devuelve todas las secciones con ETag: al volver a pedirlas el
+// navegador envía If-None-Match y, si nada cambió, recibe 304 y usa su copia.
+function urlPerfil(secciones) {
+    const url = `/rrhh/api/empleados/${empleadoId}/perfil`;
+    return secciones ? `${url}?secciones=${secciones.join(',')}` : url;
+}
+
+function pintarBadgesPerfil(secciones) {
+    const totales = {
+        asistencias: secciones.asistencias && secciones.asistencias.datos.justificaciones.pendientes,
+        vacaciones: secciones.vacaciones && secciones.vacaciones.datos.total,
+        permisos: secciones.permisos && secciones.permisos.datos.total,
+        sanciones: secciones.sanciones && secciones.sanciones.datos.total,
+        liquidaciones: secciones.liquidaciones && secciones.liquidaciones.datos.total,
+        ingresos_extras: secciones.ingresos_extras && secciones.ingresos_extras.datos.pendientes,
+        anticipos: secciones.anticipos && secciones.anticipos.datos.pendientes
+    };
+    Object.entries(totales).forEach(([seccion, total]) => {
+        const badge = document.getElementById(`badge-${seccion}`);
+        if (badge && total !== undefined) {
+            badge.textContent = total || '';
+        }
+    });
+}
+
+function cargarPerfil() {
+    const contenedor = document.getElementById('general-content');
+    mostrarCarga(contenedor);
+    
+    fetch(urlPerfil(), { cache: 'no-cache' })
+        .then(response => response.json())
+        .then(data => {
+            pintarGeneral(contenedor, data.secciones.general.datos);
+            pintarBadgesPerfil(data.secciones);
+        })
+        .catch(err => mostrarErrorEnContenedor(contenedor, 'Error al cargar datos generales'));
+}
+
 // ========== TAB GENERAL ==========
 function cargarGeneral() {
     const contenedor = document.getElementById('general-content');
     mostrarCarga(contenedor);
     
-    fetch(`/rrhh/api/empleados/${empleadoId}/general`)
+    fetch(urlPerfil(['general']), { cache: 'no-cache' })
         .then(response => response.json())
-        .then(data => {
-            let html = `
-                <div class="col-md-3 mb-3">
-                    <div class="kpi-card">
-                        <div class="numero">${data.asistencia_mes}</div>
-                        <div class="label">Asistencia Mes</div>
-                    </div>
-                </div>
-                <div class="col-md-3 mb-3">
-                    <div class="kpi-card">
-                        <div class="numero">${data.vacaciones_pendientes}</div>
-                        <div class="label">Vacaciones Pendientes</div>
-                    </div>
-                </div>
-                <div class="col-md-3 mb-3">
-                    <div class="kpi-card">
-                        <div class="numero">${data.sanciones_activas}</div>
-                        <div class="label">Sanciones Activas</div>
-                    </div>
-                </div>
-                <div class="col-md-3 mb-3">
-                    <div class="kpi-card">
-                        <div class="numero">${data.permisos_usados}</div>
-                        <div class="label">Permisos Usados</div>
-                    </div>
-                </div>
-                <div class="col-12 mt-4">
-                    <div class="card">
-                        <div class="card-body">
-                            <h6 class="card-title">Información Laboral</h6>
-                            <div class="row">
-                                <div class="col-md-6">
-                                    <p><strong>Email:</strong> ${data.email || '-'}</p>
-                                    <p><strong>Teléfono:</strong> ${data.telefono || '-'}</p>
-                                    <p><strong>Salario Base:</strong> ${formatearMoneda(data.salario_base)}</p>
-                                </div>
-                                <div class="col-md-6">
-                                    <p><strong>Fecha de Ingreso:</strong> ${data.fecha_ingreso}</p>
-                                    <p><strong>Antigüedad:</strong> ${data.antiguedad}</p>
-                                    <p><strong>Estado:</strong> <span class="badge bg-${data.estado === 'Activo' ? 'success' : 'danger'}">${data.estado}</span></p>
-                                </div>
-                            </div>
+        .then(data => pintarGeneral(contenedor, data.secciones.general.datos))
+        .catch(err => mostrarErrorEnContenedor(contenedor, 'Error al cargar datos generales'));
+}
+
+function pintarGeneral(contenedor, data) {
+    let html = `
+        <div class="col-md-3 mb-3">
+            <div class="kpi-card">
+                <div class="numero">${data.asistencia_mes}</div>
+                <div class="label">Asistencia Mes</div>
+            </div>
+        </div>
+        <div class="col-md-3 mb-3">
+            <div class="kpi-card">
+                <div class="numero">${data.vacaciones_pendientes}</div>
+                <div class="label">Vacaciones Pendientes</div>
+            </div>
+        </div>
+        <div class="col-md-3 mb-3">
+            <div class="kpi-card">
+                <div class="numero">${data.sanciones_activas}</div>
+                <div class="label">Sanciones Activas</div>
+            </div>
+        </div>
+        <div class="col-md-3 mb-3">
+            <div class="kpi-card">
+                <div class="numero">${data.permisos_usados}</div>
+                <div class="label">Permisos Usados</div>
+            </div>
+        </div>
+        <div class="col-12 mt-4">
+            <div class="card">
+                <div class="card-body">
+                    <h6 class="card-title">Información Laboral</h6>
+                    <div class="row">
+                        <div class="col-md-6">
+                            <p><strong>Email:</strong> ${data.email || '-'}</p>
+                            <p><strong>Teléfono:</strong> ${data.telefono || '-'}</p>
+                            <p><strong>Salario Base:</strong> ${formatearMoneda(data.salario_base)}</p>
                         </div>
-                    </div>
-                </div>
-                <div class="col-12 mt-4">
-                    <div class="card">
-                        <div class="card-body">
-                            <h6 class="card-title">Asistencia de hoy</h6>
-                            <p><strong>Entrada:</strong> ${data.resumen_hoy.hora_entrada ? data.resumen_hoy.hora_entrada : '-'}</p>
-                            <p><strong>Salida:</strong> ${data.resumen_hoy.hora_salida ? data.resumen_hoy.hora_salida : '-'}</p>
-                            <p><strong>Observaciones:</strong> ${data.resumen_hoy.observaciones || '-'}</p>
+                        <div class="col-md-6">
+                            <p><strong>Fecha de Ingreso:</strong> ${data.fecha_ingreso}</p>
+                            <p><strong>Antigüedad:</strong> ${data.antiguedad}</p>
+                            <p><strong>Estado:</strong> <span class="badge bg-${data.estado === 'Activo' ? 'success' : 'danger'}">${data.estado}</span></p>
                         </div>
                     </div>
                 </div>
-            `;
-            contenedor.innerHTML = html;
-        })
-        .catch(err => mostrarErrorEnContenedor(contenedor, 'Error al cargar datos generales'));
+            </div>
+        </div>
+        <div class="col-12 mt-4">
+            <div class="card">
+                <div class="card-body">
+                    <h6 class="card-title">Asistencia de hoy</h6>
+                    <p><strong>Entrada:</strong> ${data.resumen_hoy.hora_entrada ? data.resumen_hoy.hora_entrada : '-'}</p>
+                    <p><strong>Salida:</strong> ${data.resumen_hoy.hora_salida ? data.resumen_hoy.hora_salida : '-'}</p>
+                    <p><strong>Observaciones:</strong> ${data.resumen_hoy.observaciones || '-'}</p>
+                </div>
+            </div>
+        </div>
+    `;
+    contenedor.innerHTML = html;
 }
 
 // Aprobar / Rechazar Ingreso Extra desde el perfil
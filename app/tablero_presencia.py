@@ -0,0 +1,244 @@
+"""
+tablero_presencia.py
+Tablero de presencia en vivo por Server-Sent Events.
+
+Por cada día consultado se guarda en memoria una fila por empleado activo
+(estado: adentro, salio, ausente, justificado o sin_marcar). El día se carga
+con una sola consulta la primera vez que alguien lo mira. Después se mantiene
+desde la sesión: after_flush anota las Asistencia modificadas de los días
+cargados y after_commit las aplica (un rollback las descarta). Así lo
+actualizan la marcación web, las importaciones por lote, la edición y el
+reproceso.
+
+Cada cambio incrementa la secuencia del día y despierta a los suscriptores,
+que envían solo las filas cambiadas. Con muchos visores, cada marcación
+cuesta una actualización del estado y no una consulta por visor.
+
+El estado es por proceso. Con varios workers, cada uno ve al instante las
+marcaciones que atiende. Cada REFRESCO_SEGUNDOS recarga el día con una
+consulta y difunde las diferencias, así incorpora las de los demás. Las
+lecturas usan una conexión propia del engine y no la sesión: un flujo
+abierto no retiene conexiones del pool.
+"""
+
+import json
+import threading
+import time as reloj
+import uuid
+from collections import OrderedDict, deque
+from itertools import chain
+
+from sqlalchemy import event, select, and_
+
+from .models import db, Asistencia, Empleado, EstadoEmpleadoEnum
+
+REFRESCO_SEGUNDOS = 300
+LATIDO_SEGUNDOS = 15
+DIAS_EN_MEMORIA = 3
+HISTORIAL_CAMBIOS = 1000  # cambios recordados para reanudar con Last-Event-ID
+
+_CAMPOS = ('hora_entrada', 'hora_salida', 'ultimo_evento', 'presente', 'observaciones')
+
+
+class _Dia:
+    def __init__(self, fecha):
+        self.fecha = fecha
+        self.filas = {}  # empleado_id -> dict
+        self.seq = 0
+        self.cambios = deque(maxlen=HISTORIAL_CAMBIOS)  # (seq, empleado_id)
+        self.cargado = None  # reloj.monotonic() de la última carga completa
+        self.token = uuid.uuid4().hex[:8]  # distingue las secuencias de cada proceso / carga
+
+
+_condicion = threading.Condition()
+_dias = OrderedDict()  # fecha -> _Dia (los menos usados primero)
+
+
+def invalidar_tablero():
+    """Descarta los días en memoria (nueva base de datos)."""
+    with _condicion:
+        _dias.clear()
+        _condicion.notify_all()
+
+
+def _hora(valor):
+    return valor.strftime('%H:%M:%S') if valor else None
+
+
+def _fila(empleado_id, codigo, nombre, valores):
+    """Fila del tablero; `valores` es None si el empleado no tiene Asistencia ese día."""
+    if valores is None:
+        return {'empleado_id': empleado_id, 'codigo': codigo, 'nombre': nombre, 'estado': 'sin_marcar',
+                'entrada': None, 'salida': None, 'observaciones': None}
+    entrada, salida, ultimo, presente, observaciones = valores
+    if ultimo is None and entrada:  # fila anterior al registro de eventos
+        ultimo = 'out' if salida else 'in'
+    if ultimo == 'in':
+        estado = 'adentro'
+    elif ultimo == 'out':
+        estado = 'salio'
+    else:
+        estado = 'justificado' if presente else 'ausente'
+    return {'empleado_id': empleado_id, 'codigo': codigo, 'nombre': nombre, 'estado': estado,
+            'entrada': _hora(entrada), 'salida': _hora(salida), 'observaciones': observaciones}
+
+
+def _consultar(engine, fecha):
+    """{empleado_id: fila} de los empleados activos, en una consulta."""
+    consulta = select(
+        Empleado.id, Empleado.codigo, Empleado.nombre, Empleado.apellido, Asistencia.id,
+        *(getattr(Asistencia, c) for c in _CAMPOS)
+    ).outerjoin(Asistencia, and_(Asistencia.empleado_id == Empleado.id, Asistencia.fecha == fecha)).where(
+        Empleado.estado == EstadoEmpleadoEnum.ACTIVO
+    ).order_by(Empleado.codigo)
+    with engine.connect() as conexion:
+        return {
+            empleado_id: _fila(empleado_id, codigo, f'{nombre} {apellido}', valores if asistencia_id else None)
+            for empleado_id, codigo, nombre, apellido, asistencia_id, *valores in conexion.execute(consulta)
+        }
+
+
+def _registrar(dia, empleado_id, fila):
+    """Aplica una fila (None = baja) si cambió. Llamar con _condicion tomada."""
+    if dia.filas.get(empleado_id) == fila:
+        return False
+    if fila is None:
+        dia.filas.pop(empleado_id, None)
+    else:
+        dia.filas[empleado_id] = fila
+    dia.seq += 1
+    dia.cambios.append((dia.seq, empleado_id))
+    return True
+
+
+def obtener_dia(engine, fecha):
+    """Estado del día, cargándolo (o recargándolo si venció REFRESCO_SEGUNDOS)."""
+    with _condicion:
+        dia = _dias.get(fecha)
+        if dia is not None:
+            _dias.move_to_end(fecha)
+            if dia.cargado is not None and reloj.monotonic() - dia.cargado < REFRESCO_SEGUNDOS:
+                return dia
+
+    filas = _consultar(engine, fecha)  # fuera del candado: no frena a los demás días
+
+    with _condicion:
+        dia = _dias.get(fecha)
+        if dia is None:
+            dia = _dias[fecha] = _Dia(fecha)
+            while len(_dias) > DIAS_EN_MEMORIA:
+                _dias.popitem(last=False)
+        cambios = [_registrar(dia, e, filas.get(e)) for e in set(dia.filas) | set(filas)]
+        dia.cargado = reloj.monotonic()
+        if any(cambios):
+            _condicion.notify_all()
+        return dia
+
+
+# ==================== ACTUALIZACIÓN DESDE LA SESIÓN ====================
+
+@event.listens_for(db.session, 'after_flush')
+def _anotar_cambios(session, flush_context):
+    if not _dias:
+        return
+    anotados = session.info.setdefault('tablero_cambios', {})
+    for obj in chain(session.new, session.dirty):
+        if isinstance(obj, Asistencia) and obj.fecha in _dias:
+            anotados[(obj.fecha, obj.empleado_id)] = tuple(getattr(obj, c) for c in _CAMPOS)
+    for obj in session.deleted:
+        if isinstance(obj, Asistencia) and obj.fecha in _dias:
+            anotados[(obj.fecha, obj.empleado_id)] = None
+
+
+@event.listens_for(db.session, 'after_commit')
+def _publicar_cambios(session):
+    anotados = session.info.pop('tablero_cambios', None)
+    if not anotados:
+        return
+    with _condicion:
+        for (fecha, empleado_id), valores in anotados.items():
+            dia = _dias.get(fecha)
+            if dia is None:
+                continue
+            previa = dia.filas.get(empleado_id)
+            if previa is None:
+                dia.cargado = None  # empleado desconocido (alta reciente): recargar el día
+                continue
+            _registrar(dia, empleado_id, _fila(empleado_id, previa['codigo'], previa['nombre'], valores))
+        _condicion.notify_all()
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _descartar_cambios(session):
+    session.info.pop('tablero_cambios', None)
+
+
+# ==================== FLUJO SSE ====================
+
+def _mensaje(tipo, dia, datos):
+    return f'event: {tipo}\nid: {dia.token}-{dia.seq}\ndata: {json.dumps(datos, ensure_ascii=False)}\n\n'
+
+
+def _resumen(dia):
+    """{estado: cantidad de empleados}."""
+    conteo = {}
+    for fila in dia.filas.values():
+        conteo[fila['estado']] = conteo.get(fila['estado'], 0) + 1
+    return conteo
+
+
+def _estado_completo(dia):
+    return {'fecha': dia.fecha.isoformat(), 'filas': list(dia.filas.values()), 'resumen': _resumen(dia)}
+
+
+def _seq_reanudable(dia, ultimo_id):
+    """Secuencia desde la que se puede reanudar con Last-Event-ID ('token-seq') o None."""
+    token, _, seq = (ultimo_id or '').partition('-')
+    if token != dia.token or not seq.isdigit() or int(seq) > dia.seq:
+        return None
+    seq = int(seq)
+    if seq == dia.seq or (dia.cambios and dia.cambios[0][0] <= seq + 1):
+        return seq
+    return None
+
+
+def flujo_presencia(engine, fecha, ultimo_id=None):
+    """
+    Generador de mensajes SSE del día: `estado` con todas las filas al
+    conectarse (o si se perdieron cambios) y luego `cambio` con las filas
+    modificadas y el resumen por estado. Con `ultimo_id` (Last-Event-ID)
+    reanuda sin repetir el estado si los cambios siguen en el historial.
+    Envía un comentario de latido cada LATIDO_SEGUNDOS sin cambios.
+    """
+    dia = obtener_dia(engine, fecha)
+    with _condicion:
+        visto = _seq_reanudable(dia, ultimo_id)
+        if visto is None:
+            visto, mensaje = dia.seq, _mensaje('estado', dia, _estado_completo(dia))
+        else:
+            mensaje = None
+    if mensaje:
+        yield mensaje
+
+    while True:
+        with _condicion:
+            if dia.seq == visto and _dias.get(fecha) is dia:
+                _condicion.wait(LATIDO_SEGUNDOS)
+            if _dias.get(fecha) is not dia:
+                return  # día descartado de la memoria: el navegador se reconecta
+            if dia.seq == visto:
+                mensaje = ': latido\n\n'
+            elif dia.cambios and dia.cambios[0][0] > visto + 1:
+                mensaje = _mensaje('estado', dia, _estado_completo(dia))  # cambios fuera del historial
+            else:
+                ids = dict.fromkeys(e for s, e in dia.cambios if s > visto)
+                mensaje = _mensaje('cambio', dia, {
+                    'filas': [dia.filas.get(e) or {'empleado_id': e, 'baja': True} for e in ids],
+                    'resumen': _resumen(dia)
+                })
+            visto = dia.seq
+            vencido = dia.cargado is None or reloj.monotonic() - dia.cargado >= REFRESCO_SEGUNDOS
+
+        yield mensaje
+        if vencido:
+            obtener_dia(engine, fecha)
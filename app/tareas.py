@@ -0,0 +1,302 @@
+"""
+tareas.py
+Ejecutor de tareas en segundo plano (liquidaciones, aguinaldos y planillas).
+
+Las tareas se persisten en la tabla `tareas` y se ejecutan en un pool de
+threads que se inicia junto al APScheduler. Las tareas por empleado se
+procesan en lotes: cada lote se confirma en su propio commit junto con el
+avance (`procesados` / `checkpoint`), de modo que si el proceso muere la
+tarea se reanuda desde el último lote confirmado en lugar de empezar de cero.
+"""
+
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask import current_app
+from sqlalchemy import update, or_, and_, func
+
+from .models import db, Tarea, Empleado, EstadoEmpleadoEnum
+from .trazas import Tiempos, nueva_corrida, registrar_evento
+from .empresa_config import empresa_actual
+from .nomina import (
+    calcular_liquidaciones_periodo, guardar_liquidaciones,
+    calcular_aguinaldos, construir_liquidacion_aguinaldo
+)
+
+MIMETYPE_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# tipo -> (función, parámetros requeridos)
+TIPOS_TAREA = {}
+
+_ejecutor = None
+_app = None
+
+
+class TareaCancelada(Exception):
+    """Se lanza entre lotes cuando el usuario pidió cancelar la tarea."""
+
+
+def tipo_tarea(tipo, requeridos=()):
+    """Decorador que registra la función que ejecuta un tipo de tarea."""
+    def decorator(f):
+        TIPOS_TAREA[tipo] = (f, tuple(requeridos))
+        return f
+    return decorator
+
+
+# ==================== EJECUTOR ====================
+
+def iniciar_ejecutor(app):
+    """Crea el pool de workers. Con TAREAS_WORKERS = 0 las tareas solo se ejecutan a mano."""
+    global _ejecutor, _app
+    workers = app.config.get('TAREAS_WORKERS', 0)
+    if workers <= 0 or _ejecutor is not None:
+        return
+    _app = app
+    _ejecutor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tareas')
+
+
+def ejecutor_activo():
+    return _ejecutor is not None
+
+
+def _despachar(tarea_id):
+    if _ejecutor is not None:
+        _ejecutor.submit(_ejecutar_en_contexto, tarea_id)
+
+
+def _ejecutar_en_contexto(tarea_id):
+    with _app.app_context():
+        try:
+            ejecutar_tarea(tarea_id)
+        finally:
+            db.session.remove()
+
+
+def encolar_tarea(tipo, parametros, usuario_id=None):
+    """
+    Persiste una tarea nueva y la envía al pool.
+
+    Raises:
+        ValueError: si el tipo no existe o faltan parámetros
+    """
+    if tipo not in TIPOS_TAREA:
+        raise ValueError(f'Tipo de tarea desconocido: {tipo}')
+    faltantes = [p for p in TIPOS_TAREA[tipo][1] if parametros.get(p) in (None, '')]
+    if faltantes:
+        raise ValueError(f'Faltan parámetros: {", ".join(faltantes)}')
+
+    tarea = Tarea(tipo=tipo, parametros=json.dumps(parametros), usuario_id=usuario_id, estado='PENDIENTE')
+    db.session.add(tarea)
+    db.session.commit()
+    _despachar(tarea.id)
+    return tarea
+
+
+def reanudar_tareas():
+    """Reenvía al pool las tareas pendientes y las huérfanas (EN_PROCESO sin latido reciente)."""
+    limite = datetime.utcnow() - current_app.config['TAREAS_LATIDO_MAXIMO']
+    ids = [t_id for (t_id,) in db.session.query(Tarea.id).filter(_filtro_reclamable(limite)).order_by(Tarea.id)]
+    for tarea_id in ids:
+        _despachar(tarea_id)
+    return ids
+
+
+def _filtro_reclamable(limite):
+    return or_(
+        Tarea.estado == 'PENDIENTE',
+        and_(Tarea.estado == 'EN_PROCESO', or_(Tarea.latido.is_(None), Tarea.latido < limite))
+    )
+
+
+def _reclamar(tarea_id):
+    """UPDATE condicional: solo un worker (de cualquier proceso) se queda con la tarea."""
+    ahora = datetime.utcnow()
+    limite = ahora - current_app.config['TAREAS_LATIDO_MAXIMO']
+    resultado = db.session.execute(
+        update(Tarea)
+        .where(Tarea.id == tarea_id, _filtro_reclamable(limite))
+        .values(estado='EN_PROCESO', latido=ahora, fecha_inicio=func.coalesce(Tarea.fecha_inicio, ahora))
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return resultado.rowcount == 1
+
+
+def ejecutar_tarea(tarea_id):
+    """Ejecuta (o reanuda) una tarea. Retorna False si otro worker ya la tiene."""
+    if not _reclamar(tarea_id):
+        return False
+
+    tarea = db.session.get(Tarea, tarea_id)
+    try:
+        verificar_cancelacion(tarea)
+        funcion = TIPOS_TAREA[tarea.tipo][0]
+        funcion(tarea, json.loads(tarea.parametros or '{}'))
+        tarea.estado = 'COMPLETADA'
+    except TareaCancelada:
+        db.session.rollback()
+        tarea.estado = 'CANCELADA'
+        tarea.mensaje = f'Cancelada por el usuario ({tarea.procesados} de {tarea.total} procesados)'
+    except Exception as e:
+        db.session.rollback()
+        registrar_evento('tarea_fallida', logging.ERROR, exc_info=True, tarea_id=tarea_id, tipo=tarea.tipo)
+        tarea.estado = 'FALLIDA'
+        tarea.mensaje = str(e)
+    tarea.fecha_fin = datetime.utcnow()
+    db.session.commit()
+    return True
+
+
+def solicitar_cancelacion(tarea):
+    """Marca la tarea para cancelar; si aún no empezó se cancela directamente."""
+    if tarea.estado == 'PENDIENTE':
+        tarea.estado = 'CANCELADA'
+        tarea.mensaje = 'Cancelada antes de iniciar'
+        tarea.fecha_fin = datetime.utcnow()
+    tarea.cancelacion_solicitada = True
+    db.session.commit()
+
+
+# ==================== AVANCE POR LOTES ====================
+
+def verificar_cancelacion(tarea):
+    db.session.refresh(tarea, ['cancelacion_solicitada'])
+    if tarea.cancelacion_solicitada:
+        raise TareaCancelada()
+
+
+def confirmar_lote(tarea, procesados, checkpoint, resumen):
+    """Confirma en un solo commit los datos del lote y el avance de la tarea."""
+    tarea.procesados = (tarea.procesados or 0) + procesados
+    tarea.checkpoint = checkpoint
+    tarea.resumen = json.dumps(resumen, default=str)
+    tarea.latido = datetime.utcnow()
+    db.session.commit()
+
+
+def lotes_empleados_activos(tarea):
+    """
+    Ids de empleados activos pendientes (id > checkpoint), agrupados en lotes.
+    En la primera ejecución fija `total`.
+    """
+    query = db.session.query(Empleado.id).filter(Empleado.estado == EstadoEmpleadoEnum.ACTIVO)
+    if tarea.checkpoint is not None:
+        query = query.filter(Empleado.id > tarea.checkpoint)
+    ids = [e_id for (e_id,) in query.order_by(Empleado.id)]
+
+    if tarea.checkpoint is None:
+        tarea.total = len(ids)
+        tarea.procesados = 0
+        db.session.commit()
+
+    tamaño = current_app.config.get('TAREAS_TAMANO_LOTE', 200)
+    for i in range(0, len(ids), tamaño):
+        yield ids[i:i + tamaño]
+
+
+def _resumen_previo(tarea, inicial):
+    resumen = dict(inicial)
+    if tarea.resumen:
+        resumen.update(json.loads(tarea.resumen))
+    return resumen
+
+
+# ==================== TIPOS DE TAREA ====================
+
+@tipo_tarea('liquidacion', requeridos=('periodo',))
+def _tarea_liquidacion(tarea, parametros):
+    periodo = parametros['periodo']
+    resumen = _resumen_previo(tarea, {'periodo': periodo, 'generadas': 0, 'omitidos': 0, 'advertencias': []})
+
+    tiempos = Tiempos()
+    generadas = 0
+
+    for lote in lotes_empleados_activos(tarea):
+        verificar_cancelacion(tarea)
+        with tiempos.etapa('cargar_empleados'):
+            empleados = Empleado.query.filter(Empleado.id.in_(lote)).order_by(Empleado.id).all()
+        calculo = calcular_liquidaciones_periodo(periodo, empleados, tiempos=tiempos)
+
+        guardar_liquidaciones(periodo, calculo['resultados'], tiempos)
+
+        generadas += len(calculo['resultados'])
+        resumen['generadas'] += len(calculo['resultados'])
+        resumen['omitidos'] += calculo['omitidos']
+        resumen['advertencias'].extend(calculo['advertencias'])
+        with tiempos.etapa('commit'):
+            confirmar_lote(tarea, len(lote), lote[-1], resumen)
+
+    tarea.mensaje = f"{resumen['generadas']} liquidaciones generadas para {periodo}"
+    # Solo los lotes de esta ejecución (una tarea reanudada registra otra corrida)
+    corrida = nueva_corrida('liquidacion', periodo, tiempos, generadas, usuario_id=tarea.usuario_id, tarea_id=tarea.id)
+    registrar_evento('liquidaciones_generadas', periodo=periodo, tarea_id=tarea.id,
+                     generadas=generadas, duracion_ms=corrida.duracion_ms)
+
+
+@tipo_tarea('aguinaldo', requeridos=('año',))
+def _tarea_aguinaldo(tarea, parametros):
+    año = int(parametros['año'])
+    mes_corte = int(parametros.get('mes_corte') or 12)
+    dia_corte = int(parametros.get('dia_corte') or 31)
+    fecha_corte = date(año, mes_corte, dia_corte)
+    periodo = f"{año}-{mes_corte:02d}"
+    resumen = _resumen_previo(tarea, {'año': año, 'generados': 0, 'duplicados': 0, 'total_bruto': '0', 'total_neto': '0'})
+
+    for lote in lotes_empleados_activos(tarea):
+        verificar_cancelacion(tarea)
+        empleados = Empleado.query.filter(Empleado.id.in_(lote)).order_by(Empleado.id).all()
+        calculo = calcular_aguinaldos(año, fecha_corte, empleados)
+
+        for resultado in calculo['resultados']:
+            db.session.add(construir_liquidacion_aguinaldo(resultado, periodo))
+
+        resumen['generados'] += len(calculo['resultados'])
+        resumen['duplicados'] += calculo['duplicados']
+        resumen['total_bruto'] = str(Decimal(resumen['total_bruto']) + sum((r['aguinaldo_bruto'] for r in calculo['resultados']), Decimal('0')))
+        resumen['total_neto'] = str(Decimal(resumen['total_neto']) + sum((r['aguinaldo_neto'] for r in calculo['resultados']), Decimal('0')))
+        confirmar_lote(tarea, len(lote), lote[-1], resumen)
+
+    tarea.mensaje = f"{resumen['generados']} aguinaldos generados para {año}"
+
+
+def _guardar_archivo(tarea, out, filename, mimetype=MIMETYPE_XLSX):
+    tarea.resultado = out.getvalue()
+    tarea.resultado_nombre = filename
+    tarea.resultado_mimetype = mimetype
+    tarea.total = tarea.procesados = 1
+    tarea.mensaje = f'Archivo {filename} generado'
+
+
+@tipo_tarea('planilla_mtess', requeridos=('tipo', 'anio'))
+def _tarea_planilla_mtess(tarea, parametros):
+    from .routes.rrhh import construir_planilla_mtess
+
+    mes = int(parametros['mes']) if parametros.get('mes') else None
+    out, filename = construir_planilla_mtess(parametros['tipo'], int(parametros['anio']), mes)
+    _guardar_archivo(tarea, out, filename)
+
+
+@tipo_tarea('planilla_ips', requeridos=('anio', 'mes'))
+def _tarea_planilla_ips(tarea, parametros):
+    from .routes.rrhh import construir_planilla_ips_rei, liquidaciones_planilla_ips
+
+    periodo = f"{int(parametros['anio'])}-{int(parametros['mes']):02d}"
+    empresa = empresa_actual()
+    if not empresa:
+        raise ValueError('No hay empresa configurada en el sistema')
+    if not empresa.numero_patronal:
+        raise ValueError(f'La empresa "{empresa.nombre}" no tiene número patronal configurado')
+
+    liquidaciones = liquidaciones_planilla_ips(periodo)
+    if not liquidaciones:
+        raise ValueError(f'No hay liquidaciones de empleados ACTIVOS para {periodo}')
+
+    out, filename = construir_planilla_ips_rei(empresa, periodo, liquidaciones)
+    _guardar_archivo(tarea, out, filename)
+    sin_ips = [l.empleado.nombre_completo for l in liquidaciones if not l.empleado.ips_numero]
+    if sin_ips:
+        tarea.resumen = json.dumps({'empleados_sin_ips': sin_ips})
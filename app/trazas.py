@@ -0,0 +1,121 @@
+"""
+trazas.py
+Logger estructurado y tiempos por etapa de las corridas de nómina.
+
+El logger `rrhh.nomina` emite una línea JSON por evento y por defecto solo
+muestra WARNING o superior (NOMINA_LOG_NIVEL). `Tiempos` acumula la
+duración de cada etapa de una corrida; al terminar se guarda en
+`corridas_nomina` y se consulta en /rrhh/liquidaciones/runs/<id>/perf.
+"""
+
+import json
+import logging
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+from .models import db, CorridaNomina
+
+logger = logging.getLogger('rrhh.nomina')
+
+# Orden en que se muestran las etapas de una liquidación
+ETAPAS_LIQUIDACION = ('cargar_empleados', 'agregar_fuentes', 'calcular', 'insertar', 'marcar_aplicados', 'commit')
+
+
+# ==================== LOGGER ====================
+
+class FormatoEstructurado(logging.Formatter):
+    """Una línea JSON por registro: ts, nivel, evento y los campos extra."""
+
+    def format(self, record):
+        datos = {
+            'ts': datetime.utcfromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'evento': record.getMessage(),
+        }
+        datos.update(getattr(record, 'campos', {}))
+        if record.exc_info:
+            datos['excepcion'] = self.formatException(record.exc_info)
+        return json.dumps(datos, default=str, ensure_ascii=False)
+
+
+def configurar_logger(app):
+    logger.setLevel(app.config.get('NOMINA_LOG_NIVEL', 'WARNING'))
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(FormatoEstructurado())
+        logger.addHandler(handler)
+    logger.propagate = False
+
+
+def registrar_evento(evento, nivel=logging.INFO, exc_info=False, **campos):
+    """logger.log con campos estructurados (no se formatea nada si el nivel está apagado)."""
+    logger.log(nivel, evento, exc_info=exc_info, extra={'campos': campos})
+
+
+# ==================== TIEMPOS ====================
+
+class Tiempos:
+    """Duración acumulada (ms) por etapa de una corrida."""
+
+    def __init__(self):
+        self.inicio = datetime.utcnow()
+        self._t0 = time.perf_counter()
+        self.etapas = {}
+
+    @contextmanager
+    def etapa(self, nombre):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.etapas[nombre] = self.etapas.get(nombre, 0.0) + (time.perf_counter() - t) * 1000
+
+    @property
+    def total_ms(self):
+        return (time.perf_counter() - self._t0) * 1000
+
+
+def medir(tiempos, nombre):
+    """Contexto de la etapa `nombre`, o nada si no se miden tiempos."""
+    return tiempos.etapa(nombre) if tiempos is not None else nullcontext()
+
+
+def nueva_corrida(tipo, periodo, tiempos, empleados, estado='COMPLETADA', usuario_id=None, tarea_id=None):
+    """Crea (y agrega a la sesión, sin commit) la CorridaNomina con los tiempos medidos."""
+    corrida = CorridaNomina(
+        tipo=tipo,
+        periodo=periodo,
+        estado=estado,
+        empleados=empleados,
+        etapas=json.dumps({k: round(v, 3) for k, v in tiempos.etapas.items()}),
+        duracion_ms=round(tiempos.total_ms, 3),
+        usuario_id=usuario_id,
+        tarea_id=tarea_id,
+        fecha_inicio=tiempos.inicio,
+        fecha_fin=datetime.utcnow(),
+    )
+    db.session.add(corrida)
+    return corrida
+
+
+def corrida_a_dict(corrida):
+    etapas = json.loads(corrida.etapas or '{}')
+    orden = [e for e in ETAPAS_LIQUIDACION if e in etapas] + [e for e in etapas if e not in ETAPAS_LIQUIDACION]
+    medido = sum(etapas.values())
+    return {
+        'id': corrida.id,
+        'tipo': corrida.tipo,
+        'periodo': corrida.periodo,
+        'estado': corrida.estado,
+        'tarea_id': corrida.tarea_id,
+        'empleados': corrida.empleados,
+        'fecha_inicio': corrida.fecha_inicio.strftime('%Y-%m-%d %H:%M:%S') if corrida.fecha_inicio else None,
+        'duracion_ms': corrida.duracion_ms,
+        'por_empleado_ms': round(corrida.duracion_ms / corrida.empleados, 3) if corrida.empleados else None,
+        'etapas': [
+            {'etapa': e, 'ms': etapas[e], 'porcentaje': round(etapas[e] * 100 / medido, 1) if medido else 0}
+            for e in orden
+        ],
+    }
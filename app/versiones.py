@@ -0,0 +1,29 @@
+"""
+versiones.py
+Contadores de versión en estado_sistema para invalidar cachés entre procesos.
+
+Quien modifica un dato cacheado incrementa su contador en la misma
+transacción (`incrementar_version`). Cada proceso compara periódicamente el
+contador con el que tenía al cargar (`leer_version`, una lectura por clave
+primaria) y descarta su copia si cambió.
+"""
+
+from sqlalchemy import update, cast, Integer, String
+
+from .models import db, EstadoSistema
+
+
+def leer_version(clave):
+    """Valor actual del contador (None si nunca se incrementó)."""
+    fila = db.session.get(EstadoSistema, clave, populate_existing=True)
+    return fila.valor if fila else None
+
+
+def incrementar_version(clave):
+    """Incrementa el contador en la transacción actual, creándolo si no existe."""
+    tabla = EstadoSistema.__table__
+    resultado = db.session.execute(update(tabla).where(tabla.c.clave == clave).values(
+        valor=cast(cast(tabla.c.valor, Integer) + 1, String)
+    ))
+    if resultado.rowcount == 0:
+        db.session.add(EstadoSistema(clave=clave, valor='1'))
@@ -0,0 +1,59 @@
+"""
+Benchmarks de las operaciones de nómina y asistencias más costosas.
+Se ejecutan en este orden para cada tamaño: primero las de solo lectura,
+luego la generación de liquidaciones y las descargas que dependen de ellas.
+"""
+from datetime import date
+
+from conftest import PERIODO
+
+AÑO, MES = PERIODO
+PERIODO_TEXTO = f'{AÑO}-{MES:02d}'
+
+
+def _ok(respuesta, esperado=200):
+    assert respuesta.status_code == esperado, respuesta.data[:500]
+    return respuesta
+
+
+def bench_metricas_asistencias(entorno, medir):
+    cliente = entorno['cliente']
+    medir('metricas_asistencias', lambda: _ok(cliente.get(f'/rrhh/metricas/asistencias?mes={MES}&year={AÑO}')))
+
+
+def bench_preview_liquidacion(entorno, medir):
+    cliente = entorno['cliente']
+    medir('preview_liquidacion', lambda: _ok(cliente.get(f'/rrhh/liquidaciones/preview/{PERIODO_TEXTO}')))
+
+
+def bench_generar_liquidacion(entorno, medir):
+    from app.models import Liquidacion
+
+    cliente = entorno['cliente']
+    medir('generar_liquidacion',
+          lambda: _ok(cliente.post('/rrhh/liquidaciones/generar', data={'periodo': PERIODO_TEXTO}), 302),
+          repeticiones=1)
+    with entorno['app'].app_context():
+        assert Liquidacion.query.filter_by(periodo=PERIODO_TEXTO).count() == entorno['tamano']
+
+
+def bench_descargar_planilla_mensual(entorno, medir):
+    cliente = entorno['cliente']
+    medir('descargar_planilla_mensual',
+          lambda: _ok(cliente.get(f'/rrhh/liquidaciones/planilla-mensual/{PERIODO_TEXTO}/pdf')))
+
+
+def bench_planillas_ips_rei_download(entorno, medir):
+    cliente = entorno['cliente']
+    medir('planillas_ips_rei_download',
+          lambda: _ok(cliente.get(f'/rrhh/planillas/ips-rei/download?mes={MES}&anio={AÑO}')))
+
+
+def bench_cerrar_asistencias_automatico(entorno, medir):
+    """Cierre de un día hábil sin marcaciones: crea una asistencia por empleado."""
+    from app.routes.rrhh import cerrar_asistencias_automatico
+
+    fecha = date(2025, 12, 1)
+    with entorno['app'].app_context():
+        stats = medir('cerrar_asistencias_automatico', lambda: cerrar_asistencias_automatico(fecha), repeticiones=1)
+    assert stats['procesados'] == entorno['tamano'], stats
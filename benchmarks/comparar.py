@@ -0,0 +1,51 @@
+"""
+Compara dos archivos de resultados de benchmarks (mediana por operación y tamaño).
+
+Ejecutar:
+    python benchmarks/comparar.py base.json nuevo.json [--umbral 1.2]
+
+Sale con código 1 si alguna operación es más lenta que `umbral` veces la base.
+"""
+
+import argparse
+import json
+import sys
+
+
+def _cargar(ruta):
+    with open(ruta, encoding='utf-8') as f:
+        datos = json.load(f)
+    return datos, {(r['operacion'], r['empleados']): r['mediana'] for r in datos['resultados']}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compara resultados de benchmarks entre commits')
+    parser.add_argument('base')
+    parser.add_argument('nuevo')
+    parser.add_argument('--umbral', type=float, default=1.2, help='Razón nuevo/base considerada regresión')
+    args = parser.parse_args()
+
+    datos_base, base = _cargar(args.base)
+    datos_nuevo, nuevo = _cargar(args.nuevo)
+    print(f"Base: {datos_base['commit']}   Nuevo: {datos_nuevo['commit']}\n")
+    print(f"{'operación':32} {'empleados':>9} {'base (s)':>10} {'nuevo (s)':>10} {'razón':>7}")
+
+    regresiones = 0
+    for clave in sorted(set(base) | set(nuevo), key=lambda c: (c[0], c[1])):
+        operacion, empleados = clave
+        b, n = base.get(clave), nuevo.get(clave)
+        if b is None or n is None:
+            print(f"{operacion:32} {empleados:>9} {b if b is not None else '-':>10} {n if n is not None else '-':>10}")
+            continue
+        razon = n / b if b else float('inf')
+        marca = ''
+        if razon > args.umbral:
+            marca = '  ⚠️ regresión'
+            regresiones += 1
+        print(f"{operacion:32} {empleados:>9} {b:>10.4f} {n:>10.4f} {razon:>7.2f}{marca}")
+
+    sys.exit(1 if regresiones else 0)
+
+
+if __name__ == '__main__':
+    main()
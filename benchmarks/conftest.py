@@ -0,0 +1,133 @@
+"""
+Benchmarks de nómina y asistencias sobre datos sintéticos.
+
+Cada tamaño (empleados) genera su propia BD con
+scripts/generar_datos_sinteticos.py y mide las operaciones de
+bench_nomina.py a través del cliente de pruebas (incluye la ruta completa).
+Los tiempos se escriben en JSON para comparar entre commits:
+
+    python -m pytest benchmarks --tamanos 100,1000,10000
+    python -m pytest benchmarks --tamanos 1000 --bd-url postgresql://localhost/rrhh_bench
+    python benchmarks/comparar.py benchmarks/resultados/A.json benchmarks/resultados/B.json
+
+La BD de --bd-url se vacía (drop_all) antes de cada tamaño.
+"""
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+PERIODO = (2025, 11)
+
+_resultados = []
+
+
+def pytest_addoption(parser):
+    parser.addoption('--tamanos', default=os.environ.get('BENCH_TAMANOS', '100,1000,10000'),
+                     help='Cantidades de empleados separadas por coma')
+    parser.addoption('--meses', type=int, default=1, help='Meses de historia generados (terminan en 2025-11)')
+    parser.addoption('--repeticiones', type=int, default=3, help='Repeticiones de las operaciones de solo lectura')
+    parser.addoption('--bd-url', default=os.environ.get('BENCH_DATABASE_URL'),
+                     help='BD a usar (por defecto, SQLite en un directorio temporal)')
+    parser.addoption('--resultados', default=os.path.join(RAIZ, 'benchmarks', 'resultados'),
+                     help='Directorio donde se escribe el JSON de resultados')
+
+
+def pytest_generate_tests(metafunc):
+    if 'tamano' in metafunc.fixturenames:
+        tamanos = [int(t) for t in metafunc.config.getoption('tamanos').split(',') if t.strip()]
+        metafunc.parametrize('tamano', tamanos, scope='module', ids=[f'{t}emp' for t in tamanos])
+
+
+@pytest.fixture(scope='module')
+def entorno(tamano, request, tmp_path_factory):
+    """App con `tamano` empleados sintéticos y un cliente logueado como RRHH."""
+    from app import create_app
+    from app.config import TestingConfig
+    from app.models import db, Usuario, RoleEnum
+    from scripts.generar_datos_sinteticos import generar_datos
+
+    url = request.config.getoption('bd_url') or f"sqlite:///{tmp_path_factory.mktemp('bench') / 'bench.db'}"
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(TestingConfig, 'SQLALCHEMY_DATABASE_URI', url)
+        app = create_app('testing')
+    app.config['SESSION_COOKIE_SECURE'] = False
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        generar_datos(tamano, request.config.getoption('meses'), PERIODO, eco=lambda *_: None)
+
+        usuario = Usuario(nombre_usuario='bench', email='bench@sintetico.local',
+                          nombre_completo='Benchmark', rol=RoleEnum.RRHH)
+        usuario.set_password('bench')
+        db.session.add(usuario)
+        db.session.commit()
+
+        cliente = app.test_client()
+        cliente.post('/auth/login', data={'nombre_usuario': 'bench', 'password': 'bench'})
+        yield {'app': app, 'cliente': cliente, 'tamano': tamano, 'bd': db.engine.dialect.name}
+
+        db.session.remove()
+        db.drop_all()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def medir(entorno, request):
+    """medir(operacion, funcion, repeticiones=None): ejecuta y registra los tiempos."""
+    def _medir(operacion, funcion, repeticiones=None):
+        repeticiones = repeticiones or request.config.getoption('repeticiones')
+        tiempos = []
+        resultado = None
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            resultado = funcion()
+            tiempos.append(time.perf_counter() - inicio)
+        _resultados.append({
+            'operacion': operacion,
+            'empleados': entorno['tamano'],
+            'bd': entorno['bd'],
+            'segundos': [round(t, 4) for t in tiempos],
+            'mediana': round(statistics.median(tiempos), 4),
+            'minimo': round(min(tiempos), 4),
+        })
+        return resultado
+    return _medir
+
+
+def _commit_actual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'desconocido'
+
+
+def pytest_sessionfinish(session, exitstatus):
+    if not _resultados:
+        return
+    commit = _commit_actual()
+    destino = session.config.getoption('resultados')
+    os.makedirs(destino, exist_ok=True)
+    archivo = os.path.join(destino, f"{datetime.now():%Y%m%d_%H%M%S}_{commit}.json")
+    with open(archivo, 'w', encoding='utf-8') as f:
+        json.dump({
+            'commit': commit,
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'meses': session.config.getoption('meses'),
+            'resultados': _resultados,
+        }, f, indent=2, ensure_ascii=False)
+    print(f"\n📊 Resultados de benchmarks: {archivo}")
@@ -0,0 +1,59 @@
+"""
+Migración: Tabla asistencia_resumen_mensual
+Fecha: 2026-10-18
+Descripción: Contadores de asistencia por (empleado_id, año, mes) que leen la
+nómina, las métricas y el perfil en lugar de recontar asistencias. Crea la
+tabla y la llena a partir de las asistencias existentes; desde entonces se
+mantiene sola en cada flush de Asistencia (app/resumen_asistencia.py).
+
+Para recalcular un mes más adelante:
+    flask asistencia-resumen-reconstruir --año 2025 --mes 11
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Cargar variables de entorno desde .env
+from dotenv import load_dotenv
+load_dotenv()
+
+from app import create_app, db
+from app.models import AsistenciaResumenMensual
+from app.resumen_asistencia import reconstruir_resumen, meses_con_asistencias
+
+def upgrade():
+    """Crear y poblar asistencia_resumen_mensual"""
+    app = create_app()
+
+    with app.app_context():
+        try:
+            print("\n🔧 Creando tabla asistencia_resumen_mensual...")
+            AsistenciaResumenMensual.__table__.create(db.engine, checkfirst=True)
+            print("   ✅ Tabla creada")
+
+            meses = meses_con_asistencias()
+            print(f"📊 Reconstruyendo {len(meses)} meses de asistencias...")
+            for año, mes in meses:
+                filas = reconstruir_resumen(año, mes)
+                db.session.commit()
+                print(f"   ✅ {año}-{mes:02d}: {filas} empleados")
+
+            print("\n✅ Migración completada exitosamente!")
+
+        except Exception as e:
+            print(f"\n❌ Error en migración: {e}")
+            db.session.rollback()
+            raise
+
+def downgrade():
+    """Eliminar asistencia_resumen_mensual"""
+    app = create_app()
+
+    with app.app_context():
+        print("\n🔧 Revirtiendo migración...")
+        AsistenciaResumenMensual.__table__.drop(db.engine, checkfirst=True)
+        print("✅ Migración revertida")
+
+if __name__ == '__main__':
+    upgrade()
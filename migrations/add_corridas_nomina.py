@@ -0,0 +1,47 @@
+"""
+Migración: Tabla corridas_nomina
+Fecha: 2026-10-18
+Descripción: Registro de cada generación de liquidaciones (web o tarea en
+segundo plano) con la duración de sus etapas: cargar empleados, agregar
+fuentes, calcular, insertar, marcar aplicados y commit. Se consulta en
+/rrhh/liquidaciones/runs/<id>/perf.
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Cargar variables de entorno desde .env
+from dotenv import load_dotenv
+load_dotenv()
+
+from app import create_app, db
+from app.models import CorridaNomina
+
+def upgrade():
+    """Crear corridas_nomina"""
+    app = create_app()
+
+    with app.app_context():
+        try:
+            print("\n🔧 Creando tabla corridas_nomina...")
+            CorridaNomina.__table__.create(db.engine, checkfirst=True)
+            print("   ✅ Tabla creada")
+
+            print("\n✅ Migración completada exitosamente!")
+
+        except Exception as e:
+            print(f"\n❌ Error en migración: {e}")
+            raise
+
+def downgrade():
+    """Eliminar corridas_nomina"""
+    app = create_app()
+
+    with app.app_context():
+        print("\n🔧 Revirtiendo migración...")
+        CorridaNomina.__table__.drop(db.engine, checkfirst=True)
+        print("✅ Migración revertida")
+
+if __name__ == '__main__':
+    upgrade()
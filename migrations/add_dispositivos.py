@@ -0,0 +1,170 @@
+"""
+Migración: Tabla dispositivos y asistencia_eventos.dispositivo_id
+Fecha: 2026-10-18
+Descripción: El JSON {ip, user_agent} de cada marcación pasa a la tabla
+dispositivos (una fila por origen, ip y user_agent, ver app/dispositivos.py)
+y el evento guarda solo dispositivo_id. Los eventos existentes se convierten
+por lotes de TAMANO_LOTE con un commit por lote, así que se puede
+interrumpir y volver a ejecutar. Si detalles trae otras claves, solo esas
+quedan en detalles. Al final informa el espacio ahorrado.
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Cargar variables de entorno desde .env
+from dotenv import load_dotenv
+load_dotenv()
+
+import json
+from sqlalchemy import text, inspect, select, update, bindparam, func
+
+from app import create_app, db
+from app.models import AsistenciaEvento, Dispositivo
+from app.dispositivos import id_dispositivo
+
+TAMANO_LOTE = 5000
+CLAVES_DISPOSITIVO = ('ip', 'user_agent')
+
+def _bytes_detalles():
+    """Bytes de texto en asistencia_eventos.detalles + los de la tabla dispositivos."""
+    eventos = db.session.query(func.coalesce(func.sum(func.length(AsistenciaEvento.detalles)), 0)).scalar()
+    dispositivos = db.session.query(func.coalesce(func.sum(
+        func.length(Dispositivo.hash) + func.coalesce(func.length(Dispositivo.origen), 0) +
+        func.coalesce(func.length(Dispositivo.ip), 0) + func.coalesce(func.length(Dispositivo.user_agent), 0)
+    ), 0)).scalar()
+    return int(eventos) + int(dispositivos)
+
+def _bytes_tabla():
+    """Tamaño en disco de asistencia_eventos con índices (solo PostgreSQL)."""
+    if db.engine.dialect.name != 'postgresql':
+        return None
+    return db.session.execute(text("""
+        SELECT COALESCE(SUM(pg_total_relation_size(c.oid)), 0) FROM pg_class c
+        WHERE c.relname = 'asistencia_eventos'
+           OR c.oid IN (SELECT inhrelid FROM pg_inherits i JOIN pg_class p ON p.oid = i.inhparent
+                        WHERE p.relname = 'asistencia_eventos')
+    """)).scalar()
+
+def _resto(detalles):
+    """(ip, user_agent, JSON con las demás claves o None); None si detalles no es un objeto JSON."""
+    try:
+        datos = json.loads(detalles)
+    except ValueError:
+        return None
+    if not isinstance(datos, dict):
+        return None
+    resto = {k: v for k, v in datos.items() if k not in CLAVES_DISPOSITIVO}
+    return datos.get('ip'), datos.get('user_agent'), json.dumps(resto) if resto else None
+
+def upgrade():
+    """Crear dispositivos y convertir asistencia_eventos.detalles por lotes"""
+    app = create_app()
+
+    with app.app_context():
+        try:
+            print("\n🔧 Creando tabla dispositivos...")
+            Dispositivo.__table__.create(db.engine, checkfirst=True)
+            columnas = [c['name'] for c in inspect(db.engine).get_columns('asistencia_eventos')]
+            if 'dispositivo_id' not in columnas:
+                db.session.execute(text(
+                    "ALTER TABLE asistencia_eventos ADD COLUMN dispositivo_id INTEGER REFERENCES dispositivos (id)"
+                ))
+                db.session.commit()
+            print("   ✅ Tabla y columna listas")
+
+            antes, tabla_antes = _bytes_detalles(), _bytes_tabla()
+            evento = AsistenciaEvento.__table__
+            actualizar = update(evento).where(
+                evento.c.id == bindparam('e_id'), evento.c.ts == bindparam('e_ts')
+            ).values(dispositivo_id=bindparam('d_id'), detalles=bindparam('d_detalles'))
+
+            print("\n🔧 Convirtiendo eventos...")
+            ultimo, convertidos, omitidos = 0, 0, 0
+            while True:
+                filas = db.session.execute(
+                    select(evento.c.id, evento.c.ts, evento.c.origen, evento.c.detalles).where(
+                        evento.c.id > ultimo, evento.c.detalles.isnot(None), evento.c.dispositivo_id.is_(None)
+                    ).order_by(evento.c.id).limit(TAMANO_LOTE)
+                ).all()
+                if not filas:
+                    break
+                cambios = []
+                for id_, ts, origen, detalles in filas:
+                    partes = _resto(detalles)
+                    if partes is None:
+                        omitidos += 1
+                        continue
+                    ip, user_agent, resto = partes
+                    cambios.append({'e_id': id_, 'e_ts': ts, 'd_id': id_dispositivo(origen, ip, user_agent),
+                                    'd_detalles': resto})
+                if cambios:
+                    db.session.execute(actualizar, cambios)
+                db.session.commit()
+                convertidos += len(cambios)
+                ultimo = filas[-1][0]
+                print(f"   … {convertidos} eventos convertidos (hasta id {ultimo})")
+
+            despues = _bytes_detalles()
+            print(f"   ✅ {convertidos} eventos convertidos, {omitidos} con detalles no JSON sin cambios")
+            print(f"   ✅ {db.session.query(func.count(Dispositivo.id)).scalar()} dispositivos distintos")
+            print(f"   📉 Texto de detalles: {antes / 1024:,.1f} KB -> {despues / 1024:,.1f} KB "
+                  f"(ahorro {(antes - despues) / 1024:,.1f} KB)")
+            if tabla_antes is not None:
+                print(f"   📉 asistencia_eventos en disco: {tabla_antes / 1048576:,.1f} MB antes; "
+                      f"el espacio se recupera con VACUUM FULL asistencia_eventos (o pg_repack)")
+            print("\n✅ Migración completada exitosamente!")
+
+        except Exception as e:
+            print(f"\n❌ Error en migración: {e}")
+            db.session.rollback()
+            raise
+
+def downgrade():
+    """Volver a escribir ip/user_agent en detalles y eliminar dispositivos"""
+    app = create_app()
+
+    with app.app_context():
+        try:
+            print("\n🔧 Revirtiendo migración...")
+            evento = AsistenciaEvento.__table__
+            dispositivos = {d.id: d for d in Dispositivo.query.all()}
+            actualizar = update(evento).where(
+                evento.c.id == bindparam('e_id'), evento.c.ts == bindparam('e_ts')
+            ).values(detalles=bindparam('d_detalles'), dispositivo_id=None)
+
+            ultimo = 0
+            while True:
+                filas = db.session.execute(
+                    select(evento.c.id, evento.c.ts, evento.c.dispositivo_id, evento.c.detalles).where(
+                        evento.c.id > ultimo, evento.c.dispositivo_id.isnot(None)
+                    ).order_by(evento.c.id).limit(TAMANO_LOTE)
+                ).all()
+                if not filas:
+                    break
+                cambios = []
+                for id_, ts, dispositivo_id, detalles in filas:
+                    dispositivo = dispositivos[dispositivo_id]
+                    datos = {'ip': dispositivo.ip, 'user_agent': dispositivo.user_agent, **json.loads(detalles or '{}')}
+                    cambios.append({'e_id': id_, 'e_ts': ts, 'd_detalles': json.dumps(datos)})
+                db.session.execute(actualizar, cambios)
+                db.session.commit()
+                ultimo = filas[-1][0]
+
+            if db.engine.dialect.name == 'sqlite':
+                # SQLite no elimina columnas con clave foránea: queda en NULL, sin uso
+                print("   ℹ️ asistencia_eventos.dispositivo_id queda en NULL (SQLite)")
+            else:
+                db.session.execute(text("ALTER TABLE asistencia_eventos DROP COLUMN dispositivo_id"))
+                db.session.commit()
+            Dispositivo.__table__.drop(db.engine, checkfirst=True)
+            print("✅ Migración revertida")
+
+        except Exception as e:
+            print(f"\n❌ Error al revertir: {e}")
+            db.session.rollback()
+            raise
+
+if __name__ == '__main__':
+    upgrade()
@@ -0,0 +1,66 @@
+"""
+Migración: Estado de marcaciones en tabla asistencias
+Fecha: 2026-10-18
+Descripción: Columnas con el estado acumulado de las marcaciones del día
+(salida/regreso del almuerzo, cantidad de eventos, último tipo) para que
+/asistencia/registrar aplique cada marcación en O(1) sin releer los eventos
+(app/marcaciones.py). Las filas existentes quedan con eventos = NULL y se
+reconstruyen desde asistencia_eventos en su próxima marcación.
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Cargar variables de entorno desde .env
+from dotenv import load_dotenv
+load_dotenv()
+
+from app import create_app, db
+from sqlalchemy import text, inspect
+
+COLUMNAS = (
+    ('salida_almuerzo', 'TIME'),
+    ('regreso_almuerzo', 'TIME'),
+    ('eventos', 'INTEGER'),
+    ('ultimo_evento', 'VARCHAR(10)'),
+)
+
+def upgrade():
+    """Agregar columnas de estado"""
+    app = create_app()
+
+    with app.app_context():
+        try:
+            print("\n🔧 Agregando estado de marcaciones a tabla asistencias...")
+            existentes = {c['name'] for c in inspect(db.engine).get_columns('asistencias')}
+            for nombre, tipo in COLUMNAS:
+                if nombre in existentes:
+                    print(f"   ⚠️ Columna {nombre} ya existe")
+                    continue
+                db.session.execute(text(f"ALTER TABLE asistencias ADD COLUMN {nombre} {tipo}"))
+                print(f"   ✅ Columna {nombre} agregada")
+            db.session.commit()
+
+            print("\n✅ Migración completada exitosamente!")
+
+        except Exception as e:
+            print(f"\n❌ Error en migración: {e}")
+            db.session.rollback()
+            raise
+
+def downgrade():
+    """Eliminar columnas de estado"""
+    app = create_app()
+
+    with app.app_context():
+        print("\n🔧 Revirtiendo migración...")
+        existentes = {c['name'] for c in inspect(db.engine).get_columns('asistencias')}
+        for nombre, _ in COLUMNAS:
+            if nombre in existentes:
+                db.session.execute(text(f"ALTER TABLE asistencias DROP COLUMN {nombre}"))
+        db.session.commit()
+        print("✅ Migración revertida")
+
+if __name__ == '__main__':
+    upgrade()
@@ -0,0 +1,59 @@
+"""
+Migración: Tabla estado_sistema
+Fecha: 2026-10-18
+Descripción: Valores de control de los procesos programados. La primera
+clave es asistencias_cerradas_hasta, la marca de la tarea que recupera los
+días sin cerrar (app/cierre_asistencias.py). Esa tarea reemplaza la
+verificación de ausencias retroactivas que hacía el dashboard en cada carga.
+La marca se inicializa con la última fecha con asistencias.
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Cargar variables de entorno desde .env
+from dotenv import load_dotenv
+load_dotenv()
+
+from sqlalchemy import func
+
+from app import create_app, db
+from app.models import EstadoSistema, Asistencia
+from app.cierre_asistencias import CLAVE_CERRADO_HASTA, leer_cerrado_hasta
+
+def upgrade():
+    """Crear estado_sistema e inicializar la marca de cierres"""
+    app = create_app()
+
+    with app.app_context():
+        try:
+            print("\n🔧 Creando tabla estado_sistema...")
+            EstadoSistema.__table__.create(db.engine, checkfirst=True)
+            print("   ✅ Tabla creada")
+
+            if leer_cerrado_hasta() is None:
+                ultima = db.session.query(func.max(Asistencia.fecha)).scalar()
+                if ultima:
+                    db.session.add(EstadoSistema(clave=CLAVE_CERRADO_HASTA, valor=ultima.isoformat()))
+                    db.session.commit()
+                    print(f"   ✅ Marca {CLAVE_CERRADO_HASTA} = {ultima}")
+
+            print("\n✅ Migración completada exitosamente!")
+
+        except Exception as e:
+            print(f"\n❌ Error en migración: {e}")
+            db.session.rollback()
+            raise
+
+def downgrade():
+    """Eliminar estado_sistema"""
+    app = create_app()
+
+    with app.app_context():
+        print("\n🔧 Revirtiendo migración...")
+        EstadoSistema.__table__.drop(db.engine, checkfirst=True)
+        print("✅ Migración revertida")
+
+if __name__ == '__main__':
+    upgrade()
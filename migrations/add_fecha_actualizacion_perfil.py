@@ -0,0 +1,62 @@
+"""
+Migración: fecha_actualizacion en las tablas del perfil del empleado
+Fecha: 2026-10-18
+Descripción: /rrhh/api/empleados/<id>/perfil versiona cada sección con
+(cantidad, máximo id, máximo fecha_actualizacion) de sus tablas
+(app/perfil_empleado.py) y responde 304 a un If-None-Match vigente. Las
+ediciones actualizan la columna por onupdate. Las filas existentes quedan en
+NULL; su primera edición las completa.
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Cargar variables de entorno desde .env
+from dotenv import load_dotenv
+load_dotenv()
+
+from app import create_app, db
+from sqlalchemy import text, inspect
+
+TABLAS = ('asistencias', 'vacaciones', 'permisos', 'sanciones', 'liquidaciones', 'anticipos', 'ingresos_extras')
+
+def upgrade():
+    """Agregar fecha_actualizacion"""
+    app = create_app()
+
+    with app.app_context():
+        try:
+            tipo = 'TIMESTAMP' if db.engine.dialect.name == 'postgresql' else 'DATETIME'
+            print("\n🔧 Agregando fecha_actualizacion a las tablas del perfil...")
+            for tabla in TABLAS:
+                existentes = {c['name'] for c in inspect(db.engine).get_columns(tabla)}
+                if 'fecha_actualizacion' in existentes:
+                    print(f"   ⚠️ {tabla}.fecha_actualizacion ya existe")
+                    continue
+                db.session.execute(text(f"ALTER TABLE {tabla} ADD COLUMN fecha_actualizacion {tipo}"))
+                print(f"   ✅ {tabla}.fecha_actualizacion agregada")
+            db.session.commit()
+
+            print("\n✅ Migración completada exitosamente!")
+
+        except Exception as e:
+            print(f"\n❌ Error en migración: {e}")
+            db.session.rollback()
+            raise
+
+def downgrade():
+    """Eliminar fecha_actualizacion"""
+    app = create_app()
+
+    with app.app_context():
+        print("\n🔧 Revirtiendo migración...")
+        for tabla in TABLAS:
+            existentes = {c['name'] for c in inspect(db.engine).get_columns(tabla)}
+            if 'fecha_actualizacion' in existentes:
+                db.session.execute(text(f"ALTER TABLE {tabla} DROP COLUMN fecha_actualizacion"))
+        db.session.commit()
+        print("✅ Migración revertida")
+
+if __name__ == '__main__':
+    upgrade()
@@ -0,0 +1,59 @@
+"""
+Migración: Tabla feriados
+Fecha: 2026-10-18
+Descripción: Feriados que descuentan días hábiles en la nómina, las métricas,
+el cálculo de horas extra y el cierre automático de asistencias
+(app/calendario.py). Crea la tabla y carga los feriados nacionales del año
+actual y del siguiente.
+
+Para cargar otro año más adelante:
+    flask feriados-cargar --año 2027
+"""
+
+import sys
+import os
+from datetime import date
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Cargar variables de entorno desde .env
+from dotenv import load_dotenv
+load_dotenv()
+
+from app import create_app, db
+from app.models import Feriado
+from app.calendario import cargar_feriados_paraguay
+
+def upgrade():
+    """Crear feriados y cargar los nacionales"""
+    app = create_app()
+
+    with app.app_context():
+        try:
+            print("\n🔧 Creando tabla feriados...")
+            Feriado.__table__.create(db.engine, checkfirst=True)
+            print("   ✅ Tabla creada")
+
+            año_actual = date.today().year
+            for año in (año_actual, año_actual + 1):
+                nuevos = cargar_feriados_paraguay(año)
+                db.session.commit()
+                print(f"   ✅ {año}: {nuevos} feriados nacionales cargados")
+
+            print("\n✅ Migración completada exitosamente!")
+
+        except Exception as e:
+            print(f"\n❌ Error en migración: {e}")
+            db.session.rollback()
+            raise
+
+def downgrade():
+    """Eliminar feriados"""
+    app = create_app()
+
+    with app.app_context():
+        print("\n🔧 Revirtiendo migración...")
+        Feriado.__table__.drop(db.engine, checkfirst=True)
+        print("✅ Migración revertida")
+
+if __name__ == '__main__':
+    upgrade()
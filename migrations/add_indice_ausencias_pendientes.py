@@ -0,0 +1,67 @@
+"""
+Migración: Índice parcial de ausencias por justificar
+Fecha: 2026-10-18
+Descripción: El widget del dashboard (app/ausencias_pendientes.py) cuenta y
+pagina las ausencias con justificacion_estado = 'PENDIENTE', ordenadas por
+(fecha, id) descendente. El índice (justificacion_estado, fecha, id) solo
+incluye las filas con presente = false, así que ocupa una fracción de
+asistencias y resuelve el COUNT y cada página sin recorrer la tabla.
+En PostgreSQL se crea con CONCURRENTLY (sin bloquear escrituras).
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Cargar variables de entorno desde .env
+from dotenv import load_dotenv
+load_dotenv()
+
+from app import create_app, db
+from sqlalchemy import text
+
+NOMBRE = 'ix_asistencias_ausencias_justificacion'
+
+def upgrade():
+    """Crear índice parcial"""
+    app = create_app()
+
+    with app.app_context():
+        es_postgres = db.engine.dialect.name == 'postgresql'
+        concurrente = 'CONCURRENTLY ' if es_postgres else ''
+        falso = 'false' if es_postgres else '0'
+        print(f"\n🔧 Creando {NOMBRE} ({db.engine.dialect.name})...")
+
+        # CREATE INDEX CONCURRENTLY no puede ejecutarse dentro de una transacción
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            try:
+                conn.execute(text(
+                    f"CREATE INDEX {concurrente}IF NOT EXISTS {NOMBRE} "
+                    f"ON asistencias (justificacion_estado, fecha, id) WHERE presente = {falso}"
+                ))
+                print("   ✅ Índice creado")
+            except Exception as e:
+                print(f"   ⚠️ No se pudo crear: {e}")
+
+            print("📊 Actualizando estadísticas del planificador...")
+            conn.execute(text("ANALYZE asistencias"))
+
+        print("\n✅ Migración completada exitosamente!")
+
+def downgrade():
+    """Eliminar índice parcial"""
+    app = create_app()
+
+    with app.app_context():
+        try:
+            print("\n🔧 Revirtiendo migración...")
+            db.session.execute(text(f"DROP INDEX IF EXISTS {NOMBRE}"))
+            db.session.commit()
+            print("✅ Migración revertida")
+        except Exception as e:
+            print(f"❌ Error al revertir: {e}")
+            db.session.rollback()
+            raise
+
+if __name__ == '__main__':
+    upgrade()
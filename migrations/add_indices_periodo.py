@@ -0,0 +1,75 @@
+"""
+Migración: Índices compuestos para filtros de período
+Fecha: 2026-10-18
+Descripción: Los filtros por mes/año/día ahora son rangos semiabiertos sobre la
+columna desnuda (app/periodos.py). Estos índices (empleado_id, fecha|ts|año, mes)
+permiten que PostgreSQL y SQLite resuelvan esas consultas con index range scan
+en lugar de recorrer toda la tabla.
+
+asistencias ya tiene (empleado_id, fecha) por la restricción uq_empleado_fecha.
+En PostgreSQL los índices se crean con CONCURRENTLY (sin bloquear escrituras).
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Cargar variables de entorno desde .env
+from dotenv import load_dotenv
+load_dotenv()
+
+from app import create_app, db
+from sqlalchemy import text
+
+INDICES = [
+    ('ix_asistencia_eventos_empleado_ts', 'asistencia_eventos', 'empleado_id, ts'),
+    ('ix_horas_extras_empleado_fecha', 'horas_extras', 'empleado_id, fecha'),
+    ('ix_sanciones_empleado_fecha', 'sanciones', 'empleado_id, fecha'),
+    ('ix_ingresos_extras_empleado_periodo', 'ingresos_extras', 'empleado_id, año, mes'),
+    ('ix_descuentos_empleado_periodo', 'descuentos', 'empleado_id, año, mes'),
+    ('ix_anticipos_empleado_fecha_aprobacion', 'anticipos', 'empleado_id, fecha_aprobacion'),
+    ('ix_permisos_empleado_fecha_creacion', 'permisos', 'empleado_id, fecha_creacion'),
+]
+
+def upgrade():
+    """Crear índices compuestos"""
+    app = create_app()
+
+    with app.app_context():
+        es_postgres = db.engine.dialect.name == 'postgresql'
+        concurrente = 'CONCURRENTLY ' if es_postgres else ''
+        print(f"\n🔧 Creando índices compuestos de período ({db.engine.dialect.name})...")
+
+        # CREATE INDEX CONCURRENTLY no puede ejecutarse dentro de una transacción
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            for i, (nombre, tabla, columnas) in enumerate(INDICES, start=1):
+                print(f"{i}️⃣ {nombre} ON {tabla} ({columnas})...")
+                try:
+                    conn.execute(text(f"CREATE INDEX {concurrente}IF NOT EXISTS {nombre} ON {tabla} ({columnas})"))
+                    print("   ✅ Índice creado")
+                except Exception as e:
+                    print(f"   ⚠️ No se pudo crear: {e}")
+
+            print("📊 Actualizando estadísticas del planificador...")
+            conn.execute(text("ANALYZE"))
+
+        print("\n✅ Migración completada exitosamente!")
+
+def downgrade():
+    """Eliminar índices compuestos"""
+    app = create_app()
+
+    with app.app_context():
+        try:
+            print("\n🔧 Revirtiendo migración...")
+            for nombre, _, _ in INDICES:
+                db.session.execute(text(f"DROP INDEX IF EXISTS {nombre}"))
+            db.session.commit()
+            print("✅ Migración revertida")
+        except Exception as e:
+            print(f"❌ Error al revertir: {e}")
+            db.session.rollback()
+            raise
+
+if __name__ == '__main__':
+    upgrade()
@@ -0,0 +1,69 @@
+"""
+Migración: Índice único de marcaciones (empleado_id, ts, origen)
+Fecha: 2026-10-18
+Descripción: importar_marcaciones descarta los duplicados con
+INSERT ... ON CONFLICT DO NOTHING sobre este índice, así dos envíos
+simultáneos del mismo lote (un reloj que reintenta) no duplican eventos.
+Antes de crearlo se eliminan los duplicados existentes, conservando el
+evento de menor id de cada (empleado_id, ts, origen). Si asistencia_eventos
+ya está particionada el índice incluye ts, la clave de partición, y se
+propaga a cada partición.
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Cargar variables de entorno desde .env
+from dotenv import load_dotenv
+load_dotenv()
+
+from app import create_app, db
+from sqlalchemy import text
+
+NOMBRE = 'ux_asistencia_eventos_empleado_ts_origen'
+
+def upgrade():
+    """Eliminar duplicados y crear el índice único"""
+    app = create_app()
+
+    with app.app_context():
+        try:
+            print("\n🔧 Eliminando marcaciones duplicadas...")
+            eliminados = db.session.execute(text("""
+                DELETE FROM asistencia_eventos
+                WHERE id NOT IN (
+                    SELECT MIN(id) FROM asistencia_eventos GROUP BY empleado_id, ts, origen
+                )
+            """)).rowcount
+            print(f"   ✅ {eliminados} duplicados eliminados")
+
+            print(f"🔧 Creando {NOMBRE}...")
+            db.session.execute(text(
+                f"CREATE UNIQUE INDEX IF NOT EXISTS {NOMBRE} ON asistencia_eventos (empleado_id, ts, origen)"
+            ))
+            db.session.commit()
+            print("\n✅ Migración completada exitosamente!")
+
+        except Exception as e:
+            print(f"\n❌ Error en migración: {e}")
+            db.session.rollback()
+            raise
+
+def downgrade():
+    """Eliminar el índice único (los duplicados eliminados no se restauran)"""
+    app = create_app()
+
+    with app.app_context():
+        try:
+            print("\n🔧 Revirtiendo migración...")
+            db.session.execute(text(f"DROP INDEX IF EXISTS {NOMBRE}"))
+            db.session.commit()
+            print("✅ Migración revertida")
+        except Exception as e:
+            print(f"❌ Error al revertir: {e}")
+            db.session.rollback()
+            raise
+
+if __name__ == '__main__':
+    upgrade()
@@ -0,0 +1,68 @@
+"""
+Migración: Restricción única asistencias (empleado_id, fecha)
+Fecha: 2026-10-18
+Descripción: El cierre de asistencias por INSERT ... SELECT
+(app/cierre_asistencias.py) y las marcaciones simultáneas dependen de
+uq_empleado_fecha para no crear dos filas del mismo empleado y día. Las BD
+creadas con create_all ya la tienen; esta migración la crea donde falte.
+Si hay duplicados los informa y no modifica nada.
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Cargar variables de entorno desde .env
+from dotenv import load_dotenv
+load_dotenv()
+
+from app import create_app, db
+from sqlalchemy import text, inspect
+
+def _tiene_restriccion():
+    inspector = inspect(db.engine)
+    columnas = ['empleado_id', 'fecha']
+    if any(u['column_names'] == columnas for u in inspector.get_unique_constraints('asistencias')):
+        return True
+    return any(i['unique'] and i['column_names'] == columnas for i in inspector.get_indexes('asistencias'))
+
+def upgrade():
+    """Crear uq_empleado_fecha si falta"""
+    app = create_app()
+
+    with app.app_context():
+        try:
+            print("\n🔧 Verificando restricción única asistencias (empleado_id, fecha)...")
+            if _tiene_restriccion():
+                print("   ✅ La restricción ya existe")
+                return
+
+            duplicados = db.session.execute(text("""
+                SELECT empleado_id, fecha, COUNT(*) FROM asistencias
+                GROUP BY empleado_id, fecha HAVING COUNT(*) > 1
+                ORDER BY fecha, empleado_id
+            """)).all()
+            if duplicados:
+                print(f"   ❌ {len(duplicados)} (empleado, fecha) con filas duplicadas; corregirlas antes de migrar:")
+                for empleado_id, fecha, cantidad in duplicados[:20]:
+                    print(f"      empleado {empleado_id} - {fecha}: {cantidad} filas")
+                return
+
+            db.session.execute(text(
+                "CREATE UNIQUE INDEX uq_empleado_fecha ON asistencias (empleado_id, fecha)"
+            ))
+            db.session.commit()
+            print("   ✅ Restricción creada")
+            print("\n✅ Migración completada exitosamente!")
+
+        except Exception as e:
+            print(f"\n❌ Error en migración: {e}")
+            db.session.rollback()
+            raise
+
+def downgrade():
+    """La restricción forma parte del modelo: no se elimina"""
+    print("ℹ️ uq_empleado_fecha forma parte del modelo Asistencia; no se revierte")
+
+if __name__ == '__main__':
+    upgrade()
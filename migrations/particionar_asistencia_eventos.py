@@ -0,0 +1,132 @@
+"""
+Migración: Particionar asistencia_eventos por mes (PostgreSQL)
+Fecha: 2026-10-18
+Descripción: Convierte asistencia_eventos en una tabla particionada por
+rango de ts, con una partición por mes desde el primer evento hasta
+MESES_ADELANTE meses después del actual, más una partición DEFAULT para
+marcaciones fuera de rango. La clave primaria pasa a ser (id, ts), como
+exige PostgreSQL; la secuencia de id se conserva. Las particiones de los
+meses siguientes las crea la tarea programada crear_particiones_eventos
+(app/almacen_eventos.py). En SQLite no hace nada: usar
+`flask asistencia-eventos-archivar`.
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Cargar variables de entorno desde .env
+from dotenv import load_dotenv
+load_dotenv()
+
+from datetime import date
+from sqlalchemy import text
+
+from app import create_app, db
+from app.almacen_eventos import TABLA, MESES_ADELANTE, esta_particionada, meses_entre, sql_particion
+
+# Columnas que se copian entre la tabla original y la nueva (mismo orden que el modelo)
+COLUMNAS = 'id, empleado_id, ts, tipo, origen, dispositivo_id, detalles, fecha_creacion'
+
+def upgrade():
+    """Reemplazar asistencia_eventos por una tabla particionada con los mismos datos"""
+    app = create_app()
+
+    with app.app_context():
+        try:
+            print("\n🔧 Particionando asistencia_eventos...")
+            if db.engine.dialect.name != 'postgresql':
+                print("   ℹ️ Solo aplica a PostgreSQL; en SQLite usar flask asistencia-eventos-archivar")
+                return
+            if esta_particionada():
+                print("   ✅ La tabla ya está particionada")
+                return
+
+            primero = db.session.execute(text(f"SELECT MIN(ts) FROM {TABLA}")).scalar()
+            hoy = date.today()
+            ultimo = date(hoy.year + (hoy.month + MESES_ADELANTE - 1) // 12, (hoy.month + MESES_ADELANTE - 1) % 12 + 1, 1)
+            meses = meses_entre(primero.date() if primero else hoy, ultimo)
+
+            db.session.execute(text(f"ALTER TABLE {TABLA} RENAME TO {TABLA}_legado"))
+            db.session.execute(text(f"ALTER SEQUENCE {TABLA}_id_seq OWNED BY NONE"))
+            db.session.execute(text(f"""
+                CREATE TABLE {TABLA} (
+                    id INTEGER NOT NULL DEFAULT nextval('{TABLA}_id_seq'),
+                    empleado_id INTEGER NOT NULL REFERENCES empleados (id),
+                    ts TIMESTAMP NOT NULL,
+                    tipo VARCHAR(10) NOT NULL,
+                    origen VARCHAR(50),
+                    dispositivo_id INTEGER REFERENCES dispositivos (id),
+                    detalles TEXT,
+                    fecha_creacion TIMESTAMP,
+                    CONSTRAINT pk_{TABLA}_mes PRIMARY KEY (id, ts)
+                ) PARTITION BY RANGE (ts)
+            """))
+            for año, mes in meses:
+                db.session.execute(text(sql_particion(año, mes)))
+            db.session.execute(text(f"CREATE TABLE {TABLA}_default PARTITION OF {TABLA} DEFAULT"))
+            print(f"   ✅ {len(meses)} particiones mensuales ({meses[0][0]}-{meses[0][1]:02d} a "
+                  f"{meses[-1][0]}-{meses[-1][1]:02d}) + DEFAULT")
+
+            copiados = db.session.execute(text(f"""
+                INSERT INTO {TABLA} ({COLUMNAS})
+                SELECT {COLUMNAS} FROM {TABLA}_legado
+            """)).rowcount
+            db.session.execute(text(f"DROP TABLE {TABLA}_legado"))
+            db.session.execute(text(f"ALTER SEQUENCE {TABLA}_id_seq OWNED BY {TABLA}.id"))
+            db.session.execute(text(f"CREATE INDEX ix_{TABLA}_ts ON {TABLA} (ts)"))
+            db.session.execute(text(f"CREATE INDEX ix_{TABLA}_empleado_ts ON {TABLA} (empleado_id, ts)"))
+            db.session.execute(text(f"CREATE UNIQUE INDEX ux_{TABLA}_empleado_ts_origen ON {TABLA} (empleado_id, ts, origen)"))
+            db.session.commit()
+            print(f"   ✅ {copiados} eventos copiados")
+            print("\n✅ Migración completada exitosamente!")
+
+        except Exception as e:
+            print(f"\n❌ Error en migración: {e}")
+            db.session.rollback()
+            raise
+
+def downgrade():
+    """Volver a una tabla sin particionar con los mismos datos"""
+    app = create_app()
+
+    with app.app_context():
+        try:
+            print("\n🔧 Revirtiendo migración...")
+            if not esta_particionada():
+                print("   ℹ️ La tabla no está particionada")
+                return
+
+            db.session.execute(text(f"ALTER TABLE {TABLA} RENAME TO {TABLA}_particionada"))
+            db.session.execute(text(f"ALTER SEQUENCE {TABLA}_id_seq OWNED BY NONE"))
+            db.session.execute(text(f"""
+                CREATE TABLE {TABLA} (
+                    id INTEGER NOT NULL DEFAULT nextval('{TABLA}_id_seq') PRIMARY KEY,
+                    empleado_id INTEGER NOT NULL REFERENCES empleados (id),
+                    ts TIMESTAMP NOT NULL,
+                    tipo VARCHAR(10) NOT NULL,
+                    origen VARCHAR(50),
+                    dispositivo_id INTEGER REFERENCES dispositivos (id),
+                    detalles TEXT,
+                    fecha_creacion TIMESTAMP
+                )
+            """))
+            db.session.execute(text(f"""
+                INSERT INTO {TABLA} ({COLUMNAS})
+                SELECT {COLUMNAS} FROM {TABLA}_particionada
+            """))
+            db.session.execute(text(f"DROP TABLE {TABLA}_particionada"))
+            db.session.execute(text(f"ALTER SEQUENCE {TABLA}_id_seq OWNED BY {TABLA}.id"))
+            db.session.execute(text(f"CREATE INDEX ix_{TABLA}_ts ON {TABLA} (ts)"))
+            db.session.execute(text(f"CREATE INDEX ix_{TABLA}_empleado_ts ON {TABLA} (empleado_id, ts)"))
+            db.session.execute(text(f"CREATE UNIQUE INDEX ux_{TABLA}_empleado_ts_origen ON {TABLA} (empleado_id, ts, origen)"))
+            db.session.commit()
+            print("✅ Migración revertida")
+
+        except Exception as e:
+            print(f"\n❌ Error al revertir: {e}")
+            db.session.rollback()
+            raise
+
+if __name__ == '__main__':
+    upgrade()
@@ -0,0 +1,160 @@
+"""
+Benchmark de planes de consulta: filtros de período con funciones vs rangos.
+
+Compara, para las consultas de período más usadas (nómina, métricas, perfil),
+el plan y el tiempo del filtro anterior (`extract('month'/'year')`,
+`func.date(ts)`) contra el rango semiabierto de app/periodos.py.
+
+Uso:
+    python scripts/benchmark_planes_consulta.py              # SQLite en memoria con datos sintéticos
+    python scripts/benchmark_planes_consulta.py --bd-real    # BD configurada en DATABASE_URL (solo lectura)
+
+Con datos sintéticos el plan "antes" muestra SCAN de la tabla y el "después"
+SEARCH ... USING INDEX (SQLite) / Index Scan (PostgreSQL).
+"""
+
+import sys
+import os
+import time
+import random
+import argparse
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from sqlalchemy import func, text
+
+from app import create_app, db
+from app.models import (
+    Cargo, Empleado, Asistencia, AsistenciaEvento, HorasExtra, Anticipo, Sancion
+)
+from app.periodos import en_mes, en_dia
+
+AÑO, MES = 2025, 11
+DIA = date(2025, 11, 14)
+
+
+def poblar(empleados, dias):
+    """Datos sintéticos: `dias` días hábiles de asistencia y 4 marcaciones por empleado."""
+    cargo = Cargo(nombre='Benchmark', salario_base=Decimal('3000000'))
+    db.session.add(cargo)
+    db.session.flush()
+    db.session.execute(Empleado.__table__.insert(), [
+        {'codigo': f'B{i:06d}', 'nombre': 'Bench', 'apellido': str(i), 'ci': f'BCI{i}',
+         'cargo_id': cargo.id, 'salario_base': Decimal('3000000'), 'fecha_ingreso': date(2020, 1, 1)}
+        for i in range(empleados)
+    ])
+    ids = [e_id for (e_id,) in db.session.query(Empleado.id)]
+
+    inicio = date(AÑO, MES, 1) - timedelta(days=dias)
+    fechas = [inicio + timedelta(days=d) for d in range(dias * 7 // 5) if (inicio + timedelta(days=d)).weekday() < 5][:dias]
+    asistencias, eventos, horas, anticipos, sanciones = [], [], [], [], []
+    for e_id in ids:
+        for f in fechas:
+            asistencias.append({'empleado_id': e_id, 'fecha': f, 'presente': random.random() > 0.05})
+            for hora, tipo in ((8, 'in'), (12, 'out'), (13, 'in'), (17, 'out')):
+                eventos.append({'empleado_id': e_id, 'ts': datetime(f.year, f.month, f.day, hora, random.randint(0, 59)), 'tipo': tipo})
+            if random.random() < 0.1:
+                horas.append({'empleado_id': e_id, 'fecha': f, 'horas': Decimal('1.5'), 'monto_calculado': Decimal('30000'), 'estado': 'APROBADO'})
+            if random.random() < 0.02:
+                anticipos.append({'empleado_id': e_id, 'monto': Decimal('100000'), 'aprobado': True,
+                                  'fecha_aprobacion': datetime(f.year, f.month, f.day, 10, 0)})
+            if random.random() < 0.01:
+                sanciones.append({'empleado_id': e_id, 'tipo_sancion': 'Multa', 'motivo': 'Bench', 'monto': Decimal('10000'), 'fecha': f})
+
+    for tabla, filas in ((Asistencia, asistencias), (AsistenciaEvento, eventos), (HorasExtra, horas),
+                         (Anticipo, anticipos), (Sancion, sanciones)):
+        db.session.execute(tabla.__table__.insert(), filas)
+    db.session.commit()
+    db.session.execute(text('ANALYZE'))
+    print(f"Datos: {len(ids)} empleados, {len(asistencias)} asistencias, {len(eventos)} eventos")
+    return ids[len(ids) // 2]
+
+
+def consultas(empleado_id):
+    """(nombre, consulta antes, consulta después)"""
+    return [
+        ('Asistencia del mes (perfil/métricas)',
+         db.session.query(func.count(Asistencia.id)).filter(
+             Asistencia.empleado_id == empleado_id,
+             func.extract('month', Asistencia.fecha) == MES, func.extract('year', Asistencia.fecha) == AÑO),
+         db.session.query(func.count(Asistencia.id)).filter(
+             Asistencia.empleado_id == empleado_id, en_mes(Asistencia.fecha, AÑO, MES))),
+        ('Eventos del día (_resumir_dia_asistencias)',
+         db.session.query(AsistenciaEvento.id).filter(
+             AsistenciaEvento.empleado_id == empleado_id, func.date(AsistenciaEvento.ts) == DIA),
+         db.session.query(AsistenciaEvento.id).filter(
+             AsistenciaEvento.empleado_id == empleado_id, en_dia(AsistenciaEvento.ts, DIA))),
+        ('Horas extra del mes',
+         db.session.query(func.sum(HorasExtra.horas)).filter(
+             HorasExtra.empleado_id == empleado_id,
+             func.extract('year', HorasExtra.fecha) == AÑO, func.extract('month', HorasExtra.fecha) == MES),
+         db.session.query(func.sum(HorasExtra.horas)).filter(
+             HorasExtra.empleado_id == empleado_id, en_mes(HorasExtra.fecha, AÑO, MES))),
+        ('Anticipos aprobados del mes',
+         db.session.query(func.sum(Anticipo.monto)).filter(
+             Anticipo.empleado_id == empleado_id,
+             func.extract('month', Anticipo.fecha_aprobacion) == MES, func.extract('year', Anticipo.fecha_aprobacion) == AÑO),
+         db.session.query(func.sum(Anticipo.monto)).filter(
+             Anticipo.empleado_id == empleado_id, en_mes(Anticipo.fecha_aprobacion, AÑO, MES))),
+        ('Asistencias del período, todos los empleados (nómina)',
+         db.session.query(Asistencia.empleado_id, func.count(Asistencia.id)).filter(
+             func.extract('month', Asistencia.fecha) == MES, func.extract('year', Asistencia.fecha) == AÑO
+         ).group_by(Asistencia.empleado_id),
+         db.session.query(Asistencia.empleado_id, func.count(Asistencia.id)).filter(
+             en_mes(Asistencia.fecha, AÑO, MES)
+         ).group_by(Asistencia.empleado_id)),
+    ]
+
+
+def plan(query):
+    sql = str(query.statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+    prefijo = 'EXPLAIN QUERY PLAN ' if db.engine.dialect.name == 'sqlite' else 'EXPLAIN '
+    filas = db.session.execute(text(prefijo + sql)).fetchall()
+    return [str(f[-1]) for f in filas]
+
+
+def cronometrar(query, repeticiones):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        query.all()
+    return (time.perf_counter() - inicio) / repeticiones * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bd-real', action='store_true', help='Usar DATABASE_URL en lugar de datos sintéticos')
+    parser.add_argument('--empleados', type=int, default=300)
+    parser.add_argument('--dias', type=int, default=120)
+    parser.add_argument('--repeticiones', type=int, default=20)
+    args = parser.parse_args()
+
+    app = create_app('production' if args.bd_real else 'testing')
+    with app.app_context():
+        if args.bd_real:
+            empleado_id = db.session.query(func.max(Empleado.id)).scalar()
+        else:
+            random.seed(42)
+            empleado_id = poblar(args.empleados, args.dias)
+
+        print('=' * 78)
+        print(f"📊 PLANES DE CONSULTA ({db.engine.dialect.name})")
+        print('=' * 78)
+        for nombre, antes, despues in consultas(empleado_id):
+            ms_antes = cronometrar(antes, args.repeticiones)
+            ms_despues = cronometrar(despues, args.repeticiones)
+            print(f"\n▶ {nombre}")
+            print(f"  ANTES   ({ms_antes:8.3f} ms)")
+            for linea in plan(antes):
+                print(f"      {linea}")
+            print(f"  DESPUÉS ({ms_despues:8.3f} ms)  x{ms_antes / ms_despues if ms_despues else 0:.1f}")
+            for linea in plan(despues):
+                print(f"      {linea}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,277 @@
+"""
+Generador de datos sintéticos para reproducir la carga de un cliente grande.
+
+Crea N empleados con M meses de historia: marcaciones (AsistenciaEvento) y
+asistencias diarias, vacaciones, permisos, anticipos, horas extra, ingresos
+extras e hijos para bonificación familiar. Inserta en bloque con
+app.escritura.insertar_filas (executemany; COPY en PostgreSQL) y al final
+reconstruye asistencia_resumen_mensual, que la inserción masiva no dispara.
+
+Los datos son deterministas para una misma --semilla.
+
+Ejecutar:
+    python scripts/generar_datos_sinteticos.py --empleados 10000 --meses 3 --hasta 2025-11
+    DATABASE_URL=postgresql://... python scripts/generar_datos_sinteticos.py --empleados 1000
+"""
+
+import sys
+import os
+import argparse
+import random
+import time
+from datetime import date, datetime, time as hora, timedelta
+from decimal import Decimal
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models import (
+    db, Empresa, Cargo, Empleado, Asistencia, AsistenciaEvento, Permiso, Vacacion,
+    Anticipo, HorasExtra, IngresoExtra, BonificacionFamiliar, SalarioMinimo,
+    EstadoEmpleadoEnum, EstadoPermisoEnum, EstadoVacacionEnum, TipoHijoEnum
+)
+from app.escritura import insertar_filas
+from app.calendario import dias_habiles_lista
+from app.periodos import rango_mes
+from app.resumen_asistencia import reconstruir_resumen
+
+NOMBRES = ['Juan', 'María', 'Carlos', 'Ana', 'Luis', 'Rosa', 'Pedro', 'Laura', 'José', 'Lucía',
+           'Miguel', 'Sofía', 'Diego', 'Elena', 'Jorge', 'Carmen', 'Raúl', 'Patricia', 'Hugo', 'Gloria']
+APELLIDOS = ['González', 'Benítez', 'Martínez', 'López', 'Giménez', 'Vera', 'Duarte', 'Ramírez',
+             'Báez', 'Villalba', 'Ortiz', 'Rojas', 'Acosta', 'Cáceres', 'Franco', 'Britez']
+CARGOS = [('Operario', 2900000), ('Auxiliar administrativo', 3500000), ('Vendedor', 3800000),
+          ('Cajero', 3200000), ('Chofer', 3600000), ('Supervisor', 5500000), ('Analista', 6500000),
+          ('Contador', 8000000), ('Jefe de área', 10000000), ('Gerente', 15000000)]
+MOTIVOS_PERMISO = ['Médico', 'Trámite personal', 'Duelo', 'Estudio']
+SALARIO_MINIMO = Decimal('2798309')
+
+# Probabilidades por empleado y mes
+P_AUSENCIA_DIA = 0.04
+P_VACACIONES = 0.08
+P_PERMISO = 0.10
+P_ANTICIPO = 0.15
+P_HORAS_EXTRA = 0.20
+P_INGRESO_EXTRA = 0.10
+P_HIJOS = 0.30
+
+# Filas acumuladas antes de volcar a la BD
+TAMANO_LOTE = 20000
+
+
+def _meses(hasta, cantidad):
+    año, mes = hasta
+    meses = []
+    for _ in range(cantidad):
+        meses.append((año, mes))
+        año, mes = (año - 1, 12) if mes == 1 else (año, mes - 1)
+    return list(reversed(meses))
+
+
+def _momento(dia, desde_min, hasta_min, rnd):
+    return datetime.combine(dia, hora()) + timedelta(minutes=rnd.randint(desde_min, hasta_min))
+
+
+class _Lotes:
+    """Acumula filas por modelo y las inserta al llegar a TAMANO_LOTE."""
+
+    def __init__(self):
+        self.filas = {}
+        self.totales = {}
+
+    def agregar(self, modelo, fila):
+        filas = self.filas.setdefault(modelo, [])
+        filas.append(fila)
+        if len(filas) >= TAMANO_LOTE:
+            self.volcar(modelo)
+
+    def volcar(self, modelo=None):
+        for m in ([modelo] if modelo else list(self.filas)):
+            filas = self.filas.pop(m, [])
+            self.totales[m.__tablename__] = self.totales.get(m.__tablename__, 0) + insertar_filas(m, filas)
+
+
+def _base(rnd, empleados, primer_mes):
+    """Empresa, salario mínimo, cargos y empleados (con ids)."""
+    if not Empresa.query.first():
+        db.session.add(Empresa(nombre='Empresa Sintética S.A.', ruc='80000000-1', numero_patronal='0000001'))
+    año_inicio = primer_mes[0]
+    if not SalarioMinimo.query.filter(SalarioMinimo.vigencia_desde <= date(año_inicio, 1, 1)).first():
+        db.session.add(SalarioMinimo(año=año_inicio, monto=SALARIO_MINIMO, vigencia_desde=date(año_inicio - 1, 1, 1)))
+
+    cargos = []
+    for nombre, salario in CARGOS:
+        cargo = Cargo.query.filter_by(nombre=nombre).first()
+        if not cargo:
+            cargo = Cargo(nombre=nombre, salario_base=Decimal(salario))
+            db.session.add(cargo)
+        cargos.append(cargo)
+    db.session.flush()
+
+    inicio_historia = date(*primer_mes, 1)
+    desplazamiento = db.session.query(db.func.count(Empleado.id)).scalar()
+    filas = []
+    for i in range(desplazamiento, desplazamiento + empleados):
+        cargo = rnd.choice(cargos)
+        filas.append({
+            'codigo': f'SIN{i:06d}',
+            'nombre': rnd.choice(NOMBRES),
+            'apellido': rnd.choice(APELLIDOS),
+            'ci': f'S{i:07d}',
+            'email': f'sin{i:06d}@sintetico.local',
+            'cargo_id': cargo.id,
+            'salario_base': cargo.salario_base + Decimal(rnd.randint(0, 40) * 50000),
+            'fecha_ingreso': inicio_historia - timedelta(days=rnd.randint(30, 3650)),
+            'estado': EstadoEmpleadoEnum.ACTIVO,
+            'fecha_nacimiento': date(rnd.randint(1965, 2003), rnd.randint(1, 12), rnd.randint(1, 28)),
+            'sexo': rnd.choice('MF'),
+            'nacionalidad': 'Paraguaya',
+            'ips_numero': f'IPS{i:07d}',
+        })
+    insertar_filas(Empleado, filas, devolver_ids=True)
+    return filas
+
+
+def _hijos(rnd, lotes, empleado, hoy):
+    if rnd.random() >= P_HIJOS:
+        return
+    for _ in range(rnd.randint(1, 3)):
+        lotes.agregar(BonificacionFamiliar, {
+            'empleado_id': empleado['id'],
+            'hijo_nombre': rnd.choice(NOMBRES),
+            'hijo_apellido': empleado['apellido'],
+            'hijo_fecha_nacimiento': hoy - timedelta(days=rnd.randint(180, 17 * 365)),
+            'tipo': TipoHijoEnum.MENOR_18,
+            'activo': True,
+        })
+
+
+def _mes_empleado(rnd, lotes, empleado, año, mes):
+    eid = empleado['id']
+    habiles = dias_habiles_lista(año, mes)
+    inicio, _ = rango_mes(año, mes)
+
+    # Días de vacaciones y de permiso del mes
+    vacaciones = set()
+    if rnd.random() < P_VACACIONES and len(habiles) > 5:
+        i = rnd.randrange(len(habiles) - 5)
+        vacaciones = set(habiles[i:i + 5])
+        lotes.agregar(Vacacion, {
+            'empleado_id': eid, 'año': año, 'dias_disponibles': 15, 'dias_tomados': 5, 'dias_pendientes': 10,
+            'fecha_inicio_solicitud': habiles[i], 'fecha_fin_solicitud': habiles[i + 4],
+            'estado': EstadoVacacionEnum.APROBADA,
+        })
+    permiso, motivo = set(), None
+    libres = [d for d in habiles if d not in vacaciones]
+    if rnd.random() < P_PERMISO and libres:
+        dia = rnd.choice(libres)
+        permiso, motivo = {dia}, rnd.choice(MOTIVOS_PERMISO)
+        lotes.agregar(Permiso, {
+            'empleado_id': eid, 'tipo_permiso': 'Personal', 'motivo': motivo, 'fecha_inicio': dia, 'fecha_fin': dia,
+            'dias_solicitados': 1, 'estado': EstadoPermisoEnum.APROBADO, 'con_goce': True,
+        })
+
+    for dia in habiles:
+        # Mismas claves en todas las filas: un solo executemany (y columnas fijas para COPY)
+        fila = {'empleado_id': eid, 'fecha': dia, 'presente': True, 'hora_entrada': None, 'hora_salida': None,
+                'observaciones': None, 'justificacion_estado': None}
+        if dia in vacaciones:
+            fila['observaciones'] = 'Vacaciones (auto-generado)'
+        elif dia in permiso:
+            fila['observaciones'] = f'Permiso: {motivo} (auto-generado)'
+        elif rnd.random() < P_AUSENCIA_DIA:
+            fila['presente'] = False
+            fila['justificacion_estado'] = rnd.choice(['PENDIENTE', 'JUSTIFICADO', 'INJUSTIFICADO'])
+            fila['observaciones'] = 'Ausencia sin marcación (auto-generado)'
+        else:
+            entrada = _momento(dia, 7 * 60 + 30, 8 * 60 + 30, rnd)
+            salida = _momento(dia, 16 * 60 + 30, 18 * 60 + 30, rnd)
+            fila['hora_entrada'], fila['hora_salida'] = entrada.time(), salida.time()
+            lotes.agregar(AsistenciaEvento, {'empleado_id': eid, 'ts': entrada, 'tipo': 'in', 'origen': 'sintetico'})
+            lotes.agregar(AsistenciaEvento, {'empleado_id': eid, 'ts': salida, 'tipo': 'out', 'origen': 'sintetico'})
+        lotes.agregar(Asistencia, fila)
+
+    salario = empleado['salario_base']
+    if rnd.random() < P_ANTICIPO:
+        lotes.agregar(Anticipo, {
+            'empleado_id': eid, 'monto': (salario * Decimal(rnd.randint(5, 30)) / 100).quantize(Decimal('1000')),
+            'aprobado': True, 'fecha_solicitud': datetime.combine(inicio, hora(9)),
+            'fecha_aprobacion': datetime.combine(inicio + timedelta(days=rnd.randint(1, 20)), hora(10)),
+        })
+    if rnd.random() < P_HORAS_EXTRA:
+        valor_hora = salario / Decimal(240)
+        for dia in rnd.sample(habiles, min(len(habiles), rnd.randint(1, 4))):
+            horas = Decimal(rnd.randint(1, 8)) / 2
+            lotes.agregar(HorasExtra, {
+                'empleado_id': eid, 'fecha': dia, 'horas': horas,
+                'monto_calculado': (valor_hora * horas * Decimal('1.5')).quantize(Decimal('0.01')),
+                'estado': 'APROBADO', 'origen': 'sintetico',
+            })
+    if rnd.random() < P_INGRESO_EXTRA:
+        lotes.agregar(IngresoExtra, {
+            'empleado_id': eid, 'tipo': 'Bonificación', 'monto': Decimal(rnd.randint(1, 10) * 100000),
+            'mes': mes, 'año': año, 'estado': 'APROBADO',
+        })
+
+
+def generar_datos(empleados, meses=1, hasta=(2025, 11), semilla=1, eco=print):
+    """
+    Genera el conjunto de datos dentro del app context activo y hace commit.
+
+    Args:
+        empleados: Cantidad de empleados nuevos
+        meses: Meses de historia, terminando en `hasta`
+        hasta: (año, mes) del último mes generado
+        semilla: Semilla del generador pseudoaleatorio
+
+    Returns:
+        Dict tabla -> filas insertadas
+    """
+    rnd = random.Random(semilla)
+    periodos = _meses(hasta, meses)
+    inicio = time.perf_counter()
+
+    filas_empleados = _base(rnd, empleados, periodos[0])
+    lotes = _Lotes()
+    lotes.totales['empleados'] = len(filas_empleados)
+    hoy = date(*hasta, 1)
+    for n, empleado in enumerate(filas_empleados, 1):
+        _hijos(rnd, lotes, empleado, hoy)
+        for año, mes in periodos:
+            _mes_empleado(rnd, lotes, empleado, año, mes)
+        if n % 1000 == 0:
+            eco(f"   … {n}/{len(filas_empleados)} empleados")
+    lotes.volcar()
+
+    for año, mes in periodos:
+        reconstruir_resumen(año, mes)
+    db.session.commit()
+
+    eco(f"✅ Datos generados en {time.perf_counter() - inicio:.1f}s")
+    for tabla, total in sorted(lotes.totales.items()):
+        eco(f"   {tabla}: {total}")
+    return lotes.totales
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Genera datos sintéticos de un cliente grande')
+    parser.add_argument('--empleados', type=int, default=1000)
+    parser.add_argument('--meses', type=int, default=3)
+    parser.add_argument('--hasta', default='2025-11', help='Último mes generado (YYYY-MM)')
+    parser.add_argument('--semilla', type=int, default=1)
+    parser.add_argument('--config', default=os.environ.get('FLASK_ENV', 'development'))
+    args = parser.parse_args()
+
+    # Cargar variables de entorno ANTES de crear la app
+    from dotenv import load_dotenv
+    load_dotenv()
+    from app import create_app
+
+    app = create_app(args.config)
+    with app.app_context():
+        db.create_all()
+        print(f"🔧 Generando {args.empleados} empleados × {args.meses} meses en {db.engine.url.render_as_string()}")
+        generar_datos(args.empleados, args.meses, tuple(map(int, args.hasta.split('-'))), args.semilla)
+
+
+if __name__ == '__main__':
+    main()
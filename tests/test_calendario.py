@@ -0,0 +1,77 @@
+"""
+Tests del calendario laboral (app/calendario.py).
+"""
+import pytest
+from datetime import date
+from app import create_app
+from app.models import db, Feriado
+
+@pytest.fixture
+def app():
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+def test_dias_habiles_y_feriados(app):
+    from app.calendario import dias_habiles_mes, es_dia_habil, contar_dias_habiles, dias_habiles_entre
+
+    # Marzo 2025: 21 días de lunes a viernes
+    assert dias_habiles_mes(2025, 3) == 21
+    assert es_dia_habil(date(2025, 3, 3))
+    assert not es_dia_habil(date(2025, 3, 1))  # sábado
+
+    # Agregar un feriado invalida la caché
+    db.session.add(Feriado(fecha=date(2025, 3, 3), descripcion='Prueba'))
+    db.session.commit()
+    assert dias_habiles_mes(2025, 3) == 20
+    assert not es_dia_habil(date(2025, 3, 3))
+
+    # Rango que cruza meses: 28-31 marzo (vie, lun) + 1-2 abril (mar, mié)
+    assert dias_habiles_entre(date(2025, 3, 28), date(2025, 4, 2)) == [
+        date(2025, 3, 28), date(2025, 3, 31), date(2025, 4, 1), date(2025, 4, 2)
+    ]
+    assert contar_dias_habiles(date(2025, 3, 1), date(2025, 4, 30)) == 20 + 22
+    assert contar_dias_habiles(date(2025, 4, 2), date(2025, 4, 1)) == 0
+
+    db.session.delete(Feriado.query.one())
+    db.session.commit()
+    assert dias_habiles_mes(2025, 3) == 21
+
+def test_rollback_no_deja_feriado_en_cache(app):
+    from app.calendario import dias_habiles_mes
+
+    db.session.add(Feriado(fecha=date(2025, 3, 3), descripcion='Prueba'))
+    db.session.flush()
+    assert dias_habiles_mes(2025, 3) == 20
+    db.session.rollback()
+    assert dias_habiles_mes(2025, 3) == 21
+
+def test_feriados_paraguay(app):
+    from app.calendario import _domingo_de_pascua, cargar_feriados_paraguay, dias_habiles_mes
+
+    assert _domingo_de_pascua(2025) == date(2025, 4, 20)
+    assert _domingo_de_pascua(2024) == date(2024, 3, 31)
+
+    assert cargar_feriados_paraguay(2025) == 12
+    db.session.commit()
+    assert cargar_feriados_paraguay(2025) == 0  # idempotente
+    # Abril 2025: 22 días de lunes a viernes menos Jueves y Viernes Santo
+    assert dias_habiles_mes(2025, 4) == 20
+
+def test_feriado_de_otro_proceso_por_version(app, monkeypatch):
+    from sqlalchemy import insert
+    from app import calendario
+    from app.calendario import dias_habiles_mes, registrar_cambio_calendario
+
+    assert dias_habiles_mes(2025, 3) == 21
+
+    # Otro worker agrega el feriado: este proceso no ve el flush, solo el contador
+    db.session.execute(insert(Feriado.__table__).values(fecha=date(2025, 3, 3), descripcion='Prueba'))
+    registrar_cambio_calendario()
+    db.session.commit()
+    assert dias_habiles_mes(2025, 3) == 21  # hasta la siguiente verificación
+    monkeypatch.setattr(calendario, 'VERIFICAR_SEGUNDOS', 0)
+    assert dias_habiles_mes(2025, 3) == 20
@@ -0,0 +1,98 @@
+"""
+Tests de la detección de horas extra desde marcaciones (app/horas_extra.py).
+"""
+import pytest
+from datetime import date, datetime
+from decimal import Decimal
+from app import create_app
+from app.models import db, Empleado, Cargo, AsistenciaEvento, HorasExtra
+
+@pytest.fixture
+def app():
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def empleados(app):
+    cargo = Cargo(nombre='Operario', salario_base=Decimal('3000000'))
+    db.session.add(cargo)
+    db.session.flush()
+    empleados = [Empleado(codigo=f'E{i}', nombre='A', apellido=str(i), ci=str(i), cargo_id=cargo.id,
+                          salario_base=Decimal('3000000'), fecha_ingreso=date(2020, 1, 1)) for i in range(2)]
+    db.session.add_all(empleados)
+    db.session.commit()
+    return empleados
+
+def test_detectar_horas_extra_empresa(app, empleados):
+    from app.horas_extra import detectar_horas_extra
+
+    e1, e2 = empleados
+    eventos = [
+        (e1, datetime(2025, 3, 3, 17, 45), 'out'),
+        (e1, datetime(2025, 3, 3, 18, 30), 'out'),  # última salida del lunes: 1,5 h extra
+        (e1, datetime(2025, 3, 4, 16, 0), 'out'),   # antes del fin de jornada
+        (e2, datetime(2025, 3, 3, 19, 0), 'in'),    # no es salida
+        (e2, datetime(2025, 3, 4, 18, 0), 'out'),
+        (e2, datetime(2025, 3, 8, 19, 0), 'out'),   # sábado
+        (e2, datetime(2025, 3, 5, 18, 30), 'out'),
+    ]
+    db.session.add_all(AsistenciaEvento(empleado_id=e.id, ts=ts, tipo=tipo) for e, ts, tipo in eventos)
+    db.session.add_all([
+        # cargada y aprobada por RRHH: no se pisa
+        HorasExtra(empleado_id=e2.id, fecha=date(2025, 3, 4), horas=3, monto_calculado=1,
+                   origen='manual', estado='APROBADO'),
+        # detectada antes y todavía pendiente: se recalcula
+        HorasExtra(empleado_id=e2.id, fecha=date(2025, 3, 5), horas=1, monto_calculado=1,
+                   origen='asistencia', estado='PENDIENTE', aplicado=False),
+    ])
+    db.session.commit()
+
+    assert detectar_horas_extra(2025, 3) == {'creados': 1, 'actualizados': 1}
+    db.session.commit()
+
+    # 3.000.000 / 30 días / 8 h = 12.500 por hora, × 1,5
+    lunes = HorasExtra.query.filter_by(empleado_id=e1.id).one()
+    assert (lunes.fecha, float(lunes.horas), float(lunes.monto_calculado)) == (date(2025, 3, 3), 1.5, 28125)
+    assert lunes.estado == 'PENDIENTE'
+    martes = HorasExtra.query.filter_by(empleado_id=e2.id, fecha=date(2025, 3, 4)).one()
+    assert (float(martes.horas), float(martes.monto_calculado), martes.origen, martes.estado) == \
+        (3.0, 1, 'manual', 'APROBADO')
+    miercoles = HorasExtra.query.filter_by(empleado_id=e2.id, fecha=date(2025, 3, 5)).one()
+    assert (float(miercoles.horas), float(miercoles.monto_calculado), miercoles.estado) == (1.5, 28125, 'PENDIENTE')
+
+    # Una vez aprobada tampoco se recalcula
+    miercoles.estado = 'APROBADO'
+    db.session.commit()
+    assert detectar_horas_extra(2025, 3) == {'creados': 0, 'actualizados': 1}
+
+def test_empresa_actual_cacheada_y_version(app, monkeypatch):
+    from app.models import Empresa, EstadoSistema
+    from app import empresa_config
+    from app.empresa_config import empresa_actual, registrar_cambio_empresa, CLAVE_VERSION
+
+    db.session.add(Empresa(nombre='Uno', dias_habiles_mes=30))
+    db.session.commit()
+    assert empresa_actual().nombre == 'Uno'
+
+    # Cambio sin registrar: se sigue sirviendo la copia
+    Empresa.query.one().nombre = 'Dos'
+    db.session.commit()
+    assert empresa_actual().nombre == 'Uno'
+
+    # Cambio registrado en este proceso: se descarta al confirmar
+    registrar_cambio_empresa()
+    db.session.commit()
+    assert empresa_actual().nombre == 'Dos'
+    assert db.session.get(EstadoSistema, CLAVE_VERSION).valor == '1'
+
+    # Cambio hecho por otro proceso: se detecta en la siguiente verificación del contador
+    Empresa.query.one().nombre = 'Tres'
+    db.session.get(EstadoSistema, CLAVE_VERSION).valor = '2'
+    db.session.commit()
+    assert empresa_actual().nombre == 'Dos'
+    monkeypatch.setattr(empresa_config, 'VERIFICAR_SEGUNDOS', 0)
+    assert empresa_actual().nombre == 'Tres'
@@ -0,0 +1,373 @@
+"""
+Tests de la máquina de estados de marcaciones (app/marcaciones.py) y de
+/rrhh/asistencia/registrar.
+"""
+import pytest
+from datetime import date, datetime, time
+from decimal import Decimal
+from app import create_app
+from app.models import db, Empleado, Cargo, Usuario, RoleEnum, Asistencia, AsistenciaEvento, Bitacora, Dispositivo
+
+DIA = date(2025, 11, 4)
+
+@pytest.fixture
+def app():
+    app = create_app('testing')
+    app.config['SESSION_COOKIE_SECURE'] = False
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def empleado(app):
+    cargo = Cargo(nombre='Operario', salario_base=Decimal('3000000'))
+    db.session.add(cargo)
+    db.session.flush()
+    empleado = Empleado(codigo='EMP001', nombre='Ana', apellido='Pérez', ci='CI1', cargo_id=cargo.id,
+                        salario_base=Decimal('3000000'), fecha_ingreso=date(2020, 1, 1))
+    db.session.add(empleado)
+    db.session.commit()
+    return empleado
+
+def _estado(*marcaciones):
+    from app.marcaciones import EstadoDia, aplicar_evento
+
+    estado = EstadoDia()
+    for tipo, hora in marcaciones:
+        aplicar_evento(estado, tipo, datetime.combine(DIA, time.fromisoformat(hora)))
+    return estado
+
+@pytest.mark.parametrize('marcaciones, presente, observaciones', [
+    ([], False, 'Ausencia injustificada - Sin marcaciones'),
+    ([('in', '07:55')], True, 'Solo marcó entrada - Sin salida registrada'),
+    ([('in', '07:55'), ('out', '12:00'), ('in', '12:45'), ('out', '17:00')], True, 'Día completo (8h) - Almuerzo 45min'),
+    ([('in', '08:20'), ('out', '12:00'), ('in', '13:30'), ('out', '17:00')], True,
+     'Llegada tarde 20 min - Día completo - Almuerzo 1h 30min'),
+    ([('in', '08:00'), ('out', '12:00')], True, 'Solo turno mañana - No regresó del almuerzo'),
+    ([('in', '13:00'), ('out', '17:30')], True, 'Solo turno tarde (4h)'),
+    ([('in', '08:00'), ('out', '12:00'), ('in', '13:00'), ('out', '15:00')], True, 'Salida anticipada 15:00'),
+    ([('in', '09:10'), ('out', '17:00')], True, 'Llegada tarde 1h 10min - Día completo'),
+])
+def test_resumir_estado(marcaciones, presente, observaciones):
+    from app.marcaciones import resumir_estado
+
+    resumen = resumir_estado(_estado(*marcaciones))
+    assert resumen['presente'] is presente
+    assert resumen['observaciones'] == observaciones
+
+def test_estado_incremental_igual_a_reconstruido(app, empleado):
+    from app.marcaciones import EstadoDia, reconstruir_estado, CAMPOS_ESTADO
+
+    marcaciones = [('in', '07:58'), ('out', '11:45'), ('in', '12:40'), ('out', '17:05')]
+    for tipo, hora in marcaciones:
+        db.session.add(AsistenciaEvento(empleado_id=empleado.id, ts=datetime.combine(DIA, time.fromisoformat(hora)),
+                                        tipo=tipo, origen='web'))
+    db.session.commit()
+
+    reconstruido = EstadoDia()
+    reconstruir_estado(reconstruido, empleado.id, DIA)
+    incremental = _estado(*marcaciones)
+    assert {c: getattr(reconstruido, c) for c in CAMPOS_ESTADO} == {c: getattr(incremental, c) for c in CAMPOS_ESTADO}
+
+def test_registrar_asistencia_actualiza_estado(app, empleado, monkeypatch):
+    import app.routes.rrhh as rrhh
+
+    usuario = Usuario(nombre_usuario='rrhh', email='rrhh@test.com', nombre_completo='RRHH', rol=RoleEnum.RRHH)
+    usuario.set_password('clave')
+    db.session.add(usuario)
+    db.session.commit()
+    cliente = app.test_client()
+    cliente.post('/auth/login', data={'nombre_usuario': 'rrhh', 'password': 'clave'})
+
+    hoy = date.today()
+    respuestas = []
+    for hora in ('07:50', '12:00', '12:50', '17:10'):
+        ahora = datetime.combine(hoy, time.fromisoformat(hora))
+
+        class Reloj(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return ahora
+
+        monkeypatch.setattr(rrhh, 'datetime', Reloj)
+        respuesta = cliente.post('/rrhh/asistencia/registrar', json={'codigo': 'emp001'})
+        assert respuesta.status_code == 200, respuesta.get_json()
+        respuestas.append(respuesta.get_json())
+
+    assert [r['tipo'] for r in respuestas] == ['in', 'out', 'in', 'out']
+    assert respuestas[-1]['resumen'] == {
+        'hora_entrada': '07:50:00', 'hora_salida': '17:10:00', 'presente': True,
+        'observaciones': 'Día completo (8h) - Almuerzo 50min'
+    }
+
+    db.session.expire_all()
+    asistencia = Asistencia.query.filter_by(empleado_id=empleado.id, fecha=hoy).one()
+    assert (asistencia.hora_entrada, asistencia.hora_salida) == (time(7, 50), time(17, 10))
+    assert (asistencia.salida_almuerzo, asistencia.regreso_almuerzo) == (time(12, 0), time(12, 50))
+    assert (asistencia.eventos, asistencia.ultimo_evento) == (4, 'out')
+    assert AsistenciaEvento.query.count() == 4
+    assert Bitacora.query.filter_by(modulo='asistencia', registro_id=asistencia.id).count() == 4
+    # ip y user agent quedan en una sola fila de dispositivos
+    assert {(e.dispositivo_id, e.detalles) for e in AsistenciaEvento.query} == {(1, None)}
+    assert Dispositivo.query.one().origen == 'web'
+
+    # Después de las 17:30 no se permite una entrada
+    ahora = datetime.combine(hoy, time(18, 0))
+    respuesta = cliente.post('/rrhh/asistencia/registrar', json={'codigo': 'EMP001', 'tipo': 'in'})
+    assert respuesta.status_code == 403
+    assert AsistenciaEvento.query.count() == 4
+
+def test_importar_marcaciones_lote(app, empleado):
+    from app.marcaciones import leer_marcaciones, importar_marcaciones
+
+    csv_lote = (
+        'codigo,ts,tipo,device_id\n'
+        'emp001,2025-11-04 12:00:00,out,RELOJ-1\n'
+        'EMP001,2025-11-04 07:55:00,in,RELOJ-1\n'
+        'EMP001,2025-11-04 12:00:00,out,RELOJ-1\n'  # repetida en el lote
+        'EMP999,2025-11-04 08:00:00,in,RELOJ-1\n'
+        'EMP001,ayer,in,RELOJ-1\n'
+    )
+    resultado = importar_marcaciones(leer_marcaciones(csv_lote, 'csv'))
+    db.session.commit()
+    assert (resultado['aceptadas'], resultado['duplicadas'], resultado['rechazadas']) == (2, 1, 2)
+    assert [e['fila'] for e in resultado['errores']] == [4, 5]
+
+    asistencia = Asistencia.query.filter_by(empleado_id=empleado.id, fecha=DIA).one()
+    assert asistencia.observaciones == 'Solo turno mañana - No regresó del almuerzo'
+
+    # Reenvío del mismo lote más las marcaciones de la tarde
+    json_lote = '[{"codigo": "EMP001", "ts": "2025-11-04T12:00:00", "tipo": "out", "device_id": "RELOJ-1"},' \
+                ' {"codigo": "EMP001", "ts": "2025-11-04T12:40:00", "tipo": "in", "device_id": "RELOJ-1"},' \
+                ' {"codigo": "EMP001", "ts": "2025-11-04T17:05:00", "tipo": "out"}]'
+    resultado = importar_marcaciones(leer_marcaciones(json_lote, 'json'), dispositivo_defecto='RELOJ-2')
+    db.session.commit()
+    assert (resultado['aceptadas'], resultado['duplicadas'], resultado['rechazadas']) == (2, 1, 0)
+
+    db.session.expire_all()
+    asistencia = Asistencia.query.filter_by(empleado_id=empleado.id, fecha=DIA).one()
+    assert asistencia.observaciones == 'Día completo (8h) - Almuerzo 40min'
+    assert (asistencia.eventos, asistencia.hora_entrada) == (4, time(7, 55))
+    assert AsistenciaEvento.query.filter_by(origen='RELOJ-2').count() == 1
+
+def test_importar_lote_solapado_no_duplica(app, empleado):
+    from app.marcaciones import importar_marcaciones
+
+    # Un reloj reintenta el envío: el mismo lote llega dos veces
+    lote = [{'codigo': 'EMP001', 'ts': f'2025-11-04 {hora}', 'tipo': tipo, 'device_id': 'RELOJ-1'}
+            for hora, tipo in (('07:55:00', 'in'), ('12:00:00', 'out'))]
+    assert importar_marcaciones(lote)['aceptadas'] == 2
+    resultado = importar_marcaciones(lote + [{'codigo': 'EMP001', 'ts': '2025-11-04 07:55:00', 'tipo': 'in',
+                                              'device_id': 'RELOJ-2'}])
+    db.session.commit()
+    assert (resultado['aceptadas'], resultado['duplicadas'], resultado['dias_recalculados']) == (1, 2, 1)
+    assert AsistenciaEvento.query.count() == 3
+    assert AsistenciaEvento.query.filter(AsistenciaEvento.fecha_creacion.is_(None)).count() == 0
+
+def test_importar_respeta_justificaciones_y_licencias(app, empleado):
+    from app.marcaciones import leer_marcaciones, importar_marcaciones
+
+    vacaciones = date(2025, 11, 5)
+    db.session.add_all([
+        Asistencia(empleado_id=empleado.id, fecha=DIA, presente=False, justificacion_estado='JUSTIFICADO',
+                   observaciones='Certificado médico'),
+        Asistencia(empleado_id=empleado.id, fecha=vacaciones, presente=True,
+                   observaciones='Vacaciones (auto-generado)'),
+    ])
+    db.session.commit()
+
+    lote = ('codigo,ts,tipo,device_id\n'
+            'EMP001,2025-11-04 09:30:00,in,RELOJ-1\n'
+            'EMP001,2025-11-05 10:00:00,in,RELOJ-1\n')
+    resultado = importar_marcaciones(leer_marcaciones(lote, 'csv'))
+    db.session.commit()
+    assert resultado['aceptadas'] == 2
+
+    db.session.expire_all()
+    justificada = Asistencia.query.filter_by(empleado_id=empleado.id, fecha=DIA).one()
+    assert (justificada.presente, justificada.justificacion_estado, justificada.observaciones) == \
+        (False, 'JUSTIFICADO', 'Certificado médico')
+    assert justificada.eventos is None
+    licencia = Asistencia.query.filter_by(empleado_id=empleado.id, fecha=vacaciones).one()
+    assert (licencia.presente, licencia.observaciones) == (True, 'Vacaciones (auto-generado)')
+    assert (licencia.eventos, licencia.hora_entrada) == (1, time(10, 0))
+
+def test_ruta_lote_token_dispositivo_y_csrf(app, empleado, monkeypatch):
+    import app.routes.rrhh as rrhh
+
+    app.config.update(WTF_CSRF_ENABLED=True, MARCACIONES_TOKENS=('secreto-reloj',))
+    cliente = app.test_client()
+    lote = [{'codigo': 'EMP001', 'ts': '2025-11-04T07:55:00', 'tipo': 'in', 'device_id': 'RELOJ-1'}]
+    url = '/rrhh/asistencia/marcaciones/lote'
+
+    assert cliente.post(url, json=lote, headers={'X-Dispositivo-Token': 'otro'}).status_code == 401
+    respuesta = cliente.post(url, json=lote, headers={'X-Dispositivo-Token': 'secreto-reloj'})
+    assert respuesta.status_code == 200, respuesta.get_json()
+    assert respuesta.get_json()['aceptadas'] == 1
+
+    # Sesión de usuario sin token CSRF: rechazada
+    usuario = Usuario(nombre_usuario='rrhh', email='rrhh@test.com', nombre_completo='RRHH', rol=RoleEnum.RRHH)
+    usuario.set_password('clave')
+    db.session.add(usuario)
+    db.session.commit()
+    app.config['WTF_CSRF_ENABLED'] = False
+    cliente.post('/auth/login', data={'nombre_usuario': 'rrhh', 'password': 'clave'})
+    app.config['WTF_CSRF_ENABLED'] = True
+    assert cliente.post(url, json=lote).status_code == 400
+
+    # Error al importar: rollback y JSON 500
+    def falla(*args, **kwargs):
+        raise RuntimeError('sin conexión')
+    monkeypatch.setattr(rrhh, 'importar_marcaciones', falla)
+    respuesta = cliente.post(url, json=lote, headers={'X-Dispositivo-Token': 'secreto-reloj'})
+    assert respuesta.status_code == 500 and respuesta.get_json()['success'] is False
+
+def test_reglas_desde_config_y_plegado():
+    from app.marcaciones import ReglasAsistencia, EstadoDia, CAMPOS_ESTADO
+
+    reglas = ReglasAsistencia.desde_config({'ASISTENCIA_ON_TIME': '08:00', 'ASISTENCIA_TOLERANCE': '08:10'})
+    estado = _estado(('in', '08:05'), ('out', '17:00'))
+    assert reglas.resumir(estado)['observaciones'] == 'Día completo - Sin registro de almuerzo'
+    estado = _estado(('in', '08:15'), ('out', '17:00'))
+    assert reglas.resumir(estado)['observaciones'] == 'Llegada tarde 15 min - Día completo'
+
+    # Flujo ordenado por (empleado_id, ts): un estado por (empleado, día), igual al incremental
+    flujo = [
+        (1, datetime(2025, 11, 3, 8, 0), 'in'), (1, datetime(2025, 11, 3, 17, 0), 'out'),
+        (1, datetime(2025, 11, 4, 9, 0), 'in'),
+        (2, datetime(2025, 11, 3, 7, 50), 'in'), (2, datetime(2025, 11, 3, 12, 0), 'out'),
+    ]
+    dias = dict(reglas.plegar(flujo))
+    assert list(dias) == [(1, date(2025, 11, 3)), (1, date(2025, 11, 4)), (2, date(2025, 11, 3))]
+    esperado = EstadoDia()
+    for _, ts, tipo in flujo[3:]:
+        reglas.aplicar(esperado, tipo, ts)
+    assert {c: getattr(dias[(2, date(2025, 11, 3))], c) for c in CAMPOS_ESTADO} == \
+        {c: getattr(esperado, c) for c in CAMPOS_ESTADO}
+
+def test_reprocesar_asistencias(app, empleado):
+    from app.reproceso_asistencia import reprocesar_asistencias
+    from app.resumen_asistencia import resumen_mes
+
+    for dia, marcaciones in ((DIA, ('07:55', '12:00', '12:45', '17:00')), (date(2025, 11, 5), ('09:00', '17:00'))):
+        for hora, tipo in zip(marcaciones, ('in', 'out', 'in', 'out')):
+            db.session.add(AsistenciaEvento(empleado_id=empleado.id, ts=datetime.combine(dia, time.fromisoformat(hora)),
+                                            tipo=tipo, origen='web'))
+    vacaciones = date(2025, 11, 6)
+    db.session.add(AsistenciaEvento(empleado_id=empleado.id, ts=datetime.combine(vacaciones, time(9, 0)),
+                                    tipo='in', origen='web'))
+    # Fila con resumen viejo, fila justificada a mano, día cerrado como vacaciones y un día sin fila
+    db.session.add(Asistencia(empleado_id=empleado.id, fecha=DIA, presente=True, observaciones='viejo'))
+    db.session.add(Asistencia(empleado_id=empleado.id, fecha=date(2025, 11, 5), presente=False,
+                              observaciones='Médico', justificacion_estado='JUSTIFICADO'))
+    db.session.add(Asistencia(empleado_id=empleado.id, fecha=vacaciones, presente=True,
+                              observaciones='Vacaciones (auto-generado)'))
+    db.session.commit()
+
+    stats = reprocesar_asistencias(DIA, vacaciones, tamano_lote=1)
+    assert (stats['eventos'], stats['dias'], stats['actualizadas'], stats['omitidas']) == (7, 3, 2, 1)
+
+    db.session.expire_all()
+    asistencia = Asistencia.query.filter_by(empleado_id=empleado.id, fecha=DIA).one()
+    assert (asistencia.observaciones, asistencia.eventos) == ('Día completo (8h) - Almuerzo 45min', 4)
+    assert Asistencia.query.filter_by(fecha=date(2025, 11, 5)).one().observaciones == 'Médico'
+    # Las vacaciones conservan su clasificación; solo se actualizan las horas
+    licencia = Asistencia.query.filter_by(fecha=vacaciones).one()
+    assert (licencia.presente, licencia.observaciones) == (True, 'Vacaciones (auto-generado)')
+    assert (licencia.hora_entrada, licencia.eventos) == (time(9, 0), 1)
+    assert resumen_mes(empleado.id, 2025, 11)['dias_vacaciones'] == 1
+
+    # Segunda pasada: nada que cambiar
+    stats = reprocesar_asistencias(DIA, vacaciones)
+    assert (stats['actualizadas'], stats['sin_cambios'], stats['omitidas']) == (0, 2, 1)
+
+def test_archivar_mes_y_reprocesar(app, empleado, tmp_path):
+    from app.almacen_eventos import archivar_mes, meses_archivables, eventos_archivados
+    from app.marcaciones import importar_marcaciones
+    from app.reproceso_asistencia import reprocesar_asistencias
+
+    app.config['ASISTENCIA_ARCHIVO_DIR'] = str(tmp_path)
+    for hora, tipo in (('07:55', 'in'), ('12:00', 'out'), ('12:45', 'in'), ('17:00', 'out')):
+        db.session.add(AsistenciaEvento(empleado_id=empleado.id, ts=datetime.combine(DIA, time.fromisoformat(hora)),
+                                        tipo=tipo, origen='RELOJ-1'))
+    db.session.add(AsistenciaEvento(empleado_id=empleado.id, ts=datetime(2025, 12, 1, 8, 0), tipo='in', origen='web'))
+    db.session.add(Asistencia(empleado_id=empleado.id, fecha=DIA, presente=True, observaciones='viejo'))
+    db.session.commit()
+
+    assert meses_archivables(date(2025, 11, 30)) == [(2025, 11)]
+    resultado = archivar_mes(2025, 11)
+    assert (resultado['eventos'], resultado['total']) == (4, 4)
+    assert AsistenciaEvento.query.count() == 1
+    assert [r['ts'].time() for r in eventos_archivados(DIA, DIA)] == [time(7, 55), time(12, 0), time(12, 45), time(17, 0)]
+
+    # Reimportar una marcación archivada es un duplicado; una tardía se combina al volver a archivar
+    resultado = importar_marcaciones([
+        {'codigo': 'EMP001', 'ts': '2025-11-04 12:00:00', 'tipo': 'out', 'device_id': 'RELOJ-1'},
+        {'codigo': 'EMP001', 'ts': '2025-11-05 08:00:00', 'tipo': 'in', 'device_id': 'RELOJ-1'},
+    ])
+    db.session.commit()
+    assert (resultado['aceptadas'], resultado['duplicadas']) == (1, 1)
+    assert archivar_mes(2025, 11)['total'] == 5
+
+    stats = reprocesar_asistencias(DIA, DIA)
+    assert (stats['eventos'], stats['actualizadas']) == (4, 1)
+    db.session.expire_all()
+    asistencia = Asistencia.query.filter_by(empleado_id=empleado.id, fecha=DIA).one()
+    assert asistencia.observaciones == 'Día completo (8h) - Almuerzo 45min'
+
+def test_id_dispositivo_cache_y_rollback(app):
+    import app.dispositivos as dispositivos
+
+    primero = dispositivos.id_dispositivo('web', '10.0.0.1', 'Kiosco')
+    assert dispositivos.id_dispositivo('web', '10.0.0.1', 'Kiosco') == primero
+    db.session.rollback()  # el dispositivo nuevo no llegó a confirmarse
+    assert dispositivos._cache == {} and Dispositivo.query.count() == 0
+
+    primero = dispositivos.id_dispositivo('web', '10.0.0.1', 'Kiosco')
+    db.session.commit()
+    assert dispositivos._cache[dispositivos.hash_dispositivo('web', '10.0.0.1', 'Kiosco')] == primero
+    assert dispositivos.id_dispositivo('web', '10.0.0.2', 'Kiosco') != primero
+    db.session.commit()
+    assert Dispositivo.query.count() == 2
+
+def test_tablero_presencia_sse(app, empleado):
+    import json
+    from app.marcaciones import fila_del_dia, registrar_marcacion
+
+    usuario = Usuario(nombre_usuario='rrhh', email='rrhh@test.com', nombre_completo='RRHH', rol=RoleEnum.RRHH)
+    usuario.set_password('clave')
+    db.session.add(usuario)
+    db.session.commit()
+    cliente = app.test_client()
+    cliente.post('/auth/login', data={'nombre_usuario': 'rrhh', 'password': 'clave'})
+
+    respuesta = cliente.get(f'/rrhh/asistencia/tablero/eventos?fecha={DIA}', buffered=False)
+    assert respuesta.mimetype == 'text/event-stream'
+    flujo = iter(respuesta.response)
+
+    def mensaje():
+        tipo, id_, datos = next(flujo).decode().strip().split('\n')
+        return tipo.split(': ')[1], id_.split(': ')[1], json.loads(datos.split(': ', 1)[1])
+
+    tipo, id_estado, datos = mensaje()
+    assert tipo == 'estado'
+    assert [(f['codigo'], f['estado']) for f in datos['filas']] == [('EMP001', 'sin_marcar')]
+
+    # La marcación llega al flujo como diferencia, sin volver a consultar
+    registrar_marcacion(fila_del_dia(empleado.id, DIA), datetime.combine(DIA, time(7, 55)), 'in')
+    db.session.commit()
+    tipo, id_cambio, datos = mensaje()
+    assert tipo == 'cambio'
+    assert [(f['estado'], f['entrada']) for f in datos['filas']] == [('adentro', '07:55:00')]
+    assert datos['resumen'] == {'adentro': 1}
+
+    # Un rollback no publica nada; reconectar con Last-Event-ID reanuda sin repetir el estado
+    registrar_marcacion(fila_del_dia(empleado.id, DIA), datetime.combine(DIA, time(12, 0)), 'out')
+    db.session.flush()
+    db.session.rollback()
+    reanudado = cliente.get(f'/rrhh/asistencia/tablero/eventos?fecha={DIA}', buffered=False,
+                            headers={'Last-Event-ID': id_estado})
+    tipo, id_, datos = next(iter(reanudado.response)).decode().strip().split('\n')
+    assert tipo == 'event: cambio' and id_ == f'id: {id_cambio}'
@@ -0,0 +1,230 @@
+"""
+Tests del motor de liquidaciones (app/nomina.py).
+Valida que los agregados agrupados reproducen el cálculo por empleado.
+"""
+import pytest
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from app import create_app
+from app.models import (
+    db, Empleado, Cargo, Asistencia, IngresoExtra, HorasExtra, Descuento,
+    Anticipo, Sancion, Liquidacion, DetalleLiquidacion, BonificacionFamiliar, SalarioMinimo
+)
+
+PERIODO = '2025-11'
+DIAS_HABILES_NOV_2025 = 20
+
+@pytest.fixture
+def app():
+    """Crea aplicación Flask para testing con BD en memoria."""
+    app = create_app('testing')
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+def _crear_empleado(cargo, codigo, salario):
+    empleado = Empleado(
+        codigo=codigo,
+        nombre='Empleado',
+        apellido=codigo,
+        ci=f'CI{codigo}',
+        cargo_id=cargo.id,
+        salario_base=Decimal(salario),
+        fecha_ingreso=date(2020, 1, 1)
+    )
+    db.session.add(empleado)
+    db.session.flush()
+    return empleado
+
+def _crear_datos_periodo():
+    """Tres empleados: uno con movimientos, uno sin nada y uno ya liquidado."""
+    cargo = Cargo(nombre='Operario', salario_base=Decimal('3000000'))
+    db.session.add(cargo)
+    db.session.flush()
+
+    db.session.add(SalarioMinimo(año=2025, monto=Decimal('2798309'), vigencia_desde=date(2025, 1, 1)))
+
+    completo = _crear_empleado(cargo, 'EMP001', '3000000')
+    vacio = _crear_empleado(cargo, 'EMP002', '2500000')
+    liquidado = _crear_empleado(cargo, 'EMP003', '2000000')
+
+    # 18 días presentes y 1 ausencia en noviembre; 1 presente en octubre (no cuenta)
+    dia = date(2025, 11, 3)
+    presentes = 0
+    while presentes < 18:
+        if dia.weekday() < 5:
+            db.session.add(Asistencia(empleado_id=completo.id, fecha=dia, presente=True))
+            presentes += 1
+        dia += timedelta(days=1)
+    db.session.add(Asistencia(empleado_id=completo.id, fecha=date(2025, 11, 28), presente=False))
+    db.session.add(Asistencia(empleado_id=completo.id, fecha=date(2025, 10, 31), presente=True))
+
+    db.session.add_all([
+        IngresoExtra(empleado_id=completo.id, tipo='Bonificación', monto=Decimal('100000'),
+                     mes=11, año=2025, estado='APROBADO', aplicado=False),
+        IngresoExtra(empleado_id=completo.id, tipo='Comisión', monto=Decimal('999999'),
+                     mes=11, año=2025, estado='PENDIENTE', aplicado=False),
+        HorasExtra(empleado_id=completo.id, fecha=date(2025, 11, 5), horas=Decimal('2'),
+                   monto_calculado=Decimal('50000'), estado='APROBADO', aplicado=False),
+        Descuento(empleado_id=completo.id, tipo='Manual', monto=Decimal('20000'), mes=11, año=2025),
+        Anticipo(empleado_id=completo.id, monto=Decimal('200000'), aprobado=True,
+                 fecha_aprobacion=datetime(2025, 11, 30, 18, 0), aplicado=False),
+        Anticipo(empleado_id=completo.id, monto=Decimal('300000'), aprobado=True,
+                 fecha_aprobacion=datetime(2025, 12, 1, 0, 0), aplicado=False),
+        Sancion(empleado_id=completo.id, tipo_sancion='Multa', motivo='Test',
+                monto=Decimal('10000'), fecha=date(2025, 11, 10)),
+    ])
+    for i in range(2):
+        db.session.add(BonificacionFamiliar(
+            empleado_id=completo.id, hijo_nombre=f'Hijo{i}', hijo_apellido='Test',
+            hijo_fecha_nacimiento=date(2015, 1, 1), activo=True
+        ))
+
+    db.session.add(Liquidacion(empleado_id=liquidado.id, periodo=PERIODO,
+                               salario_base=Decimal('2000000'), salario_neto=Decimal('1800000')))
+    db.session.commit()
+    return {'completo': completo, 'vacio': vacio, 'liquidado': liquidado}
+
+@pytest.fixture
+def datos_periodo(app):
+    return _crear_datos_periodo()
+
+def test_calculo_periodo_reproduce_formula(app, datos_periodo):
+    """Los agregados agrupados producen los mismos montos que el cálculo por empleado."""
+    from app.nomina import calcular_liquidaciones_periodo
+
+    calculo = calcular_liquidaciones_periodo(PERIODO)
+
+    assert calculo['dias_habiles'] == DIAS_HABILES_NOV_2025
+    assert calculo['omitidos'] == 1
+    resultados = {r['empleado_id']: r for r in calculo['resultados']}
+    assert set(resultados) == {datos_periodo['completo'].id, datos_periodo['vacio'].id}
+
+    r = resultados[datos_periodo['completo'].id]
+    salario = Decimal('3000000')
+    descuento_ausencias = salario / Decimal('20') * Decimal('2')
+    ingresos = Decimal('150000')
+    bonificacion = (Decimal('2798309') * Decimal('0.05')).quantize(Decimal('0.01')) * 2
+    descuentos = Decimal('20000') + Decimal('200000') + Decimal('10000') + descuento_ausencias
+    ips = (salario + ingresos + bonificacion) * Decimal('0.09625')
+
+    assert r['dias_presentes'] == 18
+    assert r['ingresos_extras'] == ingresos
+    assert r['bonificacion_familiar'] == bonificacion
+    assert r['descuento_ausencias'] == descuento_ausencias
+    assert r['descuento_anticipos'] == Decimal('200000')
+    assert r['descuento_sanciones'] == Decimal('10000')
+    assert r['descuento_otros'] == Decimal('20000')
+    assert r['descuentos'] == descuentos
+    assert r['aporte_ips'] == ips
+    assert r['salario_neto'] == salario + ingresos + bonificacion - descuentos - ips
+
+    vacio = resultados[datos_periodo['vacio'].id]
+    assert vacio['dias_presentes'] == 0
+    assert vacio['ingresos_extras'] == Decimal('0')
+    assert vacio['descuento_ausencias'] == Decimal('2500000')
+
+def test_marcar_aplicados_solo_periodo(app, datos_periodo):
+    """Solo se marcan los ítems aprobados del período y de los empleados liquidados."""
+    from app.nomina import calcular_liquidaciones_periodo, guardar_liquidaciones
+
+    calculo = calcular_liquidaciones_periodo(PERIODO)
+    afectadas = guardar_liquidaciones(PERIODO, calculo['resultados'])
+    db.session.commit()
+
+    assert afectadas == {'liquidaciones': 2, 'detalles': afectadas['detalles'],
+                         'ingresos_extras': 1, 'horas_extras': 1, 'anticipos': 1}
+    assert DetalleLiquidacion.query.count() == afectadas['detalles']
+    completo = Liquidacion.query.filter_by(periodo=PERIODO, empleado_id=datos_periodo['completo'].id).one()
+    assert sum(d.monto for d in completo.detalles if d.tipo_rubro == 'descuentos') == completo.descuentos
+    assert [d.monto for d in completo.detalles if d.tipo_rubro == 'aporte_ips'] == [completo.aporte_ips]
+
+    assert Liquidacion.query.filter_by(periodo=PERIODO).count() == 3
+    assert IngresoExtra.query.filter_by(aplicado=True).count() == 1
+    assert HorasExtra.query.filter_by(aplicado=True).count() == 1
+    aplicados = Anticipo.query.filter_by(aplicado=True).all()
+    assert [a.monto for a in aplicados] == [Decimal('200000')]
+    assert aplicados[0].fecha_aplicacion == date(2025, 11, 1)
+
+    # Una segunda corrida no duplica liquidaciones
+    assert calcular_liquidaciones_periodo(PERIODO)['resultados'] == []
+
+@pytest.fixture
+def app_archivo(tmp_path, monkeypatch):
+    """BD SQLite en archivo: los workers del modo paralelo abren su propia conexión."""
+    from app.config import TestingConfig
+    monkeypatch.setattr(TestingConfig, 'SQLALCHEMY_DATABASE_URI', f'sqlite:///{tmp_path / "nomina.db"}')
+    app = create_app('testing')
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+def test_modo_paralelo_igual_al_serial(app_archivo):
+    """Repartir por rangos de id en varios procesos no cambia ningún monto."""
+    from app.nomina import calcular_liquidaciones_periodo, calcular_aguinaldos
+    from app.nomina_paralela import (
+        particionar_ids, calcular_liquidaciones_periodo_paralelo, calcular_aguinaldos_paralelo
+    )
+
+    assert particionar_ids([1, 2, 5, 7, 9], 2) == [(1, 5), (7, 9)]
+
+    _crear_datos_periodo()
+    serial = calcular_liquidaciones_periodo(PERIODO)
+    aguinaldos_serial = calcular_aguinaldos(2025, date(2025, 12, 31), Empleado.query.order_by(Empleado.id).all())
+
+    app_archivo.config['NOMINA_PROCESOS'] = 2
+    app_archivo.config['NOMINA_MIN_EMPLEADOS_PARALELO'] = 0
+    paralelo = calcular_liquidaciones_periodo_paralelo(PERIODO)
+    aguinaldos_paralelo = calcular_aguinaldos_paralelo(2025, date(2025, 12, 31))
+
+    assert paralelo == serial
+    assert aguinaldos_paralelo == aguinaldos_serial
+
+def test_preview_vectorial_igual_a_decimal(app):
+    """La vista previa con NumPy coincide al guaraní con el cálculo Decimal."""
+    np = pytest.importorskip('numpy')
+    import random
+    from decimal import ROUND_HALF_UP
+    from scripts.generar_datos_sinteticos import generar_datos
+    from app.nomina import calcular_liquidaciones_periodo
+    from app.nomina_vectorial import calcular_vectorial
+
+    generar_datos(150, 1, (2025, 11), semilla=7, eco=lambda *_: None)
+    # Montos con céntimos para ejercitar el redondeo
+    rnd = random.Random(7)
+    for empleado in Empleado.query.limit(60):
+        db.session.add(Descuento(empleado_id=empleado.id, tipo='Otro', monto=Decimal(rnd.randint(1, 99999999)) / 100,
+                                 mes=11, año=2025))
+        db.session.add(Sancion(empleado_id=empleado.id, tipo_sancion='Multa', motivo='x',
+                               monto=Decimal(rnd.randint(1, 9999999)) / 100, fecha=date(2025, 11, 12)))
+    db.session.commit()
+
+    empleados = Empleado.query.order_by(Empleado.id).all()
+    decimal = calcular_liquidaciones_periodo(PERIODO, empleados, incluir_liquidados=True)['resultados']
+    vectorial = calcular_vectorial(PERIODO, empleados)
+
+    def guaranies(valor):
+        return int(valor.quantize(Decimal('1'), ROUND_HALF_UP))
+
+    campos = {
+        'salario': lambda r: r['salario_base'],
+        'bonificacion': lambda r: r['bonificacion_familiar'],
+        'ingresos': lambda r: r['ingresos_extras'],
+        'descuentos': lambda r: r['descuentos'] - r['descuento_anticipos'],
+        'anticipos': lambda r: r['descuento_anticipos'],
+        'descuentos_totales': lambda r: r['descuentos'],
+        'ips': lambda r: r['aporte_ips'],
+        'neto': lambda r: r['salario_neto'],
+    }
+    assert vectorial['dias'].tolist() == [r['dias_presentes'] for r in decimal]
+    for campo, valor in campos.items():
+        assert vectorial[campo].dtype == np.int64
+        assert vectorial[campo].tolist() == [guaranies(valor(r)) for r in decimal], campo
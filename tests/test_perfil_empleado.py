@@ -0,0 +1,72 @@
+"""
+Tests del perfil consolidado del empleado (app/perfil_empleado.py).
+"""
+import pytest
+from datetime import date
+from decimal import Decimal
+from app import create_app
+from app.models import db, Empleado, Cargo, Asistencia, Permiso, Usuario, RoleEnum
+
+@pytest.fixture
+def app():
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def empleado(app):
+    cargo = Cargo(nombre='Operario', salario_base=Decimal('1'))
+    db.session.add(cargo)
+    db.session.flush()
+    empleado = Empleado(codigo='E1', nombre='A', apellido='B', ci='1', cargo_id=cargo.id,
+                        salario_base=Decimal('1'), fecha_ingreso=date(2020, 1, 1))
+    db.session.add(empleado)
+    db.session.commit()
+    return empleado
+
+@pytest.fixture
+def cliente(app):
+    usuario = Usuario(nombre_usuario='rrhh', email='rrhh@x.com', nombre_completo='RRHH', rol=RoleEnum.RRHH)
+    usuario.set_password('secreto')
+    db.session.add(usuario)
+    db.session.commit()
+    cliente = app.test_client()
+    cliente.post('/auth/login', data={'nombre_usuario': 'rrhh', 'password': 'secreto'})
+    return cliente
+
+def test_perfil_secciones_y_etag(app, empleado, cliente):
+    ausencia = Asistencia(empleado_id=empleado.id, fecha=date(2025, 3, 3), presente=False, justificacion_estado='PENDIENTE')
+    db.session.add(ausencia)
+    db.session.commit()
+    url = f'/rrhh/api/empleados/{empleado.id}/perfil'
+
+    respuesta = cliente.get(url)
+    secciones = respuesta.get_json()['secciones']
+    assert secciones['asistencias']['datos']['justificaciones']['pendientes'] == 1
+    assert secciones['general']['datos'] == cliente.get(f'/rrhh/api/empleados/{empleado.id}/general').get_json()
+    etag = respuesta.headers['ETag']
+
+    # Sin cambios: 304 sin cuerpo
+    revalidada = cliente.get(url, headers={'If-None-Match': etag})
+    assert revalidada.status_code == 304 and revalidada.data == b''
+
+    # Una edición cambia solo las secciones que dependen de la tabla
+    solo_permisos = cliente.get(f'{url}?secciones=permisos')
+    assert solo_permisos.headers['ETag'] == f'W/"{secciones["permisos"]["version"]}"'
+    ausencia.justificacion_estado = 'JUSTIFICADO'
+    db.session.commit()
+    assert cliente.get(url, headers={'If-None-Match': etag}).status_code == 200
+    assert cliente.get(f'{url}?secciones=permisos', headers={'If-None-Match': solo_permisos.headers['ETag']}).status_code == 304
+
+    # Un alta cambia la versión de su sección
+    db.session.add(Permiso(empleado_id=empleado.id, tipo_permiso='Personal', motivo='x',
+                           fecha_inicio=date(2025, 3, 4), fecha_fin=date(2025, 3, 4)))
+    db.session.commit()
+    nueva = cliente.get(f'{url}?secciones=permisos', headers={'If-None-Match': solo_permisos.headers['ETag']})
+    assert nueva.status_code == 200 and nueva.get_json()['secciones']['permisos']['datos']['total'] == 1
+
+    assert cliente.get(f'{url}?secciones=otra').status_code == 400
+    assert cliente.get('/rrhh/api/empleados/999/perfil').status_code == 404
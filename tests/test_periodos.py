@@ -0,0 +1,47 @@
+"""
+Tests de los filtros de período indexables (app/periodos.py).
+"""
+import pytest
+from datetime import date, datetime
+from decimal import Decimal
+from app import create_app
+from app.models import db, Empleado, Cargo, Asistencia, AsistenciaEvento
+from app.periodos import rango_mes, en_mes, en_año, en_dia
+
+@pytest.fixture
+def app():
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+def test_rango_mes_semiabierto():
+    assert rango_mes(2025, 2) == (date(2025, 2, 1), date(2025, 3, 1))
+    assert rango_mes(2025, 12) == (date(2025, 12, 1), date(2026, 1, 1))
+
+def test_filtros_equivalen_a_extract(app):
+    """Los bordes del mes, del año y del día quedan dentro/fuera igual que con extract/func.date."""
+    cargo = Cargo(nombre='Operario', salario_base=Decimal('1'))
+    db.session.add(cargo)
+    db.session.flush()
+    empleado = Empleado(codigo='E1', nombre='A', apellido='B', ci='1', cargo_id=cargo.id,
+                        salario_base=Decimal('1'), fecha_ingreso=date(2020, 1, 1))
+    db.session.add(empleado)
+    db.session.flush()
+
+    for f in (date(2024, 12, 31), date(2025, 1, 1), date(2025, 1, 31), date(2025, 2, 1), date(2025, 12, 31)):
+        db.session.add(Asistencia(empleado_id=empleado.id, fecha=f))
+    for ts in (datetime(2025, 1, 14, 23, 59, 59), datetime(2025, 1, 15, 0, 0), datetime(2025, 1, 15, 23, 59, 59),
+               datetime(2025, 1, 16, 0, 0)):
+        db.session.add(AsistenciaEvento(empleado_id=empleado.id, ts=ts, tipo='in'))
+    db.session.commit()
+
+    enero = Asistencia.query.filter(en_mes(Asistencia.fecha, 2025, 1)).order_by(Asistencia.fecha).all()
+    assert [a.fecha for a in enero] == [date(2025, 1, 1), date(2025, 1, 31)]
+    assert Asistencia.query.filter(en_año(Asistencia.fecha, 2025)).count() == 4
+
+    dia = AsistenciaEvento.query.filter(en_dia(AsistenciaEvento.ts, date(2025, 1, 15))).order_by(AsistenciaEvento.ts).all()
+    assert [e.ts for e in dia] == [datetime(2025, 1, 15, 0, 0), datetime(2025, 1, 15, 23, 59, 59)]
+    assert AsistenciaEvento.query.filter(en_mes(AsistenciaEvento.ts, 2025, 1)).count() == 4
@@ -0,0 +1,212 @@
+"""
+Tests de asistencia_resumen_mensual (app/resumen_asistencia.py).
+Los contadores incrementales deben coincidir siempre con una reconstrucción desde cero.
+"""
+import pytest
+from datetime import date
+from decimal import Decimal
+from app import create_app
+from app.models import db, Empleado, Cargo, Asistencia, AsistenciaResumenMensual
+
+@pytest.fixture
+def app():
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def empleado(app):
+    cargo = Cargo(nombre='Operario', salario_base=Decimal('1'))
+    db.session.add(cargo)
+    db.session.flush()
+    empleado = Empleado(codigo='E1', nombre='A', apellido='B', ci='1', cargo_id=cargo.id,
+                        salario_base=Decimal('1'), fecha_ingreso=date(2020, 1, 1))
+    db.session.add(empleado)
+    db.session.commit()
+    return empleado
+
+def _filas():
+    return {
+        (r.empleado_id, r.año, r.mes): (r.presentes, r.ausencias, r.justificadas, r.injustificadas,
+                                        r.pendientes, r.dias_vacaciones, r.dias_permiso)
+        for r in AsistenciaResumenMensual.query
+    }
+
+def test_incremental_igual_a_reconstruccion(app, empleado):
+    from app.resumen_asistencia import reconstruir_resumen, resumen_mes
+
+    db.session.add_all([
+        Asistencia(empleado_id=empleado.id, fecha=date(2025, 3, 3), presente=True),
+        Asistencia(empleado_id=empleado.id, fecha=date(2025, 3, 4), presente=True,
+                   observaciones='Vacaciones (auto-generado)'),
+        Asistencia(empleado_id=empleado.id, fecha=date(2025, 3, 5), presente=True,
+                   observaciones='Permiso: Médico (auto-generado)'),
+        Asistencia(empleado_id=empleado.id, fecha=date(2025, 3, 6), presente=False, justificacion_estado='PENDIENTE'),
+        Asistencia(empleado_id=empleado.id, fecha=date(2025, 3, 7), presente=False, justificacion_estado='PENDIENTE'),
+    ])
+    db.session.commit()
+    assert resumen_mes(empleado.id, 2025, 3) == {
+        'presentes': 3, 'ausencias': 2, 'justificadas': 0, 'injustificadas': 0,
+        'pendientes': 2, 'dias_vacaciones': 1, 'dias_permiso': 1
+    }
+
+    # Justificar, no justificar, editar (presente), mover de mes y eliminar (objetos expirados tras commit)
+    a6 = Asistencia.query.filter_by(fecha=date(2025, 3, 6)).one()
+    a7 = Asistencia.query.filter_by(fecha=date(2025, 3, 7)).one()
+    a6.justificacion_estado = 'JUSTIFICADO'
+    a7.justificacion_estado = 'INJUSTIFICADO'
+    db.session.commit()
+    a3 = Asistencia.query.filter_by(fecha=date(2025, 3, 3)).one()
+    a3.presente = False
+    a3.fecha = date(2025, 4, 1)
+    db.session.commit()
+    db.session.delete(Asistencia.query.filter_by(fecha=date(2025, 3, 5)).one())
+    db.session.commit()
+
+    incremental = _filas()
+    assert incremental[(empleado.id, 2025, 3)] == (1, 2, 1, 1, 0, 1, 0)
+    assert incremental[(empleado.id, 2025, 4)] == (0, 1, 0, 0, 0, 0, 0)
+
+    for año, mes in ((2025, 3), (2025, 4)):
+        reconstruir_resumen(año, mes)
+    db.session.commit()
+    assert _filas() == incremental
+
+def test_comando_reconstruir(app, empleado):
+    db.session.add(Asistencia(empleado_id=empleado.id, fecha=date(2025, 5, 2), presente=True))
+    db.session.commit()
+    AsistenciaResumenMensual.query.delete()
+    db.session.commit()
+
+    resultado = app.test_cli_runner().invoke(args=['asistencia-resumen-reconstruir', '--año', '2025', '--mes', '5'])
+    assert resultado.exit_code == 0, resultado.output
+    assert _filas() == {(empleado.id, 2025, 5): (1, 0, 0, 0, 0, 0, 0)}
+
+def test_cierre_por_lotes_actualiza_resumen(app, empleado):
+    from app.cierre_asistencias import cerrar_dia
+    from app.models import Vacacion, EstadoVacacionEnum, Permiso, EstadoPermisoEnum
+    from app.resumen_asistencia import reconstruir_resumen
+
+    otros = [Empleado(codigo=f'E{i}', nombre='A', apellido='B', ci=str(i), cargo_id=empleado.cargo_id,
+                      salario_base=Decimal('1'), fecha_ingreso=date(2020, 1, 1)) for i in range(2, 6)]
+    otros[3].fecha_ingreso = date(2025, 4, 1)  # aún no ingresó
+    db.session.add_all(otros)
+    db.session.flush()
+    db.session.add_all([
+        Vacacion(empleado_id=otros[0].id, año=2025, fecha_inicio_solicitud=date(2025, 3, 1),
+                 fecha_fin_solicitud=date(2025, 3, 10), estado=EstadoVacacionEnum.APROBADA),
+        Permiso(empleado_id=otros[1].id, tipo_permiso='Salud', motivo='Médico', fecha_inicio=date(2025, 3, 3),
+                fecha_fin=date(2025, 3, 3), estado=EstadoPermisoEnum.APROBADO),
+        Asistencia(empleado_id=otros[2].id, fecha=date(2025, 3, 3), presente=True),
+    ])
+    db.session.commit()
+
+    stats = cerrar_dia(date(2025, 3, 3))
+    db.session.commit()
+    assert stats == {'procesados': 3, 'vacaciones': 1, 'permisos': 1, 'ausencias': 1, 'ya_registrados': 1}
+    assert Asistencia.query.filter_by(empleado_id=otros[1].id).one().observaciones == 'Permiso: Médico (auto-generado)'
+    assert Asistencia.query.filter_by(empleado_id=empleado.id).one().justificacion_estado == 'PENDIENTE'
+
+    # Idempotente y con contadores iguales a una reconstrucción
+    assert cerrar_dia(date(2025, 3, 3))['procesados'] == 0
+    incremental = _filas()
+    reconstruir_resumen(2025, 3)
+    db.session.commit()
+    assert _filas() == incremental
+
+def test_recuperar_cierres_avanza_marca(app, empleado):
+    from app.cierre_asistencias import recuperar_cierres, leer_cerrado_hasta
+
+    # Con asistencias hasta la fecha ya cerrada, la primera corrida deja la marca guardada
+    db.session.add(Asistencia(empleado_id=empleado.id, fecha=date(2025, 3, 3), presente=True))
+    db.session.flush()
+    assert recuperar_cierres(hasta=date(2025, 3, 3))['dias'] == []
+    assert leer_cerrado_hasta() == date(2025, 3, 3)
+    db.session.rollback()
+
+    # Sin asistencias previas solo se inicializa la marca
+    assert recuperar_cierres(hasta=date(2025, 3, 3))['dias'] == []
+    assert leer_cerrado_hasta() == date(2025, 3, 3)
+
+    # Sistema apagado del martes al lunes siguiente: se cierran los días hábiles
+    resultado = recuperar_cierres(hasta=date(2025, 3, 10))
+    db.session.commit()
+    assert resultado['dias'] == [date(2025, 3, d) for d in (4, 5, 6, 7, 10)]
+    assert resultado['ausencias'] == 5
+    assert leer_cerrado_hasta() == date(2025, 3, 10)
+    assert recuperar_cierres(hasta=date(2025, 3, 10))['dias'] == []
+
+    # Como máximo max_dias hacia atrás
+    resultado = recuperar_cierres(hasta=date(2025, 3, 31), max_dias=7)
+    assert resultado['dias'] == [date(2025, 3, d) for d in (25, 26, 27, 28, 31)]
+
+def test_metricas_asistencias_cache_e_invalidacion(app, empleado):
+    from app.metricas_asistencia import metricas_asistencias, _cache
+    from app.cierre_asistencias import cerrar_dia
+
+    otro = Empleado(codigo='E2', nombre='C', apellido='D', ci='2', cargo_id=empleado.cargo_id,
+                    salario_base=Decimal('1'), fecha_ingreso=date(2020, 1, 1))
+    db.session.add_all([
+        otro,
+        Asistencia(empleado_id=empleado.id, fecha=date(2025, 3, 3), presente=True),
+        Asistencia(empleado_id=empleado.id, fecha=date(2025, 3, 4), presente=False, justificacion_estado='JUSTIFICADO'),
+        Asistencia(empleado_id=empleado.id, fecha=date(2025, 4, 1), presente=False, justificacion_estado='INJUSTIFICADO'),
+    ])
+    db.session.commit()
+
+    marzo = metricas_asistencias(date(2025, 3, 1), date(2025, 3, 31))
+    assert marzo['dias_habiles'] == 21
+    assert [(m['codigo'], m['dias_presentes'], m['ausencias_totales'], m['ausencias_justificadas'])
+            for m in marzo['empleados']] == [('E1', 1, 1, 1), ('E2', 0, 0, 0)]
+    assert marzo['resumen']['total_empleados'] == 2
+    solo_e2 = metricas_asistencias(date(2025, 3, 1), date(2025, 3, 31), empleado_ids=[otro.id])
+    assert [m['codigo'] for m in solo_e2['empleados']] == ['E2']
+    assert metricas_asistencias(date(2025, 3, 1), date(2025, 3, 31)) is marzo  # desde la caché
+
+    # Un cambio en abril no toca las entradas de marzo; uno en marzo (ORM o cierre por Core) sí
+    abril = metricas_asistencias(date(2025, 4, 1), date(2025, 4, 30))
+    Asistencia.query.filter_by(fecha=date(2025, 4, 1)).one().justificacion_estado = 'JUSTIFICADO'
+    db.session.commit()
+    assert metricas_asistencias(date(2025, 3, 1), date(2025, 3, 31)) is marzo
+    assert metricas_asistencias(date(2025, 4, 1), date(2025, 4, 30))['resumen']['total_justificadas'] == 1
+
+    cerrar_dia(date(2025, 3, 5))
+    db.session.commit()
+    marzo = metricas_asistencias(date(2025, 3, 1), date(2025, 3, 31))
+    assert marzo['resumen']['total_ausencias'] == 3
+    assert len(_cache) == 2  # abril y el marzo recalculado (la entrada filtrada de marzo también se descartó)
+
+def test_ausencias_pendientes_keyset(app, empleado):
+    from app.ausencias_pendientes import contar_ausencias_pendientes, ausencias_pendientes, leer_cursor
+
+    dias = [date(2025, 3, d) for d in range(1, 8)]
+    db.session.add_all(Asistencia(empleado_id=empleado.id, fecha=d, presente=False,
+                                  justificacion_estado='PENDIENTE') for d in dias)
+    db.session.add(Asistencia(empleado_id=empleado.id, fecha=date(2025, 3, 9), presente=False,
+                              justificacion_estado='JUSTIFICADO'))
+    db.session.commit()
+    assert contar_ausencias_pendientes() == 7
+
+    vistas, cursor = [], None
+    while True:
+        filas, siguiente = ausencias_pendientes(leer_cursor(cursor) if cursor else None, limite=3)
+        assert all('empleado' in f.__dict__ for f in filas)  # cargado en la misma consulta
+        vistas += [f.fecha for f in filas]
+        if siguiente is None:
+            break
+        cursor = siguiente
+    assert vistas == sorted(dias, reverse=True)
+
+    from app.models import Usuario, RoleEnum
+    usuario = Usuario(nombre_usuario='rrhh', email='rrhh@x.com', nombre_completo='RRHH', rol=RoleEnum.RRHH)
+    usuario.set_password('secreto')
+    db.session.add(usuario)
+    db.session.commit()
+    cliente = app.test_client()
+    cliente.post('/auth/login', data={'nombre_usuario': 'rrhh', 'password': 'secreto'})
+    assert cliente.get('/dashboard/ausencias-pendientes?despues=bad').status_code == 400
+    datos = cliente.get(f'/dashboard/ausencias-pendientes?despues={cursor}&limite=3').get_json()
+    assert [a['fecha'] for a in datos['ausencias']] == ['2025-03-01'] and datos['siguiente'] is None
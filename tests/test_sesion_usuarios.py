@@ -0,0 +1,61 @@
+"""
+Tests del usuario de la sesión cacheado (app/sesion_usuarios.py).
+"""
+import pytest
+from sqlalchemy import update
+from app import create_app
+from app.models import db, Usuario, RoleEnum, EstadoSistema
+
+@pytest.fixture
+def app():
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def usuario(app):
+    usuario = Usuario(nombre_usuario='ana', email='ana@x.com', nombre_completo='Ana',
+                      rol=RoleEnum.ASISTENTE_RRHH, activo=True)
+    usuario.set_password('secreto')
+    db.session.add(usuario)
+    db.session.commit()
+    return usuario
+
+def test_principal_cacheado_e_invalidado(app, usuario, monkeypatch):
+    from app import sesion_usuarios
+    from app.sesion_usuarios import cargar_principal, registrar_cambio_usuario, Principal
+
+    principal = cargar_principal(usuario.id)
+    assert isinstance(principal, Principal)
+    assert (principal.nombre_completo, principal.rol, principal.get_id()) == ('Ana', RoleEnum.ASISTENTE_RRHH, str(usuario.id))
+    with pytest.raises(AttributeError):
+        principal.rol = RoleEnum.ADMIN
+
+    # Cambio sin registrar: se sigue sirviendo la copia
+    db.session.execute(update(Usuario).where(Usuario.id == usuario.id).values(nombre_completo='Ana B'))
+    db.session.commit()
+    assert cargar_principal(usuario.id) is principal
+
+    # Desactivación registrada (toggle_estado_usuario): deja de estar autenticado
+    usuario.activo = False
+    registrar_cambio_usuario(usuario.id)
+    db.session.commit()
+    assert cargar_principal(usuario.id) is None
+
+    # Reactivación hecha por otro proceso: se detecta en la siguiente verificación del contador
+    usuario.activo = True
+    db.session.get(EstadoSistema, sesion_usuarios.CLAVE_VERSION).valor = '2'
+    db.session.commit()
+    monkeypatch.setattr(sesion_usuarios, 'VERIFICAR_SEGUNDOS', 0)
+    assert cargar_principal(usuario.id).nombre_completo == 'Ana B'
+
+def test_cambiar_password_con_principal(app, usuario):
+    cliente = app.test_client()
+    assert cliente.post('/auth/login', data={'nombre_usuario': 'ana', 'password': 'secreto'}).status_code == 302
+    respuesta = cliente.post('/auth/cambiar-password', data={
+        'password_actual': 'secreto', 'password_nuevo': 'nuevo123', 'password_confirmacion': 'nuevo123'})
+    assert respuesta.status_code == 302
+    assert db.session.get(Usuario, usuario.id, populate_existing=True).check_password('nuevo123')
@@ -0,0 +1,103 @@
+"""
+Tests del ejecutor de tareas en segundo plano (app/tareas.py).
+Las tareas se ejecutan de forma síncrona con ejecutar_tarea() (TAREAS_WORKERS = 0).
+"""
+import json
+import pytest
+from datetime import date
+from decimal import Decimal
+from app import create_app
+from app.models import db, Empleado, Cargo, Liquidacion, Tarea, CorridaNomina
+
+PERIODO = '2025-11'
+
+@pytest.fixture
+def app():
+    """Crea aplicación Flask para testing con BD en memoria y lotes de 2 empleados."""
+    app = create_app('testing')
+    app.config['TAREAS_TAMANO_LOTE'] = 2
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def empleados(app):
+    cargo = Cargo(nombre='Operario', salario_base=Decimal('3000000'))
+    db.session.add(cargo)
+    db.session.flush()
+    for i in range(5):
+        db.session.add(Empleado(
+            codigo=f'EMP{i:03d}', nombre='Empleado', apellido=str(i), ci=f'CI{i}',
+            cargo_id=cargo.id, salario_base=Decimal('3000000'), fecha_ingreso=date(2020, 1, 1)
+        ))
+    db.session.commit()
+    return Empleado.query.order_by(Empleado.id).all()
+
+def test_encolar_valida_parametros(app):
+    from app.tareas import encolar_tarea
+
+    with pytest.raises(ValueError):
+        encolar_tarea('inexistente', {})
+    with pytest.raises(ValueError):
+        encolar_tarea('liquidacion', {})
+
+def test_liquidacion_por_lotes(app, empleados):
+    from app.tareas import encolar_tarea, ejecutar_tarea
+
+    tarea = encolar_tarea('liquidacion', {'periodo': PERIODO})
+    assert tarea.estado == 'PENDIENTE'
+
+    assert ejecutar_tarea(tarea.id) is True
+    tarea = db.session.get(Tarea, tarea.id)
+    assert tarea.estado == 'COMPLETADA'
+    assert (tarea.total, tarea.procesados, tarea.progreso) == (5, 5, 100)
+    assert tarea.checkpoint == empleados[-1].id
+    assert json.loads(tarea.resumen)['generadas'] == 5
+    assert Liquidacion.query.filter_by(periodo=PERIODO).count() == 5
+
+    # La corrida queda registrada con el tiempo de cada etapa
+    from app.trazas import corrida_a_dict
+    corrida = CorridaNomina.query.filter_by(tarea_id=tarea.id).one()
+    perf = corrida_a_dict(corrida)
+    assert perf['empleados'] == 5
+    assert [e['etapa'] for e in perf['etapas']] == [
+        'cargar_empleados', 'agregar_fuentes', 'calcular', 'insertar', 'marcar_aplicados', 'commit'
+    ]
+
+    # Una tarea terminada no se vuelve a reclamar
+    assert ejecutar_tarea(tarea.id) is False
+
+def test_reanuda_desde_checkpoint(app, empleados):
+    """Una tarea interrumpida tras el primer lote continúa sin repetir empleados."""
+    from app.tareas import encolar_tarea, ejecutar_tarea
+    from app.nomina import calcular_liquidaciones_periodo, construir_liquidacion
+
+    tarea = encolar_tarea('liquidacion', {'periodo': PERIODO})
+    # Simular el primer lote ya confirmado y un worker caído (sin latido)
+    for r in calcular_liquidaciones_periodo(PERIODO, empleados[:2])['resultados']:
+        db.session.add(construir_liquidacion(r, PERIODO))
+    tarea.estado = 'EN_PROCESO'
+    tarea.total = 5
+    tarea.procesados = 2
+    tarea.checkpoint = empleados[1].id
+    tarea.resumen = json.dumps({'periodo': PERIODO, 'generadas': 2, 'omitidos': 0, 'advertencias': []})
+    db.session.commit()
+
+    assert ejecutar_tarea(tarea.id) is True
+    tarea = db.session.get(Tarea, tarea.id)
+    assert tarea.estado == 'COMPLETADA'
+    assert tarea.procesados == 5
+    assert json.loads(tarea.resumen) == {'periodo': PERIODO, 'generadas': 5, 'omitidos': 0, 'advertencias': []}
+    assert Liquidacion.query.filter_by(periodo=PERIODO).count() == 5
+
+def test_cancelacion_pendiente(app, empleados):
+    from app.tareas import encolar_tarea, ejecutar_tarea, solicitar_cancelacion
+
+    tarea = encolar_tarea('liquidacion', {'periodo': PERIODO})
+    solicitar_cancelacion(tarea)
+    assert tarea.estado == 'CANCELADA'
+    assert ejecutar_tarea(tarea.id) is False
+    assert Liquidacion.query.count() == 0